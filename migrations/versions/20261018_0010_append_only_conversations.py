@@ -0,0 +1,193 @@
+"""Store conversation messages as append-only rows and page code as blobs.
+
+Revision ID: 20261018_0010
+Revises: 20260809_0009
+"""
+
+from __future__ import annotations
+
+import hashlib
+import uuid
+from datetime import UTC, datetime
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "20261018_0010"
+down_revision = "20260809_0009"
+branch_labels = None
+depends_on = None
+
+conversations = sa.table(
+    "conversations",
+    sa.column("id", sa.String),
+    sa.column("owner_id", sa.String),
+    sa.column("messages", sa.JSON),
+    sa.column("current_code", sa.Text),
+    sa.column("message_count", sa.Integer),
+    sa.column("current_blob_id", sa.String),
+)
+conversation_messages = sa.table(
+    "conversation_messages",
+    sa.column("id", sa.String),
+    sa.column("conversation_id", sa.String),
+    sa.column("sequence", sa.Integer),
+    sa.column("role", sa.String),
+    sa.column("content", sa.Text),
+    sa.column("created_at", sa.DateTime(timezone=True)),
+)
+document_blobs = sa.table(
+    "document_blobs",
+    sa.column("id", sa.String),
+    sa.column("owner_id", sa.String),
+    sa.column("digest", sa.String),
+    sa.column("content", sa.Text),
+    sa.column("created_at", sa.DateTime(timezone=True)),
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "document_blobs",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("owner_id", sa.String(length=36), nullable=False),
+        sa.Column("digest", sa.String(length=64), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_document_blobs_digest"), "document_blobs", ["digest"])
+    op.create_index(op.f("ix_document_blobs_owner_id"), "document_blobs", ["owner_id"])
+    op.create_table(
+        "conversation_messages",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("conversation_id", sa.String(length=36), nullable=False),
+        sa.Column("sequence", sa.Integer(), nullable=False),
+        sa.Column("role", sa.String(length=16), nullable=False),
+        sa.Column("content", sa.Text(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(
+            ["conversation_id"], ["conversations.id"], ondelete="CASCADE"
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("conversation_id", "sequence"),
+    )
+    op.create_index(
+        op.f("ix_conversation_messages_conversation_id"),
+        "conversation_messages",
+        ["conversation_id"],
+    )
+    with op.batch_alter_table("conversations") as batch_op:
+        batch_op.add_column(
+            sa.Column("message_count", sa.Integer(), nullable=False, server_default="0")
+        )
+        batch_op.add_column(
+            sa.Column("current_blob_id", sa.String(length=36), nullable=True)
+        )
+        batch_op.create_foreign_key(
+            "fk_conversations_current_blob_id_document_blobs",
+            "document_blobs",
+            ["current_blob_id"],
+            ["id"],
+            ondelete="SET NULL",
+        )
+
+    bind = op.get_bind()
+    now = datetime.now(UTC)
+    rows = bind.execute(
+        sa.select(
+            conversations.c.id,
+            conversations.c.owner_id,
+            conversations.c.messages,
+            conversations.c.current_code,
+        )
+    ).all()
+    for conversation_id, owner_id, messages, current_code in rows:
+        messages = [item for item in messages or [] if isinstance(item, dict)]
+        if messages:
+            bind.execute(
+                conversation_messages.insert(),
+                [
+                    {
+                        "id": str(uuid.uuid4()),
+                        "conversation_id": conversation_id,
+                        "sequence": sequence,
+                        "role": str(item.get("role", "assistant")),
+                        "content": str(item.get("content", "")),
+                        "created_at": now,
+                    }
+                    for sequence, item in enumerate(messages, start=1)
+                ],
+            )
+        blob_id = None
+        if current_code is not None:
+            blob_id = str(uuid.uuid4())
+            bind.execute(
+                document_blobs.insert().values(
+                    id=blob_id,
+                    owner_id=owner_id,
+                    digest=hashlib.sha256(current_code.encode("utf-8")).hexdigest(),
+                    content=current_code,
+                    created_at=now,
+                )
+            )
+        bind.execute(
+            conversations.update()
+            .where(conversations.c.id == conversation_id)
+            .values(message_count=len(messages), current_blob_id=blob_id)
+        )
+
+    with op.batch_alter_table("conversations") as batch_op:
+        batch_op.drop_column("messages")
+        batch_op.drop_column("current_code")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("conversations") as batch_op:
+        batch_op.add_column(sa.Column("messages", sa.JSON(), nullable=True))
+        batch_op.add_column(sa.Column("current_code", sa.Text(), nullable=True))
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(conversations.c.id, conversations.c.current_blob_id)
+    ).all()
+    for conversation_id, blob_id in rows:
+        messages = [
+            {"role": role, "content": content}
+            for role, content in bind.execute(
+                sa.select(conversation_messages.c.role, conversation_messages.c.content)
+                .where(conversation_messages.c.conversation_id == conversation_id)
+                .order_by(conversation_messages.c.sequence)
+            )
+        ]
+        code = (
+            bind.scalar(
+                sa.select(document_blobs.c.content).where(
+                    document_blobs.c.id == blob_id
+                )
+            )
+            if blob_id is not None
+            else None
+        )
+        bind.execute(
+            conversations.update()
+            .where(conversations.c.id == conversation_id)
+            .values(messages=messages, current_code=code)
+        )
+
+    with op.batch_alter_table("conversations") as batch_op:
+        batch_op.alter_column("messages", nullable=False)
+        batch_op.drop_constraint(
+            "fk_conversations_current_blob_id_document_blobs", type_="foreignkey"
+        )
+        batch_op.drop_column("current_blob_id")
+        batch_op.drop_column("message_count")
+    op.drop_index(
+        op.f("ix_conversation_messages_conversation_id"),
+        table_name="conversation_messages",
+    )
+    op.drop_table("conversation_messages")
+    op.drop_index(op.f("ix_document_blobs_owner_id"), table_name="document_blobs")
+    op.drop_index(op.f("ix_document_blobs_digest"), table_name="document_blobs")
+    op.drop_table("document_blobs")
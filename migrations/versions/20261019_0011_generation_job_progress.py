@@ -0,0 +1,23 @@
+"""Record per-section progress of generation jobs.
+
+Revision ID: 20261019_0011
+Revises: 20261018_0010
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "20261019_0011"
+down_revision = "20261018_0010"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("generation_jobs") as batch_op:
+        batch_op.add_column(sa.Column("progress", sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("generation_jobs") as batch_op:
+        batch_op.drop_column("progress")
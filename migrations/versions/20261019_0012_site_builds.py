@@ -0,0 +1,40 @@
+"""Record published site builds and each project's live build.
+
+Revision ID: 20261019_0012
+Revises: 20261019_0011
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "20261019_0012"
+down_revision = "20261019_0011"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "site_builds",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("project_id", sa.String(length=36), nullable=False),
+        sa.Column("digest", sa.String(length=64), nullable=False),
+        sa.Column("revisions", sa.JSON(), nullable=False),
+        sa.Column("file_count", sa.Integer(), nullable=False),
+        sa.Column("total_bytes", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["project_id"], ["projects.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_site_builds_project_id"), "site_builds", ["project_id"])
+    with op.batch_alter_table("projects") as batch_op:
+        batch_op.add_column(
+            sa.Column("live_build_id", sa.String(length=36), nullable=True)
+        )
+
+
+def downgrade() -> None:
+    with op.batch_alter_table("projects") as batch_op:
+        batch_op.drop_column("live_build_id")
+    op.drop_index(op.f("ix_site_builds_project_id"), table_name="site_builds")
+    op.drop_table("site_builds")
@@ -0,0 +1,43 @@
+"""Record uploaded media assets and their image variants.
+
+Revision ID: 20261019_0013
+Revises: 20261019_0012
+"""
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "20261019_0013"
+down_revision = "20261019_0012"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "media_assets",
+        sa.Column("id", sa.String(length=36), nullable=False),
+        sa.Column("owner_id", sa.String(length=36), nullable=False),
+        sa.Column("sha256", sa.String(length=64), nullable=False),
+        sa.Column("content_type", sa.String(length=32), nullable=False),
+        sa.Column("byte_size", sa.Integer(), nullable=False),
+        sa.Column("filename", sa.String(length=255), nullable=False),
+        sa.Column("width", sa.Integer(), nullable=True),
+        sa.Column("height", sa.Integer(), nullable=True),
+        sa.Column("status", sa.String(length=16), nullable=False),
+        sa.Column("variants", sa.JSON(), nullable=False),
+        sa.Column("error", sa.Text(), nullable=True),
+        sa.Column("created_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("owner_id", "sha256"),
+    )
+    op.create_index(op.f("ix_media_assets_owner_id"), "media_assets", ["owner_id"])
+    op.create_index(op.f("ix_media_assets_status"), "media_assets", ["status"])
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_media_assets_status"), table_name="media_assets")
+    op.drop_index(op.f("ix_media_assets_owner_id"), table_name="media_assets")
+    op.drop_table("media_assets")
@@ -0,0 +1,232 @@
+"""Store a revision's HTML only when its editor document does not compile to it.
+
+Revision ID: 20261019_0014
+Revises: 20261019_0013
+
+Derived revisions record the compiler version that derives them. The compiler
+below is a frozen copy of version 1 of ``src.document_compiler``, with editor
+ids as revisions are saved, so this migration gives the same answer however
+the live compiler changes later.
+"""
+
+from __future__ import annotations
+
+from typing import Any
+
+import sqlalchemy as sa
+from alembic import op
+
+revision = "20261019_0014"
+down_revision = "20261019_0013"
+branch_labels = None
+depends_on = None
+
+COMPILER_VERSION = 1
+
+revisions = sa.table(
+    "revisions",
+    sa.column("id", sa.String),
+    sa.column("html", sa.Text),
+    sa.column("compiler_version", sa.Integer),
+    sa.column("document_json", sa.JSON),
+)
+
+_VOID_ELEMENTS = frozenset(
+    {
+        "area",
+        "base",
+        "br",
+        "col",
+        "embed",
+        "hr",
+        "img",
+        "input",
+        "link",
+        "meta",
+        "param",
+        "source",
+        "track",
+        "wbr",
+    }
+)
+_BREAKPOINT_WIDTHS = (("tablet", 1023), ("mobile", 639))
+_JS_WHITESPACE = (
+    "\t\n\v\f\r \u00a0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006"
+    "\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000\ufeff"
+)
+_COLLATION_ORDER = (
+    "\t\n\v\f\r _-,;:!?.'\"()[]{}@*/\\&#%`^+<=>|~$0123456789abcdefghijklmnopqrstuvwxyz"
+)
+_PRIMARY = {char: weight for weight, char in enumerate(_COLLATION_ORDER)}
+_PRIMARY.update({char.upper(): _PRIMARY[char] for char in "abcdefghijklmnopqrstuvwxyz"})
+
+
+def _collation_key(value: str) -> tuple[tuple[int, ...], tuple[bool, ...]]:
+    primary: list[int] = []
+    tertiary: list[bool] = []
+    for char in value:
+        weight = _PRIMARY.get(char)
+        if weight is None:
+            if ord(char) < 0x80:
+                continue
+            weight = len(_COLLATION_ORDER) + ord(char)
+        primary.append(weight)
+        tertiary.append(char.isupper())
+    return tuple(primary), tuple(tertiary)
+
+
+def _trim(value: str) -> str:
+    return value.strip(_JS_WHITESPACE)
+
+
+def _sorted_items(values: dict[str, str]) -> list[tuple[str, str]]:
+    return sorted(values.items(), key=lambda item: _collation_key(item[0]))
+
+
+def _escape_text(value: str) -> str:
+    return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _escape_attribute(value: str) -> str:
+    return _escape_text(value).replace('"', "&quot;")
+
+
+def _attributes(values: dict[str, str]) -> str:
+    return "".join(
+        f' {name}="{_escape_attribute(value)}"' for name, value in _sorted_items(values)
+    )
+
+
+def _compile_nodes(nodes: list[dict[str, Any]], out: list[str]) -> None:
+    for node in nodes:
+        node_type = node["type"]
+        if node_type == "text":
+            out.append(_escape_text(node["value"]))
+            continue
+        if node_type == "comment":
+            out.append(f"<!--{node['value'].replace('-->', '--&gt;')}-->")
+            continue
+        values = dict(node["attributes"])
+        values["data-mwb-id"] = node["id"]
+        tag = node["tag"]
+        out.append(f"<{tag}{_attributes(values)}>")
+        if tag in _VOID_ELEMENTS:
+            continue
+        _compile_nodes(node["children"], out)
+        out.append(f"</{tag}>")
+
+
+def _css_declarations(values: dict[str, str]) -> str:
+    return " ".join(
+        f"{name}: {_trim(value)};"
+        for name, value in _sorted_items(values)
+        if _trim(value)
+    )
+
+
+def _design_token_css(document: dict[str, Any]) -> str:
+    declarations = [
+        f"--mwb-{name}: {_trim(value)};"
+        for name, value in _sorted_items(document.get("designTokens") or {})
+        if _trim(value)
+    ]
+    return f":root {{ {' '.join(declarations)} }}" if declarations else ""
+
+
+def _responsive_css(document: dict[str, Any]) -> str:
+    styles = _sorted_items(document.get("responsiveStyles") or {})
+    blocks = []
+    for breakpoint, width in _BREAKPOINT_WIDTHS:
+        rules = []
+        for node_id, by_breakpoint in styles:
+            declarations = _css_declarations(by_breakpoint.get(breakpoint) or {})
+            if declarations:
+                rules.append(f'[data-mwb-id="{node_id}"] {{ {declarations} }}')
+        if rules:
+            joined = "\n".join(rules)
+            blocks.append(f"@media (max-width: {width}px) {{\n{joined}\n}}")
+    return "\n".join(blocks)
+
+
+def compile_document(document: dict[str, Any]) -> str:
+    compiled_css = _trim(
+        "\n\n".join(
+            part
+            for part in (
+                _design_token_css(document),
+                _trim(document["css"]),
+                _responsive_css(document),
+            )
+            if part
+        )
+    )
+    head = "\n".join(
+        item
+        for item in (
+            document["headHtml"],
+            f"<style>\n{compiled_css}\n</style>" if compiled_css else "",
+        )
+        if item
+    )
+    body: list[str] = []
+    _compile_nodes(document["body"], body)
+    body.extend(document["bodyScripts"])
+    body_attributes = _attributes(document["bodyAttributes"])
+    return "\n".join(
+        (
+            document["doctype"],
+            f"<html{_attributes(document['htmlAttributes'])}>",
+            f"<head>{head}</head>",
+            f"<body{body_attributes}>{''.join(body)}</body></html>",
+        )
+    )
+
+
+def _compiled(document: Any) -> str | None:
+    try:
+        return compile_document(document)
+    except (KeyError, TypeError, AttributeError):
+        return None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table("revisions") as batch_op:
+        batch_op.alter_column("html", existing_type=sa.Text(), nullable=True)
+        batch_op.add_column(sa.Column("compiler_version", sa.Integer(), nullable=True))
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(revisions.c.id, revisions.c.html, revisions.c.document_json).where(
+            revisions.c.document_json.is_not(None)
+        )
+    )
+    derived = [
+        revision_id
+        for revision_id, html, document in rows
+        if html is not None and _compiled(document) == html
+    ]
+    for revision_id in derived:
+        bind.execute(
+            revisions.update()
+            .where(revisions.c.id == revision_id)
+            .values(html=None, compiler_version=COMPILER_VERSION)
+        )
+
+
+def downgrade() -> None:
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.select(revisions.c.id, revisions.c.document_json).where(
+            revisions.c.html.is_(None)
+        )
+    ).all()
+    for revision_id, document in rows:
+        bind.execute(
+            revisions.update()
+            .where(revisions.c.id == revision_id)
+            .values(html=_compiled(document) or "")
+        )
+
+    with op.batch_alter_table("revisions") as batch_op:
+        batch_op.drop_column("compiler_version")
+        batch_op.alter_column("html", existing_type=sa.Text(), nullable=False)
@@ -6,7 +6,9 @@ stateful graph with:
 - **Memory**: conversation history supplied by the durable orchestration layer.
 - **Intent classification**: routes user input to generate / refine / answer.
 - **Guardrails**: every generation passes through safety + a11y + HTML validation;
-  failures route to a retry node (capped at ``MAX_RETRIES``).
+  failures route to a retry node (capped at ``MAX_RETRIES``). Output cut off at
+  the token limit is not retried: the provider layer has already tried to
+  resume it, and a fresh attempt would stop at the same limit.
 - **Resilience**: node-level try/except, retry with backoff, and a fallback
   "explain the error" node when retries are exhausted.
 
@@ -27,11 +29,17 @@ from server.editor_scope import apply_scoped_generation
 # Reuse the generation wrapper from runtime
 from server.runtime import GenerationClient, generate
 from src.a11y import audit_generated_html
-from src.generation import strip_html_code_fence
+from src.generation import finish_reason_of, strip_html_code_fence
 from src.js_analysis import audit_inline_scripts
+from src.perf_audit import DEFAULT_BUDGET, audit_page_weight
 from src.safety import apply_output_safety_policy
+from src.truncation import is_truncated
 
 MAX_RETRIES = 2
+TRUNCATED_OUTPUT_ERROR = (
+    "Output was cut off at the output token limit even after continuing it "
+    "(increase max tokens)"
+)
 
 _REFINE_KEYWORDS = re.compile(
     r"\b(change|make|update|fix|move|color|colour|smaller|larger|bigger|"
@@ -64,6 +72,8 @@ class BuilderState(TypedDict):
     generation_result: str | None
     validation_errors: list[str]
     validation_notes: list[str]
+    #: Page-weight measurements of the validated page.
+    perf: dict[str, Any] | None
     retry_count: int
     settings: dict[str, Any]
     error: str | None
@@ -171,7 +181,7 @@ def _call_refine(state: BuilderState) -> dict[str, Any]:
 
 
 def _validate_output(state: BuilderState) -> dict[str, Any]:
-    """Guardrail node: safety policy + a11y + JS audit on the LLM output."""
+    """Guardrail node: safety policy + a11y + JS + page-weight audit on the LLM output."""
     raw = state.get("generation_result")
     if not raw:
         return {"validation_errors": ["No output from LLM"], "validation_notes": []}
@@ -180,6 +190,9 @@ def _validate_output(state: BuilderState) -> dict[str, Any]:
         return {"validation_errors": [raw], "validation_notes": []}
 
     clean = strip_html_code_fence(raw)
+    # Stripping the fence may yield a plain string; the reason rides on ``raw``.
+    if is_truncated(clean, finish_reason_of(raw)):
+        return {"validation_errors": [TRUNCATED_OUTPUT_ERROR], "validation_notes": []}
     sanitized, safety_alerts = apply_output_safety_policy(clean)
     target_node_id = state.get("target_node_id")
     if target_node_id:
@@ -194,6 +207,8 @@ def _validate_output(state: BuilderState) -> dict[str, Any]:
             }
     a11y_notes = audit_generated_html(sanitized)
     js_notes = audit_inline_scripts(sanitized)
+    budget = state.get("settings", {}).get("perf_budget") or DEFAULT_BUDGET
+    perf = audit_page_weight(sanitized, budget)
 
     errors: list[str] = []
     if safety_alerts:
@@ -201,11 +216,9 @@ def _validate_output(state: BuilderState) -> dict[str, Any]:
 
     # Check that the output has actual body content
     if not re.search(r"<body", sanitized, re.IGNORECASE):
-        errors.append(
-            "Output is missing <body> — likely truncated (increase max tokens)"
-        )
+        errors.append("Output is missing <body>")
 
-    notes = a11y_notes + js_notes
+    notes = a11y_notes + js_notes + perf.notes
     if errors:
         return {"validation_errors": errors, "validation_notes": notes}
 
@@ -214,6 +227,7 @@ def _validate_output(state: BuilderState) -> dict[str, Any]:
         "generation_result": sanitized,
         "validation_errors": [],
         "validation_notes": notes,
+        "perf": perf.to_dict(),
     }
 
 
@@ -227,7 +241,10 @@ def _route_validation(state: BuilderState) -> str:
     # so re-running this node would multiply attempts (and the provider timeout)
     # instead of adding resilience. Only guardrail failures are worth another
     # generation, because those depend on what the model happened to return.
-    if any(error.startswith("API error:") for error in errors):
+    if any(
+        error.startswith("API error:") or error == TRUNCATED_OUTPUT_ERROR
+        for error in errors
+    ):
         return "error_fallback"
 
     retry_count = state.get("retry_count", 0)
@@ -395,6 +412,7 @@ def run_agent(
         "retry_count": 0,
         "validation_errors": [],
         "validation_notes": [],
+        "perf": None,
         "settings": settings or {},
         "target_node_id": target_node_id,
     }
@@ -1,14 +1,33 @@
-"""Database engine and session construction for the modular monolith."""
+"""Database engine and session construction for the modular monolith.
+
+A file SQLite database is opened in WAL mode with one writer connection and a
+pool of readers (see :func:`create_sqlite_engines`). Every
+``sessionmaker.begin()`` block runs on the writer inside ``BEGIN IMMEDIATE``,
+so write transactions queue for it in turn instead of failing with
+``database is locked``, and a read-modify-write such as a rate-limit count
+cannot lose an update. Plain sessions read from the pool, and move to the
+writer only if they flush.
+"""
 
 from __future__ import annotations
 
+import contextlib
+import hashlib
+import json
+import logging
+from collections.abc import Iterator
 from pathlib import Path
 from typing import Any
 
-from sqlalchemy import Engine, create_engine, inspect
+from sqlalchemy import Engine, create_engine, event, inspect, text
 from sqlalchemy.engine import make_url
 from sqlalchemy.orm import DeclarativeBase, Session, sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlalchemy.sql.dml import UpdateBase
+
+from src.observability import count
+
+logger = logging.getLogger(__name__)
 
 
 class Base(DeclarativeBase):
@@ -19,10 +38,35 @@ class SchemaOutOfDateError(RuntimeError):
     """The live database is missing structure the running code expects."""
 
 
-def create_database_engine(database_url: str) -> Engine:
+#: Read connections kept open to a file SQLite database; 0 shares one pool.
+DEFAULT_SQLITE_READERS = 4
+#: Seconds a write transaction waits for the writer connection.
+SQLITE_WRITE_QUEUE_TIMEOUT_SECONDS = 30.0
+#: Set on every connection to a file SQLite database. WAL lets readers run
+#: alongside the writer, and ``synchronous=NORMAL`` is durable across
+#: application crashes in that mode.
+SQLITE_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("busy_timeout", "5000"),
+    ("synchronous", "NORMAL"),
+    ("mmap_size", str(256 * 1024 * 1024)),
+    # Negative sizes are in KiB: 20 MB of page cache per connection.
+    ("cache_size", "-20000"),
+)
+
+
+def _is_file_sqlite(database_url: str) -> bool:
+    url = make_url(database_url)
+    return url.get_backend_name() == "sqlite" and url.database not in (
+        None,
+        "",
+        ":memory:",
+    )
+
+
+def create_database_engine(database_url: str, **engine_options: Any) -> Engine:
     """Build an engine with safe SQLite defaults and production-neutral behavior."""
     url = make_url(database_url)
-    engine_options: dict[str, Any] = {}
     if url.get_backend_name() == "sqlite":
         engine_options["connect_args"] = {"check_same_thread": False}
         if url.database in (None, "", ":memory:"):
@@ -31,15 +75,120 @@ def create_database_engine(database_url: str) -> Engine:
             Path(url.database).expanduser().resolve().parent.mkdir(
                 parents=True, exist_ok=True
             )
-    return create_engine(database_url, **engine_options)
+    engine = create_engine(database_url, **engine_options)
+    if _is_file_sqlite(database_url):
+        event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(engine, "before_cursor_execute", _count_query)
+    return engine
+
+
+def _set_sqlite_pragmas(dbapi_connection: Any, _record: Any) -> None:
+    cursor = dbapi_connection.cursor()
+    try:
+        for name, value in SQLITE_PRAGMAS:
+            cursor.execute(f"PRAGMA {name} = {value}")
+    finally:
+        cursor.close()
+
+
+def _own_transactions(engine: Engine, begin: str, *, read_only: bool) -> None:
+    """Have SQLAlchemy open each transaction with ``begin``, not pysqlite.
+
+    pysqlite only begins a transaction before the first write, so the reads
+    before it are not isolated, and it can only begin deferred transactions.
+    """
+
+    def on_connect(dbapi_connection: Any, _record: Any) -> None:
+        dbapi_connection.isolation_level = None
+        if read_only:
+            dbapi_connection.execute("PRAGMA query_only = ON")
+
+    def on_begin(connection: Any) -> None:
+        # On the driver connection, so it is not counted as a query.
+        connection.connection.driver_connection.execute(begin)
+
+    event.listen(engine, "connect", on_connect)
+    event.listen(engine, "begin", on_begin)
+
+
+def create_sqlite_engines(
+    database_url: str,
+    readers: int = DEFAULT_SQLITE_READERS,
+    *,
+    write_timeout: float = SQLITE_WRITE_QUEUE_TIMEOUT_SECONDS,
+) -> tuple[Engine, Engine]:
+    """The writer and reader engines for a file SQLite database.
+
+    The writer pool holds a single connection and threads wait in its queue
+    for up to ``write_timeout`` seconds; its transactions take the write lock
+    as they begin. Readers are ``query_only`` and see one snapshot per
+    transaction.
+    """
+    writer = create_database_engine(
+        database_url,
+        poolclass=QueuePool,
+        pool_size=1,
+        max_overflow=0,
+        pool_timeout=write_timeout,
+    )
+    reader = create_database_engine(
+        database_url,
+        poolclass=QueuePool,
+        pool_size=readers,
+        # A thread reading in two sessions at once cannot starve the others.
+        max_overflow=readers,
+    )
+    _own_transactions(writer, "BEGIN IMMEDIATE", read_only=False)
+    _own_transactions(reader, "BEGIN", read_only=True)
+    return writer, reader
+
+
+def _count_query(*_args: Any) -> None:
+    # Attributed to the generation job running on this thread, if any, so a
+    # per-job query count shows N+1 patterns before they show up as latency.
+    count("db_queries")
 
 
 def is_sqlite_url(database_url: str) -> bool:
     return make_url(database_url).get_backend_name() == "sqlite"
 
 
-def create_session_factory(engine: Engine) -> sessionmaker[Session]:
-    return sessionmaker(engine, expire_on_commit=False)
+class RoutedSession(Session):
+    """A session on the SQLite writer that reads from a reader pool.
+
+    It stays on ``reader`` until it flushes or executes a DML statement, then
+    uses the writer for the rest of its life. Sessions opened with
+    ``sessionmaker.begin()`` use the writer from the start.
+    """
+
+    def __init__(self, *args: Any, reader: Engine, writes: bool = False, **kw: Any):
+        super().__init__(*args, **kw)
+        self.reader = reader
+        self.writes = writes
+
+    def get_bind(self, mapper: Any = None, *, clause: Any = None, **kw: Any) -> Any:
+        if not self.writes and (self._flushing or isinstance(clause, UpdateBase)):
+            self.writes = True
+        if self.writes:
+            return super().get_bind(mapper, clause=clause, **kw)
+        return self.reader
+
+
+class RoutedSessionmaker(sessionmaker[RoutedSession]):
+    @contextlib.contextmanager
+    def begin(self) -> Iterator[RoutedSession]:  # type: ignore[override]
+        with self(writes=True) as session, session.begin():
+            yield session
+
+
+def create_session_factory(
+    engine: Engine, reader: Engine | None = None
+) -> sessionmaker[Session]:
+    if reader is None:
+        return sessionmaker(engine, expire_on_commit=False)
+    return RoutedSessionmaker(  # type: ignore[return-value]
+        engine, class_=RoutedSession, reader=reader, expire_on_commit=False
+    )
 
 
 def find_schema_drift(engine: Engine) -> list[str]:
@@ -84,18 +233,104 @@ def verify_schema(engine: Engine) -> None:
         )
 
 
+def schema_revision(engine: Engine) -> str | None:
+    """The Alembic revision the database is stamped with, if any."""
+    if not inspect(engine).has_table("alembic_version"):
+        return None
+    with engine.connect() as connection:
+        rows = connection.execute(text("SELECT version_num FROM alembic_version"))
+        versions = sorted(str(row[0]) for row in rows)
+    return ",".join(versions) or None
+
+
+def models_fingerprint() -> str:
+    """A digest of the tables and columns the running code maps."""
+    import server.models  # noqa: F401 - register the mapped tables on Base
+
+    names = sorted(
+        f"{table.name}.{column.name}"
+        for table in Base.metadata.sorted_tables
+        for column in table.columns
+    )
+    return hashlib.sha256("\n".join(names).encode()).hexdigest()[:16]
+
+
+class SchemaCheckCache:
+    """Remember which Alembic revisions already passed :func:`verify_schema`.
+
+    Reflecting every table costs a round trip per table on each boot. A
+    database stamped with a revision that was verified against the same mapped
+    models cannot have drifted without its revision changing too, so the check
+    is skipped. Unstamped databases, made by ``create_all``, are always checked.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+
+    def _load(self) -> dict[str, Any]:
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return {}
+        return data if isinstance(data, dict) else {}
+
+    @staticmethod
+    def _key(engine: Engine) -> str:
+        url = engine.url.render_as_string(hide_password=True)
+        return hashlib.sha256(url.encode()).hexdigest()[:16]
+
+    def is_verified(self, engine: Engine, revision: str, fingerprint: str) -> bool:
+        entry = self._load().get(self._key(engine))
+        return entry == {"revision": revision, "models": fingerprint}
+
+    def record(self, engine: Engine, revision: str, fingerprint: str) -> None:
+        data = self._load()
+        data[self._key(engine)] = {"revision": revision, "models": fingerprint}
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            scratch = self.path.with_suffix(".tmp")
+            scratch.write_text(json.dumps(data, sort_keys=True), encoding="utf-8")
+            scratch.replace(self.path)
+        except OSError:
+            # A cache that cannot be written only costs the next boot a check.
+            logger.warning("Could not write schema check cache %s", self.path)
+
+
 class Database:
-    """Own the shared engine and session factory for one application process."""
+    """Own the shared engine and session factory for one application process.
+
+    ``engine`` is the one that writes; ``reader`` is the SQLite read pool, when
+    there is one.
+    """
 
-    def __init__(self, engine: Engine):
+    def __init__(self, engine: Engine, reader: Engine | None = None):
         self.engine = engine
-        self.sessions = create_session_factory(engine)
+        self.reader = reader
+        self.sessions = create_session_factory(engine, reader)
 
     @classmethod
     def from_url(
-        cls, database_url: str, *, create_schema: bool | None = None
+        cls,
+        database_url: str,
+        *,
+        create_schema: bool | None = None,
+        schema_cache: SchemaCheckCache | None = None,
+        sqlite_readers: int = DEFAULT_SQLITE_READERS,
     ) -> Database:
-        engine = create_database_engine(database_url)
+        reader = None
+        if sqlite_readers > 0 and _is_file_sqlite(database_url):
+            engine, reader = create_sqlite_engines(database_url, sqlite_readers)
+        else:
+            engine = create_database_engine(database_url)
+        revision = schema_revision(engine) if schema_cache is not None else None
+        fingerprint = models_fingerprint() if revision is not None else ""
+        if (
+            schema_cache is not None
+            and revision is not None
+            and schema_cache.is_verified(engine, revision, fingerprint)
+        ):
+            logger.info("Schema at revision %s already verified", revision)
+            return cls(engine, reader)
         if create_schema is None:
             create_schema = is_sqlite_url(database_url)
         if create_schema:
@@ -104,7 +339,11 @@ class Database:
 
             Base.metadata.create_all(engine)
         verify_schema(engine)
-        return cls(engine)
+        if schema_cache is not None and revision is not None:
+            schema_cache.record(engine, revision, fingerprint)
+        return cls(engine, reader)
 
     def close(self) -> None:
         self.engine.dispose()
+        if self.reader is not None:
+            self.reader.dispose()
@@ -1,115 +1,306 @@
-"""Validation boundary for the versioned visual-editor document format."""
+"""Validation boundary for the versioned visual-editor document format.
+
+A document is checked in one walk that also measures its compact JSON size,
+so the size limit needs no serialized copy and a document over a limit fails
+as soon as the walk passes it. Strings are only collected on the way; the few
+characters JSON escapes are counted once at the end, over all of them.
+
+An autosave changes a few nodes of a document that was valid a moment ago.
+:func:`validate_editor_document_change` takes that trusted base and its
+:class:`DocumentStats` and walks only the subtrees that changed.
+"""
 
 from __future__ import annotations
 
 import json
 import re
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from itertools import chain, repeat
+from json.encoder import encode_basestring
 from typing import Any
 
 MAX_EDITOR_DOCUMENT_CHARS = 4_000_000
 MAX_EDITOR_DOCUMENT_NODES = 50_000
 MAX_EDITOR_DOCUMENT_DEPTH = 100
-EDITOR_NODE_ID_PATTERN = r"^[A-Za-z0-9_-]{1,80}$"
-_NODE_ID = re.compile(EDITOR_NODE_ID_PATTERN)
-_TAG_NAME = re.compile(r"^[A-Za-z][A-Za-z0-9:-]{0,79}$")
+MAX_CACHED_DOCUMENT_STATS = 256
+_NODE_ID = r"[A-Za-z0-9_-]{1,80}"
+_TAG_NAME = r"[A-Za-z][A-Za-z0-9:-]{0,79}"
+EDITOR_NODE_ID_PATTERN = f"^{_NODE_ID}$"
+#: Whole levels of ids and tags are checked at once, joined by newlines.
+_NODE_ID_LINES = re.compile(f"{_NODE_ID}(?:\n{_NODE_ID})*")
+_TAG_NAME_LINES = re.compile(f"{_TAG_NAME}(?:\n{_TAG_NAME})*")
 _CSS_PROPERTY = re.compile(r"^(?:--)?[A-Za-z][A-Za-z0-9-]{0,79}$")
 _DESIGN_TOKEN = re.compile(r"^[a-z][a-z0-9-]{0,79}$")
+_NEEDS_ESCAPE = re.compile(r'["\\\x00-\x1f]')
+_BREAKPOINTS = frozenset({"tablet", "mobile"})
+_STRING_FIELDS = ("doctype", "headHtml", "css")
+_ATTRIBUTE_FIELDS = ("htmlAttributes", "bodyAttributes")
+_REQUIRED_FIELDS = (*_STRING_FIELDS, *_ATTRIBUTE_FIELDS, "bodyScripts")
+_WALKED_FIELDS = frozenset({*_REQUIRED_FIELDS, "body", "responsiveStyles"})
+_ELEMENT_KEYS = frozenset({"type", "id", "tag", "attributes", "children"})
+_LEAF_KEYS = frozenset({"type", "value"})
+_join = "".join
 
 
 class EditorDocumentValidationError(ValueError):
     pass
 
 
-def _string_map(value: Any, label: str) -> None:
-    if not isinstance(value, dict) or any(
-        not isinstance(key, str) or not isinstance(item, str)
-        for key, item in value.items()
-    ):
-        raise EditorDocumentValidationError(f"{label} must contain string values")
+@dataclass(frozen=True)
+class DocumentStats:
+    """What validating a document measured, to check changes to it against."""
 
+    #: Length of the document as compact JSON (``separators=(",", ":")``).
+    chars: int
+    nodes: int
+    ids: frozenset[str]
 
-def validate_editor_document(value: dict[str, Any] | None) -> dict[str, Any] | None:
-    if value is None:
-        return None
-    if (
-        not isinstance(value, dict)
-        or type(value.get("schemaVersion")) is not int
-        or value.get("schemaVersion") != 1
-    ):
-        raise EditorDocumentValidationError("Unsupported editor document schema")
+
+class DocumentStatsCache:
+    """Thread-safe, bounded LRU map of revision ids to their document's stats."""
+
+    def __init__(self, max_entries: int = MAX_CACHED_DOCUMENT_STATS) -> None:
+        self._entries: OrderedDict[str, DocumentStats] = OrderedDict()
+        self._max_entries = max_entries
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> DocumentStats | None:
+        with self._lock:
+            stats = self._entries.get(key)
+            if stats is not None:
+                self._entries.move_to_end(key)
+            return stats
+
+    def put(self, key: str, stats: DocumentStats) -> None:
+        with self._lock:
+            self._entries[key] = stats
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+
+
+def _too_large() -> EditorDocumentValidationError:
+    return EditorDocumentValidationError(
+        f"Editor document must be at most {MAX_EDITOR_DOCUMENT_CHARS} characters"
+    )
+
+
+def _not_json() -> EditorDocumentValidationError:
+    return EditorDocumentValidationError("Editor document must be valid JSON")
+
+
+def _string_chars(value: str) -> int:
+    if _NEEDS_ESCAPE.search(value) is None:
+        return len(value) + 2
+    return len(encode_basestring(value))
+
+
+def _escaped_chars(strings: list[str]) -> int:
+    """How many more characters ``strings`` take once JSON escapes them."""
+    joined = _join(strings)
+    if _NEEDS_ESCAPE.search(joined) is None:
+        return 0
+    return len(encode_basestring(joined)) - len(joined) - 2
+
+
+def _json_chars(value: Any) -> int:
+    """Compact JSON size of a value the format leaves open."""
     try:
-        encoded = json.dumps(value, separators=(",", ":"), ensure_ascii=False)
+        return len(json.dumps(value, separators=(",", ":"), ensure_ascii=False))
     except (TypeError, ValueError) as exc:
+        raise _not_json() from exc
+
+
+def _object_chars(value: dict[Any, Any]) -> int:
+    """Braces, keys, colons and commas of a non-empty object; not its values."""
+    try:
+        keys = _join(value)
+    except TypeError as exc:
+        raise _not_json() from exc
+    return 4 * len(value) - 1 + _string_chars(keys)
+
+
+def _extra_chars(node: dict[Any, Any], known: frozenset[str]) -> int:
+    """Size of the fields of a node the format does not define, with their commas."""
+    chars = 0
+    for key, item in node.items():
+        if key not in known:
+            if not isinstance(key, str):
+                raise _not_json()
+            chars += _string_chars(key) + 2 + _json_chars(item)
+    return chars
+
+
+def _joined_lines(values: list[Any], pattern: re.Pattern[str]) -> str | None:
+    """``values`` joined by newlines, if each is a string matching one line."""
+    try:
+        joined = "\n".join(values)
+    except TypeError:
+        return None
+    # A value holding a newline would pass as two lines; the count catches it.
+    if joined.count("\n") != len(values) - 1 or pattern.fullmatch(joined) is None:
+        return None
+    return joined
+
+
+def _measure_elements(
+    node_ids: list[Any],
+    tags: list[Any],
+    attribute_maps: list[Any],
+    ids: set[str],
+    strings: list[str],
+) -> int:
+    """Check one level's element ids, tags and attributes; returns their size."""
+    joined_ids = _joined_lines(node_ids, _NODE_ID_LINES)
+    if joined_ids is None:
+        raise EditorDocumentValidationError("Element node ID is invalid")
+    known = len(ids)
+    ids.update(node_ids)
+    if len(ids) != known + len(node_ids):
+        raise EditorDocumentValidationError("Element node IDs must be unique")
+    joined_tags = _joined_lines(tags, _TAG_NAME_LINES)
+    if joined_tags is None:
+        raise EditorDocumentValidationError("Element tag is invalid")
+    if not all(map(isinstance, attribute_maps, repeat(dict))):
         raise EditorDocumentValidationError(
-            "Editor document must be valid JSON"
-        ) from exc
-    if len(encoded) > MAX_EDITOR_DOCUMENT_CHARS:
-        raise EditorDocumentValidationError(
-            f"Editor document must be at most {MAX_EDITOR_DOCUMENT_CHARS} characters"
+            "Element attributes must contain string values"
         )
+    try:
+        names = _join(chain.from_iterable(attribute_maps))
+        values = _join(chain.from_iterable(map(dict.values, attribute_maps)))
+    except TypeError:
+        raise EditorDocumentValidationError(
+            "Element attributes must contain string values"
+        ) from None
+    strings.append(names)
+    strings.append(values)
+    sizes = list(map(len, attribute_maps))
+    # Ids and tags never need escaping: their patterns say so. Each attribute
+    # is "":"" and a comma, each map {} or one comma fewer than it has pairs.
+    return (
+        len(joined_ids)
+        + len(joined_tags)
+        - 2 * (len(node_ids) - 1)
+        + len(names)
+        + len(values)
+        + 6 * sum(sizes)
+        + len(sizes)
+        + sizes.count(0)
+    )
 
-    for field in ("doctype", "headHtml", "css"):
-        if not isinstance(value.get(field), str):
-            raise EditorDocumentValidationError(f"{field} must be a string")
-    _string_map(value.get("htmlAttributes"), "htmlAttributes")
-    _string_map(value.get("bodyAttributes"), "bodyAttributes")
-    scripts = value.get("bodyScripts")
-    if not isinstance(scripts, list) or any(
-        not isinstance(script, str) for script in scripts
-    ):
-        raise EditorDocumentValidationError("bodyScripts must be a list of strings")
-    body = value.get("body")
-    if not isinstance(body, list):
-        raise EditorDocumentValidationError("body must be a list")
 
-    used_ids: set[str] = set()
-    node_count = 0
-    pending = [(node, 1) for node in reversed(body)]
-    while pending:
-        node, depth = pending.pop()
-        node_count += 1
-        if node_count > MAX_EDITOR_DOCUMENT_NODES:
+def _string_map(value: Any, label: str) -> int:
+    if not isinstance(value, dict):
+        raise EditorDocumentValidationError(f"{label} must contain string values")
+    if not value:
+        return 2
+    try:
+        joined = _join((_join(value), _join(value.values())))
+    except TypeError:
+        raise EditorDocumentValidationError(
+            f"{label} must contain string values"
+        ) from None
+    return 6 * len(value) - 1 + _string_chars(joined)
+
+
+def _walk_nodes(
+    nodes: list[Any], depth: int, ids: set[str], max_chars: int, max_nodes: int
+) -> tuple[int, int]:
+    """Validate ``nodes``, which sit at ``depth``, and everything under them.
+
+    Returns their compact JSON size, not counting the list they are in, and
+    how many nodes there were. Element ids are added to ``ids`` and must not
+    be in it already. Fails as soon as either limit is passed.
+
+    The walk goes a level at a time so that ids, tags, attributes and text of
+    a whole level are checked and measured together, by a few calls into C.
+    """
+    strings: list[str] = []
+    chars = 0
+    count = 0
+    level = nodes
+    while level:
+        count += len(level)
+        if count > max_nodes:
             raise EditorDocumentValidationError("Editor document has too many nodes")
         if depth > MAX_EDITOR_DOCUMENT_DEPTH:
             raise EditorDocumentValidationError("Editor document is nested too deeply")
-        if not isinstance(node, dict):
-            raise EditorDocumentValidationError("Document nodes must be objects")
-        node_type = node.get("type")
-        if node_type in {"text", "comment"}:
-            if not isinstance(node.get("value"), str):
-                raise EditorDocumentValidationError(
-                    f"{node_type} node value must be a string"
+        below: list[Any] = []
+        descend = below.extend
+        node_ids: list[Any] = []
+        tags: list[Any] = []
+        attribute_maps: list[Any] = []
+        leaves: list[Any] = []
+        texts = childless = 0
+        for node in level:
+            if not isinstance(node, dict):
+                raise EditorDocumentValidationError("Document nodes must be objects")
+            node_type = node.get("type")
+            if node_type == "element":
+                children = node.get("children")
+                if not isinstance(children, list):
+                    raise EditorDocumentValidationError(
+                        "Element children must be a list"
+                    )
+                if children:
+                    descend(children)
+                else:
+                    childless += 1
+                node_ids.append(node.get("id"))
+                tags.append(node.get("tag"))
+                attribute_maps.append(node.get("attributes"))
+                if len(node) != 5:
+                    chars += _extra_chars(node, _ELEMENT_KEYS)
+            elif node_type == "text" or node_type == "comment":
+                leaves.append(node)
+                if node_type == "text":
+                    texts += 1
+                if len(node) != 2:
+                    chars += _extra_chars(node, _LEAF_KEYS)
+            else:
+                raise EditorDocumentValidationError("Unsupported document node type")
+
+        if node_ids:
+            chars += _measure_elements(node_ids, tags, attribute_maps, ids, strings)
+            # {"type":"element","id":"","tag":"","attributes":,"children":[]}
+            chars += 61 * len(node_ids) + len(below) + len(node_ids) + childless
+        if leaves:
+            values = [leaf.get("value") for leaf in leaves]
+            try:
+                joined = _join(values)
+            except TypeError:
+                leaf = next(
+                    leaf for leaf in leaves if not isinstance(leaf.get("value"), str)
                 )
-            continue
-        if node_type != "element":
-            raise EditorDocumentValidationError("Unsupported document node type")
-        node_id = node.get("id")
-        if not isinstance(node_id, str) or not _NODE_ID.fullmatch(node_id):
-            raise EditorDocumentValidationError("Element node ID is invalid")
-        if node_id in used_ids:
-            raise EditorDocumentValidationError("Element node IDs must be unique")
-        used_ids.add(node_id)
-        tag = node.get("tag")
-        if not isinstance(tag, str) or not _TAG_NAME.fullmatch(tag):
-            raise EditorDocumentValidationError("Element tag is invalid")
-        _string_map(node.get("attributes"), "Element attributes")
-        children = node.get("children")
-        if not isinstance(children, list):
-            raise EditorDocumentValidationError("Element children must be a list")
-        pending.extend((child, depth + 1) for child in reversed(children))
-
-    responsive_styles = value.get("responsiveStyles", {})
-    if not isinstance(responsive_styles, dict):
+                raise EditorDocumentValidationError(
+                    f"{leaf['type']} node value must be a string"
+                ) from None
+            strings.append(joined)
+            # {"type":"text","value":""}, and three more for "comment".
+            chars += len(joined) + 29 * len(leaves) - 3 * texts
+        # Escapes are counted at the end, so this is the least the size can be.
+        if chars > max_chars:
+            raise _too_large()
+        level = below
+        depth += 1
+    return chars + _escaped_chars(strings), count
+
+
+def _responsive_styles(value: Any, ids: frozenset[str] | set[str]) -> int:
+    if not isinstance(value, dict):
         raise EditorDocumentValidationError("responsiveStyles must be an object")
-    for node_id, breakpoint_styles in responsive_styles.items():
-        if node_id not in used_ids or not isinstance(breakpoint_styles, dict):
+    chars = 2 + max(0, len(value) - 1)
+    for node_id, breakpoint_styles in value.items():
+        if node_id not in ids or not isinstance(breakpoint_styles, dict):
             raise EditorDocumentValidationError(
                 "Responsive styles must reference an existing element"
             )
+        chars += _string_chars(node_id) + 1 + 2 + max(0, len(breakpoint_styles) - 1)
         for breakpoint, declarations in breakpoint_styles.items():
-            if breakpoint not in {"tablet", "mobile"} or not isinstance(
-                declarations, dict
-            ):
+            if breakpoint not in _BREAKPOINTS or not isinstance(declarations, dict):
                 raise EditorDocumentValidationError(
                     "Responsive style breakpoint is invalid"
                 )
@@ -122,14 +313,223 @@ def validate_editor_document(value: dict[str, Any] | None) -> dict[str, Any] | N
                 raise EditorDocumentValidationError(
                     "Responsive style declarations are invalid"
                 )
+            chars += (
+                len(breakpoint)
+                + 3
+                + _string_map(declarations, "Responsive style declarations")
+            )
+    return chars
+
 
-    design_tokens = value.get("designTokens", {})
-    if not isinstance(design_tokens, dict) or any(
+def _design_tokens(value: Any) -> int:
+    if not isinstance(value, dict) or any(
         not isinstance(name, str)
         or not _DESIGN_TOKEN.fullmatch(name)
         or not isinstance(token_value, str)
         or len(token_value) > 500
-        for name, token_value in design_tokens.items()
+        for name, token_value in value.items()
     ):
         raise EditorDocumentValidationError("Design tokens are invalid")
+    return _string_map(value, "Design tokens")
+
+
+def _field_chars(document: dict[str, Any], name: str) -> int:
+    """Validate one top-level field; returns the size of its value.
+
+    Not for ``body`` and ``responsiveStyles``, which need the walk's ids.
+    """
+    value = document.get(name)
+    if name in _STRING_FIELDS:
+        if not isinstance(value, str):
+            raise EditorDocumentValidationError(f"{name} must be a string")
+        return _string_chars(value)
+    if name in _ATTRIBUTE_FIELDS:
+        return _string_map(value, name)
+    if name == "bodyScripts":
+        if not isinstance(value, list):
+            raise EditorDocumentValidationError("bodyScripts must be a list of strings")
+        try:
+            joined = _join(value)
+        except TypeError:
+            raise EditorDocumentValidationError(
+                "bodyScripts must be a list of strings"
+            ) from None
+        if not value:
+            return 2
+        return 3 * len(value) - 1 + _string_chars(joined)
+    if name == "designTokens":
+        return _design_tokens(value)
+    if name == "schemaVersion":
+        return 1
+    return _json_chars(value)
+
+
+def _check_schema(value: Any) -> None:
+    if (
+        not isinstance(value, dict)
+        or type(value.get("schemaVersion")) is not int
+        or value.get("schemaVersion") != 1
+    ):
+        raise EditorDocumentValidationError("Unsupported editor document schema")
+
+
+def editor_document_stats(value: dict[str, Any]) -> DocumentStats:
+    """Validate a whole editor document and measure it."""
+    _check_schema(value)
+    chars = _object_chars(value)
+    for name in _REQUIRED_FIELDS:
+        chars += _field_chars(value, name)
+    body = value.get("body")
+    if not isinstance(body, list):
+        raise EditorDocumentValidationError("body must be a list")
+    ids: set[str] = set()
+    body_chars, nodes = _walk_nodes(
+        body, 1, ids, MAX_EDITOR_DOCUMENT_CHARS - chars, MAX_EDITOR_DOCUMENT_NODES
+    )
+    chars += body_chars + (len(body) + 1 if body else 2)
+    frozen_ids = frozenset(ids)
+    styles_chars = _responsive_styles(value.get("responsiveStyles", {}), frozen_ids)
+    if "responsiveStyles" in value:
+        chars += styles_chars
+    for name in value:
+        if name not in _WALKED_FIELDS:
+            chars += _field_chars(value, name)
+    if chars > MAX_EDITOR_DOCUMENT_CHARS:
+        raise _too_large()
+    return DocumentStats(chars=chars, nodes=nodes, ids=frozen_ids)
+
+
+def validate_editor_document(value: dict[str, Any] | None) -> dict[str, Any] | None:
+    if value is not None:
+        editor_document_stats(value)
     return value
+
+
+# ---- changes against a trusted base ----
+
+
+def _is_index(token: str) -> bool:
+    return token.isascii() and token.isdigit() and (token == "0" or token[0] != "0")
+
+
+def _enclosing_node(path: Sequence[str]) -> tuple[str, ...] | None:
+    """The path of the deepest node that contains ``path`` without being it.
+
+    ``None`` when that is the body list itself: a node was added, removed or
+    replaced at the top level.
+    """
+    end = 0
+    while (
+        end + 2 < len(path)
+        and path[end] == ("body" if end == 0 else "children")
+        and _is_index(path[end + 1])
+    ):
+        end += 2
+    return tuple(path[:end]) if end else None
+
+
+def _resolve(document: Any, path: tuple[str, ...]) -> Any:
+    for token in path:
+        if isinstance(document, dict):
+            document = document.get(token)
+        elif isinstance(document, list) and int(token) < len(document):
+            document = document[int(token)]
+        else:
+            return None
+    return document
+
+
+def _entry_chars(document: dict[str, Any], name: str, ids: frozenset[str]) -> int:
+    """Validate one top-level field; returns its size as ``"name":value``."""
+    if name not in document and name not in _REQUIRED_FIELDS:
+        return 0
+    if name == "responsiveStyles":
+        value_chars = _responsive_styles(document[name], ids)
+    else:
+        value_chars = _field_chars(document, name)
+    return _string_chars(name) + 1 + value_chars
+
+
+def validate_editor_document_change(
+    document: dict[str, Any] | None,
+    base: dict[str, Any] | None,
+    base_stats: DocumentStats | None,
+    changed: Iterable[Sequence[str]],
+) -> DocumentStats | None:
+    """Validate ``document``, which is ``base`` changed only at the ``changed`` paths.
+
+    ``base`` must have passed validation and measured ``base_stats``; paths
+    are JSON Pointer tokens, as :func:`src.delta.changed_paths` lists them.
+    Only the nodes around each change and the top-level fields it touched are
+    walked. Changes the base cannot vouch for, such as to the body list
+    itself, fall back to validating the whole document.
+    """
+    if document is None:
+        return None
+    _check_schema(document)
+    if base is None or base_stats is None:
+        return editor_document_stats(document)
+    regions: set[tuple[str, ...]] = set()
+    fields: set[str] = set()
+    for path in changed:
+        if not path or path[0] == "schemaVersion":
+            return editor_document_stats(document)
+        if path[0] != "body":
+            fields.add(path[0])
+            continue
+        region = _enclosing_node(path)
+        if region is None:
+            return editor_document_stats(document)
+        regions.add(region)
+    # A change inside a changed node is walked with it.
+    regions = {
+        region
+        for region in regions
+        if not any(region[:end] in regions for end in range(2, len(region), 2))
+    }
+
+    pairs = []
+    for region in regions:
+        old, new = _resolve(base, region), _resolve(document, region)
+        if not isinstance(old, dict) or not isinstance(new, dict):
+            return editor_document_stats(document)
+        pairs.append((len(region) // 2, old, new))
+    old_ids: set[str] = set()
+    old_chars = old_nodes = 0
+    for depth, old, _ in pairs:
+        chars, nodes = _walk_nodes(
+            [old], depth, old_ids, MAX_EDITOR_DOCUMENT_CHARS, MAX_EDITOR_DOCUMENT_NODES
+        )
+        old_chars += chars
+        old_nodes += nodes
+    new_ids: set[str] = set()
+    chars = base_stats.chars - old_chars
+    nodes = base_stats.nodes - old_nodes
+    for depth, _, new in pairs:
+        walked_chars, walked_nodes = _walk_nodes(
+            [new],
+            depth,
+            new_ids,
+            MAX_EDITOR_DOCUMENT_CHARS - chars,
+            MAX_EDITOR_DOCUMENT_NODES - nodes,
+        )
+        chars += walked_chars
+        nodes += walked_nodes
+    if any(node_id in base_stats.ids and node_id not in old_ids for node_id in new_ids):
+        raise EditorDocumentValidationError("Element node IDs must be unique")
+    if new_ids == old_ids:
+        ids = base_stats.ids
+    else:
+        ids = (base_stats.ids - old_ids) | new_ids
+
+    # One comma per field added or removed, then the fields themselves.
+    chars += len(document) - len(base)
+    for name in fields:
+        chars += _entry_chars(document, name, ids) - _entry_chars(
+            base, name, base_stats.ids
+        )
+    if "responsiveStyles" not in fields and ids is not base_stats.ids:
+        _responsive_styles(document.get("responsiveStyles", {}), ids)
+    if chars > MAX_EDITOR_DOCUMENT_CHARS:
+        raise _too_large()
+    return DocumentStats(chars=chars, nodes=nodes, ids=ids)
@@ -0,0 +1,58 @@
+"""In-process wake-ups for requests long-polling a generation job.
+
+Jobs change on worker threads while the requests waiting on them are parked
+on the event loop, so a change is handed over with ``call_soon_threadsafe``.
+Only requests in the same process hear about it. A job finished by another
+process is picked up by the waiter's periodic re-read, unless that is turned
+off (``JOB_WAIT_RECHECK_SECONDS=0``), in which case it is seen only when the
+wait ends.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+
+class JobWatchers:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._waiters: dict[
+            str, set[tuple[asyncio.AbstractEventLoop, asyncio.Event]]
+        ] = {}
+
+    @contextmanager
+    def watch(self, job_id: str) -> Iterator[asyncio.Event]:
+        """An event set whenever ``job_id`` changes while the block runs.
+
+        Must be entered on the event loop that will await the event.
+        """
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._waiters.setdefault(job_id, set()).add(waiter)
+        try:
+            yield waiter[1]
+        finally:
+            with self._lock:
+                waiters = self._waiters.get(job_id)
+                if waiters is not None:
+                    waiters.discard(waiter)
+                    if not waiters:
+                        del self._waiters[job_id]
+
+    def notify(self, job_id: str) -> None:
+        """Wake everything watching ``job_id``; safe from any thread."""
+        with self._lock:
+            waiters = list(self._waiters.get(job_id, ()))
+        for loop, event in waiters:
+            try:
+                loop.call_soon_threadsafe(event.set)
+            except RuntimeError:
+                # The loop closed under a waiter that never got to unregister.
+                pass
+
+    def watching(self, job_id: str) -> int:
+        with self._lock:
+            return len(self._waiters.get(job_id, ()))
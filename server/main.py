@@ -9,12 +9,13 @@ from __future__ import annotations
 
 import typing
 from contextlib import asynccontextmanager
+from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
-from fastapi import FastAPI, HTTPException, Request
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
 
@@ -31,11 +32,16 @@ from server.concurrency import offload
 from server.content import DocumentValidationError, validate_document
 from server.control_routes import router as control_router
 from server.controls import IdempotencyConflictError, RequestControlService
-from server.database import Database
+from server.database import Database, SchemaCheckCache
 from server.documents import EDITOR_NODE_ID_PATTERN, EditorDocumentValidationError
 from server.editor_scope import find_editor_element
+from server.media import MediaLibrary, MediaNotFoundError, MediaValidationError
+from server.media_routes import router as media_router
 from server.mutations import run_idempotent
 from server.orchestrator import (
+    CONVERSATION_PAGE_SIZE,
+    MAX_CONVERSATION_PAGE_SIZE,
+    MAX_JOB_WAIT_SECONDS,
     CancellationToken,
     ConversationValidationError,
     GenerationOrchestrator,
@@ -48,18 +54,39 @@ from server.projects import (
     ProjectValidationError,
     VersionConflictError,
 )
+from server.publish_routes import router as publish_router
+from server.publishing import SitePublisher
 from server.request_controls import enforce_request_controls
-from server.runtime import GenerationClient, build_client, generate, regenerate_section
+from server.runtime import (
+    GenerationClient,
+    build_client,
+    generate,
+    generate_candidates,
+    generate_sectionwise,
+    regenerate_section,
+)
 from src.a11y import audit_generated_html
+from src.candidates import (
+    MAX_CANDIDATES,
+    CandidateScore,
+    is_good_enough,
+    rank,
+    score_candidate,
+)
+from src.circuit_breaker import CIRCUIT_BREAKERS
+from src.concurrency_limit import PROVIDER_LIMITS
 from src.config import cors_origins_from_env
 from src.constraints import (
     COLOR_LIMITS,
     SECTION_OPTIONS,
     build_constraints_prompt,
 )
+from src.critical_css import inline_critical_css
 from src.export import split_document
-from src.generation import strip_html_code_fence
+from src.generation import finish_reason_of, strip_html_code_fence
 from src.js_analysis import audit_inline_scripts
+from src.minify import FileSavings, optimize_page, split_savings
+from src.perf_audit import DEFAULT_BUDGET, PageWeight, PerfBudget, audit_page_weight
 from src.profiles import (
     CUSTOM_PROFILE_ID,
     get_profile,
@@ -67,6 +94,8 @@ from src.profiles import (
 )
 from src.safety import apply_output_safety_policy
 from src.sections import extract_first_top_level, extract_sections, replace_section
+from src.site_archive import SitePage, stream_site_archive
+from src.skeleton import SkeletonError, slot_keys
 from src.theme import (
     COMPLEXITY_BY_KEY,
     REFINE_ASPECTS,
@@ -84,20 +113,42 @@ WEB_DIST = REPO_ROOT / "web" / "dist"
 @asynccontextmanager
 async def lifespan(app: FastAPI) -> typing.AsyncIterator[None]:
     app.state.client = build_client()
-    app.state.database = Database.from_url(app.state.client.config.database_url)
+    config = app.state.client.config
+    app.state.database = Database.from_url(
+        config.database_url,
+        sqlite_readers=config.sqlite_readers,
+        schema_cache=(
+            SchemaCheckCache(config.schema_check_cache)
+            if config.schema_check_cache
+            else None
+        ),
+    )
     app.state.auth = AuthService(
         app.state.database.sessions,
         session_hours=app.state.client.config.session_hours,
     )
-    app.state.projects = ProjectService(app.state.database.sessions)
+    app.state.media = MediaLibrary(
+        app.state.database.sessions,
+        config.media_dir,
+        workers=config.media_workers,
+        max_upload_bytes=config.media_max_upload_bytes,
+    )
+    app.state.projects = ProjectService(
+        app.state.database.sessions, media=app.state.media
+    )
     app.state.assets = ReusableAssetService(app.state.database.sessions)
+    app.state.publisher = SitePublisher(
+        app.state.database.sessions, config.publish_dir, media=app.state.media
+    )
     app.state.orchestrator = GenerationOrchestrator(
         app.state.database.sessions,
-        max_workers=app.state.client.config.generation_max_concurrency,
+        max_workers=app.state.client.config.generation_workers,
+        job_wait_recheck_seconds=app.state.client.config.job_wait_recheck_seconds,
     )
     app.state.controls = RequestControlService(app.state.database.sessions)
     app.state.controls.recover_stale_records()
     app.state.orchestrator.recover_interrupted_jobs()
+    app.state.media.recover_pending()
     try:
         app.state.profiles = load_profiles(PROFILES_DIR)
     except (ValueError, TypeError):
@@ -106,6 +157,7 @@ async def lifespan(app: FastAPI) -> typing.AsyncIterator[None]:
         yield
     finally:
         app.state.orchestrator.shutdown()
+        app.state.media.shutdown()
         app.state.database.close()
 
 
@@ -121,6 +173,8 @@ app.include_router(auth_router)
 app.include_router(asset_router)
 app.include_router(project_router)
 app.include_router(control_router)
+app.include_router(publish_router)
+app.include_router(media_router)
 app.middleware("http")(enforce_request_controls)
 
 
@@ -145,6 +199,7 @@ async def project_validation_handler(
     return JSONResponse(status_code=400, content={"detail": str(exc)})
 
 
+@app.exception_handler(MediaNotFoundError)
 @app.exception_handler(ReusableAssetNotFoundError)
 async def reusable_asset_not_found_handler(
     _request: Request, exc: ReusableAssetNotFoundError
@@ -152,6 +207,7 @@ async def reusable_asset_not_found_handler(
     return JSONResponse(status_code=404, content={"detail": str(exc)})
 
 
+@app.exception_handler(MediaValidationError)
 @app.exception_handler(ReusableAssetValidationError)
 @app.exception_handler(DocumentValidationError)
 @app.exception_handler(EditorDocumentValidationError)
@@ -196,11 +252,73 @@ def _orchestrator() -> GenerationOrchestrator:
     return app.state.orchestrator
 
 
-def _sanitize_output(raw: str) -> tuple[str, list[str], list[str]]:
+@dataclass(frozen=True)
+class _SanitizedPage:
+    html: str
+    safety_alerts: list[str]
+    notes: list[str]
+    #: The page-weight audit, when the page was sanitized against a budget.
+    perf: PageWeight | None = None
+    #: Why the provider stopped writing the raw output, when it said.
+    finish_reason: str | None = None
+
+    def score(self) -> CandidateScore:
+        return score_candidate(
+            self.html,
+            self.safety_alerts,
+            self.notes,
+            finish_reason=self.finish_reason,
+        )
+
+
+def _sanitize_output(
+    raw: str,
+    budget: PerfBudget | None = None,
+    *,
+    finish_reason: str | None = None,
+) -> _SanitizedPage:
+    """Apply the safety policy and collect audit notes.
+
+    With a ``budget`` the output is a whole page: it is audited once, its
+    page-weight violations join the notes and the audit is returned for the
+    response's ``perf`` field.
+    """
     sanitized, safety_alerts = apply_output_safety_policy(raw)
     a11y = audit_generated_html(sanitized)
     js = audit_inline_scripts(sanitized)
-    return sanitized, safety_alerts, a11y + js
+    perf = audit_page_weight(sanitized, budget) if budget else None
+    return _SanitizedPage(
+        html=sanitized,
+        safety_alerts=safety_alerts,
+        notes=a11y + js + (perf.notes if perf else []),
+        perf=perf,
+        finish_reason=finish_reason,
+    )
+
+
+def _pick_candidate(
+    pages: list[_SanitizedPage],
+) -> tuple[_SanitizedPage, dict[str, Any]]:
+    """The best of several sanitized drafts, and the result fields for the rest.
+
+    A single page is returned as is, with no extra fields.
+    """
+    if len(pages) == 1:
+        return pages[0], {}
+    scores = [page.score() for page in pages]
+    best, *others = rank(scores)
+    return pages[best], {
+        "score": scores[best].to_dict(),
+        "alternatives": [
+            {
+                "html": pages[index].html,
+                "safety_alerts": pages[index].safety_alerts,
+                "notes": pages[index].notes,
+                "score": scores[index].to_dict(),
+            }
+            for index in others
+        ],
+    }
 
 
 class GenerateRequest(BaseModel):
@@ -213,6 +331,11 @@ class GenerateRequest(BaseModel):
     layout_dna_guidance: str = ""
     constraints: dict[str, Any] | None = None
     thread_id: str | None = None
+    #: Write a constraints page as a skeleton plus sections generated at once.
+    parallel_sections: bool = False
+    #: Pages to draft at once, returning the best-scoring one; capped by
+    #: ``GENERATION_MAX_CANDIDATES``.
+    candidates: int = Field(default=1, ge=1, le=MAX_CANDIDATES)
 
 
 class SectionRegenRequest(BaseModel):
@@ -230,7 +353,12 @@ class SectionRegenRequest(BaseModel):
 
 class ExportRequest(BaseModel):
     html: str
-    mode: str = "single"  # "single" | "split"
+    mode: str = "single"  # "single" | "split" | "zip"
+    #: Minify the files and drop CSS rules that match nothing in the page.
+    optimize: bool = False
+    #: Split mode: inline the CSS the first sections need and load
+    #: ``styles.css`` without blocking the first paint.
+    critical_css: bool = False
 
 
 # ---- routes ----
@@ -242,9 +370,15 @@ async def health() -> dict[str, Any]:
     return {
         "ok": True,
         "provider": cfg.provider,
-        "model": cfg.openrouter_model if cfg.provider == "openrouter" else cfg.model,
+        "model": cfg.active_model,
         "has_key": bool(cfg.openrouter_api_key or cfg.api_key),
         "max_prompt_chars": cfg.max_prompt_chars,
+        "prompt_token_budget": cfg.prompt_budget(),
+        "fallback_models": [
+            f"{provider}:{model}" for provider, model in cfg.generation_fallback_models
+        ],
+        "circuit_breakers": CIRCUIT_BREAKERS.snapshot(),
+        "provider_concurrency": PROVIDER_LIMITS.snapshot(),
     }
 
 
@@ -280,12 +414,14 @@ def _effective_settings(
             "complexity_key": profile.complexity_key,
             "strict_minimal": profile.strict_minimal,
             "extra_guidance": profile.extra_guidance,
+            "perf_budget": profile.perf_budget,
         }
     return {
         "tone_key": req.tone,
         "complexity_key": req.complexity,
         "strict_minimal": req.strict_minimal,
         "extra_guidance": "",
+        "perf_budget": DEFAULT_BUDGET,
     }
 
 
@@ -312,9 +448,11 @@ async def generate_page(
 
     messages: list[dict[str, str]] = []
     if req.current_code:
+        # System context, like the chat agent's, so the page joins the stable
+        # prompt prefix that providers can serve from their context cache.
         messages.append(
             {
-                "role": "assistant",
+                "role": "system",
                 "content": f"Here is the current version of the website code:\n\n{req.current_code.strip()}",
             }
         )
@@ -323,19 +461,63 @@ async def generate_page(
     extra = s["extra_guidance"]
     if req.layout_dna_guidance:
         extra = f"{extra}\n{req.layout_dna_guidance}".strip()
+    # One section gains nothing from a separate skeleton call.
+    sections = slot_keys(req.constraints.get("sections", [])) if req.constraints else []
+    sectionwise = req.parallel_sections and len(sections) >= 2
+    # Alternatives are for a first page: drafting several of every refinement
+    # would multiply the cost of each edit.
+    candidates = (
+        1 if req.current_code else min(req.candidates, cfg.generation_max_candidates)
+    )
+
+    sanitized_drafts: dict[str, _SanitizedPage] = {}
+
+    def page_of(raw: str) -> _SanitizedPage:
+        # Drafts are scored as they arrive; each is sanitized only once.
+        if raw not in sanitized_drafts:
+            sanitized_drafts[raw] = _sanitize_output(
+                strip_html_code_fence(raw),
+                s["perf_budget"],
+                finish_reason=finish_reason_of(raw),
+            )
+        return sanitized_drafts[raw]
 
     def perform(token: CancellationToken) -> dict[str, Any]:
-        raw = generate(
-            _client(),
-            messages=messages,
-            tone_key=s["tone_key"],
-            strict_minimal=s["strict_minimal"],
-            complexity_key=s["complexity_key"],
-            extra_guidance=extra,
-        )
-        if raw.startswith("API error:"):
-            raise HTTPException(status_code=502, detail=raw)
-        sanitized, safety_alerts, notes = _sanitize_output(strip_html_code_fence(raw))
+        settings = {
+            "messages": messages,
+            "tone_key": s["tone_key"],
+            "strict_minimal": s["strict_minimal"],
+            "complexity_key": s["complexity_key"],
+            "extra_guidance": extra,
+        }
+        if sectionwise:
+            try:
+                raw = generate_sectionwise(
+                    _client(),
+                    sections=sections,
+                    page_request=prompt,
+                    on_progress=token.report_progress,
+                    checkpoint=token.raise_if_cancelled,
+                    **settings,
+                )
+            except SkeletonError as exc:
+                raise HTTPException(status_code=422, detail=str(exc)) from exc
+            drafts = [raw]
+        elif candidates > 1:
+            drafts = generate_candidates(
+                _client(),
+                candidates=candidates,
+                accept=lambda raw: is_good_enough(page_of(raw).score()),
+                deadline_seconds=cfg.generation_candidate_deadline_seconds,
+                on_progress=token.report_progress,
+                **settings,
+            )
+        else:
+            drafts = [generate(_client(), **settings)]
+        pages = [page_of(raw) for raw in drafts if not raw.startswith("API error:")]
+        if not pages:
+            raise HTTPException(status_code=502, detail=drafts[0])
+        page, drafted = _pick_candidate(pages)
         token.raise_if_cancelled()
         if req.thread_id:
             _orchestrator().checkpoint_document(
@@ -343,18 +525,20 @@ async def generate_page(
                 req.thread_id,
                 prompt,
                 "Generated the page.",
-                sanitized,
+                page.html,
             )
         return {
-            "html": sanitized,
-            "safety_alerts": safety_alerts,
-            "notes": notes,
+            "html": page.html,
+            "safety_alerts": page.safety_alerts,
+            "notes": page.notes,
+            "perf": page.perf.to_dict() if page.perf else None,
             "settings": {
                 "tone": s["tone_key"],
                 "complexity": s["complexity_key"],
                 "strict_minimal": s["strict_minimal"],
                 "profile": req.profile,
             },
+            **drafted,
         }
 
     result = await run_idempotent(
@@ -415,6 +599,7 @@ async def chat(
         "complexity": effective["complexity_key"],
         "strict_minimal": effective["strict_minimal"],
         "extra_guidance": effective["extra_guidance"],
+        "perf_budget": effective["perf_budget"],
     }
     if req.layout_dna_guidance:
         settings["extra_guidance"] = (
@@ -443,9 +628,25 @@ async def chat(
 
 
 @app.get("/api/conversations/{thread_id}")
-async def conversation_get(thread_id: str, principal: Authenticated) -> dict[str, Any]:
+async def conversation_get(
+    thread_id: str,
+    principal: Authenticated,
+    limit: int = Query(
+        default=CONVERSATION_PAGE_SIZE, ge=1, le=MAX_CONVERSATION_PAGE_SIZE
+    ),
+    before: int | None = Query(default=None, ge=1),
+) -> dict[str, Any]:
+    """The conversation's page and its newest messages.
+
+    Pass the returned ``next_before`` as ``before`` to page back through older
+    messages; it is ``null`` once the start of the thread has been reached.
+    """
     conversation = await offload(
-        _orchestrator().get_conversation, principal.id, thread_id
+        _orchestrator().get_conversation,
+        principal.id,
+        thread_id,
+        limit=limit,
+        before=before,
     )
     if conversation is None:
         raise HTTPException(status_code=404, detail="Conversation not found")
@@ -468,12 +669,38 @@ async def generation_job_active(principal: Authenticated) -> dict[str, Any]:
     return {"job": await offload(_orchestrator().active_job, principal.id)}
 
 
+def _etag_version(header: str | None) -> str | None:
+    """The job version an ``If-None-Match`` header names, if it names one."""
+    if not header:
+        return None
+    # A job has one current version, so only the first tag is meaningful.
+    tag = header.split(",")[0].strip().removeprefix("W/")
+    return tag.strip('"') or None
+
+
 @app.get("/api/generation-jobs/{job_id}")
-async def generation_job(job_id: str, principal: Authenticated) -> dict[str, Any]:
-    job = await offload(_orchestrator().get_job, principal.id, job_id)
+async def generation_job(
+    job_id: str,
+    principal: Authenticated,
+    request: Request,
+    wait: float = Query(default=0, ge=0, le=MAX_JOB_WAIT_SECONDS),
+) -> Response:
+    """A job's status; ``wait`` holds the request until the job changes.
+
+    With ``If-None-Match`` set to the job's ``ETag``, an unchanged job answers
+    304, so a client long-polling in a loop transfers a body only when there
+    is news.
+    """
+    seen = _etag_version(request.headers.get("if-none-match"))
+    job = await _orchestrator().wait_for_job(
+        principal.id, job_id, seen_version=seen, timeout=wait
+    )
     if job is None:
         raise HTTPException(status_code=404, detail="Generation job not found")
-    return job
+    headers = {"ETag": f'"{job["version"]}"', "Cache-Control": "no-cache"}
+    if seen == job["version"]:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(job, headers=headers)
 
 
 @app.post("/api/generation-jobs/{job_id}/cancel")
@@ -549,13 +776,14 @@ async def generate_section(
         )
         if raw.startswith("API error:"):
             raise HTTPException(status_code=502, detail=raw)
-        sanitized, safety_alerts, notes = _sanitize_output(raw)
-        replacement = extract_first_top_level(strip_html_code_fence(sanitized))
+        page = _sanitize_output(raw)
+        replacement = extract_first_top_level(strip_html_code_fence(page.html))
         if not replacement:
             raise HTTPException(
                 status_code=422, detail="Could not parse regenerated section"
             )
         updated = replace_section(req.code, section, replacement)
+        perf = audit_page_weight(updated, s["perf_budget"])
         token.raise_if_cancelled()
         if req.thread_id:
             _orchestrator().checkpoint_document(
@@ -567,8 +795,9 @@ async def generate_section(
             )
         return {
             "html": updated,
-            "safety_alerts": safety_alerts,
-            "notes": notes,
+            "safety_alerts": page.safety_alerts,
+            "notes": page.notes + perf.notes,
+            "perf": perf.to_dict(),
         }
 
     result = await run_idempotent(
@@ -589,19 +818,57 @@ async def generate_section(
 # ---- export ----
 
 
-@app.post("/api/export")
-async def export(req: ExportRequest) -> dict[str, Any]:
+@app.post("/api/export", response_model=None)
+async def export(req: ExportRequest) -> dict[str, Any] | StreamingResponse:
+    if req.mode == "zip":
+        # A sync iterator: Starlette runs it in the thread pool, so splitting
+        # and compressing stay off the event loop.
+        return StreamingResponse(
+            stream_site_archive(
+                [SitePage("index.html", req.html)], optimize=req.optimize
+            ),
+            media_type="application/zip",
+            headers={"Content-Disposition": 'attachment; filename="site.zip"'},
+        )
+    return await offload(_export_files, req)
+
+
+def _export_files(req: ExportRequest) -> dict[str, Any]:
+    html = req.html
+    result: dict[str, Any] = {"mode": "split" if req.mode == "split" else "single"}
+    optimized = optimize_page(html) if req.optimize else None
     if req.mode == "split":
-        split = split_document(req.html)
-        return {
-            "mode": "split",
-            "files": {
-                "index.html": split.index_html,
-                "styles.css": split.styles_css,
-                "app.js": split.app_js,
-            },
+        split = split_document(html)
+        files = split
+        if optimized is not None:
+            files = split_document(optimized.html)
+            result["savings"] = [item.to_dict() for item in split_savings(split, files)]
+        if req.critical_css:
+            files, report = inline_critical_css(
+                optimized.html if optimized is not None else html, files
+            )
+            result["critical_css"] = report.to_dict()
+        result["files"] = {
+            "index.html": files.index_html,
+            "styles.css": files.styles_css,
+            "app.js": files.app_js,
+        }
+    else:
+        result["files"] = {
+            "index.html": optimized.html if optimized is not None else html
         }
-    return {"mode": "single", "files": {"index.html": req.html}}
+        if optimized is not None:
+            result["savings"] = [
+                FileSavings(
+                    "index.html",
+                    len(html.encode("utf-8")),
+                    len(optimized.html.encode("utf-8")),
+                ).to_dict()
+            ]
+    if optimized is not None:
+        result["removed_css_rules"] = optimized.removed_rules
+        result["svg_sprite"] = optimized.svg_sprite.to_dict()
+    return result
 
 
 # ---- serve built frontend in production ----
@@ -0,0 +1,362 @@
+"""Owner-scoped media library on a local content-addressed object store.
+
+An upload is stored once under ``<root>/objects/<sha256[:2]>/<sha256>`` and
+recorded for its owner; uploading the same bytes again returns the same asset.
+Variants for ``srcset`` (see :mod:`src.images`) are produced on a small
+worker pool, so an upload returns as soon as the original is safe. Assets
+still ``processing`` when the server stops are picked up again at startup.
+
+Files are served from ``/media/<asset id>/<name>``. Asset ids are random and
+what they point at never changes, so the URLs can be cached indefinitely and
+published pages can use them without a session.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import uuid
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, sessionmaker
+
+from server.models import MediaAssetRecord, isoformat_utc, utcnow
+from src.images import (
+    IMAGE_TYPES,
+    SrcsetEntry,
+    add_srcsets,
+    externalize_data_images,
+    image_size,
+    make_variants,
+    sniff_image_type,
+)
+
+MAX_UPLOAD_BYTES = 10 * 1024 * 1024
+MAX_FILENAME_CHARS = 255
+ORIGINAL_NAME = "original"
+MEDIA_URL_PREFIX = "/media/"
+
+STATUS_PROCESSING = "processing"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+
+class MediaNotFoundError(LookupError):
+    pass
+
+
+class MediaValidationError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class MediaFile:
+    path: Path
+    content_type: str
+    sha256: str
+
+
+def media_url(asset_id: str, name: str) -> str:
+    return f"{MEDIA_URL_PREFIX}{asset_id}/{name}"
+
+
+def original_name(content_type: str) -> str:
+    return f"{ORIGINAL_NAME}{IMAGE_TYPES[content_type]}"
+
+
+def variant_name(width: int) -> str:
+    return f"w{width}.webp"
+
+
+class MediaLibrary:
+    def __init__(
+        self,
+        sessions: sessionmaker[Session],
+        root: str | Path,
+        *,
+        workers: int = 2,
+        max_upload_bytes: int = MAX_UPLOAD_BYTES,
+    ):
+        self._sessions = sessions
+        self._root = Path(root)
+        self.max_upload_bytes = max_upload_bytes
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, workers), thread_name_prefix="media"
+        )
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def object_path(self, sha256: str) -> Path:
+        return self._root / "objects" / sha256[:2] / sha256
+
+    # ---- uploads ----
+
+    def upload(self, owner_id: str, data: bytes, filename: str = "") -> dict[str, Any]:
+        """Store an image for ``owner_id``; its variants follow in the background."""
+        if not data:
+            raise MediaValidationError("The upload is empty")
+        if len(data) > self.max_upload_bytes:
+            raise MediaValidationError(
+                f"Uploads must be at most {self.max_upload_bytes} bytes"
+            )
+        content_type = sniff_image_type(data)
+        if content_type is None:
+            raise MediaValidationError(
+                "Only PNG, JPEG, GIF, WebP, AVIF and SVG images can be uploaded"
+            )
+        sha256 = self._put(data)
+        clean_name = os.path.basename(filename.replace("\\", "/")).strip()
+        with self._sessions() as session:
+            existing = self._by_digest(session, owner_id, sha256)
+            if existing is not None:
+                return self._snapshot(existing)
+        record = MediaAssetRecord(
+            owner_id=owner_id,
+            sha256=sha256,
+            content_type=content_type,
+            byte_size=len(data),
+            filename=clean_name[:MAX_FILENAME_CHARS],
+            status=STATUS_PROCESSING,
+            variants=[],
+        )
+        try:
+            with self._sessions.begin() as session:
+                session.add(record)
+                session.flush()
+                snapshot = self._snapshot(record)
+        except IntegrityError:
+            # The same bytes were uploaded concurrently; that record wins.
+            with self._sessions() as session:
+                existing = self._by_digest(session, owner_id, sha256)
+                if existing is None:
+                    raise
+                return self._snapshot(existing)
+        self._queue(snapshot["id"])
+        return snapshot
+
+    def process(self, asset_id: str) -> None:
+        """Make an asset's variants and mark it ready, or failed."""
+        with self._sessions() as session:
+            record = session.get(MediaAssetRecord, asset_id)
+            if record is None or record.status != STATUS_PROCESSING:
+                return
+            data = self.object_path(record.sha256).read_bytes()
+        try:
+            size = image_size(data)
+            variants = [
+                {
+                    "name": variant_name(variant.width),
+                    "width": variant.width,
+                    "height": variant.height,
+                    "content_type": variant.content_type,
+                    "sha256": self._put(variant.data),
+                    "bytes": len(variant.data),
+                }
+                for variant in make_variants(data)
+            ]
+        except Exception as exc:  # noqa: BLE001 - recorded on the asset
+            self._finish(asset_id, status=STATUS_FAILED, error=str(exc))
+            return
+        self._finish(
+            asset_id,
+            status=STATUS_READY,
+            width=size[0] if size else None,
+            height=size[1] if size else None,
+            variants=variants,
+        )
+
+    def recover_pending(self) -> int:
+        """Queue assets whose processing a restart interrupted."""
+        with self._sessions() as session:
+            pending = list(
+                session.scalars(
+                    select(MediaAssetRecord.id).where(
+                        MediaAssetRecord.status == STATUS_PROCESSING
+                    )
+                )
+            )
+        for asset_id in pending:
+            self._queue(asset_id)
+        return len(pending)
+
+    def _queue(self, asset_id: str) -> None:
+        try:
+            self._pool.submit(self.process, asset_id)
+        except RuntimeError:
+            # Shutting down: the asset stays processing until the next startup.
+            pass
+
+    # ---- reads ----
+
+    def list_assets(self, owner_id: str) -> list[dict[str, Any]]:
+        with self._sessions() as session:
+            records = session.scalars(
+                select(MediaAssetRecord)
+                .where(MediaAssetRecord.owner_id == owner_id)
+                .order_by(MediaAssetRecord.created_at.desc())
+            )
+            return [self._snapshot(record) for record in records]
+
+    def get_asset(self, owner_id: str, asset_id: str) -> dict[str, Any]:
+        with self._sessions() as session:
+            record = session.get(MediaAssetRecord, asset_id)
+            if record is None or record.owner_id != owner_id:
+                raise MediaNotFoundError("Media asset not found")
+            return self._snapshot(record)
+
+    def resolve(self, asset_id: str, name: str) -> MediaFile | None:
+        """The stored file behind a media URL, if there is one."""
+        with self._sessions() as session:
+            record = session.get(MediaAssetRecord, asset_id)
+            if record is None:
+                return None
+            if name == original_name(record.content_type):
+                return MediaFile(
+                    self.object_path(record.sha256), record.content_type, record.sha256
+                )
+            for variant in record.variants or []:
+                if variant["name"] == name:
+                    return MediaFile(
+                        self.object_path(variant["sha256"]),
+                        variant["content_type"],
+                        variant["sha256"],
+                    )
+        return None
+
+    # ---- documents ----
+
+    def externalize(self, owner_id: str, html: str) -> str:
+        """``html`` with its ``data:`` images uploaded and replaced by URLs."""
+        return externalize_data_images(html, self._data_image_store(owner_id))[0]
+
+    def externalize_document(self, owner_id: str, document: Any) -> Any:
+        """An editor document with the ``data:`` images in its strings replaced."""
+        store = self._data_image_store(owner_id)
+
+        def walk(value: Any) -> Any:
+            if isinstance(value, str):
+                return externalize_data_images(value, store)[0]
+            if isinstance(value, list):
+                return [walk(item) for item in value]
+            if isinstance(value, dict):
+                return {key: walk(item) for key, item in value.items()}
+            return value
+
+        return walk(document)
+
+    def add_srcsets(self, owner_id: str, html: str) -> str:
+        """Point ``<img>`` tags at the variants of ``owner_id``'s ready assets."""
+        if MEDIA_URL_PREFIX not in html:
+            return html
+        with self._sessions() as session:
+            records = session.scalars(
+                select(MediaAssetRecord).where(
+                    MediaAssetRecord.owner_id == owner_id,
+                    MediaAssetRecord.status == STATUS_READY,
+                )
+            )
+            srcsets = {
+                media_url(record.id, original_name(record.content_type)): entries
+                for record in records
+                if (entries := self._srcset(record))
+            }
+        return add_srcsets(html, srcsets)[0] if srcsets else html
+
+    def _data_image_store(self, owner_id: str) -> Callable[[str, bytes], str | None]:
+        def store(_declared_type: str, data: bytes) -> str | None:
+            try:
+                asset = self.upload(owner_id, data)
+            except MediaValidationError:
+                return None
+            return asset["url"]
+
+        return store
+
+    # ---- storage ----
+
+    def _put(self, data: bytes) -> str:
+        """Store ``data`` under its digest; writing the same bytes twice is a no-op."""
+        sha256 = hashlib.sha256(data).hexdigest()
+        target = self.object_path(sha256)
+        if target.exists():
+            return sha256
+        target.parent.mkdir(parents=True, exist_ok=True)
+        staging = target.with_name(f".{sha256}.{uuid.uuid4().hex}.tmp")
+        try:
+            staging.write_bytes(data)
+            os.replace(staging, target)
+        finally:
+            staging.unlink(missing_ok=True)
+        return sha256
+
+    def _finish(self, asset_id: str, **values: Any) -> None:
+        with self._sessions.begin() as session:
+            record = session.get(MediaAssetRecord, asset_id)
+            if record is None:
+                return
+            for key, value in values.items():
+                setattr(record, key, value)
+            record.updated_at = utcnow()
+
+    @staticmethod
+    def _by_digest(
+        session: Session, owner_id: str, sha256: str
+    ) -> MediaAssetRecord | None:
+        return session.scalar(
+            select(MediaAssetRecord).where(
+                MediaAssetRecord.owner_id == owner_id,
+                MediaAssetRecord.sha256 == sha256,
+            )
+        )
+
+    @staticmethod
+    def _srcset(record: MediaAssetRecord) -> list[SrcsetEntry]:
+        entries = [
+            SrcsetEntry(media_url(record.id, variant["name"]), variant["width"])
+            for variant in record.variants or []
+        ]
+        # A full-width variant replaces the original in the list.
+        if entries and record.width and entries[-1].width < record.width:
+            entries.append(
+                SrcsetEntry(
+                    media_url(record.id, original_name(record.content_type)),
+                    record.width,
+                )
+            )
+        return entries
+
+    @classmethod
+    def _snapshot(cls, record: MediaAssetRecord) -> dict[str, Any]:
+        return {
+            "id": record.id,
+            "url": media_url(record.id, original_name(record.content_type)),
+            "filename": record.filename,
+            "content_type": record.content_type,
+            "bytes": record.byte_size,
+            "sha256": record.sha256,
+            "width": record.width,
+            "height": record.height,
+            "status": record.status,
+            "error": record.error,
+            "variants": [
+                {
+                    "url": media_url(record.id, variant["name"]),
+                    "width": variant["width"],
+                    "height": variant["height"],
+                    "content_type": variant["content_type"],
+                    "bytes": variant["bytes"],
+                }
+                for variant in record.variants or []
+            ],
+            "srcset": ", ".join(
+                f"{entry.url} {entry.width}w" for entry in cls._srcset(record)
+            ),
+            "created_at": isoformat_utc(record.created_at),
+        }
@@ -0,0 +1,90 @@
+"""HTTP contracts for uploading media and serving it."""
+
+from __future__ import annotations
+
+import hashlib
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+from server.auth_routes import Authenticated
+from server.concurrency import offload
+from server.media import MediaLibrary
+from server.mutations import run_idempotent
+from server.publish_routes import IMMUTABLE_CACHE, etag_matches
+
+router = APIRouter(tags=["media"])
+
+#: An SVG opened directly must not run script in the builder's origin.
+MEDIA_CSP = "default-src 'none'; style-src 'unsafe-inline'; sandbox"
+
+
+def _media(request: Request) -> MediaLibrary:
+    return request.app.state.media
+
+
+async def _read_upload(request: Request, limit: int) -> bytes:
+    """The request body, refused as soon as it is known to exceed ``limit``."""
+    too_large = HTTPException(
+        status_code=413, detail=f"Uploads must be at most {limit} bytes"
+    )
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > limit:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body.extend(chunk)
+        if len(body) > limit:
+            raise too_large
+    return bytes(body)
+
+
+@router.post("/api/media", status_code=201)
+async def media_upload(
+    request: Request, principal: Authenticated, filename: str = ""
+) -> dict[str, Any]:
+    """Upload one image as the raw request body.
+
+    The name may be given as the ``filename`` query parameter or the
+    ``X-Filename`` header; the type is read from the bytes.
+    """
+    media = _media(request)
+    data = await _read_upload(request, media.max_upload_bytes)
+    name = filename or request.headers.get("x-filename", "")
+    return await run_idempotent(
+        request,
+        principal,
+        "media.upload",
+        {"sha256": hashlib.sha256(data).hexdigest(), "filename": name},
+        lambda: media.upload(principal.id, data, name),
+    )
+
+
+@router.get("/api/media")
+async def media_list(request: Request, principal: Authenticated) -> dict[str, Any]:
+    return {"assets": await offload(_media(request).list_assets, principal.id)}
+
+
+@router.get("/api/media/{asset_id}")
+async def media_get(
+    request: Request, asset_id: str, principal: Authenticated
+) -> dict[str, Any]:
+    return await offload(_media(request).get_asset, principal.id, asset_id)
+
+
+@router.api_route("/media/{asset_id}/{name}", methods=["GET", "HEAD"])
+async def media_serve(request: Request, asset_id: str, name: str) -> Response:
+    stored = await offload(_media(request).resolve, asset_id, name)
+    if stored is None or not stored.path.is_file():
+        return Response("Not found", status_code=404, media_type="text/plain")
+    etag = f'"{stored.sha256}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE,
+        "X-Content-Type-Options": "nosniff",
+        "Content-Security-Policy": MEDIA_CSP,
+    }
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    return FileResponse(stored.path, headers=headers, media_type=stored.content_type)
@@ -53,6 +53,9 @@ class ProjectRecord(Base):
         DateTime(timezone=True), default=utcnow
     )
     archived_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
+    # The published build served under /sites/; switching it is the whole of a
+    # publish or rollback, so visitors never see a half-written site.
+    live_build_id: Mapped[str | None] = mapped_column(String(36))
 
 
 class PageRecord(Base):
@@ -84,7 +87,11 @@ class RevisionRecord(Base):
         String(36), ForeignKey("pages.id", ondelete="CASCADE"), index=True
     )
     sequence: Mapped[int] = mapped_column(Integer)
-    html: Mapped[str] = mapped_column(Text)
+    #: ``None`` when the page is ``document_json`` compiled, which is then
+    #: derived on read; see :func:`server.projects.revision_html`.
+    html: Mapped[str | None] = mapped_column(Text)
+    #: The ``COMPILER_VERSION`` that derives ``html``, when it is not stored.
+    compiler_version: Mapped[int | None] = mapped_column(Integer)
     document_json: Mapped[dict | None] = mapped_column(JSON)
     source: Mapped[str] = mapped_column(String(32))
     name: Mapped[str | None] = mapped_column(String(120))
@@ -94,6 +101,61 @@ class RevisionRecord(Base):
     )
 
 
+class SiteBuildRecord(Base):
+    """An immutable published build; its files live under ``builds/<digest>``.
+
+    Identical sites have the same digest and share one directory, so several
+    records may point at the same files.
+    """
+
+    __tablename__ = "site_builds"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
+    project_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("projects.id", ondelete="CASCADE"), index=True
+    )
+    digest: Mapped[str] = mapped_column(String(64))
+    # Page slug to the revision id published for it.
+    revisions: Mapped[dict] = mapped_column(JSON)
+    file_count: Mapped[int] = mapped_column(Integer)
+    total_bytes: Mapped[int] = mapped_column(Integer)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow
+    )
+
+
+class MediaAssetRecord(Base):
+    """An uploaded image; its bytes and variants live in the media object store.
+
+    ``variants`` lists the resized copies made for ``srcset``, each with the
+    digest of the object that holds it.
+    """
+
+    __tablename__ = "media_assets"
+    __table_args__ = (UniqueConstraint("owner_id", "sha256"),)
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
+    owner_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("users.id", ondelete="CASCADE"), index=True
+    )
+    sha256: Mapped[str] = mapped_column(String(64))
+    content_type: Mapped[str] = mapped_column(String(32))
+    byte_size: Mapped[int] = mapped_column(Integer)
+    filename: Mapped[str] = mapped_column(String(255))
+    width: Mapped[int | None] = mapped_column(Integer)
+    height: Mapped[int | None] = mapped_column(Integer)
+    # processing, ready or failed; assets still processing at startup are redone.
+    status: Mapped[str] = mapped_column(String(16), index=True)
+    variants: Mapped[list] = mapped_column(JSON, default=list)
+    error: Mapped[str | None] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow
+    )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow
+    )
+
+
 class UserRecord(Base):
     __tablename__ = "users"
 
@@ -152,6 +214,28 @@ class LayoutDNARecord(Base):
     )
 
 
+class DocumentBlobRecord(Base):
+    """Content-addressed page code, written once per distinct document.
+
+    Conversations point at a blob instead of carrying the page inline, so a
+    chat turn that leaves the page unchanged writes no page bytes at all.
+    """
+
+    __tablename__ = "document_blobs"
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
+    owner_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("users.id", ondelete="CASCADE"), index=True
+    )
+    # Deliberately not unique: two workers storing the same page at once may both
+    # insert it, which costs a duplicate row rather than a failed generation.
+    digest: Mapped[str] = mapped_column(String(64), index=True)
+    content: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow
+    )
+
+
 class ConversationRecord(Base):
     __tablename__ = "conversations"
     __table_args__ = (UniqueConstraint("owner_id", "thread_id"),)
@@ -161,8 +245,12 @@ class ConversationRecord(Base):
         String(36), ForeignKey("users.id", ondelete="CASCADE"), index=True
     )
     thread_id: Mapped[str] = mapped_column(String(64))
-    messages: Mapped[list] = mapped_column(JSON, default=list)
-    current_code: Mapped[str | None] = mapped_column(Text)
+    # Messages live in ``conversation_messages``; this counter allocates their
+    # sequence numbers so appending never has to read the thread back.
+    message_count: Mapped[int] = mapped_column(Integer, default=0)
+    current_blob_id: Mapped[str | None] = mapped_column(
+        String(36), ForeignKey("document_blobs.id", ondelete="SET NULL")
+    )
     document_json: Mapped[dict | None] = mapped_column(JSON)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=utcnow
@@ -172,6 +260,24 @@ class ConversationRecord(Base):
     )
 
 
+class ConversationMessageRecord(Base):
+    """One append-only chat message; ``sequence`` is 1-based within a thread."""
+
+    __tablename__ = "conversation_messages"
+    __table_args__ = (UniqueConstraint("conversation_id", "sequence"),)
+
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=new_id)
+    conversation_id: Mapped[str] = mapped_column(
+        String(36), ForeignKey("conversations.id", ondelete="CASCADE"), index=True
+    )
+    sequence: Mapped[int] = mapped_column(Integer)
+    role: Mapped[str] = mapped_column(String(16))
+    content: Mapped[str] = mapped_column(Text)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=utcnow
+    )
+
+
 class GenerationJobRecord(Base):
     __tablename__ = "generation_jobs"
 
@@ -196,6 +302,8 @@ class GenerationJobRecord(Base):
     duration_ms: Mapped[int | None] = mapped_column(Integer)
     finished_at: Mapped[datetime | None] = mapped_column(DateTime(timezone=True))
     metrics: Mapped[dict | None] = mapped_column(JSON)
+    # Latest progress the worker reported, e.g. which sections are written.
+    progress: Mapped[dict | None] = mapped_column(JSON)
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=utcnow
     )
@@ -2,19 +2,30 @@
 
 from __future__ import annotations
 
+import asyncio
+import hashlib
 import math
 import time
 from collections.abc import Callable
 from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from typing import Any, TypeVar
 
 from sqlalchemy import select, update
 from sqlalchemy.orm import Session, sessionmaker
 
-from server.agent import run_agent, set_client
+from server.concurrency import offload
 from server.documents import validate_editor_document
-from server.models import ConversationRecord, GenerationJobRecord, utcnow
+from server.job_watch import JobWatchers
+from server.models import (
+    ConversationMessageRecord,
+    ConversationRecord,
+    DocumentBlobRecord,
+    GenerationJobRecord,
+    utcnow,
+)
 from server.runtime import GenerationClient
+from src.observability import collect_counters, count, tokens_per_second
 
 T = TypeVar("T", bound=dict[str, Any])
 
@@ -22,6 +33,35 @@ T = TypeVar("T", bound=dict[str, Any])
 #: history cannot make the stats endpoint unboundedly expensive.
 STATS_WINDOW = 1000
 
+#: Provider usage counters a job's metrics carry, in total and per model.
+USAGE_KEYS = (
+    "provider_calls",
+    "provider_ms",
+    "prompt_tokens",
+    "completion_tokens",
+    "cached_tokens",
+)
+
+#: Page-weight measurements a job's metrics carry, trended by the stats endpoint.
+PAGE_WEIGHT_KEYS = ("dom_nodes", "dom_depth", "css_bytes", "js_bytes", "html_bytes")
+#: Days of page-weight history the stats endpoint reports, newest last.
+PAGE_WEIGHT_TREND_DAYS = 14
+
+#: Longest a status request may be held open waiting for a job to change;
+#: below the idle timeouts of common proxies.
+MAX_JOB_WAIT_SECONDS = 30
+
+#: Most recent messages replayed to the agent on a chat turn. The thread itself
+#: is kept in full; reading all of it back would make every turn cost more than
+#: the one before.
+CHAT_HISTORY_MESSAGES = 50
+#: Default and maximum page sizes for reading a conversation's messages.
+CONVERSATION_PAGE_SIZE = 50
+MAX_CONVERSATION_PAGE_SIZE = 200
+
+#: Marks a turn that leaves the conversation's page and document untouched.
+_UNCHANGED: Any = object()
+
 FAILURE_PROVIDER = "provider"
 FAILURE_TIMEOUT = "timeout"
 FAILURE_VALIDATION = "validation"
@@ -40,6 +80,29 @@ class ConversationValidationError(ValueError):
     pass
 
 
+def run_agent(user_input: str, **kwargs: Any) -> dict[str, Any]:
+    """Run a chat turn, importing the agent on the first one.
+
+    The agent brings in LangGraph, which is most of the API's import time and
+    is needed by nothing but chat.
+    """
+    from server.agent import run_agent as _run_agent
+
+    return _run_agent(user_input, **kwargs)
+
+
+@dataclass(frozen=True)
+class _Conversation:
+    """The slice of a conversation one turn needs, detached from its session."""
+
+    id: str
+    thread_id: str
+    current_code: str | None
+    current_blob_id: str | None
+    document_json: dict[str, Any] | None
+    history: list[dict[str, str]]
+
+
 class JobNotFoundError(LookupError):
     pass
 
@@ -56,8 +119,13 @@ class CancellationToken:
     before starting, and before committing side effects.
     """
 
-    def __init__(self, is_cancelled: Callable[[], bool]) -> None:
+    def __init__(
+        self,
+        is_cancelled: Callable[[], bool],
+        report: Callable[[dict[str, Any]], None] | None = None,
+    ) -> None:
         self._is_cancelled = is_cancelled
+        self._report = report
 
     @property
     def cancelled(self) -> bool:
@@ -67,6 +135,11 @@ class CancellationToken:
         if self.cancelled:
             raise GenerationCancelled()
 
+    def report_progress(self, progress: dict[str, Any]) -> None:
+        """Publish how far the work has got; it replaces the previous report."""
+        if self._report is not None:
+            self._report(progress)
+
 
 def _summarize(records: list[GenerationJobRecord]) -> dict[str, Any]:
     succeeded = sum(1 for item in records if item.status == STATUS_SUCCEEDED)
@@ -85,7 +158,10 @@ def _summarize(records: list[GenerationJobRecord]) -> dict[str, Any]:
     # A user changing their mind is not a reliability signal, so cancellations
     # stay out of the success rate entirely.
     settled = succeeded + failed
+    hedged = sum((item.metrics or {}).get("hedged_requests", 0) for item in records)
+    hedge_wins = sum((item.metrics or {}).get("hedge_wins", 0) for item in records)
     return {
+        **_usage([item.metrics or {} for item in records]),
         "total": len(records),
         "succeeded": succeeded,
         "failed": failed,
@@ -94,6 +170,23 @@ def _summarize(records: list[GenerationJobRecord]) -> dict[str, Any]:
         "success_rate": round(succeeded / settled, 4) if settled else None,
         "p50_ms": _percentile(durations, 50),
         "p95_ms": _percentile(durations, 95),
+        "hedged_requests": hedged,
+        "hedge_wins": hedge_wins,
+    }
+
+
+def _usage(counters: list[dict[str, Any]]) -> dict[str, Any]:
+    """Sum provider usage counters and derive throughput from them."""
+    summed = {key: sum(item.get(key, 0) for item in counters) for key in USAGE_KEYS}
+    calls = summed["provider_calls"]
+    return {
+        **summed,
+        "tokens_per_second": tokens_per_second(
+            summed["completion_tokens"], summed["provider_ms"]
+        ),
+        "avg_completion_tokens": (
+            round(summed["completion_tokens"] / calls) if calls else None
+        ),
     }
 
 
@@ -118,17 +211,66 @@ def classify_failure(exc: BaseException) -> str:
     return FAILURE_INTERNAL
 
 
-def _result_metrics(result: Any) -> dict[str, int]:
+def _result_metrics(result: Any) -> dict[str, Any]:
     """Summarize a generation result into counters worth trending over time."""
     if not isinstance(result, dict):
         return {}
     notes = result.get("notes") or result.get("validation_notes") or []
-    return {
+    metrics: dict[str, Any] = {
         "output_chars": len(result.get("html") or ""),
         "note_count": len(notes) if isinstance(notes, list) else 0,
         "safety_alert_count": len(result.get("safety_alerts") or []),
         "validation_error_count": len(result.get("validation_errors") or []),
     }
+    perf = result.get("perf")
+    if isinstance(perf, dict):
+        metrics.update({key: perf.get(key, 0) for key in PAGE_WEIGHT_KEYS})
+        metrics["perf_violations"] = [
+            item["metric"] for item in perf.get("violations") or []
+        ]
+    return metrics
+
+
+def _page_weight(records: list[GenerationJobRecord]) -> dict[str, Any]:
+    """Page-weight averages and budget violations, overall and per day."""
+    measured = [
+        item for item in records if item.metrics and "perf_violations" in item.metrics
+    ]
+    violations: dict[str, int] = {}
+    for item in measured:
+        for metric in item.metrics["perf_violations"]:
+            violations[metric] = violations.get(metric, 0) + 1
+    by_day: dict[str, list[GenerationJobRecord]] = {}
+    for item in measured:
+        by_day.setdefault(item.created_at.date().isoformat(), []).append(item)
+    days = sorted(by_day)[-PAGE_WEIGHT_TREND_DAYS:]
+    return {
+        **_weight_summary(measured),
+        "p95_dom_nodes": _percentile(
+            [item.metrics.get("dom_nodes", 0) for item in measured], 95
+        ),
+        "violations": violations,
+        "daily": [{"date": day, **_weight_summary(by_day[day])} for day in days],
+    }
+
+
+def _weight_summary(records: list[GenerationJobRecord]) -> dict[str, Any]:
+    def average(key: str) -> int | None:
+        values = [item.metrics.get(key, 0) for item in records]
+        return round(sum(values) / len(values)) if values else None
+
+    return {
+        "pages": len(records),
+        "over_budget": sum(1 for item in records if item.metrics["perf_violations"]),
+        **{f"avg_{key}": average(key) for key in PAGE_WEIGHT_KEYS},
+    }
+
+
+def _job_version(job: GenerationJobRecord) -> str:
+    """Changes whenever anything a status poll reports can have changed."""
+    stamp = job.updated_at.isoformat() if job.updated_at else ""
+    state = f"{job.status}:{int(bool(job.cancel_requested))}:{stamp}"
+    return hashlib.sha256(state.encode()).hexdigest()[:16]
 
 
 def _job_snapshot(job: GenerationJobRecord) -> dict[str, Any]:
@@ -141,7 +283,9 @@ def _job_snapshot(job: GenerationJobRecord) -> dict[str, Any]:
         "failure_kind": job.failure_kind,
         "duration_ms": job.duration_ms,
         "metrics": job.metrics,
+        "progress": job.progress,
         "cancel_requested": bool(job.cancel_requested),
+        "version": _job_version(job),
     }
 
 
@@ -165,6 +309,24 @@ def _thread_id(value: str) -> str:
     return clean
 
 
+def _page_size(limit: int | None) -> int:
+    if limit is None:
+        return CONVERSATION_PAGE_SIZE
+    return min(max(1, limit), MAX_CONVERSATION_PAGE_SIZE)
+
+
+def _turn_messages(messages: list[dict[str, str]]) -> list[dict[str, str]]:
+    """The messages one agent turn added: its user input and every reply after it.
+
+    The agent returns the replayed history ahead of the new turn, and only the
+    new messages are appended to the durable thread.
+    """
+    for index in range(len(messages) - 1, -1, -1):
+        if messages[index]["role"] == "user":
+            return messages[index:]
+    return messages
+
+
 def _message_snapshot(message: Any) -> dict[str, str]:
     if isinstance(message, dict):
         role = str(message.get("role", "assistant"))
@@ -187,14 +349,24 @@ class GenerationOrchestrator:
     """
 
     def __init__(
-        self, sessions: sessionmaker[Session], *, max_workers: int = 4
+        self,
+        sessions: sessionmaker[Session],
+        *,
+        max_workers: int = 4,
+        job_wait_recheck_seconds: float = 2.0,
     ) -> None:
         self._sessions = sessions
+        # Held status reads are woken by ``watchers``, which only hear about
+        # jobs this process runs; this interval re-reads the job anyway for
+        # jobs another process runs. 0, for a single process, re-reads only
+        # when the wait times out.
+        self._wait_recheck_seconds = job_wait_recheck_seconds
         # The pool size *is* the generation concurrency limit; further
         # submissions queue rather than oversubscribing the provider.
         self._executor = ThreadPoolExecutor(
             max_workers=max(1, max_workers), thread_name_prefix="generation"
         )
+        self.watchers = JobWatchers()
 
     def shutdown(self) -> None:
         self._executor.shutdown(wait=False, cancel_futures=True)
@@ -210,11 +382,19 @@ class GenerationOrchestrator:
     ) -> str:
         """Queue a generation and return its job ID immediately."""
         job_id = self._start_job(owner_id, operation, request, conversation_id)
-        self._executor.submit(self._run_job, job_id, work)
+        self._executor.submit(self._run_job, job_id, work, time.perf_counter())
         return job_id
 
-    def _run_job(self, job_id: str, work: Callable[[CancellationToken], T]) -> None:
-        token = CancellationToken(lambda: self._is_cancel_requested(job_id))
+    def _run_job(
+        self,
+        job_id: str,
+        work: Callable[[CancellationToken], T],
+        submitted: float | None = None,
+    ) -> None:
+        token = CancellationToken(
+            lambda: self._is_cancel_requested(job_id),
+            lambda progress: self._report_progress(job_id, progress),
+        )
         if token.cancelled:
             self._finish_job(job_id, status=STATUS_CANCELLED)
             return
@@ -222,7 +402,12 @@ class GenerationOrchestrator:
         self._mark_running(job_id)
         started = time.perf_counter()
         try:
-            result = work(token)
+            with collect_counters() as counters:
+                if submitted is not None:
+                    # Time spent waiting for a worker: the first thing to grow
+                    # when the pool, not the provider, is the bottleneck.
+                    count("queue_ms", int((started - submitted) * 1000))
+                result = work(token)
         except GenerationCancelled:
             self._finish_job(
                 job_id, status=STATUS_CANCELLED, duration_ms=_elapsed_ms(started)
@@ -252,7 +437,7 @@ class GenerationOrchestrator:
             status=STATUS_SUCCEEDED,
             result=result,
             duration_ms=_elapsed_ms(started),
-            metrics=_result_metrics(result),
+            metrics={**_result_metrics(result), **counters},
         )
 
     def request_cancel(self, owner_id: str, job_id: str) -> dict[str, Any]:
@@ -269,7 +454,9 @@ class GenerationOrchestrator:
                 job.status = STATUS_CANCELLED
                 job.finished_at = utcnow()
             job.updated_at = utcnow()
-            return _job_snapshot(job)
+            snapshot = _job_snapshot(job)
+        self.watchers.notify(job_id)
+        return snapshot
 
     def get_job(self, owner_id: str, job_id: str) -> dict[str, Any] | None:
         with self._sessions() as session:
@@ -278,6 +465,48 @@ class GenerationOrchestrator:
                 return None
             return _job_snapshot(job)
 
+    async def wait_for_job(
+        self,
+        owner_id: str,
+        job_id: str,
+        *,
+        seen_version: str | None = None,
+        timeout: float = 0,
+    ) -> dict[str, Any] | None:
+        """Read a job, holding on up to ``timeout`` seconds for it to change.
+
+        Returns as soon as the job's version differs from ``seen_version`` (by
+        default, the version of the first read) or it has settled; otherwise
+        returns it unchanged once ``timeout`` runs out. Changes made in this
+        process wake the wait at once; others are seen on the next recheck,
+        if rechecks are on, or when the wait ends.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + min(max(0.0, timeout), MAX_JOB_WAIT_SECONDS)
+        with self.watchers.watch(job_id) as changed:
+            while True:
+                # Cleared before the read, so a change landing between the
+                # read and the wait still wakes it.
+                changed.clear()
+                job = await offload(self.get_job, owner_id, job_id)
+                if job is None:
+                    return None
+                if seen_version is None:
+                    seen_version = job["version"]
+                remaining = deadline - loop.time()
+                if (
+                    job["version"] != seen_version
+                    or job["status"] in TERMINAL_STATUSES
+                    or remaining <= 0
+                ):
+                    return job
+                if self._wait_recheck_seconds > 0:
+                    remaining = min(remaining, self._wait_recheck_seconds)
+                try:
+                    await asyncio.wait_for(changed.wait(), remaining)
+                except TimeoutError:
+                    pass
+
     def active_job(self, owner_id: str) -> dict[str, Any] | None:
         """The job a reloaded browser should reattach to, if any."""
         with self._sessions() as session:
@@ -303,6 +532,16 @@ class GenerationOrchestrator:
             if job is not None:
                 job.status = STATUS_RUNNING
                 job.updated_at = utcnow()
+        self.watchers.notify(job_id)
+
+    def _report_progress(self, job_id: str, progress: dict[str, Any]) -> None:
+        with self._sessions.begin() as session:
+            job = session.get(GenerationJobRecord, job_id)
+            if job is None or job.status != STATUS_RUNNING:
+                return
+            job.progress = progress
+            job.updated_at = utcnow()
+        self.watchers.notify(job_id)
 
     def recover_interrupted_jobs(self) -> int:
         """Settle jobs a stopped process left behind.
@@ -335,7 +574,11 @@ class GenerationOrchestrator:
         target_node_id: str | None = None,
     ) -> str:
         clean_thread_id = _thread_id(thread_id)
-        conversation = self._get_or_create_conversation(owner_id, clean_thread_id)
+        conversation = self._get_or_create_conversation(
+            owner_id, clean_thread_id, history=CHAT_HISTORY_MESSAGES
+        )
+        from server.agent import set_client
+
         set_client(client)
 
         def work(token: CancellationToken) -> dict[str, Any]:
@@ -344,35 +587,32 @@ class GenerationOrchestrator:
                 thread_id=clean_thread_id,
                 current_code=current_code or conversation.current_code,
                 settings=settings,
-                history=list(conversation.messages),
+                history=list(conversation.history),
                 target_node_id=target_node_id,
             )
-            messages = [
-                snapshot
-                for item in state.get("messages", [])
-                if (snapshot := _message_snapshot(item))["role"]
-                in {"user", "assistant"}
-            ]
+            messages = _turn_messages(
+                [
+                    snapshot
+                    for item in state.get("messages", [])
+                    if (snapshot := _message_snapshot(item))["role"]
+                    in {"user", "assistant"}
+                ]
+            )
             # The conversation is the one durable side effect of a chat turn,
             # so it is the last thing checked before committing.
             token.raise_if_cancelled()
             next_code = state.get("current_code")
-            self._save_conversation(
-                conversation.id,
-                messages,
-                next_code,
-                (
-                    conversation.document_json
-                    if next_code == conversation.current_code
-                    else None
-                ),
-            )
+            if next_code == conversation.current_code:
+                self._append_turn(owner_id, conversation, messages)
+            else:
+                self._append_turn(owner_id, conversation, messages, code=next_code)
             return {
                 "html": state.get("current_code"),
                 "message": self._last_assistant_message(messages),
                 "intent": state.get("intent"),
                 "validation_errors": state.get("validation_errors", []),
                 "validation_notes": state.get("validation_notes", []),
+                "perf": state.get("perf"),
                 "error": state.get("error"),
             }
 
@@ -388,7 +628,20 @@ class GenerationOrchestrator:
             conversation_id=conversation.id,
         )
 
-    def get_conversation(self, owner_id: str, thread_id: str) -> dict[str, Any] | None:
+    def get_conversation(
+        self,
+        owner_id: str,
+        thread_id: str,
+        *,
+        limit: int | None = None,
+        before: int | None = None,
+    ) -> dict[str, Any] | None:
+        """Read a conversation with one page of its messages, newest last.
+
+        ``before`` is a message sequence number: pass the returned
+        ``next_before`` to read the page of older messages preceding this one.
+        """
+        page_size = _page_size(limit)
         with self._sessions() as session:
             record = session.scalar(
                 select(ConversationRecord).where(
@@ -398,10 +651,25 @@ class GenerationOrchestrator:
             )
             if record is None:
                 return None
+            query = (
+                select(ConversationMessageRecord)
+                .where(ConversationMessageRecord.conversation_id == record.id)
+                .order_by(ConversationMessageRecord.sequence.desc())
+                .limit(page_size)
+            )
+            if before is not None:
+                query = query.where(ConversationMessageRecord.sequence < before)
+            page = list(reversed(list(session.scalars(query))))
+            # Sequences are contiguous from 1, so anything above the first one
+            # means older messages remain.
+            oldest = page[0].sequence if page else None
             return {
                 "thread_id": record.thread_id,
-                "messages": record.messages,
-                "current_code": record.current_code,
+                "messages": [
+                    {"role": item.role, "content": item.content} for item in page
+                ],
+                "next_before": oldest if oldest is not None and oldest > 1 else None,
+                "current_code": self._blob_content(session, record.current_blob_id),
                 "document": record.document_json,
             }
 
@@ -414,12 +682,15 @@ class GenerationOrchestrator:
         code: str,
     ) -> str:
         conversation = self._get_or_create_conversation(owner_id, _thread_id(thread_id))
-        messages = [
-            *conversation.messages,
-            {"role": "user", "content": user_message},
-            {"role": "assistant", "content": assistant_message},
-        ]
-        self._save_conversation(conversation.id, messages, code)
+        self._append_turn(
+            owner_id,
+            conversation,
+            [
+                {"role": "user", "content": user_message},
+                {"role": "assistant", "content": assistant_message},
+            ],
+            code=code,
+        )
         return conversation.id
 
     def update_document(
@@ -433,11 +704,8 @@ class GenerationOrchestrator:
         clean_document = validate_editor_document(document)
         if clean_document is None and conversation.current_code == code:
             clean_document = conversation.document_json
-        self._save_conversation(
-            conversation.id,
-            list(conversation.messages),
-            code,
-            clean_document,
+        self._append_turn(
+            owner_id, conversation, [], code=code, document=clean_document
         )
         return {"thread_id": conversation.thread_id, "saved": True}
 
@@ -467,7 +735,9 @@ class GenerationOrchestrator:
 
         Reported per operation as well as overall, because the Phase 3 latency
         targets are provider- and operation-specific: a section regeneration and
-        a full-page generation are not comparable.
+        a full-page generation are not comparable. Token usage and throughput
+        are also broken down by the model that served each provider call, and
+        the weight of the pages produced is trended day by day.
         """
         with self._sessions() as session:
             records = list(
@@ -480,9 +750,12 @@ class GenerationOrchestrator:
             )
 
         by_operation: dict[str, list[GenerationJobRecord]] = {}
+        by_model: dict[str, list[dict[str, Any]]] = {}
         failure_kinds: dict[str, int] = {}
         for item in records:
             by_operation.setdefault(item.operation, []).append(item)
+            for model, usage in ((item.metrics or {}).get("models") or {}).items():
+                by_model.setdefault(model, []).append(usage)
             if item.failure_kind:
                 failure_kinds[item.failure_kind] = (
                     failure_kinds.get(item.failure_kind, 0) + 1
@@ -495,12 +768,18 @@ class GenerationOrchestrator:
                 {"operation": operation, **_summarize(items)}
                 for operation, items in sorted(by_operation.items())
             ],
+            "models": [
+                {"model": model, **_usage(items)}
+                for model, items in sorted(by_model.items())
+            ],
             "failure_kinds": failure_kinds,
+            "page_weight": _page_weight(records),
         }
 
     def _get_or_create_conversation(
-        self, owner_id: str, thread_id: str
-    ) -> ConversationRecord:
+        self, owner_id: str, thread_id: str, *, history: int = 0
+    ) -> _Conversation:
+        """Load a conversation, reading back at most ``history`` recent messages."""
         with self._sessions.begin() as session:
             record = session.scalar(
                 select(ConversationRecord).where(
@@ -509,30 +788,114 @@ class GenerationOrchestrator:
                 )
             )
             if record is None:
-                record = ConversationRecord(
-                    owner_id=owner_id,
-                    thread_id=thread_id,
-                    messages=[],
-                )
+                record = ConversationRecord(owner_id=owner_id, thread_id=thread_id)
                 session.add(record)
                 session.flush()
-            session.expunge(record)
-            return record
+            recent: list[ConversationMessageRecord] = []
+            if history > 0 and record.message_count:
+                recent = list(
+                    session.scalars(
+                        select(ConversationMessageRecord)
+                        .where(ConversationMessageRecord.conversation_id == record.id)
+                        .order_by(ConversationMessageRecord.sequence.desc())
+                        .limit(history)
+                    )
+                )
+            return _Conversation(
+                id=record.id,
+                thread_id=record.thread_id,
+                current_code=self._blob_content(session, record.current_blob_id),
+                current_blob_id=record.current_blob_id,
+                document_json=record.document_json,
+                history=[
+                    {"role": item.role, "content": item.content}
+                    for item in reversed(recent)
+                ],
+            )
 
-    def _save_conversation(
+    def _append_turn(
         self,
-        conversation_id: str,
+        owner_id: str,
+        conversation: _Conversation,
         messages: list[dict[str, str]],
-        code: str | None,
+        *,
+        code: Any = _UNCHANGED,
         document: dict[str, Any] | None = None,
     ) -> None:
+        """Append messages and, when ``code`` is given, point at its document.
+
+        The work is proportional to this turn alone: messages are inserted as new
+        rows and the page is stored once per distinct content, so the thousandth
+        turn of a thread costs what the first did. Changing the code resets the
+        structured document to ``document``; leaving it unchanged keeps both.
+        """
         with self._sessions.begin() as session:
-            record = session.get(ConversationRecord, conversation_id)
-            if record is not None:
-                record.messages = messages
-                record.current_code = code
-                record.document_json = document
-                record.updated_at = utcnow()
+            values: dict[str, Any] = {
+                "message_count": ConversationRecord.message_count + len(messages),
+                "updated_at": utcnow(),
+            }
+            if code is not _UNCHANGED:
+                values["current_blob_id"] = (
+                    conversation.current_blob_id
+                    if code == conversation.current_code
+                    else self._store_blob(session, owner_id, code)
+                )
+                values["document_json"] = document
+            # Updating first takes the row's write lock, so concurrent turns on
+            # one thread serialize here instead of racing for sequence numbers.
+            session.execute(
+                update(ConversationRecord)
+                .where(ConversationRecord.id == conversation.id)
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            if not messages:
+                return
+            count = session.scalar(
+                select(ConversationRecord.message_count).where(
+                    ConversationRecord.id == conversation.id
+                )
+            )
+            if count is None:
+                return
+            first = count - len(messages) + 1
+            session.add_all(
+                ConversationMessageRecord(
+                    conversation_id=conversation.id,
+                    sequence=first + offset,
+                    role=message["role"],
+                    content=message["content"],
+                )
+                for offset, message in enumerate(messages)
+            )
+
+    @staticmethod
+    def _store_blob(session: Session, owner_id: str, code: str | None) -> str | None:
+        if code is None:
+            return None
+        digest = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        existing = session.scalar(
+            select(DocumentBlobRecord.id)
+            .where(
+                DocumentBlobRecord.owner_id == owner_id,
+                DocumentBlobRecord.digest == digest,
+            )
+            .limit(1)
+        )
+        if existing is not None:
+            return existing
+        blob = DocumentBlobRecord(owner_id=owner_id, digest=digest, content=code)
+        session.add(blob)
+        session.flush()
+        return blob.id
+
+    @staticmethod
+    def _blob_content(session: Session, blob_id: str | None) -> str | None:
+        if blob_id is None:
+            return None
+        return session.scalar(
+            select(DocumentBlobRecord.content).where(DocumentBlobRecord.id == blob_id)
+        )
 
     def _start_job(
         self,
@@ -562,7 +925,7 @@ class GenerationOrchestrator:
         error: str | None = None,
         failure_kind: str | None = None,
         duration_ms: int | None = None,
-        metrics: dict[str, int] | None = None,
+        metrics: dict[str, Any] | None = None,
     ) -> None:
         with self._sessions.begin() as session:
             job = session.get(GenerationJobRecord, job_id)
@@ -576,6 +939,7 @@ class GenerationOrchestrator:
                 job.metrics = metrics
                 job.finished_at = now
                 job.updated_at = now
+        self.watchers.notify(job_id)
 
     @staticmethod
     def _last_assistant_message(messages: list[dict[str, str]]) -> str:
@@ -11,6 +11,7 @@ from server.auth_routes import Authenticated
 from server.concurrency import offload
 from server.mutations import run_idempotent
 from server.projects import ProjectService
+from src.delta import TextEdit
 
 router = APIRouter(prefix="/api", tags=["projects"])
 
@@ -34,6 +35,24 @@ class PageSaveRequest(BaseModel):
     document: dict[str, Any] | None = None
     expected_version: int
     source: str = "autosave"
+    #: Store repeated inline SVG icons once, in a shared sprite. Only for saves
+    #: without a ``document``, which the sprite would no longer match.
+    svg_sprite: bool = False
+
+
+class TextEditRequest(BaseModel):
+    #: Offsets into the saved HTML, in UTF-16 code units as JavaScript counts.
+    start: int
+    end: int
+    text: str = ""
+
+
+class PageDeltaRequest(BaseModel):
+    expected_version: int
+    html_edits: list[TextEditRequest] = []
+    #: RFC 6902 JSON Patch operations on the saved editor document.
+    document_patch: list[dict[str, Any]] = []
+    source: str = "autosave"
 
 
 class RevisionRestoreRequest(BaseModel):
@@ -162,6 +181,30 @@ async def pages_save(
             expected_version=body.expected_version,
             source=body.source,
             document=body.document,
+            svg_sprite=body.svg_sprite,
+        ),
+    )
+
+
+@router.patch("/pages/{page_id}/document")
+async def pages_save_delta(
+    request: Request,
+    page_id: str,
+    body: PageDeltaRequest,
+    principal: Authenticated,
+) -> dict[str, Any]:
+    return await run_idempotent(
+        request,
+        principal,
+        "page.save_delta",
+        {"page_id": page_id, **body.model_dump()},
+        lambda: _projects(request).save_page_delta(
+            principal.id,
+            page_id,
+            expected_version=body.expected_version,
+            html_edits=[TextEdit(**edit.model_dump()) for edit in body.html_edits],
+            document_patch=body.document_patch,
+            source=body.source,
         ),
     )
 
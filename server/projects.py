@@ -7,7 +7,9 @@ than on a particular database engine.
 
 from __future__ import annotations
 
-from typing import Any
+import json
+from collections.abc import Sequence
+from typing import TYPE_CHECKING, Any
 
 from sqlalchemy import (
     func,
@@ -17,7 +19,13 @@ from sqlalchemy import (
 from sqlalchemy.orm import Session, sessionmaker
 
 from server.content import validate_document
-from server.documents import validate_editor_document
+from server.documents import (
+    DocumentStats,
+    DocumentStatsCache,
+    EditorDocumentValidationError,
+    editor_document_stats,
+    validate_editor_document_change,
+)
 from server.models import (
     MAX_PROJECT_NAME_CHARS,
     PageRecord,
@@ -27,6 +35,18 @@ from server.models import (
     new_id,
     utcnow,
 )
+from src.delta import (
+    DeltaError,
+    TextEdit,
+    apply_json_patch,
+    apply_text_edits,
+    changed_paths,
+)
+from src.document_compiler import COMPILER_VERSION, CompileCache
+from src.svg_sprite import dedupe_svgs
+
+if TYPE_CHECKING:
+    from server.media import MediaLibrary
 
 _REVISION_SOURCES = {
     "create",
@@ -39,6 +59,42 @@ _REVISION_SOURCES = {
 }
 
 
+#: Pages compiled from revisions that keep only their editor document.
+_COMPILED_PAGES = CompileCache()
+
+
+def revision_html(revision: RevisionRecord | None) -> str:
+    """The HTML a revision saved, compiled from its document if it kept none."""
+    if revision is None:
+        return ""
+    if revision.html is not None or revision.document_json is None:
+        return revision.html or ""
+    if revision.compiler_version != COMPILER_VERSION:
+        # Compiling with another version could change a saved page; the
+        # migration that bumped the version should have stored its HTML.
+        raise RuntimeError(
+            f"Revision {revision.id} was derived by document compiler "
+            f"{revision.compiler_version}, not {COMPILER_VERSION}"
+        )
+    return _COMPILED_PAGES.compile(revision.document_json)
+
+
+def _stored_html(html: str, document: dict[str, Any] | None) -> str | None:
+    """``None`` when ``document`` compiles to exactly ``html``.
+
+    The compile stays cached, so reading the revision back right after a save
+    costs nothing.
+    """
+    if document is None:
+        return html
+    try:
+        compiled = _COMPILED_PAGES.compile(document)
+    except (KeyError, TypeError, AttributeError):
+        # Documents copied from revisions saved before validation existed.
+        return html
+    return None if compiled == html else html
+
+
 class ProjectNotFoundError(LookupError):
     pass
 
@@ -70,8 +126,49 @@ def _copy_name(name: str) -> str:
 
 
 class ProjectService:
-    def __init__(self, sessions: sessionmaker[Session]):
+    def __init__(
+        self, sessions: sessionmaker[Session], media: MediaLibrary | None = None
+    ):
         self._sessions = sessions
+        self._media = media
+        #: Stats of recently saved documents, by revision id, so a delta on
+        #: top of one only validates what it changed.
+        self._document_stats = DocumentStatsCache()
+
+    def _externalize_images(
+        self, owner_id: str, html: str, document: dict[str, Any] | None
+    ) -> tuple[str, dict[str, Any] | None]:
+        """Move pasted ``data:`` images into the media library before validation.
+
+        Otherwise every revision stores the image bytes again, and a large
+        enough image makes the page too big to save at all.
+        """
+        if self._media is None:
+            return html, document
+        if "data:image/" in html:
+            html = self._media.externalize(owner_id, html)
+        if isinstance(document, dict):
+            document = self._media.externalize_document(owner_id, document)
+        return html, document
+
+    def _stats(
+        self, revision_id: str | None, document: dict[str, Any] | None
+    ) -> DocumentStats | None:
+        """Stats of a stored revision's document, measured once and then cached.
+
+        ``None`` when there is no document, or when the stored one no longer
+        passes validation; a change to it is then checked in full.
+        """
+        if revision_id is None or document is None:
+            return None
+        stats = self._document_stats.get(revision_id)
+        if stats is None:
+            try:
+                stats = editor_document_stats(document)
+            except EditorDocumentValidationError:
+                return None
+            self._document_stats.put(revision_id, stats)
+        return stats
 
     def create_project(
         self,
@@ -81,8 +178,9 @@ class ProjectService:
         document: dict[str, Any] | None = None,
     ) -> dict[str, Any]:
         clean_name = _project_name(name)
+        html, document = self._externalize_images(owner_id, html, document)
         clean_html = validate_document(html)
-        clean_document = validate_editor_document(document)
+        stats = None if document is None else editor_document_stats(document)
         with self._sessions.begin() as session:
             project = ProjectRecord(owner_id=owner_id, name=clean_name)
             session.add(project)
@@ -94,9 +192,11 @@ class ProjectService:
             )
             session.add(page)
             session.flush()
-            self._append_revision(
-                session, page, clean_html, "create", document=clean_document
+            revision = self._append_revision(
+                session, page, clean_html, "create", document=document
             )
+            if stats is not None:
+                self._document_stats.put(revision.id, stats)
             return self._project_snapshot(session, project)
 
     def list_projects(
@@ -174,7 +274,7 @@ class ProjectService:
                 self._append_revision(
                     session,
                     page,
-                    revision.html if revision else "",
+                    revision_html(revision),
                     "duplicate",
                     document=revision.document_json if revision else None,
                 )
@@ -203,38 +303,124 @@ class ProjectService:
         expected_version: int,
         source: str = "autosave",
         document: dict[str, Any] | None = None,
+        svg_sprite: bool = False,
     ) -> dict[str, Any]:
+        if svg_sprite and document is not None:
+            # The sprite rewrites the HTML but not the document, so the two
+            # would no longer describe the same page. Exports and publishing
+            # share repeated icons on their own.
+            raise ProjectValidationError(
+                "svg_sprite cannot be combined with an editor document"
+            )
+        html, document = self._externalize_images(owner_id, html, document)
         clean_html = validate_document(html)
-        clean_document = validate_editor_document(document)
+        if svg_sprite:
+            clean_html, _ = dedupe_svgs(clean_html)
+        stats = None if document is None else editor_document_stats(document)
         clean_source = source if source in _REVISION_SOURCES else "manual"
         with self._sessions.begin() as session:
             page = self._owned_page(session, owner_id, page_id)
             if page.version != expected_version:
                 raise VersionConflictError(page.version)
             current = self._current_revision(session, page)
-            effective_document = clean_document
+            effective_document = document
+            current_html = revision_html(current)
             if (
                 effective_document is None
                 and current is not None
-                and current.html == clean_html
+                and current_html == clean_html
             ):
                 effective_document = current.document_json
             if (
                 current is not None
-                and current.html == clean_html
+                and current_html == clean_html
                 and current.document_json == effective_document
             ):
                 return self._page_snapshot(session, page)
-            self._append_revision(
+            revision = self._append_revision(
                 session,
                 page,
                 clean_html,
                 clean_source,
                 document=effective_document,
             )
+            if stats is not None:
+                self._document_stats.put(revision.id, stats)
             self._touch_project(session, page)
             return self._page_snapshot(session, page)
 
+    def save_page_delta(
+        self,
+        owner_id: str,
+        page_id: str,
+        *,
+        expected_version: int,
+        html_edits: Sequence[TextEdit] = (),
+        document_patch: Sequence[dict[str, Any]] = (),
+        source: str = "autosave",
+    ) -> dict[str, Any]:
+        """Save a page as changes to the revision at ``expected_version``.
+
+        Only what the delta touches is checked again: HTML edits leave the
+        document as it was validated, a patch leaves the HTML and only the
+        nodes around its changes are walked, and a delta that changes nothing
+        writes nothing. The result leaves out the page's
+        content unless the server rewrote it (moving pasted images into the
+        media library); the client must then diff against the returned
+        ``html`` and ``document`` from now on.
+        """
+        clean_source = source if source in _REVISION_SOURCES else "manual"
+        with self._sessions() as session:
+            page = self._owned_page(session, owner_id, page_id)
+            if page.version != expected_version:
+                raise VersionConflictError(page.version)
+            current = self._current_revision(session, page)
+            base_id = current.id if current else None
+            base_html = revision_html(current)
+            base_document = current.document_json if current else None
+        try:
+            html, html_changed = apply_text_edits(base_html, html_edits)
+            document, document_changed = apply_json_patch(base_document, document_patch)
+        except DeltaError as exc:
+            raise ProjectValidationError(str(exc)) from exc
+        if not (html_changed or document_changed):
+            with self._sessions() as session:
+                return self._page_fields(self._owned_page(session, owner_id, page_id))
+        saved_html, saved_document = html, document
+        if any("data:image/" in edit.text for edit in html_edits):
+            saved_html, _ = self._externalize_images(owner_id, html, None)
+        if any("data:image/" in json.dumps(op.get("value")) for op in document_patch):
+            _, saved_document = self._externalize_images(owner_id, "", document)
+        if html_changed:
+            validate_document(saved_html)
+        if saved_document is not document:
+            # Moving images out rewrote strings anywhere in the document.
+            stats = editor_document_stats(saved_document)
+        elif document_changed:
+            stats = validate_editor_document_change(
+                saved_document,
+                base_document,
+                self._stats(base_id, base_document),
+                changed_paths(document_patch),
+            )
+        else:
+            stats = self._document_stats.get(base_id) if base_id else None
+        with self._sessions.begin() as session:
+            page = self._owned_page(session, owner_id, page_id)
+            if page.version != expected_version:
+                raise VersionConflictError(page.version)
+            revision = self._append_revision(
+                session, page, saved_html, clean_source, document=saved_document
+            )
+            if stats is not None:
+                self._document_stats.put(revision.id, stats)
+            self._touch_project(session, page)
+            result = self._page_fields(page)
+        if saved_html != html or saved_document != document:
+            result["html"] = saved_html
+            result["document"] = saved_document
+        return result
+
     def list_revisions(self, owner_id: str, page_id: str) -> list[dict[str, Any]]:
         with self._sessions() as session:
             self._owned_page(session, owner_id, page_id)
@@ -258,7 +444,7 @@ class ProjectService:
             self._append_revision(
                 session,
                 page,
-                revision.html,
+                revision_html(revision),
                 "restore",
                 document=revision.document_json,
             )
@@ -277,7 +463,7 @@ class ProjectService:
             self._append_revision(
                 session,
                 page,
-                current.html if current else "",
+                revision_html(current),
                 "checkpoint",
                 name=clean_name,
                 document=current.document_json if current else None,
@@ -308,7 +494,7 @@ class ProjectService:
             self._append_revision(
                 session,
                 page,
-                revision.html,
+                revision_html(revision),
                 "duplicate",
                 document=revision.document_json,
             )
@@ -358,11 +544,13 @@ class ProjectService:
         next_version = expected_version + 1
         revision_id = new_id()
         created_at = utcnow()
+        stored_html = _stored_html(html, document)
         revision = RevisionRecord(
             id=revision_id,
             page_id=page.id,
             sequence=next_version,
-            html=html,
+            html=stored_html,
+            compiler_version=COMPILER_VERSION if stored_html is None else None,
             document_json=document,
             source=source,
             name=name,
@@ -428,7 +616,15 @@ class ProjectService:
 
     def _page_snapshot(self, session: Session, page: PageRecord) -> dict[str, Any]:
         revision = self._current_revision(session, page)
-        result: dict[str, Any] = {
+        result = self._page_fields(page)
+        result["html"] = revision_html(revision)
+        result["document"] = revision.document_json if revision else None
+        return result
+
+    @staticmethod
+    def _page_fields(page: PageRecord) -> dict[str, Any]:
+        """A page's snapshot without its content."""
+        return {
             "id": page.id,
             "project_id": page.project_id,
             "name": page.name,
@@ -438,9 +634,6 @@ class ProjectService:
             "created_at": isoformat_utc(page.created_at),
             "updated_at": isoformat_utc(page.updated_at),
         }
-        result["html"] = revision.html if revision else ""
-        result["document"] = revision.document_json if revision else None
-        return result
 
     @staticmethod
     def _revision_snapshot(revision: RevisionRecord) -> dict[str, Any]:
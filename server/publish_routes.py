@@ -0,0 +1,161 @@
+"""HTTP contracts for publishing projects and serving their live builds."""
+
+from __future__ import annotations
+
+from typing import Any
+
+from fastapi import APIRouter, Request
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from pydantic import BaseModel
+
+from server.auth_routes import Authenticated
+from server.concurrency import offload
+from server.mutations import run_idempotent
+from server.publishing import LiveFile, SitePublisher
+
+router = APIRouter(tags=["publishing"])
+
+#: Hashed assets never change behind their URL.
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+#: Pages keep their URL across publishes, so caches must ask every time; the
+#: ETag makes that a 304 when nothing changed.
+REVALIDATE_CACHE = "public, max-age=0, must-revalidate"
+#: Published pages are owner-written HTML, scripts included, served on the
+#: builder's origin. The sandbox gives them an opaque origin, so their scripts
+#: cannot use a visitor's builder session to call ``/api``.
+SITE_CSP = "sandbox allow-scripts allow-forms allow-popups"
+#: Preferred first: brotli is smaller than gzip for the same text.
+ENCODING_PREFERENCE = ("br", "gzip")
+
+
+class PublishRequest(BaseModel):
+    revision_id: str | None = None
+
+
+class RollbackRequest(BaseModel):
+    build_id: str | None = None
+
+
+def _publisher(request: Request) -> SitePublisher:
+    return request.app.state.publisher
+
+
+@router.post("/api/projects/{project_id}/publish", status_code=201)
+async def projects_publish(
+    request: Request,
+    project_id: str,
+    body: PublishRequest,
+    principal: Authenticated,
+) -> dict[str, Any]:
+    return await run_idempotent(
+        request,
+        principal,
+        "project.publish",
+        {"project_id": project_id, **body.model_dump()},
+        lambda: _publisher(request).publish(principal.id, project_id, body.revision_id),
+    )
+
+
+@router.get("/api/projects/{project_id}/builds")
+async def projects_builds(
+    request: Request,
+    project_id: str,
+    principal: Authenticated,
+) -> dict[str, Any]:
+    builds = await offload(_publisher(request).list_builds, principal.id, project_id)
+    return {"builds": builds}
+
+
+@router.post("/api/projects/{project_id}/rollback")
+async def projects_rollback(
+    request: Request,
+    project_id: str,
+    body: RollbackRequest,
+    principal: Authenticated,
+) -> dict[str, Any]:
+    return await run_idempotent(
+        request,
+        principal,
+        "project.rollback",
+        {"project_id": project_id, **body.model_dump()},
+        lambda: _publisher(request).rollback(principal.id, project_id, body.build_id),
+    )
+
+
+def accepted_encodings(header: str) -> set[str]:
+    """Content codings an ``Accept-Encoding`` header allows (``q=0`` refuses)."""
+    accepted: set[str] = set()
+    for item in header.split(","):
+        coding, *params = item.split(";")
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    pass
+        if coding.strip() and quality > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def etag_matches(header: str, etag: str) -> bool:
+    """Whether ``If-None-Match`` names ``etag``, using the weak comparison."""
+    return any(
+        tag.strip() in {"*", etag} or tag.strip().removeprefix("W/") == etag
+        for tag in header.split(",")
+    )
+
+
+def _choose_encoding(live: LiveFile, accept_encoding: str) -> str | None:
+    accepted = accepted_encodings(accept_encoding)
+    for encoding in ENCODING_PREFERENCE:
+        if encoding in live.encodings and (encoding in accepted or "*" in accepted):
+            return encoding
+    return None
+
+
+@router.api_route("/sites/{project_id}", methods=["GET", "HEAD"])
+async def sites_root(request: Request) -> Response:
+    return RedirectResponse(f"{request.url.path}/", status_code=308)
+
+
+@router.api_route("/sites/{project_id}/{path:path}", methods=["GET", "HEAD"])
+async def sites_serve(request: Request, project_id: str, path: str) -> Response:
+    publisher = _publisher(request)
+    live = await offload(publisher.resolve, project_id, path)
+    # ``about`` is the page ``about/index.html``; its relative asset links only
+    # resolve under the trailing-slash URL.
+    if (
+        live is None
+        and path
+        and not path.endswith("/")
+        and await offload(publisher.resolve, project_id, f"{path}/") is not None
+    ):
+        return RedirectResponse(f"{request.url.path}/", status_code=308)
+    if live is None:
+        return Response("Not found", status_code=404, media_type="text/plain")
+
+    encoding = _choose_encoding(live, request.headers.get("accept-encoding", ""))
+    etag = f'"{live.sha256}-{encoding}"' if encoding else f'"{live.sha256}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": IMMUTABLE_CACHE if live.immutable else REVALIDATE_CACHE,
+        # On every file, not only pages: an SVG asset opened directly is a
+        # document too.
+        "Content-Security-Policy": SITE_CSP,
+    }
+    if live.encodings:
+        headers["Vary"] = "Accept-Encoding"
+    if etag_matches(request.headers.get("if-none-match", ""), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    # Starlette hands the file to the server through the ``http.response.pathsend``
+    # extension where it is supported, so the bytes never pass through Python.
+    return FileResponse(
+        live.encodings[encoding] if encoding else live.path,
+        headers=headers,
+        media_type=live.content_type,
+    )
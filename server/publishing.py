@@ -0,0 +1,305 @@
+"""Publish projects as immutable builds and switch the live one atomically.
+
+A build is every page of a project rendered with :func:`src.site_archive.site_files`
+into ``<root>/builds/<digest>``, where the digest is that of the build's
+manifest. The manifest lists the digest of every file, so equal sites share a
+directory and a directory never changes once it is in place: it is written
+under ``<root>/tmp`` first and moved into place with one rename.
+
+Which build a project serves is a column on the project row. Publishing and
+rolling back only update that column, in the same transaction that records
+the build, so a visitor gets either the old site or the new one in full.
+"""
+
+from __future__ import annotations
+
+import functools
+import hashlib
+import json
+import os
+import posixpath
+import shutil
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session, sessionmaker
+
+from server.models import (
+    PageRecord,
+    ProjectRecord,
+    RevisionRecord,
+    SiteBuildRecord,
+    isoformat_utc,
+)
+from server.projects import (
+    ProjectNotFoundError,
+    ProjectValidationError,
+    revision_html,
+)
+from src.site_archive import ASSETS_DIR, MANIFEST_NAME, SitePage, site_files
+
+if TYPE_CHECKING:
+    from server.media import MediaLibrary
+
+HOME_SLUG = "home"
+INDEX_PAGE = "index.html"
+#: Manifests of recently served builds. Builds are immutable, so an entry
+#: never goes stale; the bound only caps memory.
+MANIFEST_CACHE_SIZE = 128
+
+
+@dataclass(frozen=True)
+class LiveFile:
+    """A file of a live build and its precompressed siblings."""
+
+    path: Path
+    content_type: str
+    sha256: str
+    #: Encoding name to the sibling's location, such as ``{"gzip": ...}``.
+    encodings: dict[str, Path]
+    #: Content-hashed, so its URL never serves different bytes.
+    immutable: bool
+
+
+def page_path(slug: str) -> str:
+    """Where a page lives in a published site: the home page at the root."""
+    return INDEX_PAGE if slug == HOME_SLUG else f"{slug}/{INDEX_PAGE}"
+
+
+def site_url(project_id: str) -> str:
+    """Where a project's live build is served."""
+    return posixpath.join("/sites", project_id, "")
+
+
+@functools.lru_cache(maxsize=MANIFEST_CACHE_SIZE)
+def _load_manifest(build_dir: Path) -> dict[str, Any]:
+    return json.loads((build_dir / MANIFEST_NAME).read_bytes())
+
+
+class SitePublisher:
+    def __init__(
+        self,
+        sessions: sessionmaker[Session],
+        root: str | Path,
+        media: MediaLibrary | None = None,
+    ):
+        self._sessions = sessions
+        self._root = Path(root)
+        # Published pages get a srcset for every library image they show.
+        self._media = media
+
+    def build_dir(self, digest: str) -> Path:
+        return self._root / "builds" / digest
+
+    def publish(
+        self, owner_id: str, project_id: str, revision_id: str | None = None
+    ) -> dict[str, Any]:
+        """Build the project and make the build live.
+
+        Every page is published at its current revision, except the page that
+        ``revision_id`` belongs to, which is published at that revision.
+        """
+        with self._sessions() as session:
+            self._owned_project(session, owner_id, project_id)
+            pages = self._pages_to_publish(session, project_id, revision_id)
+        revisions = {slug: revision.id for slug, revision in pages.items()}
+        try:
+            site = [
+                SitePage(
+                    page_path(slug), self._page_html(owner_id, revision_html(revision))
+                )
+                for slug, revision in pages.items()
+            ]
+        except ValueError as exc:
+            raise ProjectValidationError(str(exc)) from exc
+        digest, file_count, total_bytes = self._write_build(site)
+        with self._sessions.begin() as session:
+            project = self._owned_project(session, owner_id, project_id)
+            build = SiteBuildRecord(
+                project_id=project.id,
+                digest=digest,
+                revisions=revisions,
+                file_count=file_count,
+                total_bytes=total_bytes,
+            )
+            session.add(build)
+            session.flush()
+            project.live_build_id = build.id
+            return self._build_snapshot(build, live=True)
+
+    def _page_html(self, owner_id: str, html: str) -> str:
+        return html if self._media is None else self._media.add_srcsets(owner_id, html)
+
+    def rollback(
+        self, owner_id: str, project_id: str, build_id: str | None = None
+    ) -> dict[str, Any]:
+        """Make an earlier build live again; by default the one before the live one."""
+        with self._sessions.begin() as session:
+            project = self._owned_project(session, owner_id, project_id)
+            if build_id is None:
+                build = self._previous_build(session, project)
+            else:
+                build = session.get(SiteBuildRecord, build_id)
+                if build is None or build.project_id != project.id:
+                    raise ProjectNotFoundError("Build not found")
+            if not (self.build_dir(build.digest) / MANIFEST_NAME).is_file():
+                raise ProjectValidationError("The build's files are missing")
+            project.live_build_id = build.id
+            return self._build_snapshot(build, live=True)
+
+    def list_builds(self, owner_id: str, project_id: str) -> list[dict[str, Any]]:
+        with self._sessions() as session:
+            project = self._owned_project(session, owner_id, project_id)
+            builds = session.scalars(
+                select(SiteBuildRecord)
+                .where(SiteBuildRecord.project_id == project.id)
+                .order_by(SiteBuildRecord.created_at.desc())
+            )
+            return [
+                self._build_snapshot(build, live=build.id == project.live_build_id)
+                for build in builds
+            ]
+
+    def resolve(self, project_id: str, path: str) -> LiveFile | None:
+        """The live file at ``path`` of a published project, if there is one.
+
+        Only files listed in the build's manifest are served, so a path can
+        never reach outside the build directory. A directory path serves its
+        ``index.html``.
+        """
+        with self._sessions() as session:
+            digest = session.scalar(
+                select(SiteBuildRecord.digest)
+                .join(ProjectRecord, ProjectRecord.live_build_id == SiteBuildRecord.id)
+                .where(
+                    ProjectRecord.id == project_id,
+                    ProjectRecord.archived_at.is_(None),
+                )
+            )
+        if digest is None:
+            return None
+        build_dir = self.build_dir(digest)
+        try:
+            files = _load_manifest(build_dir)["files"]
+        except FileNotFoundError:
+            return None
+        name = path.lstrip("/")
+        if not name or name.endswith("/"):
+            name += INDEX_PAGE
+        entry = files.get(name)
+        if entry is None:
+            return None
+        return LiveFile(
+            path=build_dir / name,
+            content_type=entry["content_type"],
+            sha256=entry["sha256"],
+            encodings={
+                encoding: build_dir / sibling
+                for encoding, sibling in entry["encodings"].items()
+            },
+            immutable=name.startswith(f"{ASSETS_DIR}/"),
+        )
+
+    def _write_build(self, site: list[SitePage]) -> tuple[str, int, int]:
+        """Write the build into place; return its digest, file count and size."""
+        staging = self._root / "tmp" / uuid.uuid4().hex
+        file_count = total_bytes = 0
+        manifest = b""
+        try:
+            for file in site_files(site, optimize=True):
+                target = staging / file.path
+                target.parent.mkdir(parents=True, exist_ok=True)
+                target.write_bytes(file.data)
+                file_count += 1
+                total_bytes += len(file.data)
+                manifest = file.data
+            digest = hashlib.sha256(manifest).hexdigest()
+            final = self.build_dir(digest)
+            final.parent.mkdir(parents=True, exist_ok=True)
+            if not final.exists():
+                try:
+                    os.replace(staging, final)
+                except OSError:
+                    # Another publish of the same site won the rename.
+                    if not final.exists():
+                        raise
+        finally:
+            shutil.rmtree(staging, ignore_errors=True)
+        return digest, file_count, total_bytes
+
+    @staticmethod
+    def _pages_to_publish(
+        session: Session, project_id: str, revision_id: str | None
+    ) -> dict[str, RevisionRecord]:
+        pages = list(
+            session.scalars(
+                select(PageRecord)
+                .where(PageRecord.project_id == project_id)
+                .order_by(PageRecord.created_at)
+            )
+        )
+        pinned = session.get(RevisionRecord, revision_id) if revision_id else None
+        if revision_id and (
+            pinned is None or pinned.page_id not in {page.id for page in pages}
+        ):
+            raise ProjectNotFoundError("Revision not found")
+        chosen: dict[str, RevisionRecord] = {}
+        for page in pages:
+            if pinned is not None and pinned.page_id == page.id:
+                chosen[page.slug] = pinned
+            elif page.current_revision_id:
+                revision = session.get(RevisionRecord, page.current_revision_id)
+                if revision is not None:
+                    chosen[page.slug] = revision
+        if not chosen:
+            raise ProjectValidationError("The project has no page to publish")
+        return chosen
+
+    @staticmethod
+    def _previous_build(session: Session, project: ProjectRecord) -> SiteBuildRecord:
+        """The latest build older than the live one that serves a different site."""
+        live = session.get(SiteBuildRecord, project.live_build_id or "")
+        if live is not None:
+            earlier = session.scalars(
+                select(SiteBuildRecord)
+                .where(
+                    SiteBuildRecord.project_id == project.id,
+                    SiteBuildRecord.created_at < live.created_at,
+                    SiteBuildRecord.digest != live.digest,
+                )
+                .order_by(SiteBuildRecord.created_at.desc())
+                .limit(1)
+            ).first()
+            if earlier is not None:
+                return earlier
+        raise ProjectValidationError("There is no earlier build to roll back to")
+
+    @staticmethod
+    def _owned_project(
+        session: Session, owner_id: str, project_id: str
+    ) -> ProjectRecord:
+        project = session.scalar(
+            select(ProjectRecord).where(
+                ProjectRecord.id == project_id, ProjectRecord.owner_id == owner_id
+            )
+        )
+        if project is None:
+            raise ProjectNotFoundError("Project not found")
+        return project
+
+    @staticmethod
+    def _build_snapshot(build: SiteBuildRecord, *, live: bool) -> dict[str, Any]:
+        return {
+            "id": build.id,
+            "project_id": build.project_id,
+            "digest": build.digest,
+            "revisions": build.revisions,
+            "file_count": build.file_count,
+            "total_bytes": build.total_bytes,
+            "created_at": isoformat_utc(build.created_at),
+            "live": live,
+            "url": site_url(build.project_id),
+        }
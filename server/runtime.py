@@ -7,13 +7,38 @@ can call ``call_gemini`` / ``call_gemini_for_section`` unchanged.
 
 from __future__ import annotations
 
+import contextvars
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    FIRST_EXCEPTION,
+    ThreadPoolExecutor,
+    wait,
+)
 from dataclasses import dataclass
 from typing import Any
 
-from src.config import OPENROUTER_PROVIDER, AppConfig, load_config
+from src.circuit_breaker import BreakerPolicy
+from src.concurrency_limit import LimitPolicy
+from src.config import GEMINI_PROVIDER, OPENROUTER_PROVIDER, AppConfig, load_config
 from src.generation import (
+    ProviderTarget,
     call_gemini,
     call_gemini_for_section,
+    strip_html_code_fence,
+)
+from src.hedging import HedgePolicy
+from src.observability import count
+from src.sections import extract_first_top_level
+from src.skeleton import (
+    SkeletonError,
+    build_skeleton_guidance,
+    section_instructions,
+    section_label,
+    skeleton_slots,
+    stitch,
 )
 
 
@@ -22,12 +47,11 @@ class GenerationClient:
     config: AppConfig
     model: Any
     genai: Any
+    #: Targets tried, in order, once the primary provider gives up.
+    fallbacks: tuple[ProviderTarget, ...] = ()
 
 
-def build_client() -> GenerationClient:
-    cfg = load_config()
-    if cfg.provider == OPENROUTER_PROVIDER:
-        return GenerationClient(config=cfg, model=cfg.openrouter_model, genai=None)
+def _import_genai(cfg: AppConfig) -> Any:
     try:
         import google.generativeai as genai  # type: ignore
     except ModuleNotFoundError as exc:  # pragma: no cover - env dependent
@@ -36,8 +60,118 @@ def build_client() -> GenerationClient:
             "Run `pip install google-generativeai`."
         ) from exc
     genai.configure(api_key=cfg.api_key)
+    return genai
+
+
+class LazyGenai:
+    """``google.generativeai``, imported and configured on first use.
+
+    The SDK and its gRPC stack take longer to import than the rest of the API
+    process, which needs none of it until a page is actually generated.
+    """
+
+    def __init__(self, cfg: AppConfig) -> None:
+        self._cfg = cfg
+        self._module: Any = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._module is not None
+
+    def load(self) -> Any:
+        with self._lock:
+            if self._module is None:
+                self._module = _import_genai(self._cfg)
+        return self._module
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            # Private lookups (copy, pickle, a half-built instance) never load.
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+
+class LazyGenerativeModel:
+    """A ``GenerativeModel`` built on first use; its name is known up front."""
+
+    def __init__(self, genai: LazyGenai, model_name: str) -> None:
+        self.genai = genai
+        self.model_name = model_name
+        self._model: Any = None
+        self._lock = threading.Lock()
+
+    def load(self) -> Any:
+        with self._lock:
+            if self._model is None:
+                self._model = self.genai.GenerativeModel(self.model_name)
+        return self._model
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith("_"):
+            # Private lookups (copy, pickle, a half-built instance) never load.
+            raise AttributeError(name)
+        return getattr(self.load(), name)
+
+
+def _fallback_target(
+    cfg: AppConfig, genai: LazyGenai | None, provider: str, model: str
+) -> ProviderTarget:
+    if provider == OPENROUTER_PROVIDER:
+        return ProviderTarget(
+            provider,
+            model,
+            api_key=cfg.openrouter_api_key or "",
+            base_url=cfg.openrouter_base_url,
+        )
+    return ProviderTarget(provider, LazyGenerativeModel(genai, model), genai)
+
+
+def build_client() -> GenerationClient:
+    cfg = load_config()
+    providers = {cfg.provider, *(p for p, _ in cfg.generation_fallback_models)}
+    genai = LazyGenai(cfg) if GEMINI_PROVIDER in providers else None
+    fallbacks = tuple(
+        _fallback_target(cfg, genai, provider, model)
+        for provider, model in cfg.generation_fallback_models
+    )
+    if cfg.provider == OPENROUTER_PROVIDER:
+        return GenerationClient(
+            config=cfg, model=cfg.openrouter_model, genai=None, fallbacks=fallbacks
+        )
     return GenerationClient(
-        config=cfg, model=genai.GenerativeModel(cfg.model), genai=genai
+        config=cfg,
+        model=LazyGenerativeModel(genai, cfg.model),
+        genai=genai,
+        fallbacks=fallbacks,
+    )
+
+
+def _breaker_policy(cfg: AppConfig) -> BreakerPolicy:
+    return BreakerPolicy(
+        error_rate=cfg.circuit_breaker_error_rate,
+        min_calls=cfg.circuit_breaker_min_calls,
+        cooldown_seconds=cfg.circuit_breaker_cooldown_seconds,
+    )
+
+
+def _limit_policy(cfg: AppConfig) -> LimitPolicy | None:
+    if not cfg.generation_concurrency_max:
+        return None
+    return LimitPolicy(
+        min_limit=cfg.generation_concurrency_min,
+        max_limit=cfg.generation_concurrency_max,
+        initial_limit=cfg.generation_max_concurrency,
+    )
+
+
+def _hedge_policy(cfg: AppConfig) -> HedgePolicy | None:
+    if not cfg.generation_hedge_percentile:
+        return None
+    return HedgePolicy(
+        percentile=cfg.generation_hedge_percentile,
+        max_rate=cfg.generation_hedge_max_rate,
+        model=cfg.generation_hedge_model,
     )
 
 
@@ -68,6 +202,13 @@ def generate(
         max_attempts=client.config.generation_max_attempts,
         retry_backoff_seconds=client.config.generation_retry_backoff_seconds,
         total_timeout_seconds=client.config.generation_total_timeout_seconds,
+        prompt_token_budget=client.config.prompt_budget(),
+        prompt_cache_ttl_seconds=client.config.prompt_cache_ttl_seconds,
+        hedge=_hedge_policy(client.config),
+        fallbacks=client.fallbacks,
+        breaker=_breaker_policy(client.config),
+        limit=_limit_policy(client.config),
+        max_continuations=client.config.generation_max_continuations,
     )
 
 
@@ -104,4 +245,243 @@ def regenerate_section(
         max_attempts=client.config.generation_max_attempts,
         retry_backoff_seconds=client.config.generation_retry_backoff_seconds,
         total_timeout_seconds=client.config.generation_total_timeout_seconds,
+        prompt_cache_ttl_seconds=client.config.prompt_cache_ttl_seconds,
+        hedge=_hedge_policy(client.config),
+        fallbacks=client.fallbacks,
+        breaker=_breaker_policy(client.config),
+        limit=_limit_policy(client.config),
+        max_continuations=client.config.generation_max_continuations,
+    )
+
+
+def generate_candidates(
+    client: GenerationClient,
+    *,
+    candidates: int,
+    messages: list[dict[str, str]],
+    tone_key: str,
+    strict_minimal: bool,
+    complexity_key: str,
+    extra_guidance: str = "",
+    accept: Callable[[str], bool] | None = None,
+    deadline_seconds: float | None = None,
+    on_progress: Callable[[dict[str, Any]], None] | None = None,
+) -> list[str]:
+    """Draft several whole pages at once; raw outputs in the order they finished.
+
+    Each draft is an ordinary ``generate`` call, so the provider's concurrency
+    limit and circuit breaker govern the fan-out like any other traffic. An
+    entry is an ``API error:`` string when that draft failed.
+
+    Successful drafts are passed to ``accept`` as they arrive, and the first
+    one it accepts ends the wait. So does ``deadline_seconds`` once at least
+    one draft succeeded. Drafts still running then are abandoned: a provider
+    call cannot be interrupted, but its result is dropped and it reports no
+    more progress.
+    """
+    lock = threading.Lock()
+    completed = 0
+    settled = False
+
+    def draft() -> str:
+        nonlocal completed
+        raw = generate(
+            client,
+            messages=messages,
+            tone_key=tone_key,
+            strict_minimal=strict_minimal,
+            complexity_key=complexity_key,
+            extra_guidance=extra_guidance,
+        )
+        with lock:
+            if settled:
+                return raw
+            completed += 1
+            if on_progress is not None:
+                on_progress(
+                    {"stage": "candidates", "total": candidates, "completed": completed}
+                )
+        return raw
+
+    deadline = None if deadline_seconds is None else time.monotonic() + deadline_seconds
+    drafts: list[str] = []
+    pool = ThreadPoolExecutor(candidates, thread_name_prefix="candidate")
+    try:
+        # A context copy per draft keeps the job's counters visible on the
+        # drafting threads.
+        pending = {
+            pool.submit(contextvars.copy_context().run, draft)
+            for _ in range(candidates)
+        }
+        while pending:
+            timeout = None
+            if deadline is not None and any(
+                not raw.startswith("API error:") for raw in drafts
+            ):
+                timeout = max(0.0, deadline - time.monotonic())
+            done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            finished = [future.result() for future in done]
+            drafts.extend(finished)
+            if accept is not None and any(
+                not raw.startswith("API error:") and accept(raw) for raw in finished
+            ):
+                break
+    finally:
+        with lock:
+            settled = True
+        pool.shutdown(wait=False, cancel_futures=True)
+    count("candidates", candidates)
+    count("failed_candidates", sum(raw.startswith("API error:") for raw in drafts))
+    if pending:
+        count("abandoned_candidates", len(pending))
+    return drafts
+
+
+class _SectionFailed(Exception):
+    """A section call returned a provider error; carries its message."""
+
+
+class _SectionProgress:
+    """Per-section progress of one page, reported whole on every change.
+
+    Section calls finish on different threads; reports are made under the lock
+    so an older snapshot can never overwrite a newer one.
+    """
+
+    def __init__(
+        self, keys: list[str], report: Callable[[dict[str, Any]], None] | None
+    ) -> None:
+        self._lock = threading.Lock()
+        self._report = report
+        self._stage = "skeleton"
+        self._sections = [
+            {"key": key, "label": section_label(key), "status": "pending"}
+            for key in keys
+        ]
+
+    def update(self, *, stage: str | None = None, **statuses: str) -> None:
+        with self._lock:
+            if stage is not None:
+                self._stage = stage
+            for item in self._sections:
+                if item["key"] in statuses:
+                    item["status"] = statuses[item["key"]]
+            if self._report is not None:
+                self._report(self.snapshot())
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "stage": self._stage,
+            "total": len(self._sections),
+            "completed": sum(1 for s in self._sections if s["status"] == "done"),
+            "sections": [dict(item) for item in self._sections],
+        }
+
+
+def generate_sectionwise(
+    client: GenerationClient,
+    *,
+    messages: list[dict[str, str]],
+    sections: list[str],
+    page_request: str,
+    tone_key: str,
+    strict_minimal: bool,
+    complexity_key: str,
+    extra_guidance: str = "",
+    on_progress: Callable[[dict[str, Any]], None] | None = None,
+    checkpoint: Callable[[], None] | None = None,
+) -> str:
+    """Generate a skeleton with one slot per section, then every section at once.
+
+    Returns the stitched page, or an ``API error:`` string like ``generate``.
+    Each section call sees the same skeleton, so they share a cacheable prompt
+    prefix. A skeleton without the requested slots falls back to one call for
+    the whole page; a section reply that is not an element raises
+    :class:`SkeletonError`. ``checkpoint`` runs before each call and may raise
+    to abandon the rest.
+    """
+    settings = {
+        "tone_key": tone_key,
+        "strict_minimal": strict_minimal,
+        "complexity_key": complexity_key,
+    }
+    progress = _SectionProgress(sections, on_progress)
+    progress.update()
+    skeleton = generate(
+        client,
+        messages=messages,
+        extra_guidance=f"{extra_guidance}\n{build_skeleton_guidance(sections)}".strip(),
+        **settings,
+    )
+    if skeleton.startswith("API error:"):
+        return skeleton
+    skeleton = strip_html_code_fence(skeleton)
+    try:
+        slots = skeleton_slots(skeleton, sections)
+    except SkeletonError:
+        progress.update(stage="fallback")
+        return generate(
+            client, messages=messages, extra_guidance=extra_guidance, **settings
+        )
+
+    # One failed section fails the page, so sections not yet started are
+    # dropped rather than paid for.
+    abandoned = threading.Event()
+
+    def write(key: str) -> str:
+        if abandoned.is_set():
+            return ""
+        if checkpoint is not None:
+            checkpoint()
+        progress.update(**{key: "running"})
+        try:
+            raw = regenerate_section(
+                client,
+                current_code=skeleton,
+                section=slots[key],
+                instructions=section_instructions(key, page_request),
+                extra_guidance=extra_guidance,
+                **settings,
+            )
+            if raw.startswith("API error:"):
+                detail = raw.removeprefix("API error:").strip()
+                raise _SectionFailed(
+                    f"API error: {section_label(key)} section: {detail}"
+                )
+            element = extract_first_top_level(strip_html_code_fence(raw))
+            if not element:
+                raise SkeletonError(
+                    f"Could not parse the generated {section_label(key)} section"
+                )
+        except BaseException:
+            abandoned.set()
+            progress.update(**{key: "failed"})
+            raise
+        progress.update(**{key: "done"})
+        return element
+
+    progress.update(stage="sections")
+    workers = min(len(sections), client.config.generation_section_parallelism)
+    with ThreadPoolExecutor(workers, thread_name_prefix="section") as pool:
+        # A context copy per call keeps the job's counters visible on the
+        # section threads.
+        futures = {
+            key: pool.submit(contextvars.copy_context().run, write, key)
+            for key in sections
+        }
+        done, pending = wait(futures.values(), return_when=FIRST_EXCEPTION)
+        for future in pending:
+            future.cancel()
+    failure = next((f.exception() for f in done if f.exception()), None)
+    if isinstance(failure, _SectionFailed):
+        progress.update(stage="failed")
+        return str(failure)
+    if failure is not None:
+        progress.update(stage="failed")
+        raise failure
+    progress.update(stage="stitching")
+    return stitch(
+        skeleton, slots, {key: future.result() for key, future in futures.items()}
     )
@@ -0,0 +1,101 @@
+"""Score generated pages so the best of several candidates can be picked.
+
+Several candidates drafted at once cost more provider work than one, but they
+save the user the serial regenerate-and-wait rounds they would otherwise go
+through. The score is a penalty, lower being better, built only from checks
+the pipeline already runs on every page plus a few size heuristics; it is a
+tie-breaker between plausible pages, not a judgement of their design.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Sequence
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from src.sections import extract_sections
+from src.truncation import is_truncated
+
+#: Most candidates one generation may ask for.
+MAX_CANDIDATES = 4
+
+#: Penalty per safety alert: something had to be stripped from the page.
+SAFETY_ALERT_PENALTY = 5.0
+#: Penalty per accessibility or inline-script finding.
+AUDIT_NOTE_PENALTY = 2.0
+#: A page without a body, or cut off, is barely a page.
+BROKEN_PAGE_PENALTY = 20.0
+#: Penalty per top-level section short of ``MIN_SECTIONS``.
+MISSING_SECTION_PENALTY = 3.0
+MIN_SECTIONS = 3
+#: Pages outside this size range are likely thin or bloated.
+MIN_PAGE_CHARS = 1_500
+MAX_PAGE_CHARS = 60_000
+SIZE_PENALTY = 3.0
+
+_BODY_RE = re.compile(r"<body\b", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class CandidateScore:
+    penalty: float
+    safety_alerts: int
+    audit_notes: int
+    sections: int
+    chars: int
+    broken: bool
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def score_candidate(
+    html: str,
+    safety_alerts: Sequence[str],
+    notes: Sequence[str],
+    *,
+    finish_reason: str | None = None,
+) -> CandidateScore:
+    """Score a sanitized page from its safety alerts and audit notes.
+
+    ``finish_reason`` is the provider's for the raw draft; without it a cut
+    off page is recognised only from its markup.
+    """
+    broken = not _BODY_RE.search(html) or is_truncated(html, finish_reason)
+    sections = len(extract_sections(html))
+    penalty = (
+        SAFETY_ALERT_PENALTY * len(safety_alerts)
+        + AUDIT_NOTE_PENALTY * len(notes)
+        + MISSING_SECTION_PENALTY * max(0, MIN_SECTIONS - sections)
+    )
+    if broken:
+        penalty += BROKEN_PAGE_PENALTY
+    if not MIN_PAGE_CHARS <= len(html) <= MAX_PAGE_CHARS:
+        penalty += SIZE_PENALTY
+    return CandidateScore(
+        penalty=penalty,
+        safety_alerts=len(safety_alerts),
+        audit_notes=len(notes),
+        sections=sections,
+        chars=len(html),
+        broken=broken,
+    )
+
+
+def is_good_enough(score: CandidateScore) -> bool:
+    """Whether a draft can be returned without waiting for the others.
+
+    Audit notes do not count: most real pages carry a few advisory findings,
+    and waiting on them would hold nearly every generation for all its drafts.
+    A page with safety alerts, a broken page or one short of ``MIN_SECTIONS``
+    is worth waiting past.
+    """
+    return (
+        not score.safety_alerts and not score.broken and score.sections >= MIN_SECTIONS
+    )
+
+
+def rank(scores: Sequence[CandidateScore]) -> list[int]:
+    """Candidate indexes, best first; ties keep the order they are given in."""
+    return sorted(range(len(scores)), key=lambda index: scores[index].penalty)
@@ -0,0 +1,156 @@
+"""Process-wide circuit breakers, one per provider and model.
+
+During a provider outage every queued generation would otherwise spend its
+whole retry budget against the failing model before giving up. A breaker that
+has seen the error rate cross its threshold opens, and generations skip that
+model immediately for a cooldown; then a single probe request is let through
+(half-open) and its outcome decides whether the breaker closes again.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+STATE_CLOSED = "closed"
+STATE_OPEN = "open"
+STATE_HALF_OPEN = "half_open"
+
+
+@dataclass(frozen=True)
+class BreakerPolicy:
+    #: Share of recent calls that must fail before the breaker opens.
+    error_rate: float = 0.5
+    #: Calls in the window before the error rate is trusted.
+    min_calls: int = 5
+    #: Recent calls the error rate is measured over.
+    window: int = 20
+    cooldown_seconds: float = 30.0
+
+
+class CircuitBreaker:
+    def __init__(
+        self, key: str, policy: BreakerPolicy, clock: Any = time.monotonic
+    ) -> None:
+        self.key = key
+        self._policy = policy
+        self._clock = clock
+        self._outcomes: deque[bool] = deque(maxlen=policy.window)
+        self._state = STATE_CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if (
+            self._state == STATE_OPEN
+            and self._clock() - self._opened_at >= self._policy.cooldown_seconds
+        ):
+            self._state = STATE_HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may go to this target now.
+
+        A ``True`` from a half-open breaker claims its single probe, so the
+        caller must report the outcome with ``record_success`` or
+        ``record_failure``.
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == STATE_CLOSED:
+                return True
+            if state == STATE_HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def abandon(self) -> None:
+        """Give back a probe claimed by ``allow`` when no call was made."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._current_state() == STATE_HALF_OPEN:
+                self._state = STATE_CLOSED
+                self._probe_in_flight = False
+                self._outcomes.clear()
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        with self._lock:
+            state = self._current_state()
+            if state == STATE_HALF_OPEN:
+                self._trip()
+                return
+            self._outcomes.append(False)
+            failures = self._outcomes.count(False)
+            if (
+                state == STATE_CLOSED
+                and len(self._outcomes) >= self._policy.min_calls
+                and failures / len(self._outcomes) >= self._policy.error_rate
+            ):
+                self._trip()
+
+    def _trip(self) -> None:
+        self._state = STATE_OPEN
+        self._opened_at = self._clock()
+        self._probe_in_flight = False
+        self._outcomes.clear()
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._lock:
+            state = self._current_state()
+            calls = len(self._outcomes)
+            failures = self._outcomes.count(False)
+            retry_in = None
+            if state == STATE_OPEN:
+                remaining = self._policy.cooldown_seconds - (
+                    self._clock() - self._opened_at
+                )
+                retry_in = round(max(0.0, remaining), 1)
+            return {
+                "target": self.key,
+                "state": state,
+                "recent_calls": calls,
+                "error_rate": round(failures / calls, 4) if calls else None,
+                "retry_in_seconds": retry_in,
+            }
+
+
+class BreakerRegistry:
+    def __init__(self, clock: Any = time.monotonic) -> None:
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def get(self, key: str, policy: BreakerPolicy) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = self._breakers[key] = CircuitBreaker(
+                    key, policy, clock=self._clock
+                )
+            return breaker
+
+    def reset(self) -> None:
+        with self._lock:
+            self._breakers.clear()
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        with self._lock:
+            breakers = sorted(self._breakers.values(), key=lambda item: item.key)
+        return [breaker.snapshot() for breaker in breakers]
+
+
+CIRCUIT_BREAKERS = BreakerRegistry()
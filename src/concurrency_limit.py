@@ -0,0 +1,168 @@
+"""Adaptive limits on in-flight provider calls, one per provider and model.
+
+A fixed worker pool keeps sending the same load to a provider that has slowed
+down or started answering 429s, and never uses the headroom of a fast one. Each
+limiter instead tunes its limit with AIMD (additive increase, multiplicative
+decrease, as in Netflix's concurrency-limits): a success while the limit is
+actually in use raises it by one; a throttled or failed call, or a success far
+slower than the usual latency, cuts it by ``backoff_ratio``.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any
+
+OUTCOME_SUCCESS = "success"
+#: The provider pushed back: a 429, a 5xx, or a timeout.
+OUTCOME_DROPPED = "dropped"
+#: Failures that say nothing about load, such as a rejected request.
+OUTCOME_IGNORED = "ignored"
+
+#: Limit changes kept per limiter for the metrics endpoint.
+HISTORY_SIZE = 100
+#: Weight of a normal sample in the baseline latency average.
+BASELINE_ALPHA = 0.1
+#: Weight of a slow sample: a slowdown that persists becomes the new normal
+#: instead of holding the limit at its floor forever.
+SLOW_BASELINE_ALPHA = 0.02
+
+
+@dataclass(frozen=True)
+class LimitPolicy:
+    min_limit: int = 1
+    max_limit: int = 16
+    initial_limit: int = 4
+    #: Factor the limit is multiplied by when the provider pushes back.
+    backoff_ratio: float = 0.75
+    #: A success slower than this multiple of baseline latency counts as
+    #: congestion.
+    latency_tolerance: float = 2.0
+
+
+class AdaptiveLimiter:
+    def __init__(
+        self, key: str, policy: LimitPolicy, clock: Any = time.monotonic
+    ) -> None:
+        self.key = key
+        self._policy = policy
+        self._clock = clock
+        self._limit = min(policy.max_limit, max(policy.min_limit, policy.initial_limit))
+        self._inflight = 0
+        self._baseline_ms: float | None = None
+        self._history: deque[tuple[float, int, str]] = deque(maxlen=HISTORY_SIZE)
+        self._condition = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        with self._condition:
+            return self._limit
+
+    @property
+    def inflight(self) -> int:
+        with self._condition:
+            return self._inflight
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        """Wait for a free slot; ``False`` if none opened within ``timeout``."""
+        with self._condition:
+            if not self._condition.wait_for(
+                lambda: self._inflight < self._limit, timeout=timeout
+            ):
+                return False
+            self._inflight += 1
+            return True
+
+    def release(self, outcome: str, duration_ms: int | None = None) -> None:
+        """Free a slot and adjust the limit from how the call went."""
+        with self._condition:
+            # Judge utilisation as it was while the call ran, not after it left.
+            inflight = self._inflight
+            self._inflight = max(0, self._inflight - 1)
+            if outcome == OUTCOME_DROPPED:
+                self._decrease("dropped")
+            elif outcome == OUTCOME_SUCCESS:
+                self._on_success(inflight, duration_ms)
+            self._condition.notify_all()
+
+    def _on_success(self, inflight: int, duration_ms: int | None) -> None:
+        baseline = self._baseline_ms
+        slow = (
+            baseline is not None
+            and duration_ms is not None
+            and duration_ms > baseline * self._policy.latency_tolerance
+        )
+        if duration_ms is not None:
+            if baseline is None:
+                self._baseline_ms = float(duration_ms)
+            else:
+                alpha = SLOW_BASELINE_ALPHA if slow else BASELINE_ALPHA
+                self._baseline_ms = baseline + alpha * (duration_ms - baseline)
+        if slow:
+            self._decrease("latency")
+        elif inflight * 2 >= self._limit and self._limit < self._policy.max_limit:
+            # Only grow a limit that is in use; an idle service would otherwise
+            # drift to the maximum and release a burst on the next spike.
+            self._set_limit(self._limit + 1, "increase")
+
+    def _decrease(self, reason: str) -> None:
+        lowered = min(self._limit - 1, int(self._limit * self._policy.backoff_ratio))
+        self._set_limit(max(self._policy.min_limit, lowered), reason)
+
+    def _set_limit(self, limit: int, reason: str) -> None:
+        if limit != self._limit:
+            self._limit = limit
+            self._history.append((self._clock(), limit, reason))
+
+    def snapshot(self) -> dict[str, Any]:
+        with self._condition:
+            now = self._clock()
+            return {
+                "target": self.key,
+                "limit": self._limit,
+                "inflight": self._inflight,
+                "min_limit": self._policy.min_limit,
+                "max_limit": self._policy.max_limit,
+                "baseline_ms": (
+                    round(self._baseline_ms) if self._baseline_ms is not None else None
+                ),
+                "history": [
+                    {
+                        "limit": limit,
+                        "reason": reason,
+                        "age_seconds": round(now - at, 1),
+                    }
+                    for at, limit, reason in self._history
+                ],
+            }
+
+
+class LimiterRegistry:
+    def __init__(self, clock: Any = time.monotonic) -> None:
+        self._limiters: dict[str, AdaptiveLimiter] = {}
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def get(self, key: str, policy: LimitPolicy) -> AdaptiveLimiter:
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = self._limiters[key] = AdaptiveLimiter(
+                    key, policy, clock=self._clock
+                )
+            return limiter
+
+    def reset(self) -> None:
+        with self._lock:
+            self._limiters.clear()
+
+    def snapshot(self) -> list[dict[str, Any]]:
+        with self._lock:
+            limiters = sorted(self._limiters.values(), key=lambda item: item.key)
+        return [limiter.snapshot() for limiter in limiters]
+
+
+PROVIDER_LIMITS = LimiterRegistry()
@@ -24,6 +24,17 @@ class AppConfig:
     openrouter_model: str = DEFAULT_OPENROUTER_MODEL
     openrouter_base_url: str = DEFAULT_OPENROUTER_BASE_URL
     database_url: str = "sqlite:///./data/minimal-web-builder.db"
+    #: Read connections to a file SQLite database; 0 shares the writer's pool.
+    sqlite_readers: int = 4
+    #: Where boots record the Alembic revisions whose schema check passed.
+    schema_check_cache: str | None = "data/schema-check.json"
+    #: Object store of published site builds.
+    publish_dir: str = "data/publish"
+    #: Object store of uploaded media and the variants made from it.
+    media_dir: str = "data/media"
+    #: Threads that resize uploaded images in the background.
+    media_workers: int = 2
+    media_max_upload_bytes: int = 10 * 1024 * 1024
     session_cookie_secure: bool = False
     session_hours: int = 168
     cors_origins: tuple[str, ...] = (
@@ -37,6 +48,60 @@ class AppConfig:
     generation_max_attempts: int = 3
     generation_retry_backoff_seconds: float = 0.5
     generation_total_timeout_seconds: int = 300
+    #: Follow-up calls that resume an output cut off at ``max_output_tokens``.
+    generation_max_continuations: int = 2
+    #: Input token budget for one generation prompt; 0 disables compaction.
+    prompt_token_budget: int = 32_000
+    #: Overrides of ``prompt_token_budget`` keyed by model name or provider.
+    prompt_token_budgets: tuple[tuple[str, int], ...] = ()
+    #: Lifetime of provider-side prompt caches; 0 disables prompt caching.
+    prompt_cache_ttl_seconds: int = 0
+    #: Percentile of recent latency after which an attempt is hedged; 0 is off.
+    generation_hedge_percentile: float = 0.0
+    generation_hedge_max_rate: float = 0.1
+    #: Model for hedge requests; empty repeats the primary model.
+    generation_hedge_model: str = ""
+    #: Ordered ``(provider, model)`` targets tried after the primary gives up.
+    generation_fallback_models: tuple[tuple[str, str], ...] = ()
+    circuit_breaker_error_rate: float = 0.5
+    circuit_breaker_min_calls: int = 5
+    circuit_breaker_cooldown_seconds: float = 30.0
+    #: Bounds of the adaptive in-flight provider call limit; a max of 0 keeps
+    #: the fixed ``generation_max_concurrency`` pool instead.
+    generation_concurrency_min: int = 1
+    generation_concurrency_max: int = 0
+    #: Sections of one page generated at the same time in section-wise mode.
+    generation_section_parallelism: int = 6
+    #: Most candidate pages one generation may draft; 1 turns drafting off.
+    generation_max_candidates: int = 3
+    #: Seconds after which drafting returns the best candidate it has.
+    generation_candidate_deadline_seconds: float = 20.0
+    #: Seconds between re-reads of a job a status request is held open on, for
+    #: jobs run by another process; 0 relies on this process's notifications.
+    job_wait_recheck_seconds: float = 2.0
+
+    @property
+    def generation_workers(self) -> int:
+        """Worker threads for generation jobs.
+
+        With adaptive limiting the pool must be able to reach the limit's
+        ceiling; the limiter, not the pool, then decides what runs.
+        """
+        return max(self.generation_max_concurrency, self.generation_concurrency_max)
+
+    @property
+    def active_model(self) -> str:
+        if self.provider == OPENROUTER_PROVIDER:
+            return self.openrouter_model
+        return self.model
+
+    def prompt_budget(self) -> int:
+        """The prompt budget for the active model, falling back to its provider."""
+        overrides = dict(self.prompt_token_budgets)
+        for key in (self.active_model, self.provider):
+            if key in overrides:
+                return overrides[key]
+        return self.prompt_token_budget
 
 
 def _float_env(name: str, default: float) -> float:
@@ -70,6 +135,31 @@ def _bool_env(name: str, default: bool) -> bool:
     return raw.strip().lower() in {"1", "true", "yes", "on"}
 
 
+def _budgets_env(name: str) -> tuple[tuple[str, int], ...]:
+    """Parse ``key=tokens`` pairs, skipping malformed entries."""
+    budgets: list[tuple[str, int]] = []
+    for item in _str_env(name).split(","):
+        key, sep, raw = item.partition("=")
+        try:
+            tokens = int(raw)
+        except ValueError:
+            continue
+        if sep and key.strip():
+            budgets.append((key.strip(), max(0, tokens)))
+    return tuple(budgets)
+
+
+def _fallbacks_env(name: str) -> tuple[tuple[str, str], ...]:
+    """Parse ``provider:model`` entries, skipping unknown providers."""
+    targets: list[tuple[str, str]] = []
+    for item in _str_env(name).split(","):
+        provider, sep, model = item.strip().partition(":")
+        provider = provider.lower()
+        if sep and model and provider in (GEMINI_PROVIDER, OPENROUTER_PROVIDER):
+            targets.append((provider, model))
+    return tuple(targets)
+
+
 def cors_origins_from_env(
     dotenv_path: str | os.PathLike | None = ".env",
 ) -> tuple[str, ...]:
@@ -85,6 +175,10 @@ def load_config(dotenv_path: str | os.PathLike | None = None) -> AppConfig:
     provider = _str_env("GENERATION_PROVIDER", GEMINI_PROVIDER).lower()
     if provider not in (GEMINI_PROVIDER, OPENROUTER_PROVIDER):
         provider = GEMINI_PROVIDER
+    concurrency_min = max(1, _int_env("GENERATION_CONCURRENCY_MIN", 1))
+    concurrency_max = max(0, _int_env("GENERATION_CONCURRENCY_MAX", 0))
+    if concurrency_max:
+        concurrency_max = max(concurrency_min, concurrency_max)
     return AppConfig(
         api_key=_str_env("GEMINI_API_KEY"),
         model=_str_env("GEMINI_MODEL", "gemini-1.5-flash"),
@@ -101,6 +195,15 @@ def load_config(dotenv_path: str | os.PathLike | None = None) -> AppConfig:
         database_url=_str_env(
             "DATABASE_URL", "sqlite:///./data/minimal-web-builder.db"
         ),
+        sqlite_readers=max(0, _int_env("SQLITE_READERS", 4)),
+        schema_check_cache=_str_env("SCHEMA_CHECK_CACHE", "data/schema-check.json")
+        or None,
+        publish_dir=_str_env("PUBLISH_DIR") or "data/publish",
+        media_dir=_str_env("MEDIA_DIR") or "data/media",
+        media_workers=max(1, _int_env("MEDIA_WORKERS", 2)),
+        media_max_upload_bytes=max(
+            1024, _int_env("MEDIA_MAX_UPLOAD_BYTES", 10 * 1024 * 1024)
+        ),
         session_cookie_secure=_bool_env("SESSION_COOKIE_SECURE", False),
         session_hours=max(1, _int_env("SESSION_HOURS", 168)),
         cors_origins=cors_origins_from_env(),
@@ -119,4 +222,37 @@ def load_config(dotenv_path: str | os.PathLike | None = None) -> AppConfig:
         generation_total_timeout_seconds=max(
             1, _int_env("GENERATION_TOTAL_TIMEOUT_SECONDS", 300)
         ),
+        generation_max_continuations=min(
+            5, max(0, _int_env("GENERATION_MAX_CONTINUATIONS", 2))
+        ),
+        prompt_token_budget=max(0, _int_env("GENERATION_PROMPT_TOKEN_BUDGET", 32_000)),
+        prompt_token_budgets=_budgets_env("GENERATION_PROMPT_TOKEN_BUDGETS"),
+        prompt_cache_ttl_seconds=max(
+            0, _int_env("GENERATION_PROMPT_CACHE_TTL_SECONDS", 0)
+        ),
+        generation_hedge_percentile=min(
+            99.9, max(0.0, _float_env("GENERATION_HEDGE_PERCENTILE", 0.0))
+        ),
+        generation_hedge_max_rate=min(
+            1.0, max(0.0, _float_env("GENERATION_HEDGE_MAX_RATE", 0.1))
+        ),
+        generation_hedge_model=_str_env("GENERATION_HEDGE_MODEL"),
+        generation_fallback_models=_fallbacks_env("GENERATION_FALLBACK_MODELS"),
+        circuit_breaker_error_rate=min(
+            1.0, max(0.01, _float_env("CIRCUIT_BREAKER_ERROR_RATE", 0.5))
+        ),
+        circuit_breaker_min_calls=max(1, _int_env("CIRCUIT_BREAKER_MIN_CALLS", 5)),
+        circuit_breaker_cooldown_seconds=max(
+            1.0, _float_env("CIRCUIT_BREAKER_COOLDOWN_SECONDS", 30.0)
+        ),
+        generation_concurrency_min=concurrency_min,
+        generation_concurrency_max=concurrency_max,
+        generation_section_parallelism=max(
+            1, _int_env("GENERATION_SECTION_PARALLELISM", 6)
+        ),
+        generation_max_candidates=max(1, _int_env("GENERATION_MAX_CANDIDATES", 3)),
+        generation_candidate_deadline_seconds=max(
+            0.0, _float_env("GENERATION_CANDIDATE_DEADLINE_SECONDS", 20.0)
+        ),
+        job_wait_recheck_seconds=max(0.0, _float_env("JOB_WAIT_RECHECK_SECONDS", 2.0)),
     )
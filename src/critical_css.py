@@ -0,0 +1,334 @@
+"""Inline the CSS the top of a page needs and load the stylesheet later.
+
+A split export links one ``styles.css`` from ``<head>``, and the browser paints
+nothing until it has arrived. This finds the rules that can match an element
+in the first few top-level sections (the ones ``extract_sections`` reports,
+looking inside ``<main>``), inlines them in ``<head>`` and turns the link into
+a non-blocking one, so the top of the page paints as soon as the HTML is in.
+
+The deferred stylesheet stays complete: once it loads, its rules apply in
+their original order and the cascade is exactly what it was, which a
+stylesheet holding only the leftover rules could not promise.
+
+Matching errs towards inlining: pseudo-classes and attribute values are
+ignored, and a class or id that the page's scripts mention counts as present,
+since a script may add it before the first paint.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Iterator
+from dataclasses import asdict, dataclass, field, replace
+from html.parser import HTMLParser
+from typing import Any
+
+from src.export import SplitDocument, stylesheet_link
+from src.minify import DocumentIndex, filter_css_rules, minify_css, strip_css_comments
+from src.sections import PageSection, extract_sections
+
+#: Top-level sections treated as above the fold, such as a header and a hero.
+CRITICAL_SECTIONS = 2
+#: Sections whose children are the page's real sections.
+_CONTAINER_TAGS = frozenset({"main"})
+_VOID_TAGS = frozenset(
+    {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+     "source", "track", "wbr"}
+)  # fmt: skip
+
+_PSEUDO_FUNCTION_RE = re.compile(r"::?[\w-]+\([^()]*\)")
+_PSEUDO_RE = re.compile(r"::?[\w-]+")
+_ATTRIBUTE_RE = re.compile(r"\[\s*([\w-]+)[^\]]*\]")
+_COMBINATOR_RE = re.compile(r"\s*([>+~])\s*|\s+")
+_SIMPLE_RE = re.compile(r"([.#]?)([\w-]+)|\[([\w-]+)\]|\*")
+
+
+@dataclass(frozen=True)
+class CriticalCssReport:
+    #: Sections whose CSS was inlined.
+    sections: int
+    #: Bytes of CSS inlined in ``<head>``.
+    critical_bytes: int
+    #: Bytes of ``styles.css``, which no longer blocks the first paint.
+    stylesheet_bytes: int
+    index_html_bytes_before: int
+    index_html_bytes_after: int
+    #: What the browser must fetch before painting: the page and its stylesheet
+    #: before, the page with its inlined CSS after.
+    first_paint_bytes_before: int
+    first_paint_bytes_after: int
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(eq=False)
+class _Element:
+    tag: str
+    start: int
+    parent: _Element | None
+    previous: _Element | None
+    id: str = ""
+    classes: frozenset[str] = frozenset()
+    attributes: frozenset[str] = frozenset()
+    children: list[_Element] = field(default_factory=list)
+
+    def ancestors(self) -> Iterator[_Element]:
+        node = self.parent
+        while node is not None:
+            yield node
+            node = node.parent
+
+    def previous_siblings(self) -> Iterator[_Element]:
+        node = self.previous
+        while node is not None:
+            yield node
+            node = node.previous
+
+
+class _TreeBuilder(HTMLParser):
+    """Elements of a page with their source offsets, tolerating unclosed tags."""
+
+    def __init__(self, source: str) -> None:
+        super().__init__(convert_charrefs=True)
+        self._line_starts = [0]
+        self._line_starts.extend(i + 1 for i, char in enumerate(source) if char == "\n")
+        self.elements: list[_Element] = []
+        self._roots: list[_Element] = []
+        self._stack: list[_Element] = []
+
+    def _offset(self) -> int:
+        line, col = self.getpos()
+        return self._line_starts[line - 1] + col
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        parent = self._stack[-1] if self._stack else None
+        siblings = parent.children if parent is not None else self._roots
+        element = _Element(
+            tag=tag,
+            start=self._offset(),
+            parent=parent,
+            previous=siblings[-1] if siblings else None,
+            id=next((value or "" for name, value in attrs if name == "id"), ""),
+            classes=frozenset(
+                " ".join(
+                    value or "" for name, value in attrs if name == "class"
+                ).split()
+            ),
+            attributes=frozenset(name for name, _ in attrs),
+        )
+        siblings.append(element)
+        self.elements.append(element)
+        if tag not in _VOID_TAGS:
+            self._stack.append(element)
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.handle_starttag(tag, attrs)
+        if tag not in _VOID_TAGS:
+            self._stack.pop()
+
+    def handle_endtag(self, tag: str) -> None:
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth].tag == tag:
+                del self._stack[depth:]
+                return
+
+
+@dataclass(frozen=True)
+class _Compound:
+    tag: str | None
+    ids: tuple[str, ...]
+    classes: tuple[str, ...]
+    attributes: tuple[str, ...]
+
+
+def _parse_selector(selector: str) -> list[tuple[str, _Compound]] | None:
+    """Compounds left to right, each with the combinator before it.
+
+    None when the selector is beyond this matcher, which then assumes a match.
+    """
+    if "\\" in selector or "|" in selector.replace("|=", ""):
+        return None
+    simplified = _ATTRIBUTE_RE.sub(r"[\1]", selector)
+    while (reduced := _PSEUDO_FUNCTION_RE.sub("", simplified)) != simplified:
+        simplified = reduced
+    if "(" in simplified:
+        return None
+    tokens = _COMBINATOR_RE.split(_PSEUDO_RE.sub("", simplified).strip())
+    parts: list[tuple[str, _Compound]] = []
+    # ``tokens`` alternates compounds and combinators; whitespace alone is None.
+    for position in range(0, len(tokens), 2):
+        compound = _parse_compound(tokens[position])
+        if compound is None:
+            return None
+        combinator = (tokens[position - 1] or " ") if position else ""
+        parts.append((combinator, compound))
+    return parts
+
+
+def _parse_compound(text: str) -> _Compound | None:
+    if not text:
+        return None
+    tag: str | None = None
+    ids: list[str] = []
+    classes: list[str] = []
+    attributes: list[str] = []
+    position = 0
+    for match in _SIMPLE_RE.finditer(text):
+        if match.start() != position:
+            return None
+        position = match.end()
+        prefix, name, attribute = match.group(1), match.group(2), match.group(3)
+        if attribute:
+            attributes.append(attribute.lower())
+        elif prefix == "#":
+            ids.append(name)
+        elif prefix == ".":
+            classes.append(name)
+        elif name:
+            if match.start() != 0:
+                return None
+            tag = name.lower()
+    if position != len(text):
+        return None
+    return _Compound(tag, tuple(ids), tuple(classes), tuple(attributes))
+
+
+class _Matcher:
+    def __init__(self, critical: list[_Element], script_words: set[str]) -> None:
+        self._critical = critical
+        self._words = script_words
+
+    def _accepts(self, compound: _Compound, element: _Element) -> bool:
+        if compound.tag is not None and compound.tag != element.tag:
+            return False
+        if any(name != element.id and name not in self._words for name in compound.ids):
+            return False
+        if any(
+            name not in element.classes and name not in self._words
+            for name in compound.classes
+        ):
+            return False
+        return all(name in element.attributes for name in compound.attributes)
+
+    def _matches(
+        self, parts: list[tuple[str, _Compound]], index: int, element: _Element
+    ) -> bool:
+        combinator, compound = parts[index]
+        if not self._accepts(compound, element):
+            return False
+        if index == 0:
+            return True
+        if combinator == ">":
+            candidates: Iterator[_Element] = iter(
+                [element.parent] if element.parent else []
+            )
+        elif combinator == "+":
+            candidates = iter([element.previous] if element.previous else [])
+        elif combinator == "~":
+            candidates = element.previous_siblings()
+        else:
+            candidates = element.ancestors()
+        return any(self._matches(parts, index - 1, other) for other in candidates)
+
+    def may_match(self, selector: str) -> bool:
+        parts = _parse_selector(selector)
+        if parts is None:
+            return True
+        return any(
+            self._matches(parts, len(parts) - 1, element) for element in self._critical
+        )
+
+
+def _above_the_fold(html: str, count: int) -> list[PageSection]:
+    """The first ``count`` sections, reading the children of ``<main>``."""
+    chosen: list[PageSection] = []
+    for section in extract_sections(html):
+        if len(chosen) >= count:
+            break
+        if section.tag in _CONTAINER_TAGS:
+            open_end = section.html.index(">") + 1
+            inner_end = section.html.rfind("<")
+            children = extract_sections(section.html[open_end:inner_end])
+            if children:
+                base = section.start + open_end
+                chosen.extend(
+                    replace(child, start=base + child.start, end=base + child.end)
+                    for child in children[: count - len(chosen)]
+                )
+                continue
+        chosen.append(section)
+    return chosen
+
+
+def _critical_rules(html: str, css: str, fold: list[PageSection]) -> str:
+    builder = _TreeBuilder(html)
+    builder.feed(html)
+    builder.close()
+    critical: set[_Element] = set()
+    for element in builder.elements:
+        if any(section.start <= element.start < section.end for section in fold):
+            critical.add(element)
+            critical.update(element.ancestors())
+    matcher = _Matcher(
+        [element for element in builder.elements if element in critical],
+        DocumentIndex.from_html(html).script_words,
+    )
+    selected, _ = filter_css_rules(strip_css_comments(css), matcher.may_match)
+    return minify_css(selected)
+
+
+def critical_css(html: str, css: str, *, sections: int = CRITICAL_SECTIONS) -> str:
+    """The minified rules of ``css`` that may style the first ``sections`` of ``html``."""
+    fold = _above_the_fold(html, sections)
+    if not fold or not css.strip():
+        return ""
+    return _critical_rules(html, css, fold)
+
+
+def deferred_stylesheet(href: str) -> str:
+    """Markup that loads a stylesheet without blocking the first paint."""
+    return (
+        f'<link rel="stylesheet" href="{href}" media="print" onload="this.media=\'all\'">'
+        f'<noscript><link rel="stylesheet" href="{href}"></noscript>'
+    )
+
+
+def inline_critical_css(
+    html: str,
+    split: SplitDocument,
+    *,
+    sections: int = CRITICAL_SECTIONS,
+    href: str = "styles.css",
+) -> tuple[SplitDocument, CriticalCssReport]:
+    """``split`` (the split export of ``html``) with its critical CSS inlined.
+
+    The stylesheet link becomes a non-blocking one and the CSS the first
+    ``sections`` need is inlined before it. Without a stylesheet, or without
+    anything above the fold to style, the split comes back unchanged.
+    """
+    link = stylesheet_link(href)
+    before = len(split.index_html.encode("utf-8"))
+    stylesheet = len(split.styles_css.encode("utf-8"))
+    fold = _above_the_fold(html, sections) if link in split.index_html else []
+    critical = (
+        _critical_rules(html, split.styles_css, fold)
+        if fold and split.styles_css.strip()
+        else ""
+    )
+    index_html = split.index_html
+    if critical:
+        index_html = index_html.replace(
+            link, f"<style>{critical}</style>{deferred_stylesheet(href)}", 1
+        )
+    after = len(index_html.encode("utf-8"))
+    report = CriticalCssReport(
+        sections=len(fold) if critical else 0,
+        critical_bytes=len(critical.encode("utf-8")),
+        stylesheet_bytes=stylesheet,
+        index_html_bytes_before=before,
+        index_html_bytes_after=after,
+        first_paint_bytes_before=before + stylesheet,
+        first_paint_bytes_after=after if critical else before + stylesheet,
+    )
+    return replace(split, index_html=index_html), report
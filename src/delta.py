@@ -0,0 +1,268 @@
+"""Apply the small changes an autosave sends instead of the whole page.
+
+A page's HTML changes by :class:`TextEdit` splices and its editor document by
+`JSON Patch <https://www.rfc-editor.org/rfc/rfc6902>`_ operations, both
+against the revision the client last saw. Text offsets count UTF-16 code
+units, as JavaScript strings do, so an editor can send ``selectionStart``
+or the result of a string diff as is.
+
+Patches never modify the document they are applied to: containers on the
+path of a change are copied and everything else is shared, so applying a
+patch costs the depth of the change rather than the size of the document.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+MAX_TEXT_EDITS = 1_000
+MAX_PATCH_OPERATIONS = 1_000
+
+
+class DeltaError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class TextEdit:
+    """Replace ``[start, end)`` of the base text with ``text``."""
+
+    start: int
+    end: int
+    text: str = ""
+
+
+# ---- text ----
+
+
+def apply_text_edits(base: str, edits: Sequence[TextEdit]) -> tuple[str, bool]:
+    """``base`` with ``edits`` applied, and whether that changed it.
+
+    Edits use offsets into ``base`` and must be in order without overlapping.
+    """
+    if len(edits) > MAX_TEXT_EDITS:
+        raise DeltaError(f"A delta may contain at most {MAX_TEXT_EDITS} text edits")
+    edits = [edit for edit in edits if edit.start != edit.end or edit.text]
+    if not edits:
+        return base, False
+    # ASCII text has one UTF-16 code unit per character, so offsets match.
+    if base.isascii():
+        return _splice(base, edits, len(base))
+    units = base.encode("utf-16-le")
+    scaled = [TextEdit(edit.start * 2, edit.end * 2, edit.text) for edit in edits]
+    pieces: list[bytes] = []
+    position = 0
+    for edit in _checked(scaled, len(units)):
+        pieces.append(units[position : edit.start])
+        pieces.append(edit.text.encode("utf-16-le", "surrogatepass"))
+        position = edit.end
+    pieces.append(units[position:])
+    try:
+        text = b"".join(pieces).decode("utf-16-le")
+    except UnicodeDecodeError as exc:
+        raise DeltaError("A text edit splits a character in two") from exc
+    return text, text != base
+
+
+def _splice(base: str, edits: list[TextEdit], length: int) -> tuple[str, bool]:
+    pieces: list[str] = []
+    position = 0
+    changed = False
+    for edit in _checked(edits, length):
+        pieces.append(base[position : edit.start])
+        pieces.append(edit.text)
+        changed = changed or base[edit.start : edit.end] != edit.text
+        position = edit.end
+    pieces.append(base[position:])
+    return "".join(pieces), changed
+
+
+def _checked(edits: list[TextEdit], length: int) -> list[TextEdit]:
+    position = 0
+    for edit in edits:
+        if not position <= edit.start <= edit.end <= length:
+            raise DeltaError(
+                "Text edits must be in order, not overlap, and stay inside the page"
+            )
+        position = edit.end
+    return edits
+
+
+# ---- JSON Patch ----
+
+
+def parse_pointer(pointer: str) -> list[str]:
+    """The reference tokens of a JSON Pointer (RFC 6901)."""
+    if pointer == "":
+        return []
+    if not pointer.startswith("/"):
+        raise DeltaError(f"Invalid JSON pointer {pointer!r}")
+    return [
+        token.replace("~1", "/").replace("~0", "~") for token in pointer[1:].split("/")
+    ]
+
+
+def apply_json_patch(
+    document: Any, operations: Sequence[dict[str, Any]]
+) -> tuple[Any, bool]:
+    """``document`` with ``operations`` applied, and whether that changed it.
+
+    Supports every RFC 6902 operation. The patch applies in full or, raising
+    :class:`DeltaError`, not at all; ``document`` itself is never modified.
+    """
+    if len(operations) > MAX_PATCH_OPERATIONS:
+        raise DeltaError(
+            f"A delta may contain at most {MAX_PATCH_OPERATIONS} patch operations"
+        )
+    changed = False
+    for index, operation in enumerate(operations):
+        try:
+            document, op_changed = _apply_operation(document, operation)
+        except DeltaError as exc:
+            raise DeltaError(f"Patch operation {index}: {exc}") from None
+        changed = changed or op_changed
+    return document, changed
+
+
+def _apply_operation(document: Any, operation: dict[str, Any]) -> tuple[Any, bool]:
+    if not isinstance(operation, dict) or not isinstance(operation.get("path"), str):
+        raise DeltaError("each operation needs an op and a path")
+    op = operation.get("op")
+    path = parse_pointer(operation["path"])
+    if op in ("add", "replace", "test") and "value" not in operation:
+        raise DeltaError(f"{op!r} needs a value")
+    if op == "add":
+        return _add(document, path, operation["value"]), True
+    if op == "remove":
+        return _remove(document, path)[0], True
+    if op == "replace":
+        if _get(document, path) == operation["value"]:
+            return document, False
+        return _replace(document, path, operation["value"]), True
+    if op == "test":
+        if _get(document, path) != operation["value"]:
+            raise DeltaError(f"test failed at {operation['path']!r}")
+        return document, False
+    if op in ("move", "copy"):
+        if not isinstance(operation.get("from"), str):
+            raise DeltaError(f"{op!r} needs a from pointer")
+        source = parse_pointer(operation["from"])
+        value = _get(document, source)
+        if op == "copy":
+            return _add(document, path, value), True
+        if source == path:
+            return document, False
+        if path[: len(source)] == source:
+            raise DeltaError("cannot move a value into itself")
+        return _add(_remove(document, source)[0], path, value), True
+    raise DeltaError(f"unsupported op {op!r}")
+
+
+def _index(container: list[Any], token: str, *, insert: bool = False) -> int:
+    if insert and token == "-":
+        return len(container)
+    if not (token.isascii() and token.isdigit()) or (
+        len(token) > 1 and token.startswith("0")
+    ):
+        raise DeltaError(f"invalid array index {token!r}")
+    index = int(token)
+    if index > len(container) or (not insert and index == len(container)):
+        raise DeltaError(f"array index {index} is out of range")
+    return index
+
+
+def _get(document: Any, path: list[str]) -> Any:
+    for token in path:
+        if isinstance(document, dict) and token in document:
+            document = document[token]
+        elif isinstance(document, list):
+            document = document[_index(document, token)]
+        else:
+            raise DeltaError(f"path segment {token!r} does not exist")
+    return document
+
+
+def _modify(document: Any, parents: list[str], edit: Callable[[Any], None]) -> Any:
+    """A copy of ``document`` in which ``edit`` changed the container at ``parents``.
+
+    Only the containers on the way there are copied; ``edit`` gets the copy
+    of the last one to change in place.
+    """
+    if isinstance(document, dict):
+        copy: Any = dict(document)
+    elif isinstance(document, list):
+        copy = list(document)
+    else:
+        raise DeltaError("path goes through a value that is not a container")
+    if not parents:
+        edit(copy)
+        return copy
+    token, rest = parents[0], parents[1:]
+    if isinstance(copy, dict):
+        if token not in copy:
+            raise DeltaError(f"path segment {token!r} does not exist")
+        copy[token] = _modify(copy[token], rest, edit)
+    else:
+        index = _index(copy, token)
+        copy[index] = _modify(copy[index], rest, edit)
+    return copy
+
+
+def _add(document: Any, path: list[str], value: Any) -> Any:
+    if not path:
+        return value
+
+    def edit(parent: Any) -> None:
+        if isinstance(parent, dict):
+            parent[path[-1]] = value
+        else:
+            parent.insert(_index(parent, path[-1], insert=True), value)
+
+    return _modify(document, path[:-1], edit)
+
+
+def _replace(document: Any, path: list[str], value: Any) -> Any:
+    if not path:
+        return value
+
+    def edit(parent: Any) -> None:
+        if isinstance(parent, dict):
+            parent[path[-1]] = value
+        else:
+            parent[_index(parent, path[-1])] = value
+
+    return _modify(document, path[:-1], edit)
+
+
+def _remove(document: Any, path: list[str]) -> tuple[Any, Any]:
+    """The document without the value at ``path``, and that value."""
+    if not path:
+        raise DeltaError("cannot remove the whole document")
+    removed: list[Any] = []
+
+    def edit(parent: Any) -> None:
+        if isinstance(parent, dict):
+            if path[-1] not in parent:
+                raise DeltaError(f"path segment {path[-1]!r} does not exist")
+            removed.append(parent.pop(path[-1]))
+        else:
+            removed.append(parent.pop(_index(parent, path[-1])))
+
+    return _modify(document, path[:-1], edit), removed[0]
+
+
+def changed_paths(operations: Sequence[dict[str, Any]]) -> list[list[str]]:
+    """The paths a patch that applied cleanly wrote to, each as pointer tokens.
+
+    A move changes its source as well as its target; a test changes nothing.
+    """
+    paths = []
+    for operation in operations:
+        if operation["op"] == "test":
+            continue
+        paths.append(parse_pointer(operation["path"]))
+        if operation["op"] == "move":
+            paths.append(parse_pointer(operation["from"]))
+    return paths
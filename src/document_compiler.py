@@ -0,0 +1,282 @@
+"""Compile a schemaVersion 1 editor document to HTML, as the web editor does.
+
+The output is byte for byte that of ``compileDocument`` in
+``web/src/editor/document.ts``, so a revision can keep only its document and
+have its HTML derived when an export, a publish or a prompt needs it. Both
+sides are checked against ``web/src/editor/compile-fixtures.json``.
+
+The web compiler sorts names with ``localeCompare``, which follows the
+Unicode collation of the browser's locale. :func:`collation_key` reproduces
+the root collation for ASCII, the only names an editor document holds in
+practice: punctuation before digits before letters, letters compared without
+case first and lowercase first on a tie. Anything else sorts after ASCII by
+code point.
+
+Compiling a large page takes milliseconds, so :class:`CompileCache` keeps
+recent results by a digest of the document.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any
+
+#: Recorded on revisions whose HTML is derived rather than stored. Any change
+#: to the HTML some document compiles to must bump it, together with a
+#: migration that stores the HTML of revisions derived by the old version
+#: using a frozen copy of it, so saved revisions never change under a reader.
+COMPILER_VERSION = 1
+NODE_ID_ATTRIBUTE = "data-mwb-id"
+MAX_CACHED_COMPILES = 64
+#: Compiled pages can be megabytes each; the cache also stops at this total.
+MAX_CACHED_COMPILE_CHARS = 32_000_000
+
+VOID_ELEMENTS = frozenset(
+    {
+        "area",
+        "base",
+        "br",
+        "col",
+        "embed",
+        "hr",
+        "img",
+        "input",
+        "link",
+        "meta",
+        "param",
+        "source",
+        "track",
+        "wbr",
+    }
+)
+#: Media query widths, in the order the web compiler emits them.
+BREAKPOINT_WIDTHS = (("tablet", 1023), ("mobile", 639))
+
+#: What JavaScript's ``trim`` and ``\s`` treat as white space.
+_JS_WHITESPACE = (
+    "\t\n\v\f\r \u00a0\u1680\u2000\u2001\u2002\u2003\u2004\u2005\u2006"
+    "\u2007\u2008\u2009\u200a\u2028\u2029\u202f\u205f\u3000\ufeff"
+)
+_JS_WHITESPACE_RUN = re.compile(f"[{_JS_WHITESPACE}]+")
+#: ASCII in root collation order; the other control characters are ignored.
+_COLLATION_ORDER = (
+    "\t\n\v\f\r _-,;:!?.'\"()[]{}@*/\\&#%`^+<=>|~$0123456789abcdefghijklmnopqrstuvwxyz"
+)
+_PRIMARY = {char: weight for weight, char in enumerate(_COLLATION_ORDER)}
+_PRIMARY.update({char.upper(): _PRIMARY[char] for char in "abcdefghijklmnopqrstuvwxyz"})
+
+
+@lru_cache(maxsize=4096)
+def collation_key(value: str) -> tuple[tuple[int, ...], tuple[bool, ...]]:
+    """Sort key matching ``localeCompare`` in the root locale for ASCII names."""
+    primary: list[int] = []
+    tertiary: list[bool] = []
+    for char in value:
+        weight = _PRIMARY.get(char)
+        if weight is None:
+            if ord(char) < 0x80:
+                continue
+            weight = len(_COLLATION_ORDER) + ord(char)
+        primary.append(weight)
+        tertiary.append(char.isupper())
+    return tuple(primary), tuple(tertiary)
+
+
+def _trim(value: str) -> str:
+    return value.strip(_JS_WHITESPACE)
+
+
+def _sorted_items(values: dict[str, str]) -> list[tuple[str, str]]:
+    return sorted(values.items(), key=lambda item: collation_key(item[0]))
+
+
+def _escape_text(value: str) -> str:
+    return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
+
+
+def _escape_attribute(value: str) -> str:
+    return _escape_text(value).replace('"', "&quot;")
+
+
+def _attributes(values: dict[str, str]) -> str:
+    return "".join(
+        f' {name}="{_escape_attribute(value)}"' for name, value in _sorted_items(values)
+    )
+
+
+def _compile_nodes(
+    nodes: list[dict[str, Any]],
+    include_editor_ids: bool,
+    responsive_ids: set[str] | frozenset[str],
+    out: list[str],
+) -> None:
+    for node in nodes:
+        node_type = node["type"]
+        if node_type == "text":
+            out.append(_escape_text(node["value"]))
+            continue
+        if node_type == "comment":
+            out.append(f"<!--{node['value'].replace('-->', '--&gt;')}-->")
+            continue
+        values = dict(node["attributes"])
+        if include_editor_ids:
+            values[NODE_ID_ATTRIBUTE] = node["id"]
+        elif node["id"] in responsive_ids:
+            classes = [
+                name
+                for name in _JS_WHITESPACE_RUN.split(values.get("class", ""))
+                if name
+            ]
+            classes.append(f"mwb-node-{node['id']}")
+            values["class"] = " ".join(dict.fromkeys(classes))
+        tag = node["tag"]
+        out.append(f"<{tag}{_attributes(values)}>")
+        if tag in VOID_ELEMENTS:
+            continue
+        _compile_nodes(node["children"], include_editor_ids, responsive_ids, out)
+        out.append(f"</{tag}>")
+
+
+def compile_canvas(document: dict[str, Any]) -> str:
+    """The body alone, with editor ids, as the editor canvas loads it."""
+    out: list[str] = []
+    _compile_nodes(document["body"], True, frozenset(), out)
+    return "".join(out)
+
+
+def _css_declarations(values: dict[str, str]) -> str:
+    return " ".join(
+        f"{name}: {_trim(value)};"
+        for name, value in _sorted_items(values)
+        if _trim(value)
+    )
+
+
+def compile_design_token_css(document: dict[str, Any]) -> str:
+    declarations = [
+        f"--mwb-{name}: {_trim(value)};"
+        for name, value in _sorted_items(document.get("designTokens") or {})
+        if _trim(value)
+    ]
+    return f":root {{ {' '.join(declarations)} }}" if declarations else ""
+
+
+def compile_responsive_css(
+    document: dict[str, Any], *, include_editor_ids: bool = True
+) -> str:
+    styles = _sorted_items(document.get("responsiveStyles") or {})
+    blocks = []
+    for breakpoint, width in BREAKPOINT_WIDTHS:
+        rules = []
+        for node_id, by_breakpoint in styles:
+            declarations = _css_declarations(by_breakpoint.get(breakpoint) or {})
+            if not declarations:
+                continue
+            selector = (
+                f'[{NODE_ID_ATTRIBUTE}="{node_id}"]'
+                if include_editor_ids
+                else f".mwb-node-{node_id}"
+            )
+            rules.append(f"{selector} {{ {declarations} }}")
+        if rules:
+            joined = "\n".join(rules)
+            blocks.append(f"@media (max-width: {width}px) {{\n{joined}\n}}")
+    return "\n".join(blocks)
+
+
+def compile_document(
+    document: dict[str, Any], *, include_editor_ids: bool = True
+) -> str:
+    """The page ``document`` describes; ``document`` must be valid.
+
+    With ``include_editor_ids`` off, as for the code view, elements lose
+    their ``data-mwb-id`` and responsive styles select them by class.
+    """
+    compiled_css = _trim(
+        "\n\n".join(
+            part
+            for part in (
+                compile_design_token_css(document),
+                _trim(document["css"]),
+                compile_responsive_css(document, include_editor_ids=include_editor_ids),
+            )
+            if part
+        )
+    )
+    head_items = [
+        item
+        for item in (
+            document["headHtml"],
+            f"<style>\n{compiled_css}\n</style>" if compiled_css else "",
+        )
+        if item
+    ]
+    body: list[str] = []
+    _compile_nodes(
+        document["body"],
+        include_editor_ids,
+        frozenset(document.get("responsiveStyles") or {}),
+        body,
+    )
+    body.extend(document["bodyScripts"])
+    head = "\n".join(head_items)
+    body_attributes = _attributes(document["bodyAttributes"])
+    return "\n".join(
+        (
+            document["doctype"],
+            f"<html{_attributes(document['htmlAttributes'])}>",
+            f"<head>{head}</head>",
+            f"<body{body_attributes}>{''.join(body)}</body></html>",
+        )
+    )
+
+
+def document_digest(document: dict[str, Any]) -> str:
+    encoded = json.dumps(document, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(encoded.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class CompileCache:
+    """Thread-safe LRU of compiled pages by document digest.
+
+    Bounded by both the number of pages and their total length, since one
+    entry can be a few megabytes.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = MAX_CACHED_COMPILES,
+        max_chars: int = MAX_CACHED_COMPILE_CHARS,
+    ) -> None:
+        self._entries: OrderedDict[str, str] = OrderedDict()
+        self._chars = 0
+        self._max_entries = max_entries
+        self._max_chars = max_chars
+        self._lock = threading.Lock()
+
+    def compile(
+        self, document: dict[str, Any], *, include_editor_ids: bool = True
+    ) -> str:
+        key = f"{int(include_editor_ids)}:{document_digest(document)}"
+        with self._lock:
+            html = self._entries.get(key)
+            if html is not None:
+                self._entries.move_to_end(key)
+                return html
+        # Compiled outside the lock; two threads may both compile a miss.
+        html = compile_document(document, include_editor_ids=include_editor_ids)
+        with self._lock:
+            if key not in self._entries:
+                self._entries[key] = html
+                self._chars += len(html)
+            while self._entries and (
+                len(self._entries) > self._max_entries or self._chars > self._max_chars
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._chars -= len(evicted)
+        return html
@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+from collections.abc import Callable
 from dataclasses import dataclass
 from html.parser import HTMLParser
 
@@ -64,13 +65,27 @@ def _inner_content(source: str, start: int, end: int, tag: str) -> str:
     return source[open_end : end - len(close)]
 
 
-def split_document(html: str) -> SplitDocument:
+def stylesheet_link(href: str) -> str:
+    """The ``<link>`` a split page loads its stylesheet with."""
+    return f'<link rel="stylesheet" href="{href}">'
+
+
+def _bare_name(name: str, _content: str) -> str:
+    return name
+
+
+def split_document(
+    html: str, asset_url: Callable[[str, str], str] | None = None
+) -> SplitDocument:
     """Split a self-contained page into index.html, styles.css, and app.js.
 
     Inline ``<style>`` blocks are extracted into ``styles_css`` and inline
     ``<script>`` blocks into ``app_js``; each is replaced in ``index_html`` by a
     ``<link>``/``<script src>`` reference. Scripts that already carry a ``src``
     attribute (external) are left untouched. Blocks without content are skipped.
+
+    ``asset_url(name, content)`` chooses the URL each reference points at, for
+    example a content-hashed name; by default it is the bare file name.
     """
     scanner = _SplitScanner(html)
     scanner.feed(html)
@@ -83,15 +98,19 @@ def split_document(html: str) -> SplitDocument:
         for start, end in scanner.script_blocks
     ).strip()
 
+    if asset_url is None:
+        asset_url = _bare_name
     index_html = html
     replacements: list[tuple[int, int, str]] = []
     if styles:
+        href = asset_url("styles.css", styles)
         for i, (start, end) in enumerate(scanner.style_blocks):
-            ref = '<link rel="stylesheet" href="styles.css">' if i == 0 else ""
+            ref = stylesheet_link(href) if i == 0 else ""
             replacements.append((start, end, ref))
     if scripts:
+        src = asset_url("app.js", scripts)
         for i, (start, end) in enumerate(scanner.script_blocks):
-            ref = '<script src="app.js"></script>' if i == 0 else ""
+            ref = f'<script src="{src}"></script>' if i == 0 else ""
             replacements.append((start, end, ref))
     for start, end, replacement in sorted(replacements, reverse=True):
         index_html = index_html[:start] + replacement + index_html[end:]
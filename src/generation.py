@@ -6,10 +6,26 @@ import re
 import time
 import urllib.error
 import urllib.request
-from typing import Any
+from collections.abc import Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import Any, Self
 
+from src.circuit_breaker import CIRCUIT_BREAKERS, BreakerPolicy
+from src.concurrency_limit import (
+    OUTCOME_DROPPED,
+    OUTCOME_IGNORED,
+    OUTCOME_SUCCESS,
+    PROVIDER_LIMITS,
+    AdaptiveLimiter,
+    LimitPolicy,
+)
 from src.config import DEFAULT_OPENROUTER_BASE_URL, OPENROUTER_PROVIDER
-from src.observability import GenerationEvent, record
+from src.hedging import HEDGE_BUDGET, RECENT_LATENCY, HedgePolicy
+from src.observability import GenerationEvent, count, record, tokens_per_second
+from src.prompt_budget import compact_messages, estimate_tokens, is_code_dump
+from src.prompt_cache import MIN_CACHED_PREFIX_TOKENS, PROMPT_CACHE, prefix_key
 from src.sections import PageSection
 from src.theme import (
     COMPLEXITY_BY_KEY,
@@ -19,6 +35,12 @@ from src.theme import (
     STRICT_MINIMAL_GUIDANCE,
     TONE_PRESETS_BY_KEY,
 )
+from src.truncation import (
+    build_continuation_prompt,
+    is_truncated,
+    normalize_finish_reason,
+    splice,
+)
 
 _LANGUAGE_FENCE_RE = re.compile(r"^[A-Za-z][A-Za-z0-9+#.-]*$")
 
@@ -37,6 +59,10 @@ MAX_RETRY_BACKOFF_SECONDS = 30.0
 #: credentials, unknown model, wrong base URL.
 _PERMANENT_STATUS_CODES = frozenset({400, 401, 402, 403, 404, 405, 413, 422})
 
+#: Status codes that reject the request itself; the provider is healthy, so
+#: they do not count against its circuit breaker.
+_REQUEST_STATUS_CODES = frozenset({400, 413, 422})
+
 #: Fallback classification for providers that raise without a status code. The
 #: status codes are word-bounded so an unrelated number ("failed after 4013ms")
 #: is not mistaken for an auth failure and denied its retries.
@@ -53,6 +79,16 @@ _PERMANENT_ERROR_RE = re.compile(
     re.IGNORECASE,
 )
 
+#: Runs the primary leg of a hedged attempt, so the caller can stop waiting
+#: for it when the backup wins. Sized well above the generation concurrency
+#: limit, which already bounds how many attempts are in flight.
+_PRIMARY_POOL = ThreadPoolExecutor(
+    max_workers=32, thread_name_prefix="provider-primary"
+)
+#: Runs backup legs only. A backup that loses keeps its worker until its
+#: request returns, so backups must never queue primaries behind them.
+_HEDGE_POOL = ThreadPoolExecutor(max_workers=32, thread_name_prefix="provider-hedge")
+
 #: Indirections so tests can control timing without patching the stdlib globally.
 _sleep = time.sleep
 _jitter = random.uniform
@@ -76,6 +112,70 @@ class ProviderError(RuntimeError):
             self.retryable = _PERMANENT_ERROR_RE.search(message) is None
 
 
+@dataclass(frozen=True)
+class ProviderTarget:
+    """A provider and model a generation can be sent to."""
+
+    provider: str
+    model: Any
+    genai: Any = None
+    api_key: str = ""
+    base_url: str = DEFAULT_OPENROUTER_BASE_URL
+
+    @property
+    def model_name(self) -> str:
+        name = str(getattr(self.model, "model_name", self.model))
+        return name.removeprefix("models/")
+
+    @property
+    def key(self) -> str:
+        return f"{self.provider}:{self.model_name}"
+
+
+@dataclass(frozen=True)
+class ProviderResult:
+    text: str
+    #: Prompt tokens the provider served from its context cache, when reported.
+    cached_tokens: int | None = None
+    #: Token usage as counted by the provider, when reported.
+    prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    #: Why the provider stopped, normalized by ``normalize_finish_reason``.
+    finish_reason: str | None = None
+
+
+class GeneratedText(str):
+    """Generated output that remembers why the provider last stopped.
+
+    Still a ``str``, so callers of ``call_gemini`` keep working unchanged; the
+    ones that judge truncation read the reason with :func:`finish_reason_of`,
+    since a page still cut off after its continuations can look complete.
+    """
+
+    finish_reason: str | None
+
+    def __new__(cls, text: str, finish_reason: str | None = None) -> Self:
+        output = super().__new__(cls, text)
+        output.finish_reason = finish_reason
+        return output
+
+
+def finish_reason_of(output: str) -> str | None:
+    """The finish reason ``output`` carries, if it came from a generation."""
+    return output.finish_reason if isinstance(output, GeneratedText) else None
+
+
+def _finish_reason(response: Any) -> str | None:
+    candidates = getattr(response, "candidates", None) or ()
+    return normalize_finish_reason(
+        getattr(candidates[0], "finish_reason", None) if candidates else None
+    )
+
+
+def _token_count(value: Any) -> int | None:
+    return value if isinstance(value, int) and not isinstance(value, bool) else None
+
+
 BASE_PROMPT = (
     "You are an expert web app developer and UI designer specializing in minimalist, clean designs.\n"
     "Your task: Generate a beautiful, modern, and minimalistic single-page web app using only HTML, CSS, and minimal JavaScript.\n"
@@ -114,14 +214,12 @@ def _complexity_guidance(complexity_key: str) -> str:
     return f"Complexity: {level.guidance}"
 
 
-def build_generation_prompt(
-    messages: list[dict[str, str]],
-    tone_key: str = DEFAULT_TONE_KEY,
-    strict_minimal: bool = False,
-    complexity_key: str = DEFAULT_COMPLEXITY_KEY,
-    extra_guidance: str = "",
+def _generation_preamble(
+    tone_key: str,
+    strict_minimal: bool,
+    complexity_key: str,
+    extra_guidance: str,
 ) -> str:
-    conversation = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
     base_prompt = BASE_PROMPT
     guidance = _style_guidance(tone_key, strict_minimal)
     complexity = _complexity_guidance(complexity_key)
@@ -131,7 +229,43 @@ def build_generation_prompt(
         guidance = f"{guidance}\n{extra_guidance}" if guidance else extra_guidance
     if guidance:
         base_prompt = f"{base_prompt}\n\nAdditional style constraints:\n{guidance}"
-    return f"{base_prompt}\n\nConversation:\n{conversation}"
+    return base_prompt
+
+
+def _join_prompt(preamble: str, messages: list[dict[str, str]]) -> str:
+    conversation = "\n".join(f"{m['role'].upper()}: {m['content']}" for m in messages)
+    return f"{preamble}\n\nConversation:\n{conversation}"
+
+
+def _stable_prefix_chars(preamble: str, messages: list[dict[str, str]]) -> int:
+    """Length of the prompt prefix that repeats across turns on one page.
+
+    That is the instructions and guidance plus leading system context up to the
+    current page; per-turn scoping notes and the conversation come after it.
+    Zero when no page leads the conversation, since instructions alone are too
+    short for any provider to cache.
+    """
+    chars = len(preamble) + len("\n\nConversation:\n")
+    for message in messages:
+        if message["role"] != "system":
+            break
+        chars += len(message["role"]) + len(": ") + len(message["content"]) + 1
+        if is_code_dump(message["content"]):
+            return chars
+    return 0
+
+
+def build_generation_prompt(
+    messages: list[dict[str, str]],
+    tone_key: str = DEFAULT_TONE_KEY,
+    strict_minimal: bool = False,
+    complexity_key: str = DEFAULT_COMPLEXITY_KEY,
+    extra_guidance: str = "",
+) -> str:
+    return _join_prompt(
+        _generation_preamble(tone_key, strict_minimal, complexity_key, extra_guidance),
+        messages,
+    )
 
 
 def strip_html_code_fence(text: str) -> str:
@@ -176,27 +310,80 @@ def build_section_regeneration_prompt(
     extra_guidance: str = "",
     refine_aspect_key: str | None = None,
 ) -> str:
-    extra = "\n".join(
+    prefix, suffix = _section_prompt_parts(
+        current_code,
+        section,
+        instructions,
+        tone_key=tone_key,
+        strict_minimal=strict_minimal,
+        complexity_key=complexity_key,
+        extra_guidance=extra_guidance,
+        refine_aspect_key=refine_aspect_key,
+    )
+    return prefix + suffix
+
+
+def _section_prompt_parts(
+    current_code: str,
+    section: PageSection,
+    instructions: str,
+    *,
+    tone_key: str,
+    strict_minimal: bool,
+    complexity_key: str,
+    extra_guidance: str,
+    refine_aspect_key: str | None,
+) -> tuple[str, str]:
+    """Split the section prompt into a prefix shared by every section of a page
+    and the per-request remainder, so the page can be served from a cache."""
+    style = "\n".join(
         part
         for part in (
             _style_guidance(tone_key, strict_minimal),
             _complexity_guidance(complexity_key),
-            _refine_aspect_guidance(refine_aspect_key),
             extra_guidance,
         )
         if part
     )
-    prompt = (
-        SECTION_REGENERATION_INSTRUCTIONS
-        + "\n\nCurrent page code:\n"
-        + current_code
-        + f"\n\nSection to replace (position {section.index + 1}, <{section.tag}>):\n"
+    prefix = SECTION_REGENERATION_INSTRUCTIONS
+    if style:
+        prefix += "\n\nStyle constraints:\n" + style
+    prefix += "\n\nCurrent page code:\n" + current_code
+    suffix = (
+        f"\n\nSection to replace (position {section.index + 1}, <{section.tag}>):\n"
         + section.html
         + f"\n\nRegeneration instructions: {instructions or 'Match the existing design.'}"
     )
-    if extra:
-        prompt += "\n\nStyle constraints:\n" + extra
-    return prompt
+    aspect = _refine_aspect_guidance(refine_aspect_key)
+    if aspect:
+        suffix += "\n\nFocus:\n" + aspect
+    return prefix, suffix
+
+
+def _gemini_cached_model(
+    model: Any, genai: Any, prefix: str, cache_ttl_seconds: int
+) -> Any | None:
+    """A model bound to cached content for ``prefix``, creating it on a miss.
+
+    Returns ``None`` when the prefix cannot be cached (too short for the model,
+    or an SDK without caching); that answer is kept for the TTL as well.
+    """
+    model_name = str(getattr(model, "model_name", model))
+    key = prefix_key("gemini", model_name, prefix)
+    entry = PROMPT_CACHE.get(key)
+    if entry is None:
+        try:
+            handle = genai.caching.CachedContent.create(
+                model=model_name,
+                contents=[prefix],
+                ttl=timedelta(seconds=cache_ttl_seconds),
+            )
+        except Exception:  # noqa: BLE001 - caching is an optimization only
+            handle = None
+        entry = PROMPT_CACHE.put(key, handle, cache_ttl_seconds)
+    if entry.handle is None:
+        return None
+    return genai.GenerativeModel.from_cached_content(cached_content=entry.handle)
 
 
 def _generate_content(
@@ -205,8 +392,18 @@ def _generate_content(
     prompt: str,
     temperature: float,
     max_output_tokens: int,
-) -> str:
+    *,
+    prefix_chars: int = 0,
+    cache_ttl_seconds: int = 0,
+) -> ProviderResult:
     try:
+        cached_model = None
+        if cache_ttl_seconds and prefix_chars:
+            cached_model = _gemini_cached_model(
+                model, genai, prompt[:prefix_chars], cache_ttl_seconds
+            )
+        if cached_model is not None:
+            model, prompt = cached_model, prompt[prefix_chars:]
         response = model.generate_content(
             prompt,
             generation_config=genai.types.GenerationConfig(
@@ -214,7 +411,18 @@ def _generate_content(
                 max_output_tokens=max_output_tokens,
             ),
         )
-        return response.text
+        usage = getattr(response, "usage_metadata", None)
+        return ProviderResult(
+            text=response.text,
+            cached_tokens=_token_count(
+                getattr(usage, "cached_content_token_count", None)
+            ),
+            prompt_tokens=_token_count(getattr(usage, "prompt_token_count", None)),
+            completion_tokens=_token_count(
+                getattr(usage, "candidates_token_count", None)
+            ),
+            finish_reason=_finish_reason(response),
+        )
     except Exception as exc:
         raise ProviderError(str(exc)) from exc
 
@@ -228,11 +436,27 @@ def _generate_content_openrouter(
     model: str,
     base_url: str = DEFAULT_OPENROUTER_BASE_URL,
     timeout_seconds: int = DEFAULT_GENERATION_TIMEOUT_SECONDS,
-) -> str:
-    """Generate via OpenRouter's OpenAI-compatible chat completions endpoint."""
+    prefix_chars: int = 0,
+    cache_ttl_seconds: int = 0,
+) -> ProviderResult:
+    """Generate via OpenRouter's OpenAI-compatible chat completions endpoint.
+
+    With caching on, the stable prefix is sent as its own content part marked
+    with ``cache_control``; providers that cache implicitly ignore the marker.
+    """
+    content: Any = prompt
+    if cache_ttl_seconds and prefix_chars:
+        content = [
+            {
+                "type": "text",
+                "text": prompt[:prefix_chars],
+                "cache_control": {"type": "ephemeral"},
+            },
+            {"type": "text", "text": prompt[prefix_chars:]},
+        ]
     payload = {
         "model": model,
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": [{"role": "user", "content": content}],
         "temperature": temperature,
         "max_tokens": max_output_tokens,
     }
@@ -248,7 +472,16 @@ def _generate_content_openrouter(
     try:
         with urllib.request.urlopen(request, timeout=timeout_seconds) as response:
             body = json.loads(response.read().decode("utf-8"))
-        return body["choices"][0]["message"]["content"]
+        usage = body.get("usage") or {}
+        details = usage.get("prompt_tokens_details") or {}
+        choice = body["choices"][0]
+        return ProviderResult(
+            text=choice["message"]["content"],
+            cached_tokens=_token_count(details.get("cached_tokens")),
+            prompt_tokens=_token_count(usage.get("prompt_tokens")),
+            completion_tokens=_token_count(usage.get("completion_tokens")),
+            finish_reason=normalize_finish_reason(choice.get("finish_reason")),
+        )
     except urllib.error.HTTPError as exc:
         raise ProviderError(
             f"HTTP Error {exc.code}: {exc.reason}", status_code=exc.code
@@ -279,7 +512,9 @@ def _invoke_provider(
     api_key: str,
     base_url: str,
     timeout_seconds: int,
-) -> str:
+    prefix_chars: int = 0,
+    cache_ttl_seconds: int = 0,
+) -> ProviderResult:
     if provider == OPENROUTER_PROVIDER:
         return _generate_content_openrouter(
             prompt,
@@ -289,11 +524,141 @@ def _invoke_provider(
             model=str(model),
             base_url=base_url,
             timeout_seconds=timeout_seconds,
+            prefix_chars=prefix_chars,
+            cache_ttl_seconds=cache_ttl_seconds,
         )
-    return _generate_content(model, genai, prompt, temperature, max_output_tokens)
+    return _generate_content(
+        model,
+        genai,
+        prompt,
+        temperature,
+        max_output_tokens,
+        prefix_chars=prefix_chars,
+        cache_ttl_seconds=cache_ttl_seconds,
+    )
 
 
-def _generate(
+def _hedge_leg(
+    limiter: AdaptiveLimiter | None,
+    latency_key: str | None,
+    provider: str,
+    *args: Any,
+    **kwargs: Any,
+) -> ProviderResult:
+    """One request of a hedged attempt, accounted for when it returns.
+
+    It holds ``limiter``'s slot until then and, given a ``latency_key``,
+    records its own latency, so a leg left running after the other won still
+    counts against the limit and still reports how long it really took.
+    """
+    start = time.perf_counter()
+    outcome = OUTCOME_IGNORED
+    try:
+        result = _invoke_provider(provider, *args, **kwargs)
+        outcome = OUTCOME_SUCCESS
+        return result
+    except ProviderError as exc:
+        if exc.retryable:
+            outcome = OUTCOME_DROPPED
+        raise
+    finally:
+        duration_ms = int((time.perf_counter() - start) * 1000)
+        if limiter is not None:
+            limiter.release(outcome, duration_ms)
+        if latency_key is not None and outcome == OUTCOME_SUCCESS:
+            RECENT_LATENCY.record(latency_key, duration_ms)
+
+
+def _invoke_hedged(
+    provider: str,
+    prompt: str,
+    temperature: float,
+    max_output_tokens: int,
+    *,
+    hedge: HedgePolicy,
+    latency_key: str,
+    model: Any,
+    genai: Any,
+    limiter: AdaptiveLimiter | None = None,
+    **call: Any,
+) -> tuple[ProviderResult, bool, bool]:
+    """One provider attempt with a backup request if it runs long.
+
+    Returns the result plus whether a hedge was sent and whether it won. The
+    first successful response wins; the other leg is cancelled if it has not
+    started, and otherwise left to finish in the background with its result
+    discarded, since neither SDK can abort a request in flight.
+
+    The caller acquires ``limiter``'s slot for the primary and hands it over:
+    each leg releases its own slot when its request returns. The backup needs
+    a slot of its own and is not sent when none is free, since it is exactly
+    the extra load the limiter exists to govern. Only the primary's latency
+    feeds ``latency_key``; a winning backup's would pull the hedge delay down.
+    """
+    delay_ms = RECENT_LATENCY.percentile(
+        latency_key, hedge.percentile, hedge.min_samples
+    )
+    HEDGE_BUDGET.note_request()
+    leg = (limiter, latency_key, provider, prompt, temperature, max_output_tokens)
+    if delay_ms is None:
+        return (
+            _hedge_leg(*leg, model=model, genai=genai, **call),
+            False,
+            False,
+        )
+    primary = _PRIMARY_POOL.submit(_hedge_leg, *leg, model=model, genai=genai, **call)
+    done, _ = wait([primary], timeout=delay_ms / 1000)
+    if done:
+        return primary.result(), False, False
+    # Capacity first: a hedge skipped for want of a slot must not spend budget.
+    if limiter is not None and not limiter.acquire(timeout=0):
+        count("hedges_without_capacity")
+        return primary.result(), False, False
+    if not HEDGE_BUDGET.try_acquire(hedge.max_rate):
+        if limiter is not None:
+            limiter.release(OUTCOME_IGNORED)
+        return primary.result(), False, False
+
+    hedge_model = model
+    if hedge.model:
+        hedge_model = (
+            hedge.model
+            if provider == OPENROUTER_PROVIDER
+            else genai.GenerativeModel(hedge.model)
+        )
+    backup = _HEDGE_POOL.submit(
+        _hedge_leg,
+        limiter,
+        None,
+        provider,
+        prompt,
+        temperature,
+        max_output_tokens,
+        model=hedge_model,
+        genai=genai,
+        **call,
+    )
+    pending: set[Future[ProviderResult]] = {primary, backup}
+    first_error: ProviderError | None = None
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in (primary, backup):
+            if future not in done:
+                continue
+            try:
+                result = future.result()
+            except ProviderError as exc:
+                first_error = first_error or exc
+                continue
+            for loser in pending:
+                if loser.cancel() and limiter is not None:
+                    # Never started, so its slot was never used.
+                    limiter.release(OUTCOME_IGNORED)
+            return result, True, future is backup
+    raise first_error or ProviderError("hedged attempt returned no result")
+
+
+def _generate_once(
     provider: str,
     prompt: str,
     temperature: float,
@@ -304,12 +669,19 @@ def _generate(
     api_key: str,
     base_url: str,
     analytics_file: str | None,
-    event_meta: dict[str, str | bool | None] | None,
+    event_meta: dict[str, str | int | bool | None] | None,
     timeout_seconds: int = DEFAULT_GENERATION_TIMEOUT_SECONDS,
     max_attempts: int = DEFAULT_GENERATION_MAX_ATTEMPTS,
     retry_backoff_seconds: float = DEFAULT_RETRY_BACKOFF_SECONDS,
     total_timeout_seconds: int = DEFAULT_GENERATION_TOTAL_TIMEOUT_SECONDS,
-) -> str:
+    prefix_chars: int = 0,
+    cache_ttl_seconds: int = 0,
+    hedge: HedgePolicy | None = None,
+    operation: str = "generate",
+    fallbacks: Sequence[ProviderTarget] = (),
+    breaker: BreakerPolicy | None = None,
+    limit: LimitPolicy | None = None,
+) -> ProviderResult:
     """Call the provider, retrying transient failures with exponential backoff.
 
     Retries that are not going to fit inside ``total_timeout_seconds`` are not
@@ -317,62 +689,271 @@ def _generate(
     deadline a hung provider would multiply straight through the attempt count
     while holding a concurrency slot.
 
-    Non-final failures are recorded as ``generation.retry`` so that counting
+    Non-final failures are recorded as ``generation.retry`` (or
+    ``generation.failover`` when moving to the next target) so that counting
     ``generation.success`` against ``generation.error`` still yields the rate of
     generations that failed, not the rate of attempts that failed.
+
+    ``fallbacks`` are tried in order once the primary target gives up. With a
+    ``breaker`` policy each target sits behind a process-wide circuit breaker,
+    and a target whose breaker is open is skipped without a request, which is
+    what turns an outage from minutes of retries into an immediate fail-over.
+
+    ``prefix_chars`` marks how much of ``prompt`` is stable across requests; with
+    a ``cache_ttl_seconds`` it is offered to the provider's context cache when
+    it is long enough to be worth caching.
+
+    With a ``hedge`` policy each attempt may send a backup request once it
+    outlives the policy's percentile of recent latency for the same target and
+    ``operation``.
+
+    With a ``limit`` policy each attempt first takes a slot from the target's
+    adaptive concurrency limiter, waiting no later than the deadline, and its
+    outcome tunes that limit.
     """
     meta = dict(event_meta or {})
+    prompt_tokens = estimate_tokens(prompt)
+    meta.update(prompt_chars=len(prompt), prompt_tokens=prompt_tokens)
+    if prefix_chars and estimate_tokens(prompt[:prefix_chars]) < (
+        MIN_CACHED_PREFIX_TOKENS
+    ):
+        prefix_chars = 0
+    targets = [ProviderTarget(provider, model, genai, api_key, base_url), *fallbacks]
     attempts = max(1, max_attempts)
     deadline = time.monotonic() + max(0, total_timeout_seconds)
     last_error = "generation did not run"
-    for attempt in range(1, attempts + 1):
-        start = time.perf_counter()
-        try:
-            text = _invoke_provider(
-                provider,
-                prompt,
-                temperature,
-                max_output_tokens,
-                model=model,
-                genai=genai,
-                api_key=api_key,
-                base_url=base_url,
-                timeout_seconds=timeout_seconds,
-            )
-        except ProviderError as exc:
-            last_error = str(exc)
-            backoff = _backoff_delay(retry_backoff_seconds, attempt)
-            give_up = (
-                not exc.retryable
-                or attempt == attempts
-                or time.monotonic() + backoff >= deadline
-            )
+    open_circuits: list[str] = []
+    settled = False
+    for depth, target in enumerate(targets):
+        circuit = CIRCUIT_BREAKERS.get(target.key, breaker) if breaker else None
+        limiter = PROVIDER_LIMITS.get(target.key, limit) if limit else None
+        if circuit is not None and not circuit.allow():
+            open_circuits.append(target.key)
+            count("breaker_skips")
+            continue
+        target_meta = {
+            **meta,
+            "provider": target.provider,
+            "model": target.model_name,
+            "fallback_depth": depth,
+        }
+        is_last = depth == len(targets) - 1
+        for attempt in range(1, attempts + 1):
+            # Another generation may have tripped the breaker while this one
+            # backed off; the next target is then a better use of the time left.
+            if attempt > 1 and circuit is not None and not circuit.allow():
+                break
+            attempt_meta = dict(target_meta)
+            if limiter is not None:
+                queued = time.perf_counter()
+                if not limiter.acquire(timeout=max(0.0, deadline - time.monotonic())):
+                    last_error = f"no provider capacity for {target.key} in time"
+                    if circuit is not None:
+                        circuit.abandon()
+                    record(
+                        GenerationEvent(
+                            event="generation.error",
+                            error=last_error,
+                            attempt=attempt,
+                            concurrency_limit=limiter.limit,
+                            **target_meta,
+                        ),
+                        analytics_file=analytics_file,
+                    )
+                    settled = True
+                    break
+                wait_ms = int((time.perf_counter() - queued) * 1000)
+                if wait_ms:
+                    count("limiter_wait_ms", wait_ms)
+                attempt_meta["limiter_wait_ms"] = wait_ms
+            start = time.perf_counter()
+            hedged = hedge_won = False
+            call: dict[str, Any] = {
+                "model": target.model,
+                "genai": target.genai,
+                "api_key": target.api_key,
+                "base_url": target.base_url,
+                "timeout_seconds": timeout_seconds,
+                "prefix_chars": prefix_chars,
+                "cache_ttl_seconds": cache_ttl_seconds,
+            }
+            error: ProviderError | None = None
+            outcome = OUTCOME_IGNORED
+            try:
+                if hedge is None:
+                    result = _invoke_provider(
+                        target.provider, prompt, temperature, max_output_tokens, **call
+                    )
+                else:
+                    result, hedged, hedge_won = _invoke_hedged(
+                        target.provider,
+                        prompt,
+                        temperature,
+                        max_output_tokens,
+                        hedge=hedge,
+                        latency_key=f"{target.key}:{operation}",
+                        limiter=limiter,
+                        **call,
+                    )
+                outcome = OUTCOME_SUCCESS
+            except ProviderError as exc:
+                error = exc
+                if exc.retryable:
+                    outcome = OUTCOME_DROPPED
+            finally:
+                duration_ms = int((time.perf_counter() - start) * 1000)
+                if limiter is not None:
+                    # A hedged attempt's legs release their own slots.
+                    if hedge is None:
+                        limiter.release(outcome, duration_ms)
+                    attempt_meta["concurrency_limit"] = limiter.limit
+            if error is not None:
+                last_error = str(error)
+                if circuit is not None:
+                    # The provider answered; it is the request it refused.
+                    if error.status_code in _REQUEST_STATUS_CODES:
+                        circuit.record_success()
+                    else:
+                        circuit.record_failure()
+                backoff = _backoff_delay(retry_backoff_seconds, attempt)
+                give_up = (
+                    not error.retryable
+                    or attempt == attempts
+                    or time.monotonic() + backoff >= deadline
+                )
+                if not give_up:
+                    event = "generation.retry"
+                elif is_last or time.monotonic() >= deadline:
+                    event = "generation.error"
+                    settled = True
+                else:
+                    event = "generation.failover"
+                record(
+                    GenerationEvent(
+                        event=event,
+                        duration_ms=duration_ms,
+                        error=last_error,
+                        attempt=attempt,
+                        **attempt_meta,
+                    ),
+                    analytics_file=analytics_file,
+                )
+                if give_up:
+                    break
+                _sleep(backoff)
+                continue
+            if circuit is not None:
+                circuit.record_success()
+            if hedged:
+                count("hedged_requests")
+                count("hedge_wins", int(hedge_won))
+            if depth:
+                count("fallbacks")
+            if hedge_won and hedge is not None and hedge.model:
+                attempt_meta["model"] = hedge.model
+            usage = {
+                "provider_calls": 1,
+                "provider_ms": duration_ms,
+                "prompt_tokens": result.prompt_tokens,
+                "completion_tokens": result.completion_tokens,
+                "cached_tokens": result.cached_tokens,
+            }
+            for name, amount in usage.items():
+                if amount is not None:
+                    count(name, amount, model=str(attempt_meta["model"]))
             record(
                 GenerationEvent(
-                    event="generation.error" if give_up else "generation.retry",
-                    duration_ms=int((time.perf_counter() - start) * 1000),
-                    error=last_error,
+                    event="generation.success",
+                    duration_ms=duration_ms,
+                    output_chars=len(result.text),
                     attempt=attempt,
-                    **meta,
+                    cached_tokens=result.cached_tokens,
+                    provider_prompt_tokens=result.prompt_tokens,
+                    completion_tokens=result.completion_tokens,
+                    finish_reason=result.finish_reason,
+                    tokens_per_second=tokens_per_second(
+                        result.completion_tokens, duration_ms
+                    ),
+                    hedged=hedged if hedge is not None else None,
+                    hedge_won=hedge_won if hedged else None,
+                    **attempt_meta,
                 ),
                 analytics_file=analytics_file,
             )
-            if give_up:
-                break
-            _sleep(backoff)
-            continue
+            return result
+        if settled or time.monotonic() >= deadline:
+            break
+    if open_circuits and last_error == "generation did not run":
+        last_error = f"circuit open for {', '.join(open_circuits)}"
+    if not settled:
+        # Every target was skipped, or the last one tried failed over to
+        # targets whose breakers were open: the generation still failed once.
         record(
-            GenerationEvent(
-                event="generation.success",
-                duration_ms=int((time.perf_counter() - start) * 1000),
-                output_chars=len(text),
-                attempt=attempt,
-                **meta,
-            ),
+            GenerationEvent(event="generation.error", error=last_error, **meta),
             analytics_file=analytics_file,
         )
+    return ProviderResult(f"API error: {last_error}")
+
+
+def _generate(
+    provider: str,
+    prompt: str,
+    temperature: float,
+    max_output_tokens: int,
+    *,
+    max_continuations: int = 0,
+    **options: Any,
+) -> str:
+    """Generate with ``_generate_once``, resuming output cut off at the limit.
+
+    A truncated reply gets up to ``max_continuations`` follow-up calls, each
+    fed the output so far and spliced onto it. A failed follow-up leaves the
+    partial output for validation to report, rather than discarding the part
+    that was paid for. Follow-ups share the ``total_timeout_seconds`` deadline
+    of the call they resume.
+
+    Output is returned as :class:`GeneratedText` carrying the finish reason of
+    the last call that produced any, so validation can tell a page that is
+    still cut off from one that merely omits its closing tags.
+    """
+    started = time.monotonic()
+    result = _generate_once(provider, prompt, temperature, max_output_tokens, **options)
+    text = result.text
+    if text.startswith("API error:"):
         return text
-    return f"API error: {last_error}"
+    finish_reason = result.finish_reason
+    if not is_truncated(text, finish_reason):
+        return GeneratedText(text, finish_reason)
+    count("truncations")
+    operation = options.pop("operation", "generate")
+    event_meta = options.pop("event_meta", None) or {}
+    total_timeout_seconds = options.pop(
+        "total_timeout_seconds", DEFAULT_GENERATION_TOTAL_TIMEOUT_SECONDS
+    )
+    for continuation in range(1, max_continuations + 1):
+        remaining = int(total_timeout_seconds - (time.monotonic() - started))
+        if remaining < 1:
+            break
+        count("continuations")
+        result = _generate_once(
+            provider,
+            build_continuation_prompt(prompt, text),
+            temperature,
+            max_output_tokens,
+            # Kept apart from full generations so short follow-ups do not
+            # skew the latency percentiles hedging works from.
+            operation=f"{operation}_continuation",
+            event_meta={**event_meta, "continuation": continuation},
+            total_timeout_seconds=remaining,
+            **options,
+        )
+        if result.text.startswith("API error:"):
+            break
+        text = splice(text, result.text)
+        finish_reason = result.finish_reason
+        if not is_truncated(text, finish_reason):
+            break
+    return GeneratedText(text, finish_reason)
 
 
 def call_gemini(
@@ -394,14 +975,41 @@ def call_gemini(
     max_attempts: int = DEFAULT_GENERATION_MAX_ATTEMPTS,
     retry_backoff_seconds: float = DEFAULT_RETRY_BACKOFF_SECONDS,
     total_timeout_seconds: int = DEFAULT_GENERATION_TOTAL_TIMEOUT_SECONDS,
+    prompt_token_budget: int | None = None,
+    prompt_cache_ttl_seconds: int = 0,
+    hedge: HedgePolicy | None = None,
+    fallbacks: Sequence[ProviderTarget] = (),
+    breaker: BreakerPolicy | None = None,
+    limit: LimitPolicy | None = None,
+    max_continuations: int = 0,
 ) -> str:
-    prompt = build_generation_prompt(
-        messages,
-        tone_key=tone_key,
-        strict_minimal=strict_minimal,
-        complexity_key=complexity_key,
-        extra_guidance=extra_guidance,
+    """Generate a full page from the conversation.
+
+    With a ``prompt_token_budget`` the conversation is compacted so the whole
+    prompt, instructions included, fits it; without one it is sent as is. A
+    ``prompt_cache_ttl_seconds`` offers the stable prefix to the provider's
+    context cache for that long. A page cut off at ``max_output_tokens`` is
+    resumed with up to ``max_continuations`` follow-up calls.
+    """
+    preamble = _generation_preamble(
+        tone_key, strict_minimal, complexity_key, extra_guidance
     )
+    event_meta: dict[str, str | int | bool | None] = {
+        "tone_key": tone_key,
+        "complexity_key": complexity_key,
+        "strict_minimal": strict_minimal,
+        "provider": provider,
+    }
+    if prompt_token_budget:
+        compaction = compact_messages(
+            messages, prompt_token_budget - estimate_tokens(preamble)
+        )
+        messages = compaction.messages
+        event_meta.update(
+            prompt_budget_tokens=prompt_token_budget,
+            compacted_messages=compaction.compacted,
+        )
+    prompt = _join_prompt(preamble, messages)
     return _generate(
         provider,
         prompt,
@@ -416,12 +1024,15 @@ def call_gemini(
         max_attempts=max_attempts,
         retry_backoff_seconds=retry_backoff_seconds,
         total_timeout_seconds=total_timeout_seconds,
-        event_meta={
-            "tone_key": tone_key,
-            "complexity_key": complexity_key,
-            "strict_minimal": strict_minimal,
-            "provider": provider,
-        },
+        event_meta=event_meta,
+        prefix_chars=_stable_prefix_chars(preamble, messages),
+        cache_ttl_seconds=prompt_cache_ttl_seconds,
+        hedge=hedge,
+        operation="generate",
+        fallbacks=fallbacks,
+        breaker=breaker,
+        limit=limit,
+        max_continuations=max_continuations,
     )
 
 
@@ -447,8 +1058,14 @@ def call_gemini_for_section(
     max_attempts: int = DEFAULT_GENERATION_MAX_ATTEMPTS,
     retry_backoff_seconds: float = DEFAULT_RETRY_BACKOFF_SECONDS,
     total_timeout_seconds: int = DEFAULT_GENERATION_TOTAL_TIMEOUT_SECONDS,
+    prompt_cache_ttl_seconds: int = 0,
+    hedge: HedgePolicy | None = None,
+    fallbacks: Sequence[ProviderTarget] = (),
+    breaker: BreakerPolicy | None = None,
+    limit: LimitPolicy | None = None,
+    max_continuations: int = 0,
 ) -> str:
-    prompt = build_section_regeneration_prompt(
+    prefix, suffix = _section_prompt_parts(
         current_code,
         section,
         instructions,
@@ -460,7 +1077,7 @@ def call_gemini_for_section(
     )
     return _generate(
         provider,
-        prompt,
+        prefix + suffix,
         temperature,
         max_output_tokens,
         model=model,
@@ -478,4 +1095,12 @@ def call_gemini_for_section(
             "strict_minimal": strict_minimal,
             "provider": provider,
         },
+        prefix_chars=len(prefix),
+        cache_ttl_seconds=prompt_cache_ttl_seconds,
+        hedge=hedge,
+        operation="section",
+        fallbacks=fallbacks,
+        breaker=breaker,
+        limit=limit,
+        max_continuations=max_continuations,
     )
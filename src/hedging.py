@@ -0,0 +1,85 @@
+"""Hedged provider requests: a backup call for attempts that run long.
+
+A few provider calls take several times the median and set the P95 on their
+own. When an attempt is still outstanding at a high percentile of recent
+latency for the same operation, a second request is sent and whichever answers
+first wins. ``HedgeBudget`` caps how much extra load that may add.
+"""
+
+from __future__ import annotations
+
+import math
+import threading
+from collections import deque
+from dataclasses import dataclass
+
+#: Latency samples kept per operation.
+LATENCY_WINDOW = 200
+#: Recent provider requests the hedge rate is measured over.
+BUDGET_WINDOW = 200
+
+
+@dataclass(frozen=True)
+class HedgePolicy:
+    #: Percentile of recent latency after which a hedge is sent, e.g. 95.
+    percentile: float
+    #: Largest share of recent provider requests that may be hedges.
+    max_rate: float = 0.1
+    #: Samples an operation needs before its percentile is trusted.
+    min_samples: int = 20
+    #: Model for the hedge; empty sends the same model again.
+    model: str = ""
+
+
+class LatencyWindow:
+    """Recent successful attempt latencies, per operation key."""
+
+    def __init__(self, size: int = LATENCY_WINDOW) -> None:
+        self._size = size
+        self._samples: dict[str, deque[int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, duration_ms: int) -> None:
+        with self._lock:
+            samples = self._samples.get(key)
+            if samples is None:
+                samples = self._samples[key] = deque(maxlen=self._size)
+            samples.append(duration_ms)
+
+    def percentile(self, key: str, percentile: float, min_samples: int) -> int | None:
+        """Nearest-rank percentile, or ``None`` until ``min_samples`` exist."""
+        with self._lock:
+            samples = sorted(self._samples.get(key, ()))
+        if not samples or len(samples) < min_samples:
+            return None
+        rank = max(1, math.ceil(percentile / 100 * len(samples)))
+        return samples[min(rank, len(samples)) - 1]
+
+
+class HedgeBudget:
+    """Keeps hedges to a share of recent provider requests.
+
+    Without a cap, a provider-wide slowdown pushes every attempt past the
+    percentile and hedging doubles load on a provider that is already slow.
+    """
+
+    def __init__(self, window: int = BUDGET_WINDOW) -> None:
+        self._requests: deque[bool] = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def note_request(self) -> None:
+        with self._lock:
+            self._requests.append(False)
+
+    def try_acquire(self, max_rate: float) -> bool:
+        """Claim a hedge if it keeps the hedged share within ``max_rate``."""
+        with self._lock:
+            hedges = sum(self._requests)
+            if (hedges + 1) / (len(self._requests) + 1) > max_rate:
+                return False
+            self._requests.append(True)
+            return True
+
+
+RECENT_LATENCY = LatencyWindow()
+HEDGE_BUDGET = HedgeBudget()
@@ -0,0 +1,224 @@
+"""Image bytes and the markup that references them.
+
+Uploaded images are stored as they arrive and get smaller copies for
+``srcset``: each width in ``VARIANT_WIDTHS`` narrower than the image, plus one
+at full width when re-encoding alone makes it smaller, all as WebP. Resizing
+needs the optional ``Pillow`` package; without it an image keeps only its
+original.
+
+Pages that embed images as ``data:`` URIs carry every byte of them in each
+saved revision. :func:`externalize_data_images` swaps them for URLs, and
+:func:`add_srcsets` lets ``<img>`` tags pick a variant that fits.
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import io
+import re
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+#: Extension each accepted upload type is stored and served under.
+IMAGE_TYPES = {
+    "image/png": ".png",
+    "image/jpeg": ".jpg",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/avif": ".avif",
+    "image/svg+xml": ".svg",
+}
+#: Formats Pillow can resize; SVG is already resolution independent.
+_RASTER_TYPES = frozenset(IMAGE_TYPES) - {"image/svg+xml", "image/avif"}
+VARIANT_WIDTHS = (320, 640, 960, 1280, 1920)
+VARIANT_TYPE = "image/webp"
+VARIANT_QUALITY = 80
+#: Refuse to decode anything larger, whatever its file size.
+MAX_IMAGE_PIXELS = 40_000_000
+#: ``data:`` images smaller than this stay inline: a request costs more.
+MIN_EXTRACTED_BYTES = 1024
+
+_DATA_IMAGE_RE = re.compile(
+    r"data:(image/(?:png|jpeg|gif|webp|avif|svg\+xml));base64,([A-Za-z0-9+/]+={0,2})",
+    re.IGNORECASE,
+)
+_IMG_TAG_RE = re.compile(
+    r"""<img\b(?:[^>"']|"[^"]*"|'[^']*')*>""", re.IGNORECASE | re.DOTALL
+)
+_SRC_ATTR_RE = re.compile(
+    r"""\ssrc\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE
+)
+_SRCSET_ATTR_RE = re.compile(r"\ssrcset\s*=", re.IGNORECASE)
+_SIZES_ATTR_RE = re.compile(r"\ssizes\s*=", re.IGNORECASE)
+_SVG_START_RE = re.compile(
+    rb"^\s*(?:<\?xml[^>]*>\s*)?(?:<!--.*?-->\s*)*<svg\b", re.DOTALL
+)
+
+
+@dataclass(frozen=True)
+class ImageVariant:
+    width: int
+    height: int
+    content_type: str
+    data: bytes
+
+
+@dataclass(frozen=True)
+class SrcsetEntry:
+    url: str
+    width: int
+
+
+# ---- bytes ----
+
+
+def sniff_image_type(data: bytes) -> str | None:
+    """The image type ``data`` holds, judged by its bytes rather than its name."""
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    if data[4:12] in (b"ftypavif", b"ftypavis"):
+        return "image/avif"
+    if _SVG_START_RE.match(data[:1024]):
+        return "image/svg+xml"
+    return None
+
+
+def _pillow() -> Any | None:
+    try:
+        from PIL import Image, ImageOps  # type: ignore[import-not-found]
+    except ImportError:
+        return None
+    Image.MAX_IMAGE_PIXELS = MAX_IMAGE_PIXELS
+    return Image, ImageOps
+
+
+def image_size(data: bytes) -> tuple[int, int] | None:
+    """Width and height of a raster image, when Pillow can read it."""
+    pillow = _pillow()
+    if pillow is None:
+        return None
+    image_module, _ = pillow
+    try:
+        with image_module.open(io.BytesIO(data)) as image:
+            return image.size
+    except (OSError, ValueError, image_module.DecompressionBombError):
+        return None
+
+
+def make_variants(
+    data: bytes, widths: tuple[int, ...] = VARIANT_WIDTHS
+) -> list[ImageVariant]:
+    """Resized WebP copies of a raster image, narrowest first.
+
+    Empty without Pillow, and for vector or animated images. Raises
+    ``ValueError`` when the bytes cannot be decoded.
+    """
+    pillow = _pillow()
+    if pillow is None or sniff_image_type(data) not in _RASTER_TYPES:
+        return []
+    image_module, image_ops = pillow
+    try:
+        with image_module.open(io.BytesIO(data)) as source:
+            if getattr(source, "n_frames", 1) > 1:
+                return []
+            image = image_ops.exif_transpose(source)
+            image.load()
+    except (OSError, image_module.DecompressionBombError) as exc:
+        raise ValueError(f"Unreadable image: {exc}") from exc
+    has_alpha = image.mode in ("RGBA", "LA", "PA") or "transparency" in image.info
+    image = image.convert("RGBA" if has_alpha else "RGB")
+    full_width, full_height = image.size
+    variants: list[ImageVariant] = []
+    for width in sorted(widths):
+        if width >= full_width:
+            break
+        height = max(1, round(full_height * width / full_width))
+        resized = image.resize((width, height), image_module.Resampling.LANCZOS)
+        variants.append(_encode(resized))
+    full = _encode(image)
+    if len(full.data) < len(data):
+        variants.append(full)
+    return variants
+
+
+def _encode(image: Any) -> ImageVariant:
+    buffer = io.BytesIO()
+    image.save(buffer, "WEBP", quality=VARIANT_QUALITY, method=4)
+    width, height = image.size
+    return ImageVariant(width, height, VARIANT_TYPE, buffer.getvalue())
+
+
+# ---- markup ----
+
+
+def externalize_data_images(
+    text: str,
+    store: Callable[[str, bytes], str | None],
+    *,
+    min_bytes: int = MIN_EXTRACTED_BYTES,
+) -> tuple[str, int]:
+    """Replace base64 ``data:`` images with the URLs ``store`` returns for them.
+
+    ``store`` receives the declared type and the decoded bytes and may return
+    None to leave an image inline. Images under ``min_bytes`` always stay.
+    Returns the text and how many images were replaced.
+    """
+    replaced = 0
+
+    def swap(match: re.Match[str]) -> str:
+        nonlocal replaced
+        # A base64 payload decodes to three bytes for every four characters.
+        if len(match.group(2)) * 3 // 4 < min_bytes:
+            return match.group()
+        try:
+            data = base64.b64decode(match.group(2), validate=True)
+        except binascii.Error:
+            return match.group()
+        url = store(match.group(1).lower(), data)
+        if url is None:
+            return match.group()
+        replaced += 1
+        return url
+
+    return _DATA_IMAGE_RE.sub(swap, text), replaced
+
+
+def srcset_value(entries: list[SrcsetEntry]) -> str:
+    return ", ".join(f"{entry.url} {entry.width}w" for entry in entries)
+
+
+def add_srcsets(html: str, srcsets: Mapping[str, list[SrcsetEntry]]) -> tuple[str, int]:
+    """Give ``<img>`` tags whose ``src`` is a key of ``srcsets`` that ``srcset``.
+
+    Tags that already choose their own sources keep them. The added ``sizes``
+    caps the image at its natural width. Returns the HTML and the number of
+    tags changed.
+    """
+    changed = 0
+
+    def rewrite(match: re.Match[str]) -> str:
+        nonlocal changed
+        tag = match.group()
+        src = _SRC_ATTR_RE.search(tag)
+        if src is None or _SRCSET_ATTR_RE.search(tag):
+            return tag
+        entries = srcsets.get(src.group(1) or src.group(2) or src.group(3) or "")
+        if not entries:
+            return tag
+        widest = max(entry.width for entry in entries)
+        extra = f' srcset="{srcset_value(entries)}"'
+        if not _SIZES_ATTR_RE.search(tag):
+            extra += f' sizes="(max-width: {widest}px) 100vw, {widest}px"'
+        end = len(tag) - (2 if tag.endswith("/>") else 1)
+        changed += 1
+        return f"{tag[:end].rstrip()}{extra}{tag[end:]}"
+
+    return _IMG_TAG_RE.sub(rewrite, html), changed
@@ -0,0 +1,653 @@
+"""Shrink exported pages: minify HTML, CSS and inline JS, drop unused CSS.
+
+Generated pages arrive pretty-printed, and after a few section regenerations
+and visual edits their stylesheet carries rules for markup that is long gone.
+Every transform here errs on the side of keeping bytes: a CSS rule is only
+dropped when a class, id or tag it needs appears nowhere in the page, not even
+as a word in its scripts (which may add the class at runtime). A script the
+tokenizer cannot follow is left exactly as it was.
+"""
+
+from __future__ import annotations
+
+import re
+from collections.abc import Callable
+from dataclasses import asdict, dataclass, field
+from html.parser import HTMLParser
+from typing import Any
+
+from src.export import SplitDocument
+from src.svg_sprite import SpriteReport, dedupe_svgs
+
+#: Elements every document has, whether or not the markup spells them out.
+_IMPLIED_TAGS = frozenset({"html", "head", "body"})
+#: At-rules whose block holds further rules, pruned recursively.
+_GROUPING_AT_RULES = frozenset(
+    {"media", "supports", "container", "layer", "document", "scope"}
+)
+#: Elements whose surrounding whitespace never renders.
+_BLOCK_TAGS = frozenset(
+    {"address", "article", "aside", "base", "blockquote", "body", "br", "dd",
+     "details", "dialog", "div", "dl", "dt", "fieldset", "figcaption", "figure",
+     "footer", "form", "h1", "h2", "h3", "h4", "h5", "h6", "head", "header",
+     "hgroup", "hr", "html", "li", "link", "main", "menu", "meta", "nav",
+     "noscript", "ol", "option", "p", "pre", "section", "select", "style",
+     "summary", "table", "tbody", "td", "template", "tfoot", "th", "thead",
+     "title", "tr", "ul"}
+)  # fmt: skip
+_JS_TYPES = frozenset(
+    {"", "module", "text/javascript", "application/javascript", "text/ecmascript"}
+)
+
+_WORD_RE = re.compile(r"[A-Za-z_][\w-]*")
+_RAW_BLOCK_RE = re.compile(
+    r"<(script|style|pre|textarea)\b([^>]*)>(.*?)</\1\s*>", re.IGNORECASE | re.DOTALL
+)
+_TYPE_ATTR_RE = re.compile(r"""\btype\s*=\s*["']?([^"'\s>]*)""", re.IGNORECASE)
+_HTML_COMMENT_RE = re.compile(r"<!--(?!\[if|<!|>).*?-->", re.DOTALL)
+_SPACE_RE = re.compile(r"\s+")
+_PLACEHOLDER = "\x00raw-block-"
+_PLACEHOLDER_RE = re.compile(r"<[a-zA-Z]+\x00raw-block-(\d+)>")
+_GAP_BETWEEN_TAGS_RE = re.compile(r"(?<=>)\s+(?=<)")
+_TAG_NAME_RE = re.compile(r"</?([a-zA-Z][\w-]*)")
+_PARENS_RE = re.compile(r"\([^()]*\)")
+_ATTRIBUTE_SELECTOR_RE = re.compile(r"\[[^\]]*\]")
+_PSEUDO_RE = re.compile(r"::?[\w-]+")
+_ID_RE = re.compile(r"#([\w-]+)")
+_CLASS_RE = re.compile(r"\.([\w-]+)")
+_COMPOUND_TAG_RE = re.compile(r"(?:^|[\s>+~])([a-zA-Z][\w-]*)")
+
+
+@dataclass
+class DocumentIndex:
+    """What CSS selectors could match in one page."""
+
+    tags: set[str] = field(default_factory=lambda: set(_IMPLIED_TAGS))
+    classes: set[str] = field(default_factory=set)
+    ids: set[str] = field(default_factory=set)
+    #: Every identifier-like word in the page's scripts and event handlers.
+    script_words: set[str] = field(default_factory=set)
+
+    @classmethod
+    def from_html(cls, html: str) -> DocumentIndex:
+        scanner = _IndexScanner()
+        scanner.feed(html)
+        scanner.close()
+        return scanner.index
+
+
+class _IndexScanner(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.index = DocumentIndex()
+        self._in_script = False
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.index.tags.add(tag)
+        for name, value in attrs:
+            if not value:
+                continue
+            if name == "class":
+                self.index.classes.update(value.split())
+            elif name == "id":
+                self.index.ids.add(value.strip())
+            elif name.startswith("on"):
+                self.index.script_words.update(_WORD_RE.findall(value))
+        self._in_script = tag == "script"
+
+    def handle_endtag(self, tag: str) -> None:
+        self._in_script = False
+
+    def handle_data(self, data: str) -> None:
+        if self._in_script:
+            self.index.script_words.update(_WORD_RE.findall(data))
+
+
+# ---- CSS ----
+
+
+def _skip_string(text: str, start: int) -> int:
+    """Index just past the quoted string opening at ``start``."""
+    quote = text[start]
+    i = start + 1
+    while i < len(text):
+        if text[i] == "\\":
+            i += 2
+            continue
+        if text[i] == quote or text[i] == "\n":
+            return i + 1
+        i += 1
+    return len(text)
+
+
+def strip_css_comments(css: str) -> str:
+    """``css`` without comments, except ``/*! ... */`` license notices."""
+    out: list[str] = []
+    i = 0
+    while i < len(css):
+        char = css[i]
+        if char in "\"'":
+            end = _skip_string(css, i)
+            out.append(css[i:end])
+            i = end
+        elif css.startswith("/*", i):
+            end = css.find("*/", i + 2)
+            end = len(css) if end < 0 else end + 2
+            if css.startswith("/*!", i):
+                out.append(css[i:end])
+            else:
+                out.append(" ")
+            i = end
+        else:
+            out.append(char)
+            i += 1
+    return "".join(out)
+
+
+def _split_top_level(text: str, separator: str) -> list[str]:
+    parts: list[str] = []
+    depth = 0
+    start = 0
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if char in "\"'":
+            i = _skip_string(text, i)
+            continue
+        if char in "([":
+            depth += 1
+        elif char in ")]":
+            depth -= 1
+        elif char == separator and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+        i += 1
+    parts.append(text[start:])
+    return parts
+
+
+def _block_end(css: str, open_brace: int) -> int:
+    """Index of the ``}`` closing the block opened at ``open_brace``."""
+    depth = 0
+    i = open_brace
+    while i < len(css):
+        char = css[i]
+        if char in "\"'":
+            i = _skip_string(css, i)
+            continue
+        if char == "{":
+            depth += 1
+        elif char == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+        i += 1
+    return len(css)
+
+
+def _next_delimiter(css: str, start: int) -> int:
+    """Index of the next top-level ``{`` or ``;`` at or after ``start``."""
+    i = start
+    while i < len(css):
+        char = css[i]
+        if char in "\"'":
+            i = _skip_string(css, i)
+            continue
+        if char in "{;":
+            return i
+        i += 1
+    return len(css)
+
+
+def selector_may_match(selector: str, index: DocumentIndex) -> bool:
+    """False only when the selector needs a class, id or tag the page lacks."""
+    if "\\" in selector:
+        return True  # Escaped names are rare; not worth parsing to drop them.
+    simplified = selector
+    while True:
+        reduced = _PARENS_RE.sub("", simplified)
+        if reduced == simplified:
+            break
+        simplified = reduced
+    simplified = _PSEUDO_RE.sub("", _ATTRIBUTE_SELECTOR_RE.sub("", simplified))
+    words = index.script_words
+    for name in _ID_RE.findall(simplified):
+        if name not in index.ids and name not in words:
+            return False
+    for name in _CLASS_RE.findall(simplified):
+        if name not in index.classes and name not in words:
+            return False
+    for name in _COMPOUND_TAG_RE.findall(simplified.strip()):
+        tag = name.lower()
+        if tag not in index.tags and tag not in words and name not in words:
+            return False
+    return True
+
+
+def filter_css_rules(css: str, keep: Callable[[str], bool]) -> tuple[str, int]:
+    """Keep the selectors ``keep`` accepts, and the rules left with any.
+
+    Rules inside grouping at-rules such as ``@media`` are filtered too, and a
+    group left empty is dropped; other at-rules are kept as they are. Returns
+    the CSS and the number of rules removed. Comments must already be stripped.
+    """
+    out: list[str] = []
+    removed = 0
+    i = 0
+    while i < len(css):
+        delimiter = _next_delimiter(css, i)
+        if delimiter >= len(css) or css[delimiter] == ";":
+            out.append(css[i : delimiter + 1])
+            i = delimiter + 1
+            continue
+        end = _block_end(css, delimiter)
+        prelude = css[i:delimiter].strip()
+        body = css[delimiter + 1 : end]
+        i = end + 1
+        if prelude.startswith("@"):
+            name = _WORD_RE.match(prelude[1:])
+            if name and name.group(0).lower() in _GROUPING_AT_RULES:
+                inner, inner_removed = filter_css_rules(body, keep)
+                removed += inner_removed
+                if inner.strip():
+                    out.append(f"{prelude}{{{inner}}}")
+                continue
+            out.append(f"{prelude}{{{body}}}")
+            continue
+        selectors = [part.strip() for part in _split_top_level(prelude, ",")]
+        live = [part for part in selectors if part and keep(part)]
+        if not live:
+            removed += 1
+            continue
+        out.append(f"{','.join(live)}{{{body}}}")
+    return "".join(out), removed
+
+
+def prune_unused_css(css: str, index: DocumentIndex) -> tuple[str, int]:
+    """Drop rules and selectors that match nothing; returns the CSS and the
+    number of rules removed. Comments must already be stripped."""
+    return filter_css_rules(css, lambda selector: selector_may_match(selector, index))
+
+
+def minify_css(css: str) -> str:
+    """Collapse whitespace and drop comments and redundant semicolons."""
+    css = strip_css_comments(css)
+    out: list[str] = []
+    # For each open block, whether it holds declarations (where a space after
+    # ``:`` is noise) rather than rules (where ``a :hover`` differs from
+    # ``a:hover``).
+    blocks: list[bool] = []
+    statement_start = 0
+    i = 0
+    while i < len(css):
+        char = css[i]
+        if char in "\"'":
+            end = _skip_string(css, i)
+            out.append(css[i:end])
+            i = end
+            continue
+        if char.isspace():
+            while i < len(css) and css[i].isspace():
+                i += 1
+            previous = out[-1][-1] if out and out[-1] else ""
+            following = css[i] if i < len(css) else ""
+            in_declarations = bool(blocks) and blocks[-1]
+            if (
+                not previous
+                or not following
+                or previous in "{};,>"
+                or following in "{};,>!"
+                or (in_declarations and (previous == ":" or following == ":"))
+            ):
+                continue
+            out.append(" ")
+            continue
+        if char == "{":
+            prelude = "".join(out[statement_start:]).strip()
+            name = _WORD_RE.match(prelude[1:]) if prelude.startswith("@") else None
+            blocks.append(
+                not (
+                    name
+                    and (
+                        name.group(0).lower() in _GROUPING_AT_RULES
+                        or name.group(0).lower().endswith("keyframes")
+                    )
+                )
+            )
+        elif char == "}":
+            if out and out[-1] == ";":
+                out.pop()
+            if blocks:
+                blocks.pop()
+        out.append(char)
+        if char in "{};":
+            statement_start = len(out)
+        i += 1
+    return "".join(out).strip()
+
+
+# ---- JavaScript ----
+
+#: Keywords after which a ``/`` starts a regular expression, not a division.
+_REGEX_KEYWORDS = frozenset(
+    {"return", "typeof", "instanceof", "in", "of", "new", "delete", "void",
+     "throw", "case", "do", "else", "yield", "await"}
+)  # fmt: skip
+_REGEX_PRECEDERS = set("(,=:[!&|?{};+-*%<>~^")
+
+
+class _Unparseable(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class _Gap:
+    """Whitespace or a comment between two tokens, resolved once both are known."""
+
+    newline: bool
+
+
+_Piece = str | _Gap
+
+
+def _is_word(char: str) -> bool:
+    return char.isalnum() or char in "_$" or ord(char) > 127
+
+
+def _previous_text(pieces: list[_Piece]) -> str:
+    for piece in reversed(pieces):
+        if isinstance(piece, str) and piece:
+            return piece
+    return ""
+
+
+def _regex_allowed(pieces: list[_Piece]) -> bool:
+    text = _previous_text(pieces)
+    if not text:
+        return True
+    if text[-1] in _REGEX_PRECEDERS:
+        return True
+    match = re.search(r"[A-Za-z_$][\w$]*$", text)
+    return bool(match) and match.group(0) in _REGEX_KEYWORDS
+
+
+def _skip_js_string(source: str, start: int) -> int:
+    quote = source[start]
+    i = start + 1
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == quote:
+            return i + 1
+        if char == "\n":
+            raise _Unparseable
+        i += 1
+    raise _Unparseable
+
+
+def _skip_regex(source: str, start: int) -> int:
+    i = start + 1
+    in_class = False
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            i += 2
+            continue
+        if char == "\n":
+            raise _Unparseable
+        if char == "[":
+            in_class = True
+        elif char == "]":
+            in_class = False
+        elif char == "/" and not in_class:
+            i += 1
+            while i < len(source) and _is_word(source[i]):
+                i += 1
+            return i
+        i += 1
+    raise _Unparseable
+
+
+#: Characters with no special meaning to the tokenizer, consumed as one run.
+_JS_PLAIN_RE = re.compile(r"[^\s\"'`/{}]+")
+
+#: A line break can go after these, or before the next set, without changing
+#: how automatic semicolon insertion reads the code.
+_NEWLINE_SAFE_BEFORE = set("{;,([=:&|?*%<>!~^")
+_NEWLINE_SAFE_AFTER = set("});,.]=:&|?*%<>")
+
+
+def _resolve_gap(before: str, after: str, newline: bool) -> str:
+    if not before or not after:
+        return ""
+    if _is_word(before) and _is_word(after):
+        return "\n" if newline else " "
+    if before in "+-" and after in "+-":
+        return " "  # ``a + +b`` must not become ``a++b``.
+    if newline and not (before in _NEWLINE_SAFE_BEFORE or after in _NEWLINE_SAFE_AFTER):
+        return "\n"
+    return ""
+
+
+def _join(pieces: list[_Piece]) -> str:
+    out: list[str] = []
+    pending: bool | None = None
+    for piece in pieces:
+        if isinstance(piece, _Gap):
+            pending = piece.newline or bool(pending)
+            continue
+        if not piece:
+            continue
+        if pending is not None:
+            before = out[-1][-1] if out else ""
+            out.append(_resolve_gap(before, piece[0], pending))
+            pending = None
+        out.append(piece)
+    return "".join(out)
+
+
+def _minify_js_code(source: str, start: int, stop_at_brace: bool) -> tuple[str, int]:
+    """Minify from ``start``; inside a template ``${...}`` stop at its ``}``."""
+    pieces: list[_Piece] = []
+    depth = 0
+    i = start
+    while i < len(source):
+        char = source[i]
+        if char in "\"'":
+            end = _skip_js_string(source, i)
+            pieces.append(source[i:end])
+            i = end
+        elif char == "`":
+            text, i = _minify_template(source, i)
+            pieces.append(text)
+        elif source.startswith("//", i):
+            end = source.find("\n", i)
+            i = len(source) if end < 0 else end
+            pieces.append(_Gap(newline=True))
+        elif source.startswith("/*", i):
+            end = source.find("*/", i + 2)
+            if end < 0:
+                raise _Unparseable
+            # A comment spanning lines still ends a statement for ASI.
+            pieces.append(_Gap(newline="\n" in source[i:end]))
+            i = end + 2
+        elif char == "/" and _regex_allowed(pieces):
+            end = _skip_regex(source, i)
+            pieces.append(source[i:end])
+            i = end
+        elif char.isspace():
+            run_start = i
+            while i < len(source) and source[i].isspace():
+                i += 1
+            pieces.append(_Gap(newline="\n" in source[run_start:i]))
+        elif char in "{}":
+            if stop_at_brace:
+                if char == "{":
+                    depth += 1
+                elif depth == 0:
+                    return _join(pieces), i + 1
+                else:
+                    depth -= 1
+            pieces.append(char)
+            i += 1
+        else:
+            run = _JS_PLAIN_RE.match(source, i)
+            end = run.end() if run else i + 1
+            pieces.append(source[i:end])
+            i = end
+    if stop_at_brace:
+        raise _Unparseable
+    return _join(pieces), i
+
+
+def _minify_template(source: str, start: int) -> tuple[str, int]:
+    """A template literal kept verbatim, with its ``${...}`` parts minified."""
+    out = ["`"]
+    i = start + 1
+    while i < len(source):
+        char = source[i]
+        if char == "\\":
+            out.append(source[i : i + 2])
+            i += 2
+        elif char == "`":
+            out.append("`")
+            return "".join(out), i + 1
+        elif source.startswith("${", i):
+            code, i = _minify_js_code(source, i + 2, stop_at_brace=True)
+            out.append("${" + code + "}")
+        else:
+            out.append(char)
+            i += 1
+    raise _Unparseable
+
+
+def minify_js(source: str) -> str:
+    """Drop comments and needless whitespace; unsure input comes back as is.
+
+    Line breaks that could end a statement are kept, so automatic semicolon
+    insertion sees the same code.
+    """
+    try:
+        code, _ = _minify_js_code(source, 0, stop_at_brace=False)
+    except _Unparseable:
+        return source
+    return code
+
+
+# ---- HTML ----
+
+
+def _collapse_markup(html: str) -> str:
+    html = _HTML_COMMENT_RE.sub("", html)
+
+    def gap(match: re.Match[str]) -> str:
+        before = html.rfind("<", 0, match.start())
+        after = _TAG_NAME_RE.match(html, match.end())
+        names = {
+            name.group(1).lower()
+            for name in (_TAG_NAME_RE.match(html, before), after)
+            if name is not None
+        }
+        return "" if names & _BLOCK_TAGS else " "
+
+    html = _GAP_BETWEEN_TAGS_RE.sub(gap, html)
+    return _SPACE_RE.sub(" ", html)
+
+
+def _minify_raw_block(
+    tag: str, attrs: str, content: str, css_index: DocumentIndex | None
+) -> tuple[str, int]:
+    removed = 0
+    name = tag.lower()
+    if name == "style":
+        css = strip_css_comments(content)
+        if css_index is not None:
+            css, removed = prune_unused_css(css, css_index)
+        content = minify_css(css)
+    elif name == "script":
+        script_type = _TYPE_ATTR_RE.search(attrs)
+        if (script_type.group(1).lower() if script_type else "") in _JS_TYPES:
+            content = minify_js(content)
+    return f"<{tag}{_SPACE_RE.sub(' ', attrs)}>{content}</{tag}>", removed
+
+
+def minify_html(html: str, css_index: DocumentIndex | None = None) -> tuple[str, int]:
+    """Minify a page, its inline styles and scripts.
+
+    With ``css_index``, unused rules are pruned from the inline styles too.
+    Returns the page and the number of CSS rules removed.
+    """
+    blocks: list[str] = []
+    removed = 0
+
+    def stash(match: re.Match[str]) -> str:
+        nonlocal removed
+        block, pruned = _minify_raw_block(*match.groups(), css_index)
+        removed += pruned
+        blocks.append(block)
+        # Stands in for the block while the markup around it is collapsed; its
+        # tag name still decides whether the whitespace next to it matters.
+        return f"<{match.group(1)}{_PLACEHOLDER}{len(blocks) - 1}>"
+
+    # Browsers read NUL as U+FFFD anyway; this keeps the placeholders unique.
+    html = html.replace("\x00", "\ufffd")
+    markup = _collapse_markup(_RAW_BLOCK_RE.sub(stash, html))
+    markup = _PLACEHOLDER_RE.sub(lambda match: blocks[int(match.group(1))], markup)
+    return markup.strip(), removed
+
+
+# ---- export stage ----
+
+
+@dataclass(frozen=True)
+class FileSavings:
+    name: str
+    original_bytes: int
+    optimized_bytes: int
+
+    @property
+    def saved_bytes(self) -> int:
+        return self.original_bytes - self.optimized_bytes
+
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "saved_bytes": self.saved_bytes}
+
+
+@dataclass(frozen=True)
+class OptimizedPage:
+    html: str
+    #: CSS rules dropped because nothing in the page could match them.
+    removed_rules: int
+    svg_sprite: SpriteReport = field(default_factory=SpriteReport)
+
+
+def optimize_page(html: str) -> OptimizedPage:
+    """The page minified, with CSS rules for markup it no longer has removed.
+
+    Repeated inline SVG icons are hoisted into a shared sprite first.
+    """
+    html, sprite = dedupe_svgs(html)
+    optimized, removed = minify_html(html, DocumentIndex.from_html(html))
+    return OptimizedPage(html=optimized, removed_rules=removed, svg_sprite=sprite)
+
+
+def _size(text: str) -> int:
+    return len(text.encode("utf-8"))
+
+
+def split_savings(
+    original: SplitDocument, optimized: SplitDocument
+) -> list[FileSavings]:
+    """Byte savings per exported file, for the files the export has."""
+    pairs = {
+        "index.html": (original.index_html, optimized.index_html),
+        "styles.css": (original.styles_css, optimized.styles_css),
+        "app.js": (original.app_js, optimized.app_js),
+    }
+    return [
+        FileSavings(name, _size(before), _size(after))
+        for name, (before, after) in pairs.items()
+        if before or after
+    ]
@@ -2,13 +2,20 @@ from __future__ import annotations
 
 import json
 import logging
+import threading
 import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from dataclasses import asdict, dataclass, field
 from pathlib import Path
 from typing import Any
 
 LOGGER = logging.getLogger("minimal_web_builder")
 
+_COUNTERS: ContextVar[dict[str, Any] | None] = ContextVar("counters", default=None)
+_COUNTERS_LOCK = threading.Lock()
+
 
 @dataclass
 class GenerationEvent:
@@ -19,9 +26,38 @@ class GenerationEvent:
     complexity_key: str | None = None
     strict_minimal: bool | None = None
     provider: str | None = None
+    model: str | None = None
+    #: Position in the fallback chain that served this attempt; 0 is the primary.
+    fallback_depth: int | None = None
     #: 1-based provider attempt this event describes; >1 means a retry.
     attempt: int | None = None
     error: str | None = None
+    #: Size of the prompt sent; ``prompt_tokens`` is a local estimate.
+    prompt_chars: int | None = None
+    prompt_tokens: int | None = None
+    prompt_budget_tokens: int | None = None
+    #: Conversation messages elided or dropped to fit the budget.
+    compacted_messages: int | None = None
+    #: Prompt tokens served from the provider's context cache.
+    cached_tokens: int | None = None
+    #: A backup request was sent for this attempt, and whether it answered first.
+    hedged: bool | None = None
+    hedge_won: bool | None = None
+    #: Token usage as counted by the provider; ``prompt_tokens`` above is the
+    #: local estimate made before sending.
+    provider_prompt_tokens: int | None = None
+    completion_tokens: int | None = None
+    #: Completion tokens over the whole call time. Calls are not streamed, so
+    #: this includes the time before the first token.
+    tokens_per_second: float | None = None
+    #: Why the provider stopped; ``length``/``max_tokens`` mean it was cut off.
+    finish_reason: str | None = None
+    #: Follow-up call number, for calls resuming a truncated output.
+    continuation: int | None = None
+    #: Adaptive provider concurrency limit after this attempt, and how long the
+    #: attempt queued for a slot under it.
+    concurrency_limit: int | None = None
+    limiter_wait_ms: int | None = None
     timestamp: float = field(default_factory=time.time)
 
     def to_dict(self) -> dict[str, Any]:
@@ -40,3 +76,41 @@ def record(
         path.parent.mkdir(parents=True, exist_ok=True)
         with path.open("a", encoding="utf-8") as handle:
             handle.write(json.dumps(payload) + "\n")
+
+
+def tokens_per_second(tokens: int | None, duration_ms: int | None) -> float | None:
+    if not tokens or not duration_ms:
+        return None
+    return round(tokens * 1000 / duration_ms, 2)
+
+
+@contextmanager
+def collect_counters() -> Iterator[dict[str, Any]]:
+    """Gather ``count`` calls made by the code running inside the block.
+
+    Lets a caller attribute provider-level counters (hedges, say) to the job
+    that caused them without threading a collector through every signature.
+    """
+    counters: dict[str, Any] = {}
+    token = _COUNTERS.set(counters)
+    try:
+        yield counters
+    finally:
+        _COUNTERS.reset(token)
+
+
+def count(name: str, amount: int = 1, *, model: str | None = None) -> None:
+    """Add to a counter of the enclosing ``collect_counters`` block, if any.
+
+    With a ``model`` the amount is also kept under ``counters["models"][model]``,
+    so a job that failed over between models can still be broken down by model.
+    """
+    counters = _COUNTERS.get()
+    if counters is None:
+        return
+    # Parallel section calls share their job's counters from several threads.
+    with _COUNTERS_LOCK:
+        counters[name] = counters.get(name, 0) + amount
+        if model is not None:
+            per_model = counters.setdefault("models", {}).setdefault(model, {})
+            per_model[name] = per_model.get(name, 0) + amount
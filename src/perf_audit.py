@@ -0,0 +1,272 @@
+"""Measure how heavy a generated page is and check it against a budget.
+
+The safety, a11y and script audits say whether a page is correct; this one
+says whether it is cheap to load and render. It measures what makes a page
+slow to parse, style and paint: how many elements it has and how deeply they
+nest, how much CSS and JavaScript it carries inline, how many selectors the
+browser must match and how long they are, icon markup repeated instead of
+shared, blocking ``@import`` chains, web fonts, and animations that never
+stop.
+
+A :class:`PerfBudget` sets a limit per measurement. Profiles may tighten or
+relax the defaults with a ``perf_budget`` object; a limit of ``null`` turns
+that check off.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import asdict, dataclass, fields, replace
+from html.parser import HTMLParser
+from typing import Any
+
+from src.minify import filter_css_rules, strip_css_comments
+from src.svg_sprite import dedupe_svgs
+
+_VOID_TAGS = frozenset(
+    {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta",
+     "source", "track", "wbr"}
+)  # fmt: skip
+#: Elements a browser closes when a sibling of the same kind starts.
+_IMPLICITLY_CLOSED = {
+    "li": {"li"},
+    "p": {"p"},
+    "dt": {"dt", "dd"},
+    "dd": {"dt", "dd"},
+    "tr": {"tr"},
+    "td": {"td", "th"},
+    "th": {"td", "th"},
+    "option": {"option"},
+}
+_JS_TYPES = frozenset(
+    {"", "module", "text/javascript", "application/javascript", "text/ecmascript"}
+)
+
+_IMPORT_RE = re.compile(r"@import\b", re.IGNORECASE)
+_FONT_FACE_RE = re.compile(r"@font-face\b", re.IGNORECASE)
+_INFINITE_ANIMATION_RE = re.compile(
+    r"\banimation(?:-iteration-count)?\s*:[^;{}]*\binfinite\b", re.IGNORECASE
+)
+_PARENS_RE = re.compile(r"\([^()]*\)")
+_ATTRIBUTE_SELECTOR_RE = re.compile(r"\[[^\]]*\]")
+_COMBINATOR_RE = re.compile(r"\s*[>+~]\s*|\s+")
+
+
+@dataclass(frozen=True)
+class PerfBudget:
+    """Upper limits for :class:`PageWeight`; ``None`` means unlimited."""
+
+    #: Lighthouse starts warning at 800 elements and flags pages over 1,400.
+    max_dom_nodes: int | None = 1500
+    max_dom_depth: int | None = 32
+    #: ``<style>`` blocks.
+    max_css_bytes: int | None = 50_000
+    #: ``style`` attributes, which cannot be cached or shared between elements.
+    max_inline_style_bytes: int | None = 5_000
+    #: Inline ``<script>`` blocks and event handler attributes.
+    max_js_bytes: int | None = 30_000
+    max_css_selectors: int | None = 800
+    #: Compound selectors in the longest selector: ``nav ul > li a`` has four.
+    max_selector_length: int | None = 4
+    #: Bytes a shared SVG sprite would save.
+    max_duplicate_svg_bytes: int | None = 2_000
+    max_css_imports: int | None = 0
+    max_font_faces: int | None = 4
+    max_infinite_animations: int | None = 2
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+DEFAULT_BUDGET = PerfBudget()
+
+
+def budget_from_dict(
+    data: dict[str, Any], base: PerfBudget = DEFAULT_BUDGET
+) -> PerfBudget:
+    """``base`` with the limits in ``data`` replaced; unknown keys are errors."""
+    known = {item.name for item in fields(PerfBudget)}
+    for key, value in data.items():
+        if key not in known:
+            raise ValueError(f"Unknown perf budget '{key}'")
+        if value is not None and (
+            isinstance(value, bool) or not isinstance(value, int) or value < 0
+        ):
+            raise ValueError(f"Perf budget '{key}' must be a non-negative integer")
+    return replace(base, **data)
+
+
+@dataclass(frozen=True)
+class PerfViolation:
+    metric: str
+    value: int
+    limit: int
+
+    @property
+    def note(self) -> str:
+        label = _LABELS[self.metric]
+        return f"Page weight: {label} is {self.value:,}, over the budget of {self.limit:,}."
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class PageWeight:
+    html_bytes: int
+    dom_nodes: int
+    dom_depth: int
+    css_bytes: int
+    inline_style_bytes: int
+    js_bytes: int
+    external_stylesheets: int
+    external_scripts: int
+    css_selectors: int
+    selector_length: int
+    duplicate_svg_bytes: int
+    css_imports: int
+    font_faces: int
+    infinite_animations: int
+    violations: tuple[PerfViolation, ...] = ()
+
+    @property
+    def notes(self) -> list[str]:
+        return [violation.note for violation in self.violations]
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            **{
+                item.name: getattr(self, item.name)
+                for item in fields(self)
+                if item.name != "violations"
+            },
+            "violations": [violation.to_dict() for violation in self.violations],
+        }
+
+
+#: How each budgeted measurement reads in a note.
+_LABELS = {
+    "dom_nodes": "element count",
+    "dom_depth": "element nesting depth",
+    "css_bytes": "<style> CSS size in bytes",
+    "inline_style_bytes": "style attribute size in bytes",
+    "js_bytes": "inline JavaScript size in bytes",
+    "css_selectors": "CSS selector count",
+    "selector_length": "longest CSS selector, in compound selectors",
+    "duplicate_svg_bytes": "repeated SVG icon size in bytes",
+    "css_imports": "CSS @import count",
+    "font_faces": "@font-face count",
+    "infinite_animations": "infinite animation count",
+}
+
+
+class _WeightScanner(HTMLParser):
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=False)
+        self.dom_nodes = 0
+        self.dom_depth = 0
+        self.css: list[str] = []
+        self.inline_styles: list[str] = []
+        self.js: list[str] = []
+        self.external_stylesheets = 0
+        self.external_scripts = 0
+        self._stack: list[str] = []
+        #: What the current raw-text element holds: "css", "js" or neither.
+        self._raw: str | None = None
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if self._stack and self._stack[-1] in _IMPLICITLY_CLOSED.get(tag, ()):
+            self._stack.pop()
+        self.dom_nodes += 1
+        self.dom_depth = max(self.dom_depth, len(self._stack) + 1)
+        values = {name: value or "" for name, value in attrs}
+        for name, value in attrs:
+            if name == "style" and value:
+                self.inline_styles.append(value)
+            elif name.startswith("on") and value:
+                self.js.append(value)
+        if tag == "link" and "stylesheet" in values.get("rel", "").lower().split():
+            self.external_stylesheets += 1
+        elif tag == "script":
+            if "src" in values:
+                self.external_scripts += 1
+            elif values.get("type", "").strip().lower() in _JS_TYPES:
+                self._raw = "js"
+        elif tag == "style":
+            self._raw = "css"
+        if tag not in _VOID_TAGS:
+            self._stack.append(tag)
+
+    def handle_startendtag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        self.handle_starttag(tag, attrs)
+        self._raw = None
+        if tag not in _VOID_TAGS:
+            self._stack.pop()
+
+    def handle_endtag(self, tag: str) -> None:
+        self._raw = None
+        for depth in range(len(self._stack) - 1, -1, -1):
+            if self._stack[depth] == tag:
+                del self._stack[depth:]
+                return
+
+    def handle_data(self, data: str) -> None:
+        if self._raw == "css":
+            self.css.append(data)
+        elif self._raw == "js":
+            self.js.append(data)
+
+
+def _size(parts: list[str]) -> int:
+    return sum(len(part.encode("utf-8")) for part in parts)
+
+
+def selector_length(selector: str) -> int:
+    """Compound selectors in ``selector``: ``nav ul > li a`` has four."""
+    simplified = _ATTRIBUTE_SELECTOR_RE.sub("", selector)
+    while (reduced := _PARENS_RE.sub("", simplified)) != simplified:
+        simplified = reduced
+    return len([part for part in _COMBINATOR_RE.split(simplified.strip()) if part])
+
+
+def _selectors(css: str) -> list[str]:
+    found: list[str] = []
+    filter_css_rules(css, lambda selector: found.append(selector) or True)
+    return found
+
+
+def _violations(weight: PageWeight, budget: PerfBudget) -> tuple[PerfViolation, ...]:
+    found: list[PerfViolation] = []
+    for metric in _LABELS:
+        limit = getattr(budget, f"max_{metric}")
+        value = getattr(weight, metric)
+        if limit is not None and value > limit:
+            found.append(PerfViolation(metric, value, limit))
+    return tuple(found)
+
+
+def audit_page_weight(html: str, budget: PerfBudget = DEFAULT_BUDGET) -> PageWeight:
+    """Measure ``html`` and list the measurements over ``budget``."""
+    scanner = _WeightScanner()
+    scanner.feed(html)
+    scanner.close()
+    css = strip_css_comments("".join(scanner.css))
+    styles = f"{css} {' '.join(scanner.inline_styles)}"
+    selectors = _selectors(css)
+    weight = PageWeight(
+        html_bytes=len(html.encode("utf-8")),
+        dom_nodes=scanner.dom_nodes,
+        dom_depth=scanner.dom_depth,
+        css_bytes=_size(scanner.css),
+        inline_style_bytes=_size(scanner.inline_styles),
+        js_bytes=_size(scanner.js),
+        external_stylesheets=scanner.external_stylesheets,
+        external_scripts=scanner.external_scripts,
+        css_selectors=len(selectors),
+        selector_length=max(map(selector_length, selectors), default=0),
+        duplicate_svg_bytes=dedupe_svgs(html)[1].saved_bytes,
+        css_imports=len(_IMPORT_RE.findall(css)),
+        font_faces=len(_FONT_FACE_RE.findall(css)),
+        infinite_animations=len(_INFINITE_ANIMATION_RE.findall(styles)),
+    )
+    return replace(weight, violations=_violations(weight, budget))
@@ -4,6 +4,7 @@ import json
 from dataclasses import dataclass
 from pathlib import Path
 
+from src.perf_audit import DEFAULT_BUDGET, PerfBudget, budget_from_dict
 from src.theme import (
     COMPLEXITY_BY_KEY,
     DEFAULT_COMPLEXITY_KEY,
@@ -23,6 +24,7 @@ class GenerationProfile:
     complexity_key: str
     strict_minimal: bool
     extra_guidance: str
+    perf_budget: PerfBudget = DEFAULT_BUDGET
 
 
 def load_profiles(profiles_dir: str | Path) -> list[GenerationProfile]:
@@ -46,6 +48,13 @@ def _load_profile_file(path: Path) -> GenerationProfile:
         raise ValueError(f"Unknown tone_key '{tone_key}' in {path.name}")
     if complexity_key not in COMPLEXITY_BY_KEY:
         raise ValueError(f"Unknown complexity_key '{complexity_key}' in {path.name}")
+    perf_budget = data.get("perf_budget") or {}
+    if not isinstance(perf_budget, dict):
+        raise TypeError(f"Invalid perf_budget in {path.name}")
+    try:
+        budget = budget_from_dict(perf_budget)
+    except ValueError as exc:
+        raise ValueError(f"{exc} in {path.name}") from exc
 
     return GenerationProfile(
         id=profile_id,
@@ -55,6 +64,7 @@ def _load_profile_file(path: Path) -> GenerationProfile:
         complexity_key=complexity_key,
         strict_minimal=bool(data.get("strict_minimal", False)),
         extra_guidance=str(data.get("extra_guidance", "")),
+        perf_budget=budget,
     )
 
 
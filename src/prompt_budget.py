@@ -0,0 +1,135 @@
+"""Token estimation and budgeted compaction of generation conversations.
+
+A chat session replays its history into every prompt, and pages travel through
+that history as whole code dumps, so without a budget the prompt (and with it
+provider latency and cost) grows with every turn. ``compact_messages`` trims the
+conversation deterministically until it fits: the same messages and budget
+always produce the same prompt.
+"""
+
+from __future__ import annotations
+
+import math
+import re
+from dataclasses import dataclass
+
+#: Replaces a code dump that a newer version of the page has superseded.
+STALE_CODE_PLACEHOLDER = "[An earlier version of the page code was omitted.]"
+
+_WORD_RE = re.compile(r"\w+")
+_SYMBOL_RE = re.compile(r"[^\w\s]")
+_CODE_DUMP_RE = re.compile(r"<(?:!doctype|html|body)\b", re.IGNORECASE)
+#: Per-message overhead: the ``ROLE: `` prefix and the joining newline.
+_MESSAGE_OVERHEAD_TOKENS = 3
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate a BPE tokenizer without loading one.
+
+    Words cost one token per four characters and every symbol costs one, which
+    tracks real tokenizers closely on markup-heavy text where a flat
+    characters-per-token ratio undercounts.
+    """
+    words = sum(math.ceil(len(word) / 4) for word in _WORD_RE.findall(text))
+    return words + len(_SYMBOL_RE.findall(text))
+
+
+def _message_tokens(message: dict[str, str]) -> int:
+    return estimate_tokens(message["content"]) + _MESSAGE_OVERHEAD_TOKENS
+
+
+def is_code_dump(text: str) -> bool:
+    """Whether ``text`` carries a whole page rather than a chat reply."""
+    return _CODE_DUMP_RE.search(text) is not None
+
+
+@dataclass(frozen=True)
+class PromptCompaction:
+    messages: list[dict[str, str]]
+    tokens: int
+    #: Superseded code dumps replaced by ``STALE_CODE_PLACEHOLDER``.
+    elided: int = 0
+    #: Older turns removed outright.
+    dropped: int = 0
+
+    @property
+    def compacted(self) -> int:
+        return self.elided + self.dropped
+
+
+def compact_messages(
+    messages: list[dict[str, str]], budget_tokens: int
+) -> PromptCompaction:
+    """Fit ``messages`` into ``budget_tokens``, oldest and least useful first.
+
+    Nothing changes while the conversation fits. Past the budget, assistant
+    code dumps other than the current page are elided first, then older
+    assistant replies are dropped, then older user instructions. User messages
+    are never elided, and system messages, the current page, the first user
+    message (the original brief) and the latest user message are never
+    removed or elided, so a conversation can stay over budget when those
+    alone exceed it.
+    """
+    sizes = [_message_tokens(message) for message in messages]
+    total = sum(sizes)
+    if total <= budget_tokens:
+        return PromptCompaction(messages=list(messages), tokens=total)
+
+    # Only pages the model or the caller put in the conversation count: an
+    # instruction can quote tags ("make the <body> dark") without being a page,
+    # and eliding it would hide the request from the model.
+    dumps = [
+        index
+        for index, message in enumerate(messages)
+        if message["role"] != "user" and is_code_dump(message["content"])
+    ]
+    system_dumps = [index for index in dumps if messages[index]["role"] == "system"]
+    # The page the model should work from is the one the caller pinned as system
+    # context; without one, the newest dump is the page as it stands.
+    current = (system_dumps or dumps or [None])[-1]
+
+    user_indexes = [
+        index for index, message in enumerate(messages) if message["role"] == "user"
+    ]
+    pinned = {current, *user_indexes[:1], *user_indexes[-1:]}
+    pinned.update(
+        index for index, message in enumerate(messages) if message["role"] == "system"
+    )
+
+    compacted = list(messages)
+    elided = 0
+    for index in dumps:
+        if total <= budget_tokens:
+            break
+        if index in pinned:
+            continue
+        compacted[index] = {
+            "role": messages[index]["role"],
+            "content": STALE_CODE_PLACEHOLDER,
+        }
+        replacement = _message_tokens(compacted[index])
+        total -= sizes[index] - replacement
+        sizes[index] = replacement
+        elided += 1
+
+    candidates = [
+        index
+        for role in ("assistant", "user")
+        for index, message in enumerate(messages)
+        if message["role"] == role and index not in pinned
+    ]
+    removed: set[int] = set()
+    for index in candidates:
+        if total <= budget_tokens:
+            break
+        removed.add(index)
+        total -= sizes[index]
+
+    return PromptCompaction(
+        messages=[
+            message for index, message in enumerate(compacted) if index not in removed
+        ],
+        tokens=total,
+        elided=elided,
+        dropped=len(removed),
+    )
@@ -0,0 +1,92 @@
+"""Local registry of prompt prefixes cached on the provider side.
+
+Gemini context caching is explicit: a prefix is uploaded once as cached content
+and later requests refer to it by handle until it expires. The registry maps a
+digest of (provider, model, prefix) to that handle so later generations over
+the same page reuse one upload instead of creating a cache each.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any
+
+#: Provider minimums vary by model (1024 to 32768 tokens); below this estimate
+#: a cache costs a round trip and cannot be created anyway.
+MIN_CACHED_PREFIX_TOKENS = 1024
+#: Forget entries this long before the provider does, so a request never
+#: references a cache that expires while the request is in flight.
+EXPIRY_MARGIN_SECONDS = 30.0
+MAX_CACHED_PREFIXES = 256
+
+
+def prefix_key(provider: str, model: str, prefix: str) -> str:
+    digest = hashlib.sha256()
+    for part in (provider, model, prefix):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class CachedPrefix:
+    key: str
+    #: The provider's cache object, or ``None`` when the provider refused to
+    #: cache this prefix; that is remembered too so it is not retried per call.
+    handle: Any
+    expires_at: float
+
+
+class PromptCacheRegistry:
+    """Thread-safe, bounded map of prefix digests to live provider caches."""
+
+    def __init__(
+        self,
+        max_entries: int = MAX_CACHED_PREFIXES,
+        clock: Any = time.monotonic,
+    ) -> None:
+        self._entries: dict[str, CachedPrefix] = {}
+        self._max_entries = max_entries
+        self._clock = clock
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> CachedPrefix | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= self._clock():
+                del self._entries[key]
+                return None
+            return entry
+
+    def put(self, key: str, handle: Any, ttl_seconds: float) -> CachedPrefix:
+        lifetime = max(0.0, ttl_seconds - min(EXPIRY_MARGIN_SECONDS, ttl_seconds / 10))
+        entry = CachedPrefix(
+            key=key, handle=handle, expires_at=self._clock() + lifetime
+        )
+        with self._lock:
+            self._entries[key] = entry
+            if len(self._entries) > self._max_entries:
+                now = self._clock()
+                for stale in [
+                    k for k, e in self._entries.items() if e.expires_at <= now
+                ]:
+                    del self._entries[stale]
+                while len(self._entries) > self._max_entries:
+                    oldest = min(self._entries.values(), key=lambda e: e.expires_at)
+                    del self._entries[oldest.key]
+        return entry
+
+    def discard(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self) -> int:
+        with self._lock:
+            now = self._clock()
+            return sum(1 for entry in self._entries.values() if entry.expires_at > now)
+
+
+PROMPT_CACHE = PromptCacheRegistry()
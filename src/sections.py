@@ -7,6 +7,25 @@ SNIPPET_MAX_CHARS = 72
 
 _WRAPPER_TAGS = ("html", "body")
 _SKIP_TAGS = ("head", "script", "style", "noscript", "template")
+#: Elements with no end tag. Written without a trailing slash they would
+#: otherwise stay on the open-element stack and swallow the rest of the page.
+_VOID_TAGS = frozenset(
+    {
+        "area",
+        "base",
+        "br",
+        "col",
+        "embed",
+        "hr",
+        "img",
+        "input",
+        "link",
+        "meta",
+        "source",
+        "track",
+        "wbr",
+    }
+)
 
 
 @dataclass(frozen=True)
@@ -52,6 +71,9 @@ class _SectionScanner(HTMLParser):
         self._snippet_parts = []
 
     def handle_starttag(self, tag: str, attrs) -> None:
+        if tag in _VOID_TAGS:
+            self.handle_startendtag(tag, attrs)
+            return
         if self._open_tag is None:
             self._open_tag = tag
             self._open_start = self._offset()
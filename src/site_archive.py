@@ -0,0 +1,236 @@
+"""Stream a site as a ZIP archive of cache-friendly, precompressed files.
+
+Each page is split into HTML, CSS and JavaScript. The assets are named after
+a digest of their content (``assets/styles.3f9a1c2b.css``), so a host can
+cache them forever and a changed asset gets a new URL. Text files also get
+``.gz`` and, when ``brotli`` is installed, ``.br`` siblings for servers that
+serve precompressed files (nginx ``gzip_static``/``brotli_static``, most CDNs).
+``manifest.json`` maps every page to its assets and every file to its size,
+digest and encodings.
+
+The archive is written to an unseekable sink and handed out chunk by chunk as
+it grows. Only one page and its assets are held at a time, so memory does not
+grow with the number of pages; only the manifest's per-file metadata does.
+"""
+
+from __future__ import annotations
+
+import gzip
+import hashlib
+import io
+import json
+import posixpath
+import time
+import zipfile
+from collections.abc import Iterable, Iterator
+from dataclasses import dataclass
+from typing import Any
+
+from src.export import split_document
+from src.minify import optimize_page, split_savings
+
+ASSETS_DIR = "assets"
+MANIFEST_NAME = "manifest.json"
+MANIFEST_VERSION = 1
+#: Hex digits of the content digest kept in an asset's file name.
+HASH_LENGTH = 8
+#: Smaller files fit in a packet or two anyway; compressing them buys nothing.
+MIN_PRECOMPRESS_BYTES = 256
+
+CONTENT_TYPES = {
+    ".html": "text/html; charset=utf-8",
+    ".css": "text/css; charset=utf-8",
+    ".js": "text/javascript; charset=utf-8",
+    ".json": "application/json",
+}
+#: Encoding name and file suffix of each precompressed sibling.
+ENCODING_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+
+
+@dataclass(frozen=True)
+class SitePage:
+    #: Path of the page inside the site, such as ``index.html`` or
+    #: ``about/index.html``.
+    path: str
+    html: str
+
+    def __post_init__(self) -> None:
+        normalized = posixpath.normpath(self.path)
+        if (
+            not self.path.endswith(".html")
+            or normalized != self.path
+            or normalized.startswith(("/", "../"))
+            or normalized.split("/")[0] == ASSETS_DIR
+        ):
+            raise ValueError(f"Unusable page path: {self.path!r}")
+
+
+@dataclass(frozen=True)
+class SiteFile:
+    path: str
+    data: bytes
+    #: A ``.gz`` or ``.br`` sibling of another file.
+    precompressed: bool = False
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(name: str, data: bytes) -> str:
+    """``styles.css`` with the digest of ``data`` before its extension."""
+    stem, ext = posixpath.splitext(name)
+    return f"{stem}.{content_hash(data)}{ext}"
+
+
+def _brotli() -> Any | None:
+    try:
+        import brotli  # type: ignore[import-not-found]
+    except ModuleNotFoundError:  # pragma: no cover - env dependent
+        return None
+    return brotli
+
+
+def precompress(data: bytes) -> dict[str, bytes]:
+    """Compressed variants of ``data`` worth shipping, by encoding name."""
+    if len(data) < MIN_PRECOMPRESS_BYTES:
+        return {}
+    variants = {"gzip": gzip.compress(data, compresslevel=9, mtime=0)}
+    brotli = _brotli()
+    if brotli is not None:
+        variants["br"] = brotli.compress(data, quality=11)
+    return {name: body for name, body in variants.items() if len(body) < len(data)}
+
+
+def _page_files(page: SitePage, html: str) -> tuple[list[SiteFile], dict[str, str]]:
+    """The page's HTML and assets, plus the assets its HTML points at."""
+    assets: list[SiteFile] = []
+    references: dict[str, str] = {}
+    page_dir = posixpath.dirname(page.path)
+
+    def asset_url(name: str, content: str) -> str:
+        data = content.encode("utf-8")
+        path = posixpath.join(ASSETS_DIR, hashed_name(name, data))
+        assets.append(SiteFile(path, data))
+        references[name] = path
+        return posixpath.relpath(path, page_dir or ".")
+
+    split = split_document(html, asset_url)
+    return [SiteFile(page.path, split.index_html.encode("utf-8")), *assets], references
+
+
+def _optimized(page: SitePage) -> tuple[str, dict[str, Any]]:
+    """The page minified, and what that saved per file before hashing."""
+    optimized = optimize_page(page.html)
+    savings = split_savings(split_document(page.html), split_document(optimized.html))
+    return optimized.html, {
+        "removed_css_rules": optimized.removed_rules,
+        "svg_sprite": optimized.svg_sprite.to_dict(),
+        "files": [item.to_dict() for item in savings],
+    }
+
+
+class _ChunkSink(io.RawIOBase):
+    """A write-only, unseekable stream whose bytes are collected and drained.
+
+    ``zipfile`` detects that it cannot seek and writes each member's sizes in
+    a data descriptor after its data instead of going back to patch them.
+    """
+
+    def __init__(self) -> None:
+        self._chunks: list[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _write_member(
+    archive: zipfile.ZipFile,
+    path: str,
+    data: bytes,
+    date_time: tuple[int, int, int, int, int, int],
+    *,
+    compress: bool,
+) -> None:
+    info = zipfile.ZipInfo(path, date_time=date_time)
+    info.compress_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    info.external_attr = 0o644 << 16
+    with archive.open(info, "w") as member:
+        member.write(data)
+
+
+def site_files(
+    pages: Iterable[SitePage], *, optimize: bool = False
+) -> Iterator[SiteFile]:
+    """Every file of the site built from ``pages``, ``manifest.json`` last.
+
+    Assets shared by several pages have the same digest and are produced once.
+    With ``optimize`` each page is minified and its unused CSS dropped first,
+    and the manifest reports the savings per page. The manifest lists content
+    digests and is serialized deterministically, so it identifies the build.
+    """
+    page_assets: dict[str, dict[str, str]] = {}
+    files: dict[str, dict[str, Any]] = {}
+    optimization: dict[str, dict[str, Any]] = {}
+    for page in pages:
+        html = page.html
+        if optimize:
+            html, optimization[page.path] = _optimized(page)
+        page_files, page_assets[page.path] = _page_files(page, html)
+        for file in page_files:
+            if file.path in files:
+                continue
+            yield file
+            encodings: dict[str, str] = {}
+            for encoding, body in precompress(file.data).items():
+                sibling = file.path + ENCODING_SUFFIXES[encoding]
+                yield SiteFile(sibling, body, precompressed=True)
+                encodings[encoding] = sibling
+            files[file.path] = {
+                "size": len(file.data),
+                "sha256": hashlib.sha256(file.data).hexdigest(),
+                "content_type": CONTENT_TYPES.get(
+                    posixpath.splitext(file.path)[1], "application/octet-stream"
+                ),
+                "encodings": encodings,
+            }
+    manifest: dict[str, Any] = {
+        "version": MANIFEST_VERSION,
+        "pages": page_assets,
+        "files": files,
+    }
+    if optimize:
+        manifest["optimization"] = optimization
+    yield SiteFile(
+        MANIFEST_NAME,
+        json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8"),
+    )
+
+
+def stream_site_archive(
+    pages: Iterable[SitePage],
+    *,
+    date_time: tuple[int, int, int, int, int, int] | None = None,
+    optimize: bool = False,
+) -> Iterator[bytes]:
+    """Yield a ZIP archive of :func:`site_files` in chunks, a file at a time."""
+    stamp = date_time or time.localtime()[:6]
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w") as archive:
+        for file in site_files(pages, optimize=optimize):
+            # Precompressed siblings are stored: deflating them only costs time.
+            _write_member(
+                archive, file.path, file.data, stamp, compress=not file.precompressed
+            )
+            yield sink.drain()
+    # Closing the archive writes the central directory.
+    yield sink.drain()
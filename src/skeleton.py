@@ -0,0 +1,108 @@
+"""Plan a page as a skeleton of empty section slots, then stitch sections in.
+
+A full page from one provider call takes as long as its longest output. Split
+into a short skeleton (head, design tokens, shared CSS, one empty placeholder
+per section) and one call per section, the sections can be written at the same
+time and the page takes about as long as its slowest section.
+"""
+
+from __future__ import annotations
+
+import re
+
+from src.constraints import SECTION_OPTIONS_BY_KEY
+from src.sections import PageSection, extract_sections, replace_section
+
+#: Attribute naming the section a placeholder stands for.
+SLOT_ATTRIBUTE = "data-section"
+
+_KEY_RE = re.compile(r"^[a-z][a-z0-9-]{0,39}$")
+
+
+class SkeletonError(ValueError):
+    """The skeleton does not hold the slots that were asked for."""
+
+
+def section_label(key: str) -> str:
+    option = SECTION_OPTIONS_BY_KEY.get(key)
+    return option.label if option is not None else key.replace("-", " ").title()
+
+
+def slot_keys(sections: list[str]) -> list[str]:
+    """Usable, de-duplicated section keys in their requested order."""
+    keys: list[str] = []
+    for item in sections:
+        key = str(item).strip().lower()
+        if _KEY_RE.fullmatch(key) and key not in keys:
+            keys.append(key)
+    return keys
+
+
+def _slot_tag(key: str) -> str:
+    return "footer" if key == "footer" else "section"
+
+
+def _placeholder(key: str) -> str:
+    tag = _slot_tag(key)
+    return f'<{tag} {SLOT_ATTRIBUTE}="{key}"></{tag}>'
+
+
+def build_skeleton_guidance(keys: list[str]) -> str:
+    """Instructions that turn a page request into a skeleton with these slots."""
+    slots = "\n".join(f"  {_placeholder(key)}" for key in keys)
+    return (
+        "Return only the page skeleton; each section is written separately and "
+        "slotted in afterwards.\n"
+        "- Write the complete <head>: meta tags, a title, and one <style> block "
+        "holding the design tokens as CSS custom properties on :root, base "
+        "typography, shared layout classes, and the styles each section below "
+        "will need.\n"
+        "- The <body> must contain exactly these empty placeholders as its "
+        "direct children, in this order:\n"
+        f"{slots}\n"
+        "- Shared JavaScript, if any, goes in one <script> after the placeholders."
+    )
+
+
+def section_instructions(key: str, page_request: str) -> str:
+    """Regeneration instructions that fill the empty slot for ``key``."""
+    return (
+        f"Write the {section_label(key)} section. Its placeholder is empty: "
+        "invent the content from the page request below and style it with the "
+        "classes and custom properties the page's <style> defines. Keep the "
+        f'{SLOT_ATTRIBUTE}="{key}" attribute.\n'
+        f"Page request: {page_request}"
+    )
+
+
+def _slot_key(section: PageSection) -> str | None:
+    match = re.search(
+        rf"""\b{SLOT_ATTRIBUTE}\s*=\s*["']?([a-z0-9-]+)""",
+        section.html[: section.html.index(">") + 1],
+    )
+    return match.group(1) if match else None
+
+
+def skeleton_slots(html: str, keys: list[str]) -> dict[str, PageSection]:
+    """The top-level placeholder for every key, or :class:`SkeletonError`."""
+    slots: dict[str, PageSection] = {}
+    for section in extract_sections(html):
+        key = _slot_key(section)
+        if key in keys and key not in slots:
+            slots[key] = section
+    missing = [key for key in keys if key not in slots]
+    if missing:
+        raise SkeletonError(f"Skeleton is missing slots: {', '.join(missing)}")
+    return slots
+
+
+def stitch(html: str, slots: dict[str, PageSection], sections: dict[str, str]) -> str:
+    """Put each generated section in place of its slot.
+
+    Slots are filled from the end of the page backwards, so the offsets of
+    those still to fill stay valid.
+    """
+    ordered = sorted(slots.items(), key=lambda item: item[1].start, reverse=True)
+    for key, slot in ordered:
+        html = replace_section(html, slot, sections[key])
+    return html
@@ -0,0 +1,237 @@
+"""Hoist repeated inline SVG icons into one hidden sprite.
+
+Generated pages draw every icon as inline SVG, so a feature grid or a footer
+repeats the same markup over and over. Each SVG whose drawing appears at least
+``MIN_OCCURRENCES`` times is rewritten to reference a ``<symbol>`` in a hidden
+sprite at the top of the body::
+
+    <svg class="icon" viewBox="0 0 24 24" aria-hidden="true"><use href="#svg-1a2b3c4d"/></svg>
+
+The outer ``<svg>`` tag is kept as it was, so its size, viewBox, class,
+presentation attributes and accessibility attributes (``role``, ``aria-*``,
+``focusable``) still apply, and its ``<title>`` and ``<desc>`` stay in place to
+name it. The symbol has no viewBox of its own, so the drawing keeps the
+coordinates of whichever SVG references it.
+
+Content inside a ``<use>`` lives in a shadow tree that page CSS and scripts
+cannot reach, so an SVG is left alone when its drawing has ids or classes,
+text or links, or elements that the page's CSS selectors or scripts name.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import re
+from collections import Counter
+from dataclasses import asdict, dataclass
+from typing import Any
+
+#: An icon drawn fewer times than this stays inline.
+MIN_OCCURRENCES = 2
+SYMBOL_ID_PREFIX = "svg-"
+#: Off-screen rather than ``display: none``, which stops gradients and clip
+#: paths inside the symbols from rendering in some browsers.
+SPRITE_OPEN = '<svg aria-hidden="true" style="position:absolute;width:0;height:0;overflow:hidden">'
+
+_PROTECTED_RE = re.compile(
+    r"<!--.*?-->|<(script|style|textarea)\b[^>]*>.*?</\1\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+_SVG_OPEN_RE = re.compile(
+    r"""<svg\b(?:[^>"']|"[^"]*"|'[^']*')*>""", re.IGNORECASE | re.DOTALL
+)
+_SVG_TAG_RE = re.compile(
+    r"""<(/?)svg\b(?:[^>"']|"[^"]*"|'[^']*')*?(/?)>""", re.IGNORECASE | re.DOTALL
+)
+_BODY_OPEN_RE = re.compile(r"<body\b[^>]*>", re.IGNORECASE)
+#: Drawings that would change meaning or lose styling inside a shadow tree.
+_UNSHAREABLE_RE = re.compile(
+    r"<(?:svg|use|symbol|script|style|foreignobject|text|a)\b"
+    r"""|\s(?:id|class)\s*=""",
+    re.IGNORECASE,
+)
+_LABEL_RE = re.compile(r"<(title|desc)\b[^>]*>.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+_EDITOR_ID_RE = re.compile(r"""\sdata-mwb-id\s*=\s*(?:"[^"]*"|'[^']*'|[^\s>]+)""")
+_ELEMENT_NAME_RE = re.compile(r"<([a-zA-Z][\w:-]*)")
+_GAP_BETWEEN_TAGS_RE = re.compile(r">\s+<")
+_SPACE_RE = re.compile(r"\s+")
+_STYLE_BLOCK_RE = re.compile(
+    r"<style\b[^>]*>(.*?)</style\s*>", re.IGNORECASE | re.DOTALL
+)
+_SCRIPT_BLOCK_RE = re.compile(
+    r"<script\b[^>]*>(.*?)</script\s*>", re.IGNORECASE | re.DOTALL
+)
+_EVENT_ATTR_RE = re.compile(
+    r"""\son[a-z]+\s*=\s*(?:"([^"]*)"|'([^']*)')""", re.IGNORECASE
+)
+_CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.DOTALL)
+_SELECTOR_RE = re.compile(r"([^{}]+)\{")
+_WORD_RE = re.compile(r"[A-Za-z_][\w-]*")
+
+
+@dataclass(frozen=True)
+class SpriteReport:
+    #: Distinct drawings hoisted into the sprite.
+    symbols: int = 0
+    #: Inline SVGs rewritten to reference a symbol.
+    replaced: int = 0
+    saved_bytes: int = 0
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+@dataclass(frozen=True)
+class _InlineSvg:
+    start: int
+    end: int
+    open_tag: str
+    #: ``<title>`` and ``<desc>`` elements, which stay in the outer SVG.
+    labels: str
+    #: The drawing with insignificant whitespace and editor ids removed.
+    drawing: str
+
+
+def _protected_spans(html: str) -> list[tuple[int, int]]:
+    return [match.span() for match in _PROTECTED_RE.finditer(html)]
+
+
+def _inside(position: int, spans: list[tuple[int, int]]) -> bool:
+    return any(start <= position < end for start, end in spans)
+
+
+def _close_of(html: str, open_end: int) -> tuple[int, int] | None:
+    """Span of the ``</svg>`` closing the SVG whose start tag ends at ``open_end``."""
+    depth = 1
+    for tag in _SVG_TAG_RE.finditer(html, open_end):
+        closing, self_closing = tag.group(1), tag.group(2)
+        if closing:
+            depth -= 1
+            if depth == 0:
+                return tag.span()
+        elif not self_closing:
+            depth += 1
+    return None
+
+
+def _normalize(drawing: str) -> str:
+    drawing = _EDITOR_ID_RE.sub("", drawing)
+    drawing = _GAP_BETWEEN_TAGS_RE.sub("><", drawing)
+    return _SPACE_RE.sub(" ", drawing).strip()
+
+
+def _find_svgs(html: str) -> list[_InlineSvg]:
+    """Outermost inline SVGs outside comments, scripts, styles and textareas."""
+    spans = _protected_spans(html)
+    found: list[_InlineSvg] = []
+    position = 0
+    while (match := _SVG_OPEN_RE.search(html, position)) is not None:
+        position = match.end()
+        if match.group().endswith("/>") or _inside(match.start(), spans):
+            continue
+        close = _close_of(html, match.end())
+        if close is None:
+            break
+        inner = html[match.end() : close[0]]
+        found.append(
+            _InlineSvg(
+                start=match.start(),
+                end=close[1],
+                open_tag=match.group(),
+                labels="".join(label.group() for label in _LABEL_RE.finditer(inner)),
+                drawing=_normalize(_LABEL_RE.sub("", inner)),
+            )
+        )
+        position = close[1]
+    return found
+
+
+def _referenced_names(html: str) -> set[str]:
+    """Lowercased words in the page's CSS selectors and scripts."""
+    names: set[str] = set()
+    for style in _STYLE_BLOCK_RE.finditer(html):
+        css = _CSS_COMMENT_RE.sub("", style.group(1))
+        for selector in _SELECTOR_RE.finditer(css):
+            names.update(word.lower() for word in _WORD_RE.findall(selector.group(1)))
+    for script in _SCRIPT_BLOCK_RE.finditer(html):
+        names.update(word.lower() for word in _WORD_RE.findall(script.group(1)))
+    for handler in _EVENT_ATTR_RE.finditer(html):
+        code = handler.group(1) or handler.group(2) or ""
+        names.update(word.lower() for word in _WORD_RE.findall(code))
+    return names
+
+
+def _shareable(drawing: str, referenced: set[str]) -> bool:
+    if not drawing or _UNSHAREABLE_RE.search(drawing):
+        return False
+    elements = {name.lower() for name in _ELEMENT_NAME_RE.findall(drawing)}
+    return not elements & referenced
+
+
+def symbol_id(drawing: str) -> str:
+    digest = hashlib.sha256(drawing.encode("utf-8")).hexdigest()[:8]
+    return f"{SYMBOL_ID_PREFIX}{digest}"
+
+
+def dedupe_svgs(
+    html: str, *, min_occurrences: int = MIN_OCCURRENCES
+) -> tuple[str, SpriteReport]:
+    """Replace repeated inline SVG drawings with references to a shared sprite.
+
+    Running it again is harmless: rewritten SVGs hold a ``<use>`` and are
+    skipped, and symbols already in the page are reused rather than repeated.
+    The page comes back unchanged when the rewrite would not make it smaller.
+    """
+    svgs = _find_svgs(html)
+    if len(svgs) < min_occurrences:
+        return html, SpriteReport()
+    referenced = _referenced_names(html)
+    counts = Counter(svg.drawing for svg in svgs)
+    shared = {
+        drawing
+        for drawing, count in counts.items()
+        if count >= min_occurrences and _shareable(drawing, referenced)
+    }
+    if not shared:
+        return html, SpriteReport()
+
+    pieces: list[str] = []
+    symbols: dict[str, str] = {}
+    replaced = 0
+    cursor = 0
+    for svg in svgs:
+        if svg.drawing not in shared:
+            continue
+        ident = symbols.setdefault(svg.drawing, symbol_id(svg.drawing))
+        pieces.append(html[cursor : svg.start])
+        pieces.append(f'{svg.open_tag}{svg.labels}<use href="#{ident}"/></svg>')
+        cursor = svg.end
+        replaced += 1
+    pieces.append(html[cursor:])
+    rewritten = "".join(pieces)
+
+    sprite = "".join(
+        f'<symbol id="{ident}">{drawing}</symbol>'
+        for drawing, ident in symbols.items()
+        if f'id="{ident}"' not in html
+    )
+    if sprite:
+        at = _sprite_position(rewritten)
+        rewritten = f"{rewritten[:at]}{SPRITE_OPEN}{sprite}</svg>{rewritten[at:]}"
+
+    saved = len(html.encode("utf-8")) - len(rewritten.encode("utf-8"))
+    if saved <= 0:
+        return html, SpriteReport()
+    return rewritten, SpriteReport(
+        symbols=len(symbols), replaced=replaced, saved_bytes=saved
+    )
+
+
+def _sprite_position(html: str) -> int:
+    """The start of the body, or before the first reference in a fragment."""
+    spans = _protected_spans(html)
+    for body in _BODY_OPEN_RE.finditer(html):
+        if not _inside(body.start(), spans):
+            return body.end()
+    use = html.find(f'<use href="#{SYMBOL_ID_PREFIX}')
+    return max(0, html.lower().rfind("<svg", 0, use)) if use >= 0 else 0
@@ -0,0 +1,96 @@
+"""Detect output cut off at the token limit and resume it instead of retrying.
+
+A page that stopped at ``max_output_tokens`` will most likely stop there again
+if it is regenerated from scratch. Feeding the partial output back and asking
+the provider to carry on costs one short call, and splicing the pieces gives
+the page that one long call would have produced.
+"""
+
+from __future__ import annotations
+
+import re
+
+#: Normalized provider finish reasons meaning the output hit its token limit:
+#: OpenAI-compatible APIs say ``length``, Gemini ``MAX_TOKENS``.
+TRUNCATED_FINISH_REASONS = frozenset({"length", "max_tokens"})
+
+#: Longest repeated stretch looked for where a continuation meets its partial.
+MAX_OVERLAP_CHARS = 2000
+#: Shorter matches are as likely to be coincidence as repetition.
+MIN_OVERLAP_CHARS = 16
+
+#: Fences around the partial reply inside a continuation prompt.
+PARTIAL_REPLY_START = "<<<PARTIAL REPLY\n"
+PARTIAL_REPLY_END = "\nPARTIAL REPLY>>>"
+
+_DOCUMENT_START_RE = re.compile(r"^\s*(?:<!doctype\b|<html\b)", re.IGNORECASE)
+_HTML_OPEN_RE = re.compile(r"<html\b", re.IGNORECASE)
+#: HTML5 lets a page leave out ``</html>`` and ``</body>``, so their absence
+#: alone says nothing; a reply that also stops inside a tag was cut off.
+_DOCUMENT_CLOSE_RE = re.compile(r"</(?:html|body)\s*>", re.IGNORECASE)
+_LEADING_FENCE_RE = re.compile(r"^\s*```[A-Za-z0-9+#.-]*[ \t]*\n")
+
+
+def normalize_finish_reason(reason: object) -> str | None:
+    """Provider finish reasons as lowercase names; enum members by name."""
+    if reason is None:
+        return None
+    name = getattr(reason, "name", reason)
+    return str(name).strip().lower() or None
+
+
+def is_truncated(text: str, finish_reason: str | None = None) -> bool:
+    """Whether ``text`` stopped before the model meant it to.
+
+    The finish reason decides whenever the provider reports one. Without it,
+    only a document that opened ``<html>``, closed neither its body nor
+    itself, and stops in the middle of a tag is taken as cut off; a complete
+    page may omit the closing tags, and partial fragments such as a single
+    section cannot be judged at all.
+    """
+    if finish_reason is not None:
+        return finish_reason in TRUNCATED_FINISH_REASONS
+    return (
+        bool(_HTML_OPEN_RE.search(text))
+        and not _DOCUMENT_CLOSE_RE.search(text)
+        and text.rfind("<") > text.rfind(">")
+    )
+
+
+def build_continuation_prompt(prompt: str, partial: str) -> str:
+    """The original prompt followed by the partial reply and a request to resume.
+
+    Starting with the original prompt keeps the provider's cached prefix valid
+    for the follow-up call.
+    """
+    return (
+        f"{prompt}\n\n"
+        "Your previous reply reached the output limit and was cut off. This is "
+        "everything it contained, between the markers:\n"
+        f"{PARTIAL_REPLY_START}{partial}{PARTIAL_REPLY_END}\n\n"
+        "Continue the reply from exactly where it stopped, even mid-tag or "
+        "mid-word. Return only the missing remainder: do not repeat any of the "
+        "partial reply, do not restart the document, and do not open a new code "
+        "fence."
+    )
+
+
+def _overlap(partial: str, continuation: str) -> int:
+    longest = min(len(partial), len(continuation), MAX_OVERLAP_CHARS)
+    for size in range(longest, MIN_OVERLAP_CHARS - 1, -1):
+        if partial.endswith(continuation[:size]):
+            return size
+    return 0
+
+
+def splice(partial: str, continuation: str) -> str:
+    """Join a continuation onto the partial output it resumes.
+
+    A stray opening code fence is dropped, as is any stretch the model repeated
+    from the end of the partial. A continuation that starts a whole new
+    document replaces the partial rather than being appended to it.
+    """
+    continuation = _LEADING_FENCE_RE.sub("", continuation, count=1)
+    if _DOCUMENT_START_RE.match(continuation):
+        return continuation.strip()
+    return partial + continuation[_overlap(partial, continuation) :]
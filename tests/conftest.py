@@ -1,7 +1,22 @@
 import sys
 from pathlib import Path
 
+import pytest
+
 # Ensure tests can import project modules when executed from any working directory.
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
+
+
+@pytest.fixture(autouse=True)
+def _reset_provider_state():
+    """Breakers and limiters are process-wide; keep one test's load out of the next."""
+    from src.circuit_breaker import CIRCUIT_BREAKERS
+    from src.concurrency_limit import PROVIDER_LIMITS
+
+    CIRCUIT_BREAKERS.reset()
+    PROVIDER_LIMITS.reset()
+    yield
+    CIRCUIT_BREAKERS.reset()
+    PROVIDER_LIMITS.reset()
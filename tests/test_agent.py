@@ -1,8 +1,11 @@
 from __future__ import annotations
 
+from dataclasses import replace
+
 import pytest
 
 from server.agent import (
+    TRUNCATED_OUTPUT_ERROR,
     BuilderState,
     _apply_result,
     _classify_intent,
@@ -14,8 +17,9 @@ from server.agent import (
     run_agent,
     set_client,
 )
-from server.runtime import GenerationClient
+from server.runtime import GenerationClient, generate
 from src.config import AppConfig
+from src.generation import ProviderResult
 
 _VALID_HTML = (
     "<!doctype html><html><head><title>x</title></head>"
@@ -330,7 +334,7 @@ def test_run_agent_refine_builds_a_real_prompt(monkeypatch: pytest.MonkeyPatch)
 
     def fake_invoke_provider(provider, prompt, *args, **kwargs):
         captured["prompt"] = prompt
-        return "<!doctype html><html><body><h1>Blue</h1></body></html>"
+        return ProviderResult("<!doctype html><html><body><h1>Blue</h1></body></html>")
 
     monkeypatch.setattr("src.generation._invoke_provider", fake_invoke_provider)
     set_client(_mock_client())
@@ -347,3 +351,59 @@ def test_run_agent_refine_builds_a_real_prompt(monkeypatch: pytest.MonkeyPatch)
     assert "Blue" in (result["current_code"] or "")
     assert "USER: make the heading blue" in captured["prompt"]
     assert "SYSTEM: Here is the current version" in captured["prompt"]
+
+
+def test_output_still_truncated_after_continuing_is_not_regenerated() -> None:
+    state: BuilderState = {  # type: ignore[typeddict-item]
+        "generation_result": '<!doctype html><html><body><main>Cut <a href="/of'
+    }
+
+    result = _validate_output(state)
+
+    assert result["validation_errors"] == [TRUNCATED_OUTPUT_ERROR]
+    routed = {**state, **result, "retry_count": 0}
+    assert _route_validation(routed) == "error_fallback"  # type: ignore[arg-type]
+
+
+def test_a_page_the_provider_still_cut_off_after_continuing_is_rejected(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    calls: list[str] = []
+
+    def fake_invoke_provider(provider, prompt, *args, **kwargs):
+        calls.append(prompt)
+        return ProviderResult(
+            "<!doctype html><html><body><main><h1>Fresh bread</h1>"
+            "<p>We bake every morning and",
+            finish_reason="length",
+        )
+
+    monkeypatch.setattr("src.generation._invoke_provider", fake_invoke_provider)
+    client = _mock_client()
+    client.config = replace(client.config, generation_max_continuations=1)
+
+    raw = generate(
+        client,
+        messages=[{"role": "user", "content": "a bakery page"}],
+        tone_key="minimal",
+        strict_minimal=False,
+        complexity_key="balanced",
+    )
+    result = _validate_output({"generation_result": raw})  # type: ignore[typeddict-item]
+
+    assert len(calls) == 2
+    assert result["validation_errors"] == [TRUNCATED_OUTPUT_ERROR]
+
+
+def test_a_complete_page_without_closing_html_passes_validation() -> None:
+    state: BuilderState = {  # type: ignore[typeddict-item]
+        "generation_result": (
+            "<!doctype html><html lang=en><head><title>Bakery</title></head>"
+            "<body><main><h1>Fresh bread</h1><p>Baked daily.</p></main>"
+        )
+    }
+
+    result = _validate_output(state)
+
+    assert TRUNCATED_OUTPUT_ERROR not in result["validation_errors"]
+    assert "Fresh bread" in result["generation_result"]
@@ -0,0 +1,98 @@
+from server.content import MAX_DOCUMENT_CHARS
+from server.documents import editor_document_stats, validate_editor_document
+from server.editor_scope import find_editor_element
+from src.sections import extract_sections
+from tools import bench_corpus
+from tools.benchmarks import (
+    cases,
+    compare,
+    format_comparisons,
+    load_baseline,
+    measure,
+    save_baseline,
+    select,
+)
+
+
+def test_realistic_pages_fill_their_size_without_passing_the_limit() -> None:
+    pages = bench_corpus.pages()
+    for name, size in bench_corpus.PAGE_SIZES.items():
+        page = pages[name]
+        assert size * 0.85 <= len(page) <= size <= MAX_DOCUMENT_CHARS
+        tags = [section.tag for section in extract_sections(page)]
+        assert tags == ["header", "main", "footer"]
+        assert find_editor_element(page, bench_corpus.TARGET_NODE_ID) is not None
+
+
+def test_the_corpus_is_deterministic() -> None:
+    assert bench_corpus.realistic_page(20_000) == bench_corpus.realistic_page(20_000)
+    assert bench_corpus.realistic_page(20_000, seed=1) != bench_corpus.realistic_page(
+        20_000
+    )
+
+
+def test_pathological_inputs_stay_within_the_document_limit() -> None:
+    pages = bench_corpus.pages()
+    assert len(pages["huge-inline-script"]) > 1_000_000
+    for name in ("deep-nesting", "many-attributes", "unclosed-tags"):
+        assert len(pages[name]) <= MAX_DOCUMENT_CHARS
+    for name in ("deep-nesting", "many-attributes"):
+        assert find_editor_element(pages[name], bench_corpus.TARGET_NODE_ID)
+
+
+def test_editor_documents_pass_validation() -> None:
+    for document in bench_corpus.editor_documents().values():
+        assert validate_editor_document(document) is document
+    documents = bench_corpus.editor_documents()
+    for name, nodes in bench_corpus.NODE_COUNTS.items():
+        assert editor_document_stats(documents[name]).nodes == nodes
+
+
+def test_every_case_has_a_recorded_baseline() -> None:
+    baseline = load_baseline()
+
+    assert baseline is not None
+    assert baseline["corpus_version"] == bench_corpus.CORPUS_VERSION
+    assert {case.name for case in cases()} == set(baseline["cases"])
+
+
+def test_compare_flags_only_slowdowns_beyond_the_threshold() -> None:
+    baseline = {
+        "calibration_ms": 10.0,
+        "cases": {"fast/page": 5.0, "slow/page": 5.0, "same/page": 5.0},
+    }
+    # This machine is twice as fast: its calibration took half as long.
+    results = {"fast/page": 2.0, "slow/page": 4.0, "same/page": 2.6, "new/page": 1.0}
+
+    by_name = {item.name: item for item in compare(results, 5.0, baseline, 0.25)}
+
+    assert by_name["fast/page"].ratio == 0.8
+    assert not by_name["fast/page"].regressed
+    assert by_name["same/page"].ratio == 1.04
+    assert not by_name["same/page"].regressed
+    assert by_name["slow/page"].ratio == 1.6
+    assert by_name["slow/page"].regressed
+    assert by_name["new/page"].baseline_ms is None
+    report = format_comparisons(list(by_name.values()))
+    assert "+60%  REGRESSION" in report
+    assert "new" in report
+
+
+def test_a_filtered_save_keeps_the_other_cases_rescaled(tmp_path) -> None:
+    path = tmp_path / "baseline.json"
+    previous = {
+        "corpus_version": bench_corpus.CORPUS_VERSION,
+        "calibration_ms": 10.0,
+        "cases": {"a/page": 4.0, "b/page": 8.0},
+    }
+
+    save_baseline({"a/page": 3.0}, 5.0, path, previous)
+
+    assert load_baseline(path)["cases"] == {"a/page": 3.0, "b/page": 4.0}
+
+
+def test_cases_run_and_select_by_substring() -> None:
+    chosen = select(cases(), ["audit_inline_scripts/page-5kb"])
+
+    assert [case.name for case in chosen] == ["audit_inline_scripts/page-5kb"]
+    assert measure(chosen[0].run, repeat=1) > 0
@@ -0,0 +1,69 @@
+from src.candidates import (
+    AUDIT_NOTE_PENALTY,
+    BROKEN_PAGE_PENALTY,
+    SAFETY_ALERT_PENALTY,
+    CandidateScore,
+    is_good_enough,
+    rank,
+    score_candidate,
+)
+
+_FILLER = "<p>" + "Fresh bread every morning. " * 60 + "</p>"
+GOOD_PAGE = (
+    '<!doctype html><html lang="en"><head><title>Bakery</title></head><body>'
+    f"<header><h1>Bakery</h1></header><main>{_FILLER}</main><footer>Hi</footer>"
+    "</body></html>"
+)
+
+
+def test_a_clean_page_of_reasonable_size_has_no_penalty() -> None:
+    score = score_candidate(GOOD_PAGE, [], [])
+
+    assert score.penalty == 0
+    assert score.sections == 3
+    assert not score.broken
+
+
+def test_alerts_and_audit_notes_add_to_the_penalty() -> None:
+    score = score_candidate(GOOD_PAGE, ["Removed an iframe."], ["No alt.", "No h1."])
+
+    assert score.penalty == SAFETY_ALERT_PENALTY + 2 * AUDIT_NOTE_PENALTY
+    assert score.to_dict()["safety_alerts"] == 1
+
+
+def test_thin_and_broken_pages_are_penalized() -> None:
+    thin = score_candidate("<html><body><main>Hi</main></body></html>", [], [])
+    cut_off = score_candidate(GOOD_PAGE[:-20], [], [])
+
+    assert thin.penalty > 0
+    assert not thin.broken
+    assert cut_off.broken
+    assert cut_off.penalty >= BROKEN_PAGE_PENALTY
+
+
+def test_rank_orders_by_penalty_and_keeps_ties_in_drafting_order() -> None:
+    def scored(penalty: float) -> CandidateScore:
+        return CandidateScore(penalty, 0, 0, 3, 2000, False)
+
+    assert rank([scored(4), scored(0), scored(4), scored(0)]) == [1, 3, 0, 2]
+
+
+def test_a_draft_the_provider_cut_off_is_broken_even_if_it_looks_whole() -> None:
+    # Truncation after the last tag leaves nothing in the markup to notice.
+    cut_off = GOOD_PAGE.split("</main>")[0]
+
+    assert not score_candidate(cut_off, [], []).broken
+    assert score_candidate(cut_off, [], [], finish_reason="length").broken
+    assert not score_candidate(GOOD_PAGE, [], [], finish_reason="stop").broken
+
+
+def test_advisory_notes_do_not_stop_a_draft_from_being_good_enough() -> None:
+    noted = score_candidate(GOOD_PAGE, [], ["No alt.", "Inline handler.", "Heavy."])
+    alerted = score_candidate(GOOD_PAGE, ["Removed an iframe."], [])
+    cut_off = score_candidate(GOOD_PAGE[:-20], [], [])
+    thin = score_candidate("<html><body><main>Hi</main></body></html>", [], [])
+
+    assert is_good_enough(noted)
+    assert not is_good_enough(alerted)
+    assert not is_good_enough(cut_off)
+    assert not is_good_enough(thin)
@@ -0,0 +1,194 @@
+import json
+import time
+
+from src.circuit_breaker import (
+    CIRCUIT_BREAKERS,
+    STATE_CLOSED,
+    STATE_HALF_OPEN,
+    STATE_OPEN,
+    BreakerPolicy,
+    CircuitBreaker,
+)
+from src.generation import ProviderError, ProviderResult, ProviderTarget, call_gemini
+
+_POLICY = BreakerPolicy(error_rate=0.5, min_calls=4, window=10, cooldown_seconds=30)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _stub_provider(monkeypatch, outcomes: dict[str, object]) -> list[str]:
+    """Answer per model: a text, or a ProviderError to raise."""
+    calls: list[str] = []
+
+    def fake_invoke_provider(provider, prompt, *args, model=None, **kwargs):
+        calls.append(f"{provider}:{model}")
+        outcome = outcomes[model]
+        if isinstance(outcome, Exception):
+            raise outcome
+        return ProviderResult(str(outcome))
+
+    monkeypatch.setattr("src.generation._invoke_provider", fake_invoke_provider)
+    monkeypatch.setattr("src.generation._sleep", lambda _seconds: None)
+    return calls
+
+
+def _call(analytics=None, **overrides) -> str:
+    kwargs = {
+        "model": "primary",
+        "genai": None,
+        "messages": [{"role": "user", "content": "hi"}],
+        "temperature": 0.2,
+        "max_output_tokens": 100,
+        "provider": "openrouter",
+        "api_key": "k",
+        "max_attempts": 2,
+        "retry_backoff_seconds": 0,
+        "fallbacks": (ProviderTarget("openrouter", "secondary", api_key="k"),),
+        "breaker": _POLICY,
+        "analytics_file": str(analytics) if analytics else None,
+    }
+    kwargs.update(overrides)
+    return call_gemini(**kwargs)
+
+
+def test_breaker_opens_at_the_error_rate_and_probes_after_cooldown() -> None:
+    clock = _Clock()
+    breaker = CircuitBreaker("gemini:flash", _POLICY, clock=clock)
+
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == STATE_CLOSED  # three calls are too few to judge
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+    assert breaker.allow() is False
+    assert breaker.snapshot()["retry_in_seconds"] == 30
+
+    clock.now += 30
+    assert breaker.state == STATE_HALF_OPEN
+    assert breaker.allow() is True
+    assert breaker.allow() is False  # one probe at a time
+    breaker.record_failure()
+    assert breaker.state == STATE_OPEN
+
+    clock.now += 30
+    assert breaker.allow() is True
+    breaker.record_success()
+    assert breaker.state == STATE_CLOSED
+    assert breaker.snapshot()["error_rate"] == 0
+
+
+def test_an_abandoned_probe_can_be_claimed_again() -> None:
+    clock = _Clock()
+    breaker = CircuitBreaker("gemini:flash", _POLICY, clock=clock)
+    for _ in range(4):
+        breaker.record_failure()
+    clock.now += 30
+
+    assert breaker.allow() is True
+    breaker.abandon()
+    assert breaker.allow() is True
+    assert breaker.state == STATE_HALF_OPEN
+
+
+def test_failing_primary_fails_over_to_the_next_model(monkeypatch, tmp_path) -> None:
+    calls = _stub_provider(
+        monkeypatch,
+        {
+            "primary": ProviderError("HTTP 503", status_code=503),
+            "secondary": "<p>ok</p>",
+        },
+    )
+    analytics = tmp_path / "events.jsonl"
+
+    out = _call(analytics)
+
+    assert out == "<p>ok</p>"
+    assert calls == ["openrouter:primary", "openrouter:primary", "openrouter:secondary"]
+    events = [json.loads(line) for line in analytics.read_text().splitlines()]
+    assert [(e["event"], e["model"], e["fallback_depth"]) for e in events] == [
+        ("generation.retry", "primary", 0),
+        ("generation.failover", "primary", 0),
+        ("generation.success", "secondary", 1),
+    ]
+
+
+def test_open_breaker_skips_the_primary_without_a_request(monkeypatch) -> None:
+    calls = _stub_provider(
+        monkeypatch,
+        {
+            "primary": ProviderError("HTTP 503", status_code=503),
+            "secondary": "<p>ok</p>",
+        },
+    )
+    _call()
+    _call()  # four primary failures: the breaker opens
+    calls.clear()
+
+    started = time.perf_counter()
+    out = _call()
+
+    assert out == "<p>ok</p>"
+    assert calls == ["openrouter:secondary"]
+    assert time.perf_counter() - started < 0.1
+    states = {item["target"]: item["state"] for item in CIRCUIT_BREAKERS.snapshot()}
+    assert states == {
+        "openrouter:primary": STATE_OPEN,
+        "openrouter:secondary": "closed",
+    }
+
+
+def test_every_breaker_open_fails_fast_with_one_error_event(
+    monkeypatch, tmp_path
+) -> None:
+    calls = _stub_provider(
+        monkeypatch, {"primary": ProviderError("HTTP 503", status_code=503)}
+    )
+    for _ in range(2):
+        _call(fallbacks=())
+    calls.clear()
+    analytics = tmp_path / "events.jsonl"
+
+    out = _call(analytics, fallbacks=())
+
+    assert out == "API error: circuit open for openrouter:primary"
+    assert calls == []
+    events = [json.loads(line) for line in analytics.read_text().splitlines()]
+    assert [event["event"] for event in events] == ["generation.error"]
+
+
+def test_rejected_requests_do_not_trip_the_breaker(monkeypatch) -> None:
+    calls = _stub_provider(
+        monkeypatch,
+        {
+            "primary": ProviderError("HTTP 400", status_code=400),
+            "secondary": ProviderError("HTTP 400", status_code=400),
+        },
+    )
+
+    for _ in range(5):
+        assert _call().startswith("API error:")
+
+    assert len(calls) == 10
+    assert {item["state"] for item in CIRCUIT_BREAKERS.snapshot()} == {STATE_CLOSED}
+
+
+def test_without_a_breaker_policy_no_breakers_are_tracked(monkeypatch) -> None:
+    _stub_provider(monkeypatch, {"primary": "<p>ok</p>"})
+
+    assert _call(breaker=None) == "<p>ok</p>"
+    assert CIRCUIT_BREAKERS.snapshot() == []
+
+
+def test_target_keys_drop_the_gemini_models_prefix() -> None:
+    class _Model:
+        model_name = "models/gemini-2.5-flash"
+
+    assert ProviderTarget("gemini", _Model()).key == "gemini:gemini-2.5-flash"
+    assert ProviderTarget("openrouter", "a/b").key == "openrouter:a/b"
@@ -0,0 +1,218 @@
+import json
+import threading
+import time
+
+from src.concurrency_limit import (
+    OUTCOME_DROPPED,
+    OUTCOME_IGNORED,
+    OUTCOME_SUCCESS,
+    PROVIDER_LIMITS,
+    AdaptiveLimiter,
+    LimitPolicy,
+)
+from src.generation import ProviderError, ProviderResult, call_gemini
+from src.observability import collect_counters
+
+_POLICY = LimitPolicy(min_limit=1, max_limit=6, initial_limit=2)
+#: Tolerant enough that scheduler jitter on a 5ms call never reads as a spike.
+_LOAD_POLICY = LimitPolicy(
+    min_limit=1, max_limit=6, initial_limit=2, latency_tolerance=5
+)
+
+
+def _fill(limiter: AdaptiveLimiter, slots: int) -> None:
+    for _ in range(slots):
+        assert limiter.acquire(timeout=0)
+
+
+def test_limit_grows_only_while_it_is_in_use() -> None:
+    limiter = AdaptiveLimiter("openrouter:m", _POLICY)
+
+    _fill(limiter, 1)
+    limiter.release(OUTCOME_SUCCESS, 100)
+    assert limiter.limit == 3  # one call in flight is half of a limit of two
+
+    _fill(limiter, 1)
+    limiter.release(OUTCOME_SUCCESS, 100)
+    assert limiter.limit == 3  # one of three is too little use to grow
+
+    for _ in range(10):
+        _fill(limiter, limiter.limit)
+        for _ in range(limiter.limit):
+            limiter.release(OUTCOME_SUCCESS, 100)
+    assert limiter.limit == 6
+
+
+def test_pushback_cuts_the_limit_down_to_the_floor() -> None:
+    limiter = AdaptiveLimiter(
+        "gemini:m", LimitPolicy(min_limit=2, max_limit=16, initial_limit=16)
+    )
+
+    seen = []
+    for _ in range(7):
+        _fill(limiter, 1)
+        limiter.release(OUTCOME_DROPPED)
+        seen.append(limiter.limit)
+
+    assert seen == [12, 9, 6, 4, 3, 2, 2]
+    _fill(limiter, 1)
+    limiter.release(OUTCOME_IGNORED)
+    assert limiter.limit == 2
+
+
+def test_a_latency_spike_counts_as_congestion() -> None:
+    limiter = AdaptiveLimiter("gemini:m", LimitPolicy(initial_limit=4))
+    _fill(limiter, 4)
+    for _ in range(3):
+        limiter.release(OUTCOME_SUCCESS, 100)
+    assert limiter.limit == 6
+
+    _fill(limiter, 3)
+    limiter.release(OUTCOME_SUCCESS, 1000)
+
+    assert limiter.limit == 4
+    reasons = [item["reason"] for item in limiter.snapshot()["history"]]
+    assert reasons == ["increase", "increase", "latency"]
+
+
+def test_acquire_waits_for_a_free_slot_and_times_out() -> None:
+    limiter = AdaptiveLimiter("gemini:m", LimitPolicy(min_limit=1, initial_limit=1))
+    _fill(limiter, 1)
+
+    started = time.perf_counter()
+    assert limiter.acquire(timeout=0.05) is False
+    assert time.perf_counter() - started >= 0.04
+
+    timer = threading.Timer(0.02, limiter.release, args=(OUTCOME_IGNORED,))
+    timer.start()
+    assert limiter.acquire(timeout=2) is True
+    timer.join()
+
+
+def test_snapshot_reports_the_limit_and_its_history() -> None:
+    clock = [10.0]
+    limiter = AdaptiveLimiter("gemini:m", _POLICY, clock=lambda: clock[0])
+    _fill(limiter, 2)
+    limiter.release(OUTCOME_DROPPED)
+    clock[0] += 4
+
+    snapshot = limiter.snapshot()
+
+    assert snapshot == {
+        "target": "gemini:m",
+        "limit": 1,
+        "inflight": 1,
+        "min_limit": 1,
+        "max_limit": 6,
+        "baseline_ms": None,
+        "history": [{"limit": 1, "reason": "dropped", "age_seconds": 4.0}],
+    }
+
+
+class _SpikyProvider:
+    """A stub provider whose latency and throttling can be switched per phase."""
+
+    def __init__(self) -> None:
+        self.delay = 0.005
+        self.throttle = False
+        self.inflight = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, provider, prompt, *args, model=None, **kwargs):
+        with self._lock:
+            self.inflight += 1
+            self.peak = max(self.peak, self.inflight)
+        try:
+            time.sleep(self.delay)
+            if self.throttle:
+                raise ProviderError("HTTP 429: rate limited", status_code=429)
+            return ProviderResult("<main>ok</main>")
+        finally:
+            with self._lock:
+                self.inflight -= 1
+
+
+def _call(**kwargs) -> str:
+    return call_gemini(
+        model="m",
+        genai=None,
+        messages=[{"role": "user", "content": "hi"}],
+        temperature=0.2,
+        max_output_tokens=100,
+        provider="openrouter",
+        api_key="k",
+        max_attempts=1,
+        limit=_LOAD_POLICY,
+        **kwargs,
+    )
+
+
+def _load(calls_per_thread: int, threads: int = 8) -> None:
+    def worker() -> None:
+        for _ in range(calls_per_thread):
+            _call()
+
+    pool = [threading.Thread(target=worker) for _ in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+
+
+def test_limit_tracks_a_provider_through_spikes_and_throttling(
+    monkeypatch,
+) -> None:
+    provider = _SpikyProvider()
+    monkeypatch.setattr("src.generation._invoke_provider", provider)
+    limiter = PROVIDER_LIMITS.get("openrouter:m", _LOAD_POLICY)
+
+    _load(10)
+    assert limiter.limit == _LOAD_POLICY.max_limit
+    assert provider.peak <= _LOAD_POLICY.max_limit
+
+    provider.delay = 0.1
+    _load(1)
+    assert limiter.limit == _LOAD_POLICY.min_limit
+
+    provider.delay = 0.005
+    provider.peak = 0
+    _load(10)
+    assert limiter.limit == _LOAD_POLICY.max_limit
+    assert provider.peak <= _LOAD_POLICY.max_limit
+
+    provider.throttle = True
+    _load(1)
+    assert limiter.limit == _LOAD_POLICY.min_limit
+    reasons = {item["reason"] for item in limiter.snapshot()["history"]}
+    assert reasons == {"increase", "latency", "dropped"}
+
+
+def test_events_and_job_counters_report_the_limiter(monkeypatch, tmp_path) -> None:
+    provider = _SpikyProvider()
+    monkeypatch.setattr("src.generation._invoke_provider", provider)
+    analytics = tmp_path / "events.jsonl"
+    limiter = PROVIDER_LIMITS.get("openrouter:m", _LOAD_POLICY)
+    _fill(limiter, 2)
+    threading.Timer(0.05, limiter.release, args=(OUTCOME_IGNORED,)).start()
+
+    with collect_counters() as counters:
+        _call(analytics_file=str(analytics))
+
+    event = json.loads(analytics.read_text())
+    assert event["event"] == "generation.success"
+    assert event["limiter_wait_ms"] >= 40
+    assert event["concurrency_limit"] == 3  # it ran beside the held slot
+    assert counters["limiter_wait_ms"] >= 40
+
+
+def test_no_slot_before_the_deadline_fails_the_generation(monkeypatch) -> None:
+    provider = _SpikyProvider()
+    monkeypatch.setattr("src.generation._invoke_provider", provider)
+    limiter = PROVIDER_LIMITS.get("openrouter:m", _LOAD_POLICY)
+    _fill(limiter, 2)
+
+    out = _call(total_timeout_seconds=0)
+
+    assert out == "API error: no provider capacity for openrouter:m in time"
+    assert provider.peak == 0
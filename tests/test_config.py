@@ -59,6 +59,14 @@ def test_load_config_reads_database_url(monkeypatch) -> None:
     assert cfg.database_url == "postgresql+psycopg://builder:test@db/builder"
 
 
+def test_load_config_reads_sqlite_readers(monkeypatch) -> None:
+    monkeypatch.setenv("SQLITE_READERS", "-3")
+    assert load_config(dotenv_path=_NO_DOTENV).sqlite_readers == 0
+
+    monkeypatch.delenv("SQLITE_READERS")
+    assert load_config(dotenv_path=_NO_DOTENV).sqlite_readers == 4
+
+
 def test_load_config_reads_session_and_cors_settings(monkeypatch) -> None:
     monkeypatch.setenv("SESSION_COOKIE_SECURE", "true")
     monkeypatch.setenv("SESSION_HOURS", "24")
@@ -231,3 +239,110 @@ def test_load_config_total_generation_timeout_default(monkeypatch) -> None:
     monkeypatch.delenv("GENERATION_TOTAL_TIMEOUT_SECONDS", raising=False)
 
     assert load_config(dotenv_path=_NO_DOTENV).generation_total_timeout_seconds == 300
+
+
+def test_load_config_reads_prompt_token_budgets(monkeypatch) -> None:
+    monkeypatch.setenv("GENERATION_PROMPT_TOKEN_BUDGET", "20000")
+    monkeypatch.setenv(
+        "GENERATION_PROMPT_TOKEN_BUDGETS", "gemini-2.5-pro=100000, openrouter=8000,bad"
+    )
+
+    cfg = load_config(dotenv_path=_NO_DOTENV)
+
+    assert cfg.prompt_token_budget == 20000
+    assert cfg.prompt_token_budgets == (
+        ("gemini-2.5-pro", 100000),
+        ("openrouter", 8000),
+    )
+
+
+def test_prompt_budget_prefers_model_then_provider(monkeypatch) -> None:
+    monkeypatch.setenv("GEMINI_MODEL", "gemini-2.5-pro")
+    monkeypatch.setenv("GENERATION_PROMPT_TOKEN_BUDGET", "20000")
+    monkeypatch.setenv(
+        "GENERATION_PROMPT_TOKEN_BUDGETS", "gemini=50000,gemini-2.5-pro=100000"
+    )
+    monkeypatch.delenv("GENERATION_PROVIDER", raising=False)
+
+    assert load_config(dotenv_path=_NO_DOTENV).prompt_budget() == 100000
+
+    monkeypatch.setenv("GENERATION_PROVIDER", "openrouter")
+    assert load_config(dotenv_path=_NO_DOTENV).prompt_budget() == 20000
+
+
+def test_load_config_prompt_cache_is_off_by_default(monkeypatch) -> None:
+    monkeypatch.delenv("GENERATION_PROMPT_CACHE_TTL_SECONDS", raising=False)
+    assert load_config(dotenv_path=_NO_DOTENV).prompt_cache_ttl_seconds == 0
+
+    monkeypatch.setenv("GENERATION_PROMPT_CACHE_TTL_SECONDS", "900")
+    assert load_config(dotenv_path=_NO_DOTENV).prompt_cache_ttl_seconds == 900
+
+
+def test_load_config_reads_hedging_settings(monkeypatch) -> None:
+    monkeypatch.setenv("GENERATION_HEDGE_PERCENTILE", "95")
+    monkeypatch.setenv("GENERATION_HEDGE_MAX_RATE", "3")
+    monkeypatch.setenv("GENERATION_HEDGE_MODEL", "gemini-2.5-flash-lite")
+
+    cfg = load_config(dotenv_path=_NO_DOTENV)
+
+    assert cfg.generation_hedge_percentile == 95
+    assert cfg.generation_hedge_max_rate == 1.0
+    assert cfg.generation_hedge_model == "gemini-2.5-flash-lite"
+
+
+def test_load_config_hedging_is_off_by_default(monkeypatch) -> None:
+    monkeypatch.delenv("GENERATION_HEDGE_PERCENTILE", raising=False)
+
+    assert load_config(dotenv_path=_NO_DOTENV).generation_hedge_percentile == 0
+
+
+def test_load_config_reads_the_fallback_chain(monkeypatch) -> None:
+    monkeypatch.setenv(
+        "GENERATION_FALLBACK_MODELS",
+        "openrouter:anthropic/claude-3.5-haiku, Gemini:gemini-2.5-flash-lite,"
+        "bogus:model,missing-model",
+    )
+    monkeypatch.setenv("CIRCUIT_BREAKER_ERROR_RATE", "0")
+    monkeypatch.setenv("CIRCUIT_BREAKER_MIN_CALLS", "10")
+    monkeypatch.setenv("CIRCUIT_BREAKER_COOLDOWN_SECONDS", "45")
+
+    cfg = load_config(dotenv_path=_NO_DOTENV)
+
+    assert cfg.generation_fallback_models == (
+        ("openrouter", "anthropic/claude-3.5-haiku"),
+        ("gemini", "gemini-2.5-flash-lite"),
+    )
+    assert cfg.circuit_breaker_error_rate == 0.01
+    assert cfg.circuit_breaker_min_calls == 10
+    assert cfg.circuit_breaker_cooldown_seconds == 45
+
+
+def test_load_config_has_no_fallbacks_by_default(monkeypatch) -> None:
+    monkeypatch.delenv("GENERATION_FALLBACK_MODELS", raising=False)
+
+    assert load_config(dotenv_path=_NO_DOTENV).generation_fallback_models == ()
+
+
+def test_load_config_reads_adaptive_concurrency_bounds(monkeypatch) -> None:
+    monkeypatch.setenv("GENERATION_MAX_CONCURRENCY", "4")
+    monkeypatch.setenv("GENERATION_CONCURRENCY_MIN", "3")
+    monkeypatch.setenv("GENERATION_CONCURRENCY_MAX", "2")
+
+    cfg = load_config(dotenv_path=_NO_DOTENV)
+
+    assert cfg.generation_concurrency_min == 3
+    assert cfg.generation_concurrency_max == 3
+    assert cfg.generation_workers == 4
+
+    monkeypatch.setenv("GENERATION_CONCURRENCY_MAX", "12")
+    assert load_config(dotenv_path=_NO_DOTENV).generation_workers == 12
+
+
+def test_load_config_adaptive_concurrency_is_off_by_default(monkeypatch) -> None:
+    monkeypatch.delenv("GENERATION_CONCURRENCY_MAX", raising=False)
+    monkeypatch.setenv("GENERATION_MAX_CONCURRENCY", "4")
+
+    cfg = load_config(dotenv_path=_NO_DOTENV)
+
+    assert cfg.generation_concurrency_max == 0
+    assert cfg.generation_workers == 4
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import pytest
+
+from src.critical_css import (
+    critical_css,
+    deferred_stylesheet,
+    inline_critical_css,
+)
+from src.export import split_document, stylesheet_link
+
+PAGE = """<!doctype html>
+<html>
+<head>
+  <style>
+    body { margin: 0; }
+    .nav a { color: red; }
+    .hero h1 { font-size: 3rem; }
+    .card { padding: 1rem; }
+    footer p { color: gray; }
+    @media (max-width: 600px) { .hero { padding: 0; } .card { margin: 0; } }
+    @font-face { font-family: Brand; src: url(brand.woff2); }
+    .is-open .menu { display: block; }
+  </style>
+  <script>document.body.classList.add('is-open');</script>
+</head>
+<body>
+  <header class="nav"><a href="/">Home</a><div class="menu"></div></header>
+  <main>
+    <section class="hero"><h1>Hello</h1></section>
+    <section><div class="card">Card</div></section>
+  </main>
+  <footer><p>Footer</p></footer>
+</body>
+</html>"""
+
+
+def _critical(selector_css: str, body: str) -> str:
+    html = f"<html><body>{body}</body></html>"
+    return critical_css(html, selector_css, sections=1)
+
+
+def test_only_rules_for_the_first_sections_are_critical() -> None:
+    css = critical_css(PAGE, split_document(PAGE).styles_css)
+
+    assert css == (
+        "body{margin:0}.nav a{color:red}.hero h1{font-size:3rem}"
+        "@media (max-width: 600px){.hero{padding:0}}"
+        "@font-face{font-family:Brand;src:url(brand.woff2)}"
+        ".is-open .menu{display:block}"
+    )
+
+
+def test_more_sections_take_in_more_rules() -> None:
+    css = critical_css(PAGE, split_document(PAGE).styles_css, sections=3)
+
+    assert ".card{padding:1rem}" in css
+    assert "footer" not in css
+
+
+@pytest.mark.parametrize(
+    ("selector", "body", "critical"),
+    [
+        ("nav > a", "<nav><a>x</a></nav>", True),
+        ("nav > a", "<nav><p><a>x</a></p></nav>", False),
+        ("nav a", "<nav><p><a>x</a></p></nav>", True),
+        ("h1 + p", "<div><h1>t</h1><p>x</p></div>", True),
+        ("h1 + p", "<div><h1>t</h1><span></span><p>x</p></div>", False),
+        ("h1 ~ p", "<div><h1>t</h1><span></span><p>x</p></div>", True),
+        ("a[href^='http:']", "<div><a href='http://x'>x</a></div>", True),
+        ("a[download]", "<div><a href='x'>x</a></div>", False),
+        ("a:hover::after", "<div><a>x</a></div>", True),
+        ("li:nth-child(2n+1)", "<ul><li>x</li></ul>", True),
+        ("#top.hero", "<div id='top' class='hero'></div>", True),
+        ("#top.hero", "<div id='top'></div>", False),
+        ("body .late", "<div></div><footer class='late'></footer>", False),
+        ("ul:is(.a, .b) li", "<ul><li>x</li></ul>", True),
+    ],
+)
+def test_selector_matching(selector: str, body: str, critical: bool) -> None:
+    css = f"{selector} {{ color: red; }}"
+
+    assert bool(_critical(css, body)) is critical
+
+
+def test_inline_critical_css_defers_the_stylesheet() -> None:
+    split = split_document(PAGE)
+
+    inlined, report = inline_critical_css(PAGE, split)
+
+    deferred = deferred_stylesheet("styles.css")
+    assert deferred in inlined.index_html
+    assert stylesheet_link("styles.css") not in inlined.index_html.replace(deferred, "")
+    assert f"<style>{critical_css(PAGE, split.styles_css)}</style>" in (
+        inlined.index_html
+    )
+    assert inlined.styles_css == split.styles_css
+    assert report.sections == 2
+    assert report.stylesheet_bytes == len(split.styles_css.encode())
+    assert report.first_paint_bytes_before == (
+        len(split.index_html.encode()) + report.stylesheet_bytes
+    )
+    assert report.first_paint_bytes_after == len(inlined.index_html.encode())
+    assert report.index_html_bytes_after == (
+        report.index_html_bytes_before
+        + report.critical_bytes
+        + len(deferred_stylesheet("styles.css"))
+        + len("<style></style>")
+        - len(stylesheet_link("styles.css"))
+    )
+
+
+def test_pages_without_styles_or_sections_are_unchanged() -> None:
+    bare = "<html><body><main>Hi</main></body></html>"
+    split = split_document(bare)
+
+    inlined, report = inline_critical_css(bare, split)
+
+    assert inlined == split
+    assert report.critical_bytes == 0
+    assert report.first_paint_bytes_after == report.first_paint_bytes_before
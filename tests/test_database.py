@@ -1,17 +1,26 @@
 from __future__ import annotations
 
+import threading
+import time
+
 import pytest
 from alembic import command
 from alembic.config import Config
-from sqlalchemy import text
+from sqlalchemy import func, select, text
 
+from server import database as database_module
+from server.controls import RequestControlService
 from server.database import (
     Database,
+    SchemaCheckCache,
     SchemaOutOfDateError,
     create_database_engine,
     find_schema_drift,
+    schema_revision,
     verify_schema,
 )
+from server.models import AuditEventRecord, RateLimitRecord, UserRecord
+from server.projects import ProjectService
 
 
 def _migrated_url(tmp_path, revision: str) -> str:
@@ -48,10 +57,10 @@ def test_database_predating_the_metrics_migration_is_reported(
     engine = create_database_engine(_migrated_url(tmp_path, "20260809_0007"))
     try:
         drift = find_schema_drift(engine)
-        assert len(drift) == 1
-        assert "generation_jobs" in drift[0]
+        jobs_drift = [item for item in drift if "'generation_jobs'" in item]
+        assert len(jobs_drift) == 1
         for column in ("duration_ms", "failure_kind", "finished_at", "metrics"):
-            assert column in drift[0]
+            assert column in jobs_drift[0]
 
         with pytest.raises(SchemaOutOfDateError) as excinfo:
             verify_schema(engine)
@@ -89,3 +98,196 @@ def test_opening_a_stale_database_fails_fast(tmp_path, monkeypatch) -> None:
 
     with pytest.raises(SchemaOutOfDateError):
         Database.from_url(database_url, create_schema=False)
+
+
+def _counting_checks(monkeypatch) -> list[int]:
+    checks: list[int] = []
+    real_verify = database_module.verify_schema
+
+    def verify(engine) -> None:
+        checks.append(1)
+        real_verify(engine)
+
+    monkeypatch.setattr(database_module, "verify_schema", verify)
+    return checks
+
+
+def test_schema_check_is_cached_by_alembic_revision(tmp_path, monkeypatch) -> None:
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    database_url = _migrated_url(tmp_path, "head")
+    cache = SchemaCheckCache(tmp_path / "schema-check.json")
+    checks = _counting_checks(monkeypatch)
+
+    for _ in range(3):
+        Database.from_url(database_url, schema_cache=cache).close()
+
+    assert len(checks) == 1
+    engine = create_database_engine(database_url)
+    try:
+        revision = schema_revision(engine)
+    finally:
+        engine.dispose()
+    assert revision is not None
+    assert revision in cache.path.read_text(encoding="utf-8")
+
+
+def test_schema_check_reruns_when_the_revision_or_models_change(
+    tmp_path, monkeypatch
+) -> None:
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    database_url = _migrated_url(tmp_path, "head")
+    cache = SchemaCheckCache(tmp_path / "schema-check.json")
+    checks = _counting_checks(monkeypatch)
+    Database.from_url(database_url, schema_cache=cache).close()
+
+    monkeypatch.setattr(database_module, "models_fingerprint", lambda: "changed")
+    Database.from_url(database_url, schema_cache=cache).close()
+    assert len(checks) == 2
+
+    config = Config("alembic.ini")
+    config.set_main_option("sqlalchemy.url", database_url)
+    command.downgrade(config, "20260809_0007")
+    with pytest.raises(SchemaOutOfDateError):
+        Database.from_url(database_url, create_schema=False, schema_cache=cache)
+    assert len(checks) == 3
+
+
+def test_unstamped_databases_are_always_checked(tmp_path, monkeypatch) -> None:
+    cache = SchemaCheckCache(tmp_path / "schema-check.json")
+    checks = _counting_checks(monkeypatch)
+    database_url = f"sqlite:///{tmp_path / 'fresh.db'}"
+
+    for _ in range(2):
+        Database.from_url(database_url, schema_cache=cache).close()
+
+    assert len(checks) == 2
+    assert not cache.path.exists()
+
+
+def test_unreadable_schema_check_cache_is_ignored(tmp_path, monkeypatch) -> None:
+    monkeypatch.delenv("DATABASE_URL", raising=False)
+    database_url = _migrated_url(tmp_path, "head")
+    cache = SchemaCheckCache(tmp_path / "schema-check.json")
+    cache.path.write_text("not json", encoding="utf-8")
+    checks = _counting_checks(monkeypatch)
+
+    Database.from_url(database_url, schema_cache=cache).close()
+    Database.from_url(database_url, schema_cache=cache).close()
+
+    assert len(checks) == 1
+
+
+def _pragma(connection, name: str):
+    return connection.exec_driver_sql(f"PRAGMA {name}").scalar()
+
+
+def test_file_sqlite_gets_a_writer_and_a_read_only_pool(tmp_path) -> None:
+    database = Database.from_url(f"sqlite:///{tmp_path / 'split.db'}")
+    try:
+        assert database.reader is not None
+        for engine in (database.engine, database.reader):
+            with engine.connect() as connection:
+                assert _pragma(connection, "journal_mode") == "wal"
+                assert _pragma(connection, "busy_timeout") == 5000
+                assert _pragma(connection, "synchronous") == 1
+        with database.reader.connect() as connection:
+            assert _pragma(connection, "query_only") == 1
+        with database.engine.connect() as connection:
+            assert _pragma(connection, "query_only") == 0
+        assert database.engine.pool.size() == 1
+    finally:
+        database.close()
+
+
+def test_sessions_write_on_the_writer_and_read_from_the_pool(tmp_path) -> None:
+    database = Database.from_url(f"sqlite:///{tmp_path / 'routed.db'}")
+    owner = UserRecord(id="owner-1", email="owner@example.test", password_hash="!x")
+    try:
+        with database.sessions.begin() as session:
+            assert session.get_bind() is database.engine
+            session.add(owner)
+        with database.sessions() as session:
+            assert session.get(UserRecord, "owner-1") is not None
+            assert session.get_bind() is database.reader
+            session.add(
+                UserRecord(id="owner-2", email="two@example.test", password_hash="!x")
+            )
+            session.commit()
+            assert session.get_bind() is database.engine
+        with database.sessions() as session:
+            assert session.scalar(select(func.count()).select_from(UserRecord)) == 2
+    finally:
+        database.close()
+
+
+def test_memory_and_single_pool_databases_are_not_split(tmp_path) -> None:
+    for database in (
+        Database.from_url("sqlite://"),
+        Database.from_url(f"sqlite:///{tmp_path / 'one.db'}", sqlite_readers=0),
+    ):
+        try:
+            assert database.reader is None
+            with database.sessions() as session:
+                assert session.get_bind() is database.engine
+        finally:
+            database.close()
+
+
+#: Writes per second a single-node deployment must sustain without lock errors:
+#: autosaves, audit events and rate-limit updates from many request threads.
+TARGET_WRITES_PER_SECOND = 100
+
+
+def test_concurrent_writers_never_see_lock_errors(tmp_path) -> None:
+    database = Database.from_url(f"sqlite:///{tmp_path / 'stress.db'}")
+    owner_id = "00000000-0000-0000-0000-000000000010"
+    with database.sessions.begin() as session:
+        session.add(
+            UserRecord(id=owner_id, email="stress@example.test", password_hash="!x")
+        )
+    projects = ProjectService(database.sessions)
+    controls = RequestControlService(database.sessions)
+    threads, rounds = 16, 20
+    pages = [
+        projects.create_project(owner_id, f"Stress {index}", "<main>0</main>")["pages"][
+            0
+        ]
+        for index in range(threads)
+    ]
+    errors: list[Exception] = []
+
+    def work(page: dict) -> None:
+        version = page["version"]
+        try:
+            for round_number in range(rounds):
+                version = projects.save_page(
+                    owner_id,
+                    page["id"],
+                    f"<main>{round_number}</main>",
+                    expected_version=version,
+                )["version"]
+                controls.audit(owner_id, "stress", 200)
+                controls.check_rate_limit("stress", "shared", 10**9)
+                projects.get_page(owner_id, page["id"])
+        except Exception as exc:  # noqa: BLE001 - reported by the assertion
+            errors.append(exc)
+
+    workers = [threading.Thread(target=work, args=(page,)) for page in pages]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    elapsed = time.perf_counter() - started
+
+    try:
+        assert errors == []
+        with database.sessions() as session:
+            # SQLite ignores FOR UPDATE; only serialized writers keep every count.
+            counted = session.scalar(select(func.sum(RateLimitRecord.count)))
+            audited = session.scalar(select(func.count()).select_from(AuditEventRecord))
+        assert counted == threads * rounds
+        assert audited == threads * rounds
+        assert threads * rounds * 3 / elapsed >= TARGET_WRITES_PER_SECOND
+    finally:
+        database.close()
@@ -0,0 +1,131 @@
+from __future__ import annotations
+
+import copy
+
+import pytest
+
+from src.delta import (
+    DeltaError,
+    TextEdit,
+    apply_json_patch,
+    apply_text_edits,
+    parse_pointer,
+)
+
+
+def test_text_edits_splice_in_order() -> None:
+    base = "<main><h1>Hello</h1><p>Old copy</p></main>"
+
+    text, changed = apply_text_edits(
+        base, [TextEdit(10, 15, "Hi"), TextEdit(23, 26, "New")]
+    )
+
+    assert text == "<main><h1>Hi</h1><p>New copy</p></main>"
+    assert changed
+    assert apply_text_edits(base, []) == (base, False)
+    assert apply_text_edits(base, [TextEdit(10, 15, "Hello")]) == (base, False)
+
+
+def test_text_offsets_count_utf16_code_units() -> None:
+    # The emoji is two UTF-16 code units, as in a JavaScript string.
+    base = "<p>\U0001f680 launch</p>"
+
+    text, changed = apply_text_edits(base, [TextEdit(6, 12, "liftoff")])
+
+    assert text == "<p>\U0001f680 liftoff</p>"
+    assert changed
+    with pytest.raises(DeltaError, match="splits a character"):
+        apply_text_edits(base, [TextEdit(4, 4, "x")])
+
+
+@pytest.mark.parametrize(
+    "edits",
+    [
+        [TextEdit(5, 2)],
+        [TextEdit(0, 99)],
+        [TextEdit(-1, 0, "x")],
+        [TextEdit(4, 6, "x"), TextEdit(5, 7, "y")],
+    ],
+)
+def test_text_edits_outside_or_overlapping_are_rejected(
+    edits: list[TextEdit],
+) -> None:
+    with pytest.raises(DeltaError, match="in order"):
+        apply_text_edits("<p>copy</p>", edits)
+
+
+def test_pointer_tokens_are_unescaped() -> None:
+    assert parse_pointer("") == []
+    assert parse_pointer("/a~1b/c~0d/0") == ["a/b", "c~d", "0"]
+    with pytest.raises(DeltaError, match="Invalid JSON pointer"):
+        parse_pointer("body/0")
+
+
+def test_json_patch_applies_every_operation_without_touching_the_original() -> None:
+    document = {
+        "css": "",
+        "body": [{"id": "a", "children": []}, {"id": "b", "children": []}],
+        "designTokens": {"brand": "#000"},
+    }
+    original = copy.deepcopy(document)
+
+    patched, changed = apply_json_patch(
+        document,
+        [
+            {"op": "test", "path": "/body/0/id", "value": "a"},
+            {"op": "replace", "path": "/css", "value": "p{}"},
+            {"op": "add", "path": "/body/0/children/-", "value": {"id": "c"}},
+            {"op": "add", "path": "/body/1", "value": {"id": "d", "children": []}},
+            {"op": "remove", "path": "/designTokens/brand"},
+            {"op": "copy", "from": "/body/0/children/0", "path": "/body/0/children/0"},
+            {"op": "move", "from": "/body/2", "path": "/body/0"},
+        ],
+    )
+
+    assert changed
+    assert document == original
+    assert [node["id"] for node in patched["body"]] == ["b", "a", "d"]
+    assert patched["body"][1]["children"] == [{"id": "c"}, {"id": "c"}]
+    assert patched["css"] == "p{}"
+    assert patched["designTokens"] == {}
+    # Untouched subtrees are shared rather than copied.
+    assert patched["body"][0] is document["body"][1]
+
+
+def test_json_patch_reports_no_change_for_equal_replacements() -> None:
+    document = {"css": "p{}", "body": []}
+
+    assert apply_json_patch(
+        document, [{"op": "replace", "path": "/css", "value": "p{}"}]
+    ) == (
+        document,
+        False,
+    )
+    assert apply_json_patch(None, [{"op": "add", "path": "", "value": document}]) == (
+        document,
+        True,
+    )
+
+
+@pytest.mark.parametrize(
+    ("operation", "message"),
+    [
+        ({"op": "replace", "path": "/missing", "value": 1}, "does not exist"),
+        ({"op": "remove", "path": "/body/3"}, "out of range"),
+        ({"op": "add", "path": "/body/01", "value": 1}, "invalid array index"),
+        ({"op": "add", "path": "/css/x", "value": 1}, "not a container"),
+        ({"op": "test", "path": "/css", "value": "x"}, "test failed"),
+        ({"op": "move", "from": "/body", "path": "/body/0"}, "into itself"),
+        ({"op": "remove", "path": ""}, "whole document"),
+        ({"op": "add", "path": "/css"}, "needs a value"),
+        ({"op": "frobnicate", "path": "/css"}, "unsupported op"),
+        ({"path": "/css"}, "unsupported op"),
+    ],
+)
+def test_invalid_operations_name_their_position(operation: dict, message: str) -> None:
+    document = {"css": "", "body": []}
+
+    with pytest.raises(DeltaError, match=rf"Patch operation 1: .*{message}"):
+        apply_json_patch(
+            document, [{"op": "test", "path": "/css", "value": ""}, operation]
+        )
@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+from src.document_compiler import (
+    CompileCache,
+    collation_key,
+    compile_canvas,
+    compile_document,
+    document_digest,
+)
+from tests.editor_document import editor_document
+
+FIXTURES = json.loads(
+    (
+        Path(__file__).parents[1] / "web" / "src" / "editor" / "compile-fixtures.json"
+    ).read_text(encoding="utf-8")
+)
+
+
+@pytest.mark.parametrize("fixture", FIXTURES, ids=[item["name"] for item in FIXTURES])
+def test_compiles_like_the_web_editor(fixture: dict) -> None:
+    assert compile_document(fixture["document"]) == fixture["html"]
+    assert (
+        compile_document(fixture["document"], include_editor_ids=False)
+        == fixture["codeHtml"]
+    )
+
+
+def test_names_sort_like_locale_compare() -> None:
+    names = ["b", "B", "a", "A", "data-b", "data-a", "aria-label", "10", "2", "_x"]
+
+    assert sorted(names, key=collation_key) == [
+        "_x",
+        "10",
+        "2",
+        "a",
+        "A",
+        "aria-label",
+        "b",
+        "B",
+        "data-a",
+        "data-b",
+    ]
+
+
+def test_canvas_is_the_body_with_editor_ids() -> None:
+    assert compile_canvas(editor_document()) == (
+        '<main class="hero" data-mwb-id="hero">Hello</main>'
+    )
+
+
+def test_digest_tracks_document_content() -> None:
+    assert document_digest(editor_document()) == document_digest(editor_document())
+    assert document_digest(editor_document()) != document_digest(
+        editor_document("other")
+    )
+
+
+def test_cache_reuses_compiled_pages_per_mode() -> None:
+    cache = CompileCache()
+    document = editor_document()
+
+    first = cache.compile(document)
+
+    assert cache.compile(editor_document()) is first
+    assert cache.compile(document, include_editor_ids=False) == compile_document(
+        document, include_editor_ids=False
+    )
+    assert cache.compile(document, include_editor_ids=False) is not first
+
+
+def test_cache_evicts_least_recent_pages_by_count_and_size() -> None:
+    by_count = CompileCache(max_entries=2)
+    first = by_count.compile(editor_document("one"))
+    second = by_count.compile(editor_document("two"))
+    by_count.compile(editor_document("one"))
+    by_count.compile(editor_document("three"))
+
+    assert by_count.compile(editor_document("one")) is first
+    assert by_count.compile(editor_document("two")) is not second
+
+    size = len(compile_document(editor_document("one")))
+    by_size = CompileCache(max_chars=size + 1)
+    kept = by_size.compile(editor_document("one"))
+    by_size.compile(editor_document("two"))
+
+    assert by_size.compile(editor_document("one")) is not kept
@@ -1,11 +1,46 @@
 from __future__ import annotations
 
+import json
+
 import pytest
 
-from server.documents import EditorDocumentValidationError, validate_editor_document
+from server.documents import (
+    MAX_EDITOR_DOCUMENT_CHARS,
+    DocumentStats,
+    DocumentStatsCache,
+    EditorDocumentValidationError,
+    editor_document_stats,
+    validate_editor_document,
+    validate_editor_document_change,
+)
+from src.delta import apply_json_patch, changed_paths
 from tests.editor_document import editor_document
 
 
+def _element(node_id: str, *children: dict, tag: str = "div") -> dict:
+    return {
+        "type": "element",
+        "id": node_id,
+        "tag": tag,
+        "attributes": {},
+        "children": list(children),
+    }
+
+
+def _nested_document() -> dict:
+    document = editor_document()
+    document["body"][0]["children"].append(
+        _element("card", _element("title", {"type": "text", "value": "Card"}))
+    )
+    document["body"].append(_element("footer", {"type": "comment", "value": "end"}))
+    document["responsiveStyles"] = {"title": {"mobile": {"font-size": "1rem"}}}
+    return document
+
+
+def _compact_length(document: dict) -> int:
+    return len(json.dumps(document, separators=(",", ":"), ensure_ascii=False))
+
+
 def test_accepts_versioned_editor_document() -> None:
     document = editor_document()
 
@@ -56,3 +91,140 @@ def test_validates_design_tokens() -> None:
     document["designTokens"] = {"Invalid token name": "red"}
     with pytest.raises(EditorDocumentValidationError, match="Design tokens"):
         validate_editor_document(document)
+
+
+def test_stats_measure_the_compact_json_size() -> None:
+    document = _nested_document()
+    document["body"][0]["attributes"]["data-note"] = 'say "hi"\\\n\x01 é 😀'
+    document["body"][0]["children"].append({"type": "text", "value": "", "x": [1]})
+    document["body"].append(_element("empty", tag="hr"))
+    document["headHtml"] += '<title>"Q"</title>\n'
+    document["designTokens"] = {"quote": '"'}
+    document["extension"] = {"any": ["json", None, 1.5]}
+
+    stats = editor_document_stats(document)
+
+    assert stats.chars == _compact_length(document)
+    assert stats.nodes == 9
+    assert stats.ids == {"hero", "card", "title", "footer", "empty"}
+
+
+@pytest.mark.parametrize(
+    ("mutate", "message"),
+    [
+        (lambda value: value["body"].append({"type": "video"}), "node type"),
+        (lambda value: value["body"].append("text"), "must be objects"),
+        (
+            lambda value: value["body"][0]["children"].append({"type": "text"}),
+            "text node value",
+        ),
+        (lambda value: value["body"][0].update(id="two\nlines"), "ID is invalid"),
+        (lambda value: value["body"][0].update(attributes={"a": 1}), "attributes"),
+        (lambda value: value["body"][0].update(children=None), "children"),
+        (lambda value: value["body"][0].update({1: "x"}), "valid JSON"),
+        (lambda value: value.update(bodyScripts=[None]), "bodyScripts"),
+    ],
+)
+def test_rejects_malformed_nodes_and_fields(mutate, message: str) -> None:
+    document = _nested_document()
+    mutate(document)
+
+    with pytest.raises(EditorDocumentValidationError, match=message):
+        validate_editor_document(document)
+
+
+def test_oversized_documents_fail_before_the_walk_ends() -> None:
+    document = editor_document()
+    big = {"type": "text", "value": "x" * (MAX_EDITOR_DOCUMENT_CHARS // 2)}
+    document["body"] = [dict(big), dict(big), _element("late", "never reached")]
+
+    with pytest.raises(EditorDocumentValidationError, match="at most"):
+        validate_editor_document(document)
+
+
+@pytest.mark.parametrize(
+    "patch",
+    [
+        [
+            {
+                "op": "replace",
+                "path": "/body/0/children/1/children/0/children/0/value",
+                "value": "Hi",
+            }
+        ],
+        [
+            {
+                "op": "add",
+                "path": "/body/0/children/1/children/-",
+                "value": _element("new"),
+            }
+        ],
+        [{"op": "remove", "path": "/body/0/children/1/children/0/children/0"}],
+        [{"op": "add", "path": "/body/0/attributes/title", "value": 'A "title"'}],
+        [{"op": "move", "from": "/body/0/children/1", "path": "/body/1/children/0"}],
+        [{"op": "add", "path": "/body/-", "value": _element("appended")}],
+        [
+            {"op": "add", "path": "/designTokens/space", "value": "2rem"},
+            {"op": "remove", "path": "/responsiveStyles/title"},
+            {"op": "add", "path": "/extension", "value": {"note": "kept"}},
+        ],
+    ],
+)
+def test_change_validation_agrees_with_a_full_walk(patch) -> None:
+    base = _nested_document()
+    base_stats = editor_document_stats(base)
+    document, _ = apply_json_patch(base, patch)
+
+    stats = validate_editor_document_change(
+        document, base, base_stats, changed_paths(patch)
+    )
+
+    assert stats == editor_document_stats(document)
+    assert stats.chars == _compact_length(document)
+
+
+@pytest.mark.parametrize(
+    ("patch", "message"),
+    [
+        (
+            [{"op": "add", "path": "/body/1/children/-", "value": _element("card")}],
+            "IDs must be unique",
+        ),
+        ([{"op": "remove", "path": "/body/0/children/1"}], "existing element"),
+        ([{"op": "replace", "path": "/body/1/tag", "value": "1x"}], "tag is invalid"),
+        ([{"op": "remove", "path": "/css"}], "css must be a string"),
+        (
+            [
+                {
+                    "op": "add",
+                    "path": "/body/0/children/-",
+                    "value": {"type": "text", "value": "x" * MAX_EDITOR_DOCUMENT_CHARS},
+                }
+            ],
+            "at most",
+        ),
+    ],
+)
+def test_change_validation_rejects_what_a_full_walk_rejects(patch, message) -> None:
+    base = _nested_document()
+    document, _ = apply_json_patch(base, patch)
+
+    with pytest.raises(EditorDocumentValidationError, match=message):
+        validate_editor_document(document)
+    with pytest.raises(EditorDocumentValidationError, match=message):
+        validate_editor_document_change(
+            document, base, editor_document_stats(base), changed_paths(patch)
+        )
+
+
+def test_stats_cache_forgets_the_least_recently_used() -> None:
+    cache = DocumentStatsCache(max_entries=2)
+    stats = DocumentStats(chars=2, nodes=0, ids=frozenset())
+    cache.put("a", stats)
+    cache.put("b", stats)
+    assert cache.get("a") is stats
+
+    cache.put("c", stats)
+
+    assert cache.get("b") is None
+    assert cache.get("a") is stats and cache.get("c") is stats
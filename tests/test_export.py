@@ -109,3 +109,20 @@ def test_split_ignores_self_closing_style_and_script() -> None:
     assert split.styles_css == ""
     assert split.app_js == ""
     assert "<style/><script/>" in split.index_html
+
+
+def test_split_points_references_at_the_chosen_asset_urls() -> None:
+    seen: list[tuple[str, str]] = []
+
+    def asset_url(name: str, content: str) -> str:
+        seen.append((name, content))
+        return f"assets/{name}?v=1"
+
+    split = split_document(SAMPLE, asset_url)
+
+    assert seen == [
+        ("styles.css", "h1 { color: #222; }"),
+        ("app.js", "console.log('hi');"),
+    ]
+    assert 'href="assets/styles.css?v=1"' in split.index_html
+    assert 'src="assets/app.js?v=1"' in split.index_html
@@ -0,0 +1,118 @@
+import json
+import math
+import random
+
+import httpx
+import pytest
+
+from src.generation import ProviderError, _generate_content_openrouter, call_gemini
+from src.sections import extract_sections
+from tools.fake_provider import (
+    CANNED_PAGES,
+    CANNED_SECTION,
+    SECTION_PROMPT_MARKER,
+    FakeProvider,
+    FakeProviderConfig,
+    Latency,
+)
+
+
+def _complete(provider: FakeProvider, prompt: str = "A bakery"):
+    return _generate_content_openrouter(
+        prompt, 0.2, 1000, api_key="k", model="m", base_url=provider.base_url
+    )
+
+
+def test_completions_return_a_canned_page_with_usage() -> None:
+    with FakeProvider(FakeProviderConfig(seed=1)) as provider:
+        result = _complete(provider)
+
+    assert result.text in CANNED_PAGES
+    assert result.prompt_tokens and result.completion_tokens
+    assert provider.counts["requests"] == 1
+
+
+def test_canned_pages_have_the_sections_the_editor_expects() -> None:
+    for page in CANNED_PAGES:
+        names = [section.tag for section in extract_sections(page)]
+        assert names == ["header", "main", "footer"]
+
+
+def test_section_prompts_get_a_section_back() -> None:
+    with FakeProvider() as provider:
+        result = _complete(provider, f"{SECTION_PROMPT_MARKER}:\n<section/>")
+
+    assert result.text == CANNED_SECTION
+
+
+@pytest.mark.parametrize(
+    ("config", "status", "counter"),
+    [
+        (FakeProviderConfig(throttle_rate=1.0), 429, "throttled"),
+        (FakeProviderConfig(error_rate=1.0), 503, "errors"),
+    ],
+)
+def test_injected_failures_surface_as_provider_errors(config, status, counter) -> None:
+    with FakeProvider(config) as provider, pytest.raises(ProviderError) as caught:
+        _complete(provider)
+
+    assert caught.value.status_code == status
+    assert provider.counts[counter] == 1
+
+
+def test_streaming_sends_chunks_then_usage_then_done() -> None:
+    config = FakeProviderConfig(stream_chunk_chars=64, seed=2)
+    with FakeProvider(config) as provider:
+        response = httpx.post(
+            f"{provider.base_url}/chat/completions",
+            json={
+                "model": "m",
+                "stream": True,
+                "messages": [{"role": "user", "content": "A bakery"}],
+            },
+        )
+
+    lines = [
+        line[6:] for line in response.text.splitlines() if line.startswith("data: ")
+    ]
+    assert lines[-1] == "[DONE]"
+    chunks = [json.loads(line) for line in lines[:-1]]
+    text = "".join(
+        chunk["choices"][0]["delta"].get("content", "")
+        for chunk in chunks
+        if chunk.get("choices")
+    )
+    assert text in CANNED_PAGES
+    assert len(chunks) > 2
+    assert chunks[-1]["usage"]["completion_tokens"] > 0
+    assert provider.counts["streamed"] == 1
+
+
+def test_latency_specs_parse_and_sample() -> None:
+    rng = random.Random(0)
+    assert Latency.parse("fixed:40").sample_ms(rng) == 40
+    assert 10 <= Latency.parse("uniform:10:20").sample_ms(rng) <= 20
+    assert Latency.parse("lognormal:100:0.5").sample_ms(rng) > 0
+    with pytest.raises(ValueError, match="Invalid latency"):
+        Latency.parse("uniform:10")
+    with pytest.raises(ValueError, match="Invalid latency"):
+        Latency.parse("gaussian:1:2")
+
+
+def test_output_past_max_tokens_is_cut_off_and_can_be_continued() -> None:
+    with FakeProvider(FakeProviderConfig(seed=1)) as provider:
+        page = call_gemini(
+            model="m",
+            genai=None,
+            messages=[{"role": "user", "content": "A bakery"}],
+            temperature=0.2,
+            max_output_tokens=150,
+            provider="openrouter",
+            api_key="k",
+            base_url=provider.base_url,
+            max_continuations=3,
+        )
+
+    # 150 tokens are 600 characters; every further 600 takes a continuation.
+    assert page in CANNED_PAGES
+    assert provider.counts["continued"] == math.ceil(len(page) / 600) - 1
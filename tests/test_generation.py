@@ -14,8 +14,10 @@ from src.generation import (
     build_section_regeneration_prompt,
     call_gemini,
     call_gemini_for_section,
+    finish_reason_of,
     strip_html_code_fence,
 )
+from src.observability import collect_counters
 from src.sections import PageSection
 from src.theme import DEFAULT_TONE_KEY, STRICT_MINIMAL_GUIDANCE
 
@@ -208,6 +210,39 @@ def test_call_gemini_records_success_event(tmp_path) -> None:
     assert payload["complexity_key"] == "compact"
     assert payload["strict_minimal"] is True
     assert payload["duration_ms"] is not None
+    assert payload["prompt_chars"] > len(BASE_PROMPT)
+    assert payload["prompt_tokens"] > 0
+    assert payload["prompt_budget_tokens"] is None
+
+
+def test_call_gemini_compacts_history_to_the_prompt_budget(tmp_path) -> None:
+    analytics = tmp_path / "events.jsonl"
+    model = _FakeModel(text="ok")
+    stale_page = "<html><body>" + "<p>old copy</p>" * 2000 + "</body></html>"
+
+    call_gemini(
+        model,
+        _FakeGenai(),
+        [
+            {"role": "user", "content": "build a portfolio"},
+            {"role": "assistant", "content": stale_page},
+            {"role": "system", "content": "<html><body>current</body></html>"},
+            {"role": "user", "content": "make it darker"},
+        ],
+        temperature=0.2,
+        max_output_tokens=100,
+        analytics_file=str(analytics),
+        prompt_token_budget=2000,
+    )
+
+    assert "old copy" not in model.last_prompt
+    assert "USER: build a portfolio" in model.last_prompt
+    assert "<body>current</body>" in model.last_prompt
+    payload = json.loads(analytics.read_text(encoding="utf-8").splitlines()[0])
+    assert payload["prompt_budget_tokens"] == 2000
+    assert payload["compacted_messages"] == 1
+    assert payload["prompt_tokens"] <= 2000
+    assert payload["prompt_chars"] == len(model.last_prompt)
 
 
 def test_call_gemini_records_error_event(tmp_path) -> None:
@@ -400,6 +435,82 @@ def test_call_gemini_openrouter_records_provider_event(tmp_path, monkeypatch) ->
     assert payload["provider"] == "openrouter"
 
 
+def test_openrouter_usage_is_recorded_with_throughput(tmp_path, monkeypatch) -> None:
+    analytics = tmp_path / "events.jsonl"
+
+    def fake_urlopen(request, timeout=None):
+        body = {
+            "choices": [{"message": {"content": "ok"}}],
+            "usage": {
+                "prompt_tokens": 1200,
+                "completion_tokens": 800,
+                "prompt_tokens_details": {"cached_tokens": 1024},
+            },
+        }
+        return _FakeResponse(json.dumps(body).encode("utf-8"))
+
+    monkeypatch.setattr("src.generation.urllib.request.urlopen", fake_urlopen)
+    ticks = iter([10.0])
+    monkeypatch.setattr("src.generation.time.perf_counter", lambda: next(ticks, 12.0))
+
+    with collect_counters() as counters:
+        call_gemini(
+            model="anthropic/claude-3.5-haiku",
+            genai=None,
+            messages=[{"role": "user", "content": "hi"}],
+            temperature=0.2,
+            max_output_tokens=1000,
+            provider="openrouter",
+            api_key="or-key",
+            analytics_file=str(analytics),
+        )
+
+    payload = json.loads(analytics.read_text(encoding="utf-8"))
+    assert payload["provider_prompt_tokens"] == 1200
+    assert payload["completion_tokens"] == 800
+    assert payload["cached_tokens"] == 1024
+    assert payload["tokens_per_second"] == 400.0
+    usage = {
+        "provider_calls": 1,
+        "provider_ms": 2000,
+        "prompt_tokens": 1200,
+        "completion_tokens": 800,
+        "cached_tokens": 1024,
+    }
+    assert counters == {**usage, "models": {"anthropic/claude-3.5-haiku": usage}}
+
+
+def test_gemini_usage_metadata_is_recorded(tmp_path) -> None:
+    analytics = tmp_path / "events.jsonl"
+    model = _FakeModel(text="<main>ok</main>")
+    model.model_name = "models/gemini-2.5-flash"
+    usage = SimpleNamespace(
+        prompt_token_count=900,
+        candidates_token_count=300,
+        cached_content_token_count=None,
+    )
+    model.generate_content = lambda prompt, generation_config=None: SimpleNamespace(
+        text="<main>ok</main>", usage_metadata=usage
+    )
+
+    with collect_counters() as counters:
+        call_gemini(
+            model,
+            _FakeGenai(),
+            [{"role": "user", "content": "hi"}],
+            temperature=0.2,
+            max_output_tokens=100,
+            analytics_file=str(analytics),
+        )
+
+    payload = json.loads(analytics.read_text(encoding="utf-8"))
+    assert payload["provider_prompt_tokens"] == 900
+    assert payload["completion_tokens"] == 300
+    assert payload["cached_tokens"] is None
+    assert counters["models"]["gemini-2.5-flash"]["completion_tokens"] == 300
+    assert "cached_tokens" not in counters
+
+
 def test_call_gemini_default_provider_is_gemini(tmp_path) -> None:
     model = _FakeModel(text="<div>ok</div>")
     call_gemini(
@@ -768,3 +879,106 @@ def test_backoff_applies_jitter(monkeypatch) -> None:
 
     assert captured == [(0, 2.0)]
     assert delay == 4.0
+
+
+def _scripted_urlopen(*replies: tuple[str, str | None]):
+    """Answer successive OpenRouter calls with ``(content, finish_reason)``."""
+    prompts: list[str] = []
+    script = iter(replies)
+
+    def fake_urlopen(request, timeout=None):
+        prompts.append(json.loads(request.data)["messages"][0]["content"])
+        content, finish_reason = next(script)
+        body = {
+            "choices": [
+                {"message": {"content": content}, "finish_reason": finish_reason}
+            ]
+        }
+        return _FakeResponse(json.dumps(body).encode("utf-8"))
+
+    return fake_urlopen, prompts
+
+
+def test_a_truncated_page_is_continued_and_spliced(tmp_path, monkeypatch) -> None:
+    analytics = tmp_path / "events.jsonl"
+    fake_urlopen, prompts = _scripted_urlopen(
+        ("```html\n<!doctype html><html><body><main><p>Fresh bre", "length"),
+        ("<main><p>Fresh bread daily</p></main></body></html>\n```", "stop"),
+    )
+    monkeypatch.setattr("src.generation.urllib.request.urlopen", fake_urlopen)
+
+    with collect_counters() as counters:
+        out = _openrouter_call(max_continuations=2, analytics_file=str(analytics))
+
+    assert strip_html_code_fence(out) == (
+        "<!doctype html><html><body><main><p>Fresh bread daily</p></main></body></html>"
+    )
+    assert finish_reason_of(out) == "stop"
+    assert len(prompts) == 2
+    assert prompts[1].startswith(prompts[0])
+    assert "Fresh bre\nPARTIAL REPLY>>>" in prompts[1]
+    assert counters["truncations"] == 1
+    assert counters["continuations"] == 1
+    events = [json.loads(line) for line in analytics.read_text().splitlines()]
+    assert [(e["finish_reason"], e["continuation"]) for e in events] == [
+        ("length", None),
+        ("stop", 1),
+    ]
+
+
+def test_continuations_are_bounded(monkeypatch) -> None:
+    fake_urlopen, prompts = _scripted_urlopen(
+        ("<html><body><p>one", "length"),
+        (" two", "length"),
+        (" three", "length"),
+    )
+    monkeypatch.setattr("src.generation.urllib.request.urlopen", fake_urlopen)
+
+    out = _openrouter_call(max_continuations=1)
+
+    assert out == "<html><body><p>one two"
+    assert finish_reason_of(out) == "length"
+    assert len(prompts) == 2
+
+
+def test_structurally_truncated_output_is_continued_without_a_finish_reason(
+    monkeypatch,
+) -> None:
+    fake_urlopen, prompts = _scripted_urlopen(
+        ('<html><body><p class="le', None),
+        ('ad">cut</p></body></html>', None),
+    )
+    monkeypatch.setattr("src.generation.urllib.request.urlopen", fake_urlopen)
+
+    out = _openrouter_call(max_continuations=1)
+
+    assert out == '<html><body><p class="lead">cut</p></body></html>'
+    assert len(prompts) == 2
+
+
+def test_truncated_output_is_returned_as_is_without_continuations(monkeypatch) -> None:
+    fake_urlopen, prompts = _scripted_urlopen(("<html><body><p>cut", "length"))
+    monkeypatch.setattr("src.generation.urllib.request.urlopen", fake_urlopen)
+
+    assert _openrouter_call() == "<html><body><p>cut"
+    assert len(prompts) == 1
+
+
+def test_gemini_finish_reason_is_read_from_the_candidate(tmp_path) -> None:
+    analytics = tmp_path / "events.jsonl"
+    model = _FakeModel()
+    model.generate_content = lambda prompt, generation_config=None: SimpleNamespace(
+        text="<main>ok</main>",
+        candidates=[SimpleNamespace(finish_reason=SimpleNamespace(name="STOP"))],
+    )
+
+    call_gemini(
+        model,
+        _FakeGenai(),
+        [{"role": "user", "content": "hi"}],
+        temperature=0.2,
+        max_output_tokens=100,
+        analytics_file=str(analytics),
+    )
+
+    assert json.loads(analytics.read_text())["finish_reason"] == "stop"
@@ -0,0 +1,286 @@
+import json
+import threading
+import time
+
+import pytest
+
+from src.concurrency_limit import LimiterRegistry, LimitPolicy
+from src.generation import ProviderError, ProviderResult, call_gemini
+from src.hedging import HedgeBudget, HedgePolicy, LatencyWindow
+from src.observability import collect_counters
+
+_POLICY = HedgePolicy(percentile=95, max_rate=0.5, min_samples=5, model="fast-model")
+
+
+@pytest.fixture
+def latency(monkeypatch) -> LatencyWindow:
+    window = LatencyWindow()
+    for _ in range(20):
+        window.record("openrouter:slow-model:generate", 20)
+    monkeypatch.setattr("src.generation.RECENT_LATENCY", window)
+    monkeypatch.setattr("src.generation.HEDGE_BUDGET", HedgeBudget())
+    return window
+
+
+def _stub_provider(monkeypatch, behaviours: dict[str, tuple[float, object]]):
+    """Route each model to a (delay, text-or-exception) pair."""
+    calls: list[str] = []
+    release = threading.Event()
+
+    def fake_invoke_provider(provider, prompt, *args, model=None, **kwargs):
+        calls.append(model)
+        delay, outcome = behaviours[model]
+        release.wait(delay)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return ProviderResult(str(outcome))
+
+    monkeypatch.setattr("src.generation._invoke_provider", fake_invoke_provider)
+    return calls, release
+
+
+def _call(tmp_path, hedge=_POLICY, limit=None) -> tuple[str, dict]:
+    analytics = tmp_path / "events.jsonl"
+    out = call_gemini(
+        model="slow-model",
+        genai=None,
+        messages=[{"role": "user", "content": "hi"}],
+        temperature=0.2,
+        max_output_tokens=100,
+        analytics_file=str(analytics),
+        provider="openrouter",
+        api_key="k",
+        hedge=hedge,
+        limit=limit,
+    )
+    lines = analytics.read_text().splitlines() if analytics.exists() else []
+    return out, json.loads(lines[-1]) if lines else {}
+
+
+def test_latency_window_needs_enough_samples() -> None:
+    window = LatencyWindow()
+    for value in (10, 20, 30, 40):
+        window.record("k", value)
+
+    assert window.percentile("k", 50, min_samples=5) is None
+    window.record("k", 1000)
+    assert window.percentile("k", 50, min_samples=5) == 30
+    assert window.percentile("k", 95, min_samples=5) == 1000
+    assert window.percentile("other", 50, min_samples=0) is None
+
+
+def test_hedge_budget_caps_the_hedged_share() -> None:
+    budget = HedgeBudget()
+    for _ in range(9):
+        budget.note_request()
+
+    assert budget.try_acquire(0.1) is True
+    assert budget.try_acquire(0.1) is False
+    for _ in range(10):
+        budget.note_request()
+    assert budget.try_acquire(0.1) is True
+    assert budget.try_acquire(0.0) is False
+
+
+def test_slow_attempt_is_hedged_and_the_backup_wins(
+    latency, monkeypatch, tmp_path
+) -> None:
+    calls, release = _stub_provider(
+        monkeypatch,
+        {
+            "slow-model": (5.0, "<main>slow</main>"),
+            "fast-model": (0, "<main>fast</main>"),
+        },
+    )
+
+    started = time.perf_counter()
+    with collect_counters() as counters:
+        out, event = _call(tmp_path)
+    elapsed = time.perf_counter() - started
+    release.set()
+
+    assert out == "<main>fast</main>"
+    assert elapsed < 2
+    assert calls == ["slow-model", "fast-model"]
+    assert event["hedged"] is True
+    assert event["hedge_won"] is True
+    assert counters["hedged_requests"] == 1
+    assert counters["hedge_wins"] == 1
+    assert list(counters["models"]) == ["fast-model"]
+
+
+def test_fast_attempt_is_not_hedged(latency, monkeypatch, tmp_path) -> None:
+    calls, _release = _stub_provider(
+        monkeypatch, {"slow-model": (0, "<main>ok</main>")}
+    )
+
+    with collect_counters() as counters:
+        out, event = _call(tmp_path)
+
+    assert out == "<main>ok</main>"
+    assert calls == ["slow-model"]
+    assert event["hedged"] is False
+    assert event["hedge_won"] is None
+    assert "hedged_requests" not in counters
+
+
+def test_no_hedge_without_enough_latency_history(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr("src.generation.RECENT_LATENCY", LatencyWindow())
+    calls, _release = _stub_provider(
+        monkeypatch, {"slow-model": (0.2, "<main>ok</main>")}
+    )
+
+    out, event = _call(tmp_path)
+
+    assert out == "<main>ok</main>"
+    assert calls == ["slow-model"]
+    assert event["hedged"] is False
+
+
+def test_exhausted_budget_waits_for_the_primary(latency, monkeypatch, tmp_path) -> None:
+    calls, _release = _stub_provider(
+        monkeypatch,
+        {
+            "slow-model": (0.2, "<main>slow</main>"),
+            "fast-model": (0, "<main>fast</main>"),
+        },
+    )
+
+    out, event = _call(tmp_path, hedge=HedgePolicy(percentile=95, max_rate=0.0))
+
+    assert out == "<main>slow</main>"
+    assert calls == ["slow-model"]
+    assert event["hedged"] is False
+
+
+def test_failed_backup_falls_back_to_the_primary(
+    latency, monkeypatch, tmp_path
+) -> None:
+    _stub_provider(
+        monkeypatch,
+        {
+            "slow-model": (0.3, "<main>slow</main>"),
+            "fast-model": (0, ProviderError("HTTP 503", status_code=503)),
+        },
+    )
+
+    with collect_counters() as counters:
+        out, event = _call(tmp_path)
+
+    assert out == "<main>slow</main>"
+    assert event["hedged"] is True
+    assert event["hedge_won"] is False
+    assert counters["hedged_requests"] == 1
+    assert counters["hedge_wins"] == 0
+
+
+def test_successful_latencies_feed_the_window(latency, monkeypatch, tmp_path) -> None:
+    _stub_provider(monkeypatch, {"slow-model": (0, "<main>ok</main>")})
+
+    _call(tmp_path)
+
+    assert (
+        latency.percentile("openrouter:slow-model:generate", 100, min_samples=21) == 20
+    )
+
+
+def test_no_hedge_without_a_free_limiter_slot(latency, monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr("src.generation.PROVIDER_LIMITS", LimiterRegistry())
+    charged: list[float] = []
+    monkeypatch.setattr(
+        "src.generation.HEDGE_BUDGET.try_acquire",
+        lambda max_rate: charged.append(max_rate) or True,
+    )
+    calls, _release = _stub_provider(
+        monkeypatch,
+        {
+            "slow-model": (0.2, "<main>slow</main>"),
+            "fast-model": (0, "<main>fast</main>"),
+        },
+    )
+    policy = LimitPolicy(min_limit=1, max_limit=1, initial_limit=1)
+
+    with collect_counters() as counters:
+        out, event = _call(tmp_path, limit=policy)
+
+    assert out == "<main>slow</main>"
+    assert calls == ["slow-model"]
+    assert event["hedged"] is False
+    assert counters["hedges_without_capacity"] == 1
+    assert charged == []
+
+
+def test_backup_holds_its_own_limiter_slot(latency, monkeypatch, tmp_path) -> None:
+    registry = LimiterRegistry()
+    monkeypatch.setattr("src.generation.PROVIDER_LIMITS", registry)
+    policy = LimitPolicy(min_limit=2, max_limit=2, initial_limit=2)
+    limiter = registry.get("openrouter:slow-model", policy)
+    inflight: list[int] = []
+
+    def fake_invoke_provider(provider, prompt, *args, model=None, **kwargs):
+        inflight.append(limiter.inflight)
+        if model == "slow-model":
+            time.sleep(0.3)
+        return ProviderResult(f"<main>{model}</main>")
+
+    monkeypatch.setattr("src.generation._invoke_provider", fake_invoke_provider)
+
+    out, event = _call(tmp_path, limit=policy)
+    time.sleep(0.4)
+
+    assert out == "<main>fast-model</main>"
+    assert event["hedge_won"] is True
+    assert inflight == [1, 2]
+    assert limiter.inflight == 0
+
+
+def test_a_losing_primary_keeps_its_slot_until_it_returns(
+    latency, monkeypatch, tmp_path
+) -> None:
+    registry = LimiterRegistry()
+    monkeypatch.setattr("src.generation.PROVIDER_LIMITS", registry)
+    policy = LimitPolicy(min_limit=2, max_limit=2, initial_limit=2)
+    limiter = registry.get("openrouter:slow-model", policy)
+    _calls, release = _stub_provider(
+        monkeypatch,
+        {
+            "slow-model": (5.0, "<main>slow</main>"),
+            "fast-model": (0, "<main>fast</main>"),
+        },
+    )
+
+    out, event = _call(tmp_path, limit=policy)
+    still_running = limiter.inflight
+    release.set()
+    deadline = time.monotonic() + 2
+    while limiter.inflight and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert out == "<main>fast</main>"
+    assert event["hedge_won"] is True
+    assert still_running == 1
+    assert limiter.inflight == 0
+
+
+def test_only_the_primary_latency_feeds_the_window(
+    latency, monkeypatch, tmp_path
+) -> None:
+    _stub_provider(
+        monkeypatch,
+        {
+            "slow-model": (0.3, "<main>slow</main>"),
+            "fast-model": (0, "<main>fast</main>"),
+        },
+    )
+    key = "openrouter:slow-model:generate"
+
+    _out, event = _call(tmp_path)
+    recorded_at_return = latency.percentile(key, 100, min_samples=21)
+    deadline = time.monotonic() + 2
+    while latency.percentile(key, 100, min_samples=21) is None:
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+    assert event["hedge_won"] is True
+    assert recorded_at_return is None
+    assert latency.percentile(key, 100, min_samples=21) >= 300
@@ -0,0 +1,99 @@
+from __future__ import annotations
+
+import base64
+import io
+
+import pytest
+
+from src.images import (
+    SrcsetEntry,
+    add_srcsets,
+    externalize_data_images,
+    make_variants,
+    sniff_image_type,
+)
+
+SVG = b'<?xml version="1.0"?><svg xmlns="http://www.w3.org/2000/svg"></svg>'
+
+
+def _png(width: int, height: int) -> bytes:
+    image_module = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    image_module.effect_noise((width, height), 40).convert("RGB").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize(
+    ("data", "content_type"),
+    [
+        (b"\x89PNG\r\n\x1a\n....", "image/png"),
+        (b"\xff\xd8\xff\xe0....", "image/jpeg"),
+        (b"GIF89a....", "image/gif"),
+        (b"RIFF\x00\x00\x00\x00WEBPVP8 ", "image/webp"),
+        (b"\x00\x00\x00\x1cftypavif", "image/avif"),
+        (SVG, "image/svg+xml"),
+        (b"  <!-- icon --><svg/>", "image/svg+xml"),
+        (b"<html><svg/></html>", None),
+        (b"%PDF-1.7", None),
+    ],
+)
+def test_image_type_is_sniffed_from_bytes(
+    data: bytes, content_type: str | None
+) -> None:
+    assert sniff_image_type(data) == content_type
+
+
+def test_variants_are_narrower_webp_copies() -> None:
+    variants = make_variants(_png(1000, 500))
+
+    assert [variant.width for variant in variants][:3] == [320, 640, 960]
+    assert all(variant.content_type == "image/webp" for variant in variants)
+    assert variants[0].height == 160
+    assert variants[0].data.startswith(b"RIFF")
+
+
+def test_images_without_raster_pixels_get_no_variants() -> None:
+    assert make_variants(SVG) == []
+    pytest.importorskip("PIL")
+    with pytest.raises(ValueError, match="Unreadable image"):
+        make_variants(b"\x89PNG\r\n\x1a\nnot really a png")
+
+
+def test_large_data_images_are_swapped_for_urls() -> None:
+    payload = base64.b64encode(b"\x89PNG\r\n\x1a\n" + b"x" * 2000).decode()
+    small = base64.b64encode(b"\x89PNG\r\n\x1a\n").decode()
+    html = (
+        f'<img src="data:image/png;base64,{payload}">'
+        f'<img src="data:image/png;base64,{small}">'
+    )
+    stored: list[tuple[str, int]] = []
+
+    def store(content_type: str, data: bytes) -> str:
+        stored.append((content_type, len(data)))
+        return "/media/a/original.png"
+
+    text, count = externalize_data_images(html, store)
+
+    assert count == 1
+    assert stored == [("image/png", 2008)]
+    assert text.startswith('<img src="/media/a/original.png">')
+    assert small in text
+    assert externalize_data_images(html, lambda *_: None) == (html, 0)
+
+
+def test_srcsets_are_added_to_matching_images_only() -> None:
+    entries = [SrcsetEntry("/m/w320.webp", 320), SrcsetEntry("/m/o.png", 800)]
+    html = (
+        '<img src="/m/o.png" alt="a"><img src=/m/o.png />'
+        '<img src="/m/o.png" srcset="/custom.png 1x"><img src="/other.png">'
+    )
+
+    rewritten, changed = add_srcsets(html, {"/m/o.png": entries})
+
+    assert changed == 2
+    srcset = 'srcset="/m/w320.webp 320w, /m/o.png 800w"'
+    sizes = 'sizes="(max-width: 800px) 100vw, 800px"'
+    assert rewritten.startswith(f'<img src="/m/o.png" alt="a" {srcset} {sizes}>')
+    assert f"<img src=/m/o.png {srcset} {sizes}/>" in rewritten
+    assert '<img src="/m/o.png" srcset="/custom.png 1x">' in rewritten
+    assert '<img src="/other.png">' in rewritten
@@ -0,0 +1,57 @@
+from tools.fake_provider import FakeProviderConfig
+from tools.loadtest import (
+    JobSample,
+    build_report,
+    format_report,
+    local_stack,
+    percentile,
+    run_load,
+    summarize,
+)
+
+
+def test_percentile_is_nearest_rank() -> None:
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([7], 99) == 7
+    assert percentile([], 50) is None
+
+
+def test_summarize_groups_samples_by_operation() -> None:
+    samples = [
+        JobSample("generate", 202, "succeeded", 100, 5, 8),
+        JobSample("generate", 202, "succeeded", 300, 15, 10),
+        JobSample("generate", 202, "failed", 50, failure_kind="provider_error"),
+        JobSample("chat", 429),
+    ]
+
+    generate, chat = summarize(samples)
+
+    assert (generate.jobs, generate.succeeded, generate.failed) == (3, 2, 1)
+    assert (generate.p50_ms, generate.p95_ms, generate.queue_p95_ms) == (100, 300, 15)
+    assert (generate.db_queries_mean, generate.db_queries_max) == (9.0, 10)
+    assert generate.failure_kinds == {"provider_error": 1}
+    assert (chat.jobs, chat.rejected, chat.p50_ms) == (1, 1, None)
+
+
+def test_an_in_process_run_settles_every_job() -> None:
+    with local_stack(FakeProviderConfig(seed=3)) as (base_url, provider):
+        samples, duration = run_load(base_url, users=2, iterations=1)
+        report = build_report(samples, 2, duration, provider)
+
+    assert [item.operation for item in report.operations] == [
+        "generate",
+        "section",
+        "chat",
+    ]
+    for item in report.operations:
+        assert item.jobs == item.succeeded == 2
+        assert item.p50_ms is not None
+        assert item.queue_p50_ms is not None
+        assert item.db_queries_max
+        # Long-polling sees each job settle in a read or two, not dozens.
+        assert item.polls_mean <= 3
+    assert report.provider["requests"] == 6
+    assert "jobs/s" in format_report(report)
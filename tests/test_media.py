@@ -0,0 +1,197 @@
+from __future__ import annotations
+
+import base64
+import io
+import time
+
+import pytest
+
+from server.database import Database
+from server.media import MediaLibrary, MediaNotFoundError, MediaValidationError
+from server.models import UserRecord
+from server.projects import ProjectService
+from server.publishing import SitePublisher, page_path
+from src.delta import TextEdit
+
+OWNER_ID = "00000000-0000-0000-0000-000000000010"
+OTHER_ID = "00000000-0000-0000-0000-000000000011"
+SVG = b'<svg xmlns="http://www.w3.org/2000/svg"><rect width="4" height="4"/></svg>'
+
+
+def _png(width: int, height: int) -> bytes:
+    image_module = pytest.importorskip("PIL.Image")
+    buffer = io.BytesIO()
+    image_module.effect_noise((width, height), 40).convert("RGB").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+@pytest.fixture()
+def database(tmp_path) -> Database:
+    database = Database.from_url(f"sqlite:///{tmp_path / 'media.db'}")
+    with database.sessions.begin() as session:
+        for owner_id in (OWNER_ID, OTHER_ID):
+            session.add(
+                UserRecord(
+                    id=owner_id,
+                    email=f"{owner_id}@example.test",
+                    password_hash="!test-account",
+                )
+            )
+    try:
+        yield database
+    finally:
+        database.close()
+
+
+@pytest.fixture()
+def media(database: Database, tmp_path) -> MediaLibrary:
+    library = MediaLibrary(database.sessions, tmp_path / "media", workers=1)
+    try:
+        yield library
+    finally:
+        library.shutdown()
+
+
+def _settled(media: MediaLibrary, owner_id: str, asset_id: str) -> dict:
+    deadline = time.time() + 10
+    while time.time() < deadline:
+        asset = media.get_asset(owner_id, asset_id)
+        if asset["status"] != "processing":
+            return asset
+        time.sleep(0.01)
+    raise AssertionError(f"asset {asset_id} never settled")
+
+
+def test_upload_is_deduplicated_per_owner_and_shares_storage(
+    media: MediaLibrary,
+) -> None:
+    first = media.upload(OWNER_ID, SVG, "../icons/logo.svg")
+    again = media.upload(OWNER_ID, SVG, "other.svg")
+    theirs = media.upload(OTHER_ID, SVG)
+
+    assert first["id"] == again["id"]
+    assert theirs["id"] != first["id"]
+    assert first["filename"] == "logo.svg"
+    assert first["url"] == f"/media/{first['id']}/original.svg"
+    assert [asset["id"] for asset in media.list_assets(OWNER_ID)] == [first["id"]]
+    assert media.object_path(first["sha256"]).read_bytes() == SVG
+    with pytest.raises(MediaNotFoundError):
+        media.get_asset(OTHER_ID, first["id"])
+
+
+def test_upload_rejects_unknown_and_oversized_files(
+    database: Database, tmp_path
+) -> None:
+    media = MediaLibrary(database.sessions, tmp_path / "media", max_upload_bytes=64)
+    try:
+        with pytest.raises(MediaValidationError, match="Only PNG"):
+            media.upload(OWNER_ID, b"<html><script>alert(1)</script></html>")
+        with pytest.raises(MediaValidationError, match="at most 64 bytes"):
+            media.upload(OWNER_ID, SVG + b" " * 64)
+        with pytest.raises(MediaValidationError, match="empty"):
+            media.upload(OWNER_ID, b"")
+    finally:
+        media.shutdown()
+
+
+def test_raster_uploads_get_variants_in_the_background(media: MediaLibrary) -> None:
+    uploaded = media.upload(OWNER_ID, _png(700, 350), "photo.png")
+
+    asset = _settled(media, OWNER_ID, uploaded["id"])
+
+    assert asset["status"] == "ready"
+    assert (asset["width"], asset["height"]) == (700, 350)
+    assert [variant["width"] for variant in asset["variants"]][:2] == [320, 640]
+    assert asset["srcset"].startswith(f"/media/{asset['id']}/w320.webp 320w, ")
+    narrow = media.resolve(asset["id"], "w320.webp")
+    assert narrow is not None and narrow.content_type == "image/webp"
+    assert narrow.path.read_bytes().startswith(b"RIFF")
+    assert (
+        media.resolve(asset["id"], "original.png").path.stat().st_size
+        == (uploaded["bytes"])
+    )
+    assert media.resolve(asset["id"], "w9999.webp") is None
+    assert media.resolve("missing", "original.png") is None
+
+
+def test_unreadable_images_fail_and_interrupted_work_is_recovered(
+    database: Database, tmp_path
+) -> None:
+    pytest.importorskip("PIL")
+    media = MediaLibrary(database.sessions, tmp_path / "media", workers=1)
+    media.shutdown()
+    # An upload racing shutdown is left for the next startup.
+    broken = media.upload(OWNER_ID, b"\x89PNG\r\n\x1a\nnot really a png")
+    assert media.get_asset(OWNER_ID, broken["id"])["status"] == "processing"
+
+    restarted = MediaLibrary(database.sessions, tmp_path / "media", workers=1)
+    try:
+        assert restarted.recover_pending() == 1
+        asset = _settled(restarted, OWNER_ID, broken["id"])
+    finally:
+        restarted.shutdown()
+
+    assert asset["status"] == "failed"
+    assert "Unreadable image" in asset["error"]
+
+
+def test_saving_a_page_moves_pasted_images_into_the_library(
+    database: Database, media: MediaLibrary
+) -> None:
+    projects = ProjectService(database.sessions, media=media)
+    encoded = base64.b64encode(SVG + b" " * 2048).decode()
+    html = f'<main><img src="data:image/svg+xml;base64,{encoded}" alt=""></main>'
+    document = {
+        "schemaVersion": 1,
+        "css": f"a{{background:url(data:image/svg+xml;base64,{encoded})}}",
+    }
+
+    project = projects.create_project(OWNER_ID, "Site", html)
+    page = project["pages"][0]
+    saved = projects.get_page(OWNER_ID, page["id"])
+    [asset] = media.list_assets(OWNER_ID)
+
+    assert encoded not in saved["html"]
+    assert f'<img src="{asset["url"]}" alt="">' in saved["html"]
+    assert media.externalize_document(OWNER_ID, document)["css"] == (
+        f"a{{background:url({asset['url']})}}"
+    )
+
+
+def test_delta_saves_return_the_page_when_pasted_images_were_moved(
+    database: Database, media: MediaLibrary
+) -> None:
+    projects = ProjectService(database.sessions, media=media)
+    page = projects.create_project(OWNER_ID, "Site", "<main></main>")["pages"][0]
+    encoded = base64.b64encode(SVG + b" " * 2048).decode()
+
+    saved = projects.save_page_delta(
+        OWNER_ID,
+        page["id"],
+        expected_version=1,
+        html_edits=[TextEdit(6, 6, f'<img src="data:image/svg+xml;base64,{encoded}">')],
+    )
+
+    [asset] = media.list_assets(OWNER_ID)
+    assert saved["html"] == f'<main><img src="{asset["url"]}"></main>'
+    assert projects.get_page(OWNER_ID, page["id"])["html"] == saved["html"]
+
+
+def test_published_pages_get_srcsets_for_library_images(
+    database: Database, media: MediaLibrary, tmp_path
+) -> None:
+    projects = ProjectService(database.sessions, media=media)
+    publisher = SitePublisher(database.sessions, tmp_path / "publish", media=media)
+    asset = media.upload(OWNER_ID, _png(700, 350))
+    _settled(media, OWNER_ID, asset["id"])
+    project = projects.create_project(
+        OWNER_ID,
+        "Site",
+        f'<!doctype html><html><body><img src="{asset["url"]}" alt=""></body></html>',
+    )
+
+    build = publisher.publish(OWNER_ID, project["id"])
+
+    home = (publisher.build_dir(build["digest"]) / page_path("home")).read_text()
+    assert f"/media/{asset['id']}/w320.webp 320w" in home
+    assert 'sizes="(max-width: 700px) 100vw, 700px"' in home
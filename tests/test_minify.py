@@ -0,0 +1,209 @@
+from __future__ import annotations
+
+import pytest
+
+from src.export import split_document
+from src.minify import (
+    DocumentIndex,
+    filter_css_rules,
+    minify_css,
+    minify_html,
+    minify_js,
+    optimize_page,
+    prune_unused_css,
+    selector_may_match,
+    split_savings,
+)
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+  <!-- generated -->
+  <title>Demo</title>
+  <style>
+    /* layout */
+    .hero { padding: 2rem; }
+    .stale-card, .hero h1 { color: red; }
+    #old-banner { display: none; }
+    .is-open { display: block; }
+    @media (max-width: 600px) {
+      .stale-card { margin: 0; }
+      .hero { padding: 1rem; }
+    }
+    @media print { .stale-card { color: black; } }
+    @font-face { font-family: Brand; src: url(brand.woff2); }
+    table td { border: 0; }
+  </style>
+</head>
+<body>
+  <section class="hero" id="top">
+    <h1>Hello   <em>world</em></h1>
+    <span>a</span> <span>b</span>
+    <button onclick="toggle()">Menu</button>
+  </section>
+  <pre>  keep
+     this </pre>
+  <script>
+    // Opens the menu.
+    function toggle () {
+      document.body.classList.toggle( 'is-open' );
+    }
+  </script>
+</body>
+</html>"""
+
+
+def _index(html: str = PAGE) -> DocumentIndex:
+    return DocumentIndex.from_html(html)
+
+
+def test_the_index_collects_tags_classes_ids_and_script_words() -> None:
+    index = _index()
+
+    assert {"section", "h1", "em", "html", "body"} <= index.tags
+    assert index.classes == {"hero"}
+    assert index.ids == {"top"}
+    assert {"is-open", "toggle"} <= index.script_words
+
+
+@pytest.mark.parametrize(
+    ("selector", "matches"),
+    [
+        (".hero h1", True),
+        ("#top > h1 em", True),
+        (".hero:hover", True),
+        ("button:not(.ghost)::after", True),
+        ("section[data-x='.gone']", True),
+        (".is-open", True),  # toggled by the script
+        (":root", True),
+        (".stale-card", False),
+        ("#old-banner", False),
+        ("table td", False),
+        (".hero .stale-card", False),
+        (r".sm\:p-4", True),  # escaped names are kept
+    ],
+)
+def test_selectors_only_fail_when_they_need_something_missing(
+    selector: str, matches: bool
+) -> None:
+    assert selector_may_match(selector, _index()) is matches
+
+
+def test_unused_rules_and_selectors_are_pruned() -> None:
+    css = (
+        ".hero{a:b}.stale-card,.hero h1{c:d}#old-banner{e:f}"
+        "@media (max-width: 600px){.stale-card{g:h}}"
+        "@media print{.hero{i:j}}@font-face{font-family:X}"
+    )
+
+    pruned, removed = prune_unused_css(css, _index())
+
+    # The emptied @media block goes too; a dead selector in a list that still
+    # has live ones is not a removed rule.
+    assert removed == 2
+    assert pruned == (
+        ".hero{a:b}.hero h1{c:d}@media print{.hero{i:j}}@font-face{font-family:X}"
+    )
+
+
+def test_rules_can_be_filtered_by_any_selector_test() -> None:
+    css = ".a{x:1}.b,.a p{y:2}@media print{.b{z:3}}@keyframes k{from{o:0}}"
+
+    kept, removed = filter_css_rules(css, lambda selector: ".a" in selector)
+
+    assert removed == 1
+    assert kept == ".a{x:1}.a p{y:2}@keyframes k{from{o:0}}"
+
+
+def test_css_minification_keeps_meaningful_spaces() -> None:
+    css = """
+    /* dropped */ /*! kept */
+    a :hover , .b > .c { color : red ; margin: 0 auto ; }
+    @media (max-width: 600px) { .x { padding : 1px 2px ; } }
+    @keyframes spin { from { transform: rotate(0deg); } }
+    .g { width: calc(100% - 2rem); font-family: "A  B", serif !important; }
+    """
+
+    assert minify_css(css) == (
+        "/*! kept */ a :hover,.b>.c{color:red;margin:0 auto}"
+        "@media (max-width: 600px){.x{padding:1px 2px}}"
+        "@keyframes spin{from{transform:rotate(0deg)}}"
+        '.g{width:calc(100% - 2rem);font-family:"A  B",serif!important}'
+    )
+
+
+def test_js_minification_keeps_literals_and_statement_breaks() -> None:
+    source = """
+    // comment
+    const a = 1 + +b;   /* block */
+    let re = /ab+c\\/d/g.test(s) ? x / 2 : y;
+    const t = `hi ${ a  +  b } there`;
+    const q = 'A  B';
+    i++
+    j--
+    function f ( x ) {
+      return x
+    }
+    """
+
+    assert minify_js(source) == (
+        "const a=1+ +b;let re=/ab+c\\/d/g.test(s)?x/2:y;"
+        "const t=`hi ${a+b} there`;const q='A  B';i++\nj--\n"
+        "function f(x){return x}"
+    )
+
+
+def test_js_the_tokenizer_cannot_follow_is_left_alone() -> None:
+    source = "let s = 'never closed\nfoo ( )"
+
+    assert minify_js(source) == source
+
+
+def test_html_minification_preserves_pre_and_inline_spacing() -> None:
+    html, removed = minify_html(PAGE)
+
+    assert removed == 0
+    assert "<!--" not in html
+    assert "<pre>  keep\n     this </pre>" in html
+    assert "<h1>Hello <em>world</em></h1>" in html
+    assert "<span>a</span> <span>b</span>" in html
+    assert "</title><style>" in html
+
+
+def test_optimize_page_reports_removed_rules_and_shrinks_the_page() -> None:
+    optimized = optimize_page(PAGE)
+
+    assert optimized.removed_rules == 4
+    assert ".stale-card" not in optimized.html
+    assert ".is-open{display:block}" in optimized.html
+    assert "@media (max-width: 600px){.hero{padding:1rem}}" in optimized.html
+    assert len(optimized.html) < len(PAGE) * 0.75
+
+
+def test_optimize_page_shares_repeated_svg_icons() -> None:
+    icon = (
+        '<svg viewBox="0 0 24 24" aria-hidden="true">\n'
+        '  <path d="M4 12h16M12 4v16" stroke="currentColor" stroke-width="2"/>\n'
+        "</svg>"
+    )
+    page = PAGE.replace("<body>", "<body>" + icon * 8, 1)
+    assert page != PAGE
+
+    optimized = optimize_page(page)
+
+    assert optimized.svg_sprite.symbols == 1
+    assert optimized.svg_sprite.replaced == 8
+    assert optimized.html.count("<use href=") == 8
+    assert optimize_page(PAGE).svg_sprite.replaced == 0
+
+
+def test_split_savings_are_reported_per_file() -> None:
+    original = split_document(PAGE)
+    optimized = split_document(optimize_page(PAGE).html)
+
+    savings = {item.name: item for item in split_savings(original, optimized)}
+
+    assert set(savings) == {"index.html", "styles.css", "app.js"}
+    for item in savings.values():
+        assert 0 < item.optimized_bytes < item.original_bytes
+        assert item.to_dict()["saved_bytes"] == item.saved_bytes
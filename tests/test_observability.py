@@ -2,7 +2,13 @@ import json
 import logging
 from pathlib import Path
 
-from src.observability import GenerationEvent, record
+from src.observability import (
+    GenerationEvent,
+    collect_counters,
+    count,
+    record,
+    tokens_per_second,
+)
 
 
 def test_record_writes_jsonl(tmp_path: Path) -> None:
@@ -56,3 +62,26 @@ def test_generation_event_to_dict_includes_all_fields() -> None:
     assert payload["strict_minimal"] is True
     assert payload["provider"] == "openrouter"
     assert "timestamp" in payload
+
+
+def test_count_keeps_a_per_model_breakdown() -> None:
+    with collect_counters() as counters:
+        count("completion_tokens", 10, model="a")
+        count("completion_tokens", 5, model="b")
+        count("completion_tokens", 1)
+        count("provider_calls", model="a")
+
+    assert counters == {
+        "completion_tokens": 16,
+        "provider_calls": 1,
+        "models": {
+            "a": {"completion_tokens": 10, "provider_calls": 1},
+            "b": {"completion_tokens": 5},
+        },
+    }
+
+
+def test_tokens_per_second_needs_tokens_and_time() -> None:
+    assert tokens_per_second(300, 1500) == 200.0
+    assert tokens_per_second(None, 1500) is None
+    assert tokens_per_second(300, 0) is None
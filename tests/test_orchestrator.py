@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import threading
 import time
 
@@ -8,7 +9,12 @@ from fastapi import HTTPException
 from sqlalchemy import select
 
 from server.database import Database
-from server.models import GenerationJobRecord, UserRecord
+from server.models import (
+    ConversationMessageRecord,
+    DocumentBlobRecord,
+    GenerationJobRecord,
+    UserRecord,
+)
 from server.orchestrator import (
     FAILURE_INTERNAL,
     FAILURE_INTERRUPTED,
@@ -21,6 +27,8 @@ from server.orchestrator import (
     _percentile,
     classify_failure,
 )
+from src.observability import collect_counters, count
+from tests.editor_document import editor_document
 
 OWNER_ID = "00000000-0000-0000-0000-000000000030"
 OTHER_OWNER_ID = "00000000-0000-0000-0000-000000000031"
@@ -45,7 +53,11 @@ def orchestrator(tmp_path):
             )
         )
     try:
-        yield GenerationOrchestrator(database.sessions), database
+        # Rechecks off, so a wait that wakes early proves a notification did it.
+        yield (
+            GenerationOrchestrator(database.sessions, job_wait_recheck_seconds=0),
+            database,
+        )
     finally:
         database.close()
 
@@ -223,7 +235,23 @@ def test_submit_records_duration_and_result_metrics(orchestrator) -> None:
             "note_count": 2,
             "safety_alert_count": 1,
             "validation_error_count": 0,
+            "queue_ms": job.metrics["queue_ms"],
         }
+        assert job.metrics["queue_ms"] >= 0
+
+
+def test_queries_made_by_a_job_are_counted_in_its_metrics(orchestrator) -> None:
+    service, database = orchestrator
+
+    def work(_token):
+        with database.sessions() as session:
+            for _ in range(3):
+                session.scalar(select(GenerationJobRecord.id))
+        return {"html": "ok"}
+
+    job = run_job(service, work)
+
+    assert job["metrics"]["db_queries"] == 3
 
 
 def test_submit_classifies_and_times_failures(orchestrator) -> None:
@@ -245,6 +273,84 @@ def test_submit_classifies_and_times_failures(orchestrator) -> None:
         assert job.metrics is None
 
 
+def test_provider_counters_are_folded_into_job_metrics(orchestrator) -> None:
+    service, _database = orchestrator
+
+    def work(_token):
+        count("hedged_requests")
+        count("hedge_wins")
+        return {"html": "ok"}
+
+    job = run_job(service, work)
+    run_job(service, lambda _token: {"html": "ok"})
+
+    assert job["metrics"]["hedged_requests"] == 1
+    assert job["metrics"]["hedge_wins"] == 1
+    totals = service.job_stats(OWNER_ID)["totals"]
+    assert totals["hedged_requests"] == 1
+    assert totals["hedge_wins"] == 1
+
+
+def test_job_stats_report_token_usage_per_model(orchestrator) -> None:
+    service, database = orchestrator
+    flash = {
+        "provider_calls": 1,
+        "provider_ms": 2000,
+        "prompt_tokens": 1000,
+        "completion_tokens": 400,
+        "cached_tokens": 600,
+    }
+    haiku = {**flash, "provider_ms": 1000, "completion_tokens": 300}
+    _seed_job(
+        database,
+        OWNER_ID,
+        duration_ms=10,
+        metrics={**flash, "models": {"flash": flash}},
+    )
+    _seed_job(
+        database,
+        OWNER_ID,
+        duration_ms=10,
+        metrics={
+            "provider_calls": 2,
+            "provider_ms": 3000,
+            "prompt_tokens": 2000,
+            "completion_tokens": 700,
+            "cached_tokens": 1200,
+            "models": {"flash": flash, "haiku": haiku},
+        },
+    )
+    _seed_job(database, OWNER_ID, duration_ms=10)
+
+    stats = service.job_stats(OWNER_ID)
+
+    assert stats["totals"]["completion_tokens"] == 1100
+    assert stats["totals"]["provider_calls"] == 3
+    assert stats["totals"]["tokens_per_second"] == 220.0
+    assert stats["models"] == [
+        {
+            "model": "flash",
+            "provider_calls": 2,
+            "provider_ms": 4000,
+            "prompt_tokens": 2000,
+            "completion_tokens": 800,
+            "cached_tokens": 1200,
+            "tokens_per_second": 200.0,
+            "avg_completion_tokens": 400,
+        },
+        {
+            "model": "haiku",
+            "provider_calls": 1,
+            "provider_ms": 1000,
+            "prompt_tokens": 1000,
+            "completion_tokens": 300,
+            "cached_tokens": 600,
+            "tokens_per_second": 300.0,
+            "avg_completion_tokens": 300,
+        },
+    ]
+
+
 def test_list_jobs_exposes_metrics(orchestrator) -> None:
     service, _database = orchestrator
     run_job(service, lambda _token: {"html": "ok"})
@@ -320,13 +426,49 @@ def test_job_stats_excludes_running_jobs_from_success_rate(orchestrator) -> None
     assert totals["success_rate"] == 1.0
 
 
+def test_page_weight_is_recorded_in_metrics_and_trended(orchestrator) -> None:
+    service, database = orchestrator
+    perf = {
+        "dom_nodes": 900,
+        "dom_depth": 12,
+        "css_bytes": 4000,
+        "js_bytes": 1000,
+        "html_bytes": 20000,
+        "violations": [{"metric": "dom_nodes", "value": 900, "limit": 600}],
+    }
+
+    job = run_job(service, lambda _token: {"html": "<html></html>", "perf": perf})
+    run_job(
+        service,
+        lambda _token: {
+            "html": "<html></html>",
+            "perf": {**perf, "dom_nodes": 100, "violations": []},
+        },
+    )
+    _seed_job(database, OWNER_ID, metrics={"output_chars": 5})
+
+    assert job["metrics"]["dom_nodes"] == 900
+    assert job["metrics"]["perf_violations"] == ["dom_nodes"]
+    weight = service.job_stats(OWNER_ID)["page_weight"]
+    assert weight["pages"] == 2
+    assert weight["over_budget"] == 1
+    assert weight["avg_dom_nodes"] == 500
+    assert weight["p95_dom_nodes"] == 900
+    assert weight["violations"] == {"dom_nodes": 1}
+    assert [day["pages"] for day in weight["daily"]] == [2]
+    assert weight["daily"][0]["avg_css_bytes"] == 4000
+
+
 def test_job_stats_is_empty_without_jobs(orchestrator) -> None:
     service, _database = orchestrator
 
     stats = service.job_stats(OWNER_ID)
 
     assert stats["operations"] == []
+    assert stats["models"] == []
     assert stats["failure_kinds"] == {}
+    assert stats["page_weight"]["pages"] == 0
+    assert stats["page_weight"]["daily"] == []
     assert stats["totals"]["success_rate"] is None
     assert stats["totals"]["p95_ms"] is None
 
@@ -438,6 +580,129 @@ def test_cancel_rejects_another_owners_job(orchestrator) -> None:
     assert service.get_job(OTHER_OWNER_ID, job_id) is None
 
 
+def _running_job(service) -> tuple[str, threading.Event]:
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow(_token):
+        started.set()
+        release.wait(timeout=5)
+        return {"html": "<main>done</main>"}
+
+    job_id = service.submit(OWNER_ID, "generate", {}, slow)
+    assert started.wait(timeout=5)
+    return job_id, release
+
+
+def test_a_waiting_status_read_wakes_as_soon_as_the_job_settles(
+    orchestrator,
+) -> None:
+    # Without rechecks, only the in-process notification can wake it.
+    service, _database = orchestrator
+    job_id, release = _running_job(service)
+    threading.Timer(0.1, release.set).start()
+
+    started = time.perf_counter()
+    job = asyncio.run(service.wait_for_job(OWNER_ID, job_id, timeout=20))
+
+    assert job["status"] == "succeeded"
+    assert time.perf_counter() - started < 5
+    assert service.watchers.watching(job_id) == 0
+
+
+def test_a_waiting_status_read_returns_the_unchanged_job_on_timeout(
+    orchestrator,
+) -> None:
+    service, _database = orchestrator
+    job_id, release = _running_job(service)
+    before = service.get_job(OWNER_ID, job_id)
+
+    job = asyncio.run(
+        service.wait_for_job(
+            OWNER_ID, job_id, seen_version=before["version"], timeout=0.1
+        )
+    )
+    release.set()
+
+    assert job == before
+    assert asyncio.run(service.wait_for_job(OTHER_OWNER_ID, job_id)) is None
+
+
+def test_a_stale_version_is_answered_without_waiting(orchestrator) -> None:
+    service, _database = orchestrator
+    job_id, release = _running_job(service)
+
+    started = time.perf_counter()
+    job = asyncio.run(
+        service.wait_for_job(OWNER_ID, job_id, seen_version="stale", timeout=20)
+    )
+    release.set()
+
+    assert job["status"] == "running"
+    assert time.perf_counter() - started < 5
+
+
+def test_cancelling_wakes_a_waiting_status_read(orchestrator) -> None:
+    service, _database = orchestrator
+    job_id, release = _running_job(service)
+    threading.Timer(0.1, service.request_cancel, args=(OWNER_ID, job_id)).start()
+
+    job = asyncio.run(service.wait_for_job(OWNER_ID, job_id, timeout=20))
+    release.set()
+
+    assert job["status"] == "running"
+    assert job["cancel_requested"] is True
+
+
+def test_a_job_settled_by_another_process_is_seen_on_recheck(orchestrator) -> None:
+    _service, database = orchestrator
+    service = GenerationOrchestrator(database.sessions, job_wait_recheck_seconds=0.05)
+    _seed_job(database, OWNER_ID, status="running")
+    job_id = service.list_jobs(OWNER_ID)[0]["id"]
+    # A second orchestrator has its own watchers, like another worker process.
+    elsewhere = GenerationOrchestrator(database.sessions)
+    threading.Timer(
+        0.1, lambda: elsewhere._finish_job(job_id, status="succeeded")
+    ).start()
+
+    job = asyncio.run(service.wait_for_job(OWNER_ID, job_id, timeout=20))
+
+    assert job["status"] == "succeeded"
+
+
+def test_an_idle_wait_reads_the_job_only_at_its_start_and_end(orchestrator) -> None:
+    service, _database = orchestrator
+    job_id, release = _running_job(service)
+    with collect_counters() as one_read:
+        before = service.get_job(OWNER_ID, job_id)
+
+    with collect_counters() as counters:
+        job = asyncio.run(service.wait_for_job(OWNER_ID, job_id, timeout=2.5))
+    release.set()
+
+    assert job == before
+    assert counters["db_queries"] == 2 * one_read["db_queries"]
+
+
+def test_by_default_a_job_settled_by_another_process_is_seen_before_the_timeout(
+    orchestrator,
+) -> None:
+    _service, database = orchestrator
+    service = GenerationOrchestrator(database.sessions)
+    _seed_job(database, OWNER_ID, status="running")
+    job_id = service.list_jobs(OWNER_ID)[0]["id"]
+    elsewhere = GenerationOrchestrator(database.sessions)
+    threading.Timer(
+        0.1, lambda: elsewhere._finish_job(job_id, status="succeeded")
+    ).start()
+
+    started = time.perf_counter()
+    job = asyncio.run(service.wait_for_job(OWNER_ID, job_id, timeout=20))
+
+    assert job["status"] == "succeeded"
+    assert time.perf_counter() - started < 5
+
+
 def test_active_job_is_what_a_reloaded_browser_reattaches_to(orchestrator) -> None:
     service, _database = orchestrator
     assert service.active_job(OWNER_ID) is None
@@ -486,3 +751,129 @@ def test_cancelled_jobs_stay_out_of_the_success_rate(orchestrator) -> None:
     assert totals["cancelled"] == 1
     # One success, no failures: a user changing their mind is not a defect.
     assert totals["success_rate"] == 1.0
+
+
+def test_chat_turns_append_messages_without_rewriting_the_thread(
+    orchestrator, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    service, database = orchestrator
+    histories: list[int] = []
+
+    def fake_run_agent(user_input, **kwargs):
+        histories.append(len(kwargs["history"]))
+        return {
+            "messages": [
+                *kwargs["history"],
+                {"role": "user", "content": user_input},
+                {"role": "assistant", "content": f"re: {user_input}"},
+            ],
+            "current_code": "<main>same</main>",
+            "intent": "refine",
+        }
+
+    monkeypatch.setattr("server.orchestrator.run_agent", fake_run_agent)
+    monkeypatch.setattr("server.orchestrator.CHAT_HISTORY_MESSAGES", 4)
+    for turn in range(5):
+        wait_for_job(
+            service,
+            service.submit_chat(
+                OWNER_ID,
+                "long",
+                f"turn {turn}",
+                None,
+                {},
+                None,  # type: ignore[arg-type]
+            ),
+        )
+
+    # Replayed history is capped, however long the thread grows.
+    assert histories == [0, 2, 4, 4, 4]
+    with database.sessions() as session:
+        rows = list(
+            session.scalars(
+                select(ConversationMessageRecord).order_by(
+                    ConversationMessageRecord.sequence
+                )
+            )
+        )
+        assert [row.sequence for row in rows] == list(range(1, 11))
+        assert rows[-1].content == "re: turn 4"
+        # Unchanged page code is stored once, not once per turn.
+        assert len(list(session.scalars(select(DocumentBlobRecord)))) == 1
+
+
+def test_conversation_messages_are_paginated_newest_last(orchestrator) -> None:
+    service, _database = orchestrator
+    for turn in range(3):
+        service.checkpoint_document(
+            OWNER_ID, "paged", f"ask {turn}", f"answer {turn}", f"<main>{turn}</main>"
+        )
+
+    latest = service.get_conversation(OWNER_ID, "paged", limit=4)
+    assert latest is not None
+    assert [item["content"] for item in latest["messages"]] == [
+        "ask 1",
+        "answer 1",
+        "ask 2",
+        "answer 2",
+    ]
+    assert latest["current_code"] == "<main>2</main>"
+    assert latest["next_before"] == 3
+
+    older = service.get_conversation(
+        OWNER_ID, "paged", limit=4, before=latest["next_before"]
+    )
+    assert older is not None
+    assert [item["content"] for item in older["messages"]] == ["ask 0", "answer 0"]
+    assert older["next_before"] is None
+
+
+def test_changing_the_code_resets_the_structured_document(orchestrator) -> None:
+    service, _database = orchestrator
+    document = editor_document()
+    service.update_document(OWNER_ID, "drafts", "<main>a</main>", document)
+    assert service.get_conversation(OWNER_ID, "drafts")["document"] == document
+
+    # Re-saving the same code without a document keeps the structured one.
+    service.update_document(OWNER_ID, "drafts", "<main>a</main>")
+    assert service.get_conversation(OWNER_ID, "drafts")["document"] == document
+
+    service.checkpoint_document(OWNER_ID, "drafts", "ask", "done", "<main>b</main>")
+    conversation = service.get_conversation(OWNER_ID, "drafts")
+    assert conversation["document"] is None
+    assert conversation["current_code"] == "<main>b</main>"
+
+
+def test_reported_progress_is_stored_and_wakes_waiting_reads(orchestrator) -> None:
+    service, _database = orchestrator
+    reported = threading.Event()
+    release = threading.Event()
+
+    def work(token):
+        reported.wait(timeout=5)
+        token.report_progress({"stage": "sections", "completed": 1, "total": 2})
+        release.wait(timeout=5)
+        return {"html": "<main>done</main>"}
+
+    job_id = service.submit(OWNER_ID, "generate", {}, work)
+    running = service.get_job(OWNER_ID, job_id)
+    while running["status"] == "queued":
+        running = asyncio.run(
+            service.wait_for_job(
+                OWNER_ID, job_id, seen_version=running["version"], timeout=5
+            )
+        )
+    assert running["status"] == "running"
+    assert running["progress"] is None
+    threading.Timer(0.1, reported.set).start()
+
+    started = time.perf_counter()
+    job = asyncio.run(
+        service.wait_for_job(
+            OWNER_ID, job_id, seen_version=running["version"], timeout=20
+        )
+    )
+
+    assert time.perf_counter() - started < 5
+    assert job["progress"] == {"stage": "sections", "completed": 1, "total": 2}
+    release.set()
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import pytest
+
+from src.perf_audit import (
+    DEFAULT_BUDGET,
+    PerfBudget,
+    PerfViolation,
+    audit_page_weight,
+    budget_from_dict,
+    selector_length,
+)
+
+ICON = (
+    '<svg viewBox="0 0 24 24"><path d="M5 12h14M12 5l7 7-7 7" '
+    'stroke-linecap="round" stroke-linejoin="round"/><circle cx="12" cy="12" r="10"/></svg>'
+)
+
+PAGE = """<!doctype html>
+<html>
+<head>
+  <link rel="stylesheet" href="fonts.css">
+  <style>
+    /* a comment that is not CSS */
+    @import url(theme.css);
+    @font-face { font-family: Brand; src: url(brand.woff2); }
+    .hero h1, nav > ul li a:hover { color: red; }
+    @media (max-width: 600px) { .hero { padding: 0; } }
+    .spin { animation: spin 1s linear infinite; }
+    @keyframes spin { from { transform: rotate(0deg); } to { transform: rotate(360deg); } }
+  </style>
+  <script src="vendor.js"></script>
+  <script type="application/ld+json">{"@type": "Organization"}</script>
+</head>
+<body>
+  <main class="hero" style="color: blue">
+    <h1 onclick="go()">Hi</h1>
+    <img src="a.png" alt="">
+  </main>
+  <script>const go = () => 1;</script>
+</body>
+</html>"""
+
+
+def test_page_weight_measurements() -> None:
+    weight = audit_page_weight(PAGE)
+
+    assert weight.html_bytes == len(PAGE.encode())
+    # html, head, link, style, 2 scripts, body, main, h1, img, script
+    assert weight.dom_nodes == 11
+    assert weight.dom_depth == 4
+    assert weight.inline_style_bytes == len("color: blue")
+    assert weight.js_bytes == len("go()") + len("const go = () => 1;")
+    assert weight.external_stylesheets == 1
+    assert weight.external_scripts == 1
+    assert weight.css_selectors == 4
+    assert weight.selector_length == 4
+    assert weight.css_imports == 1
+    assert weight.font_faces == 1
+    assert weight.infinite_animations == 1
+    assert weight.duplicate_svg_bytes == 0
+
+
+def test_unclosed_and_void_elements_do_not_inflate_depth() -> None:
+    html = "<body><ul><li>One<li>Two<br><input></ul><p>After</body>"
+
+    weight = audit_page_weight(html)
+
+    assert weight.dom_nodes == 7
+    assert weight.dom_depth == 4
+
+
+@pytest.mark.parametrize(
+    ("selector", "length"),
+    [
+        (".hero", 1),
+        ("nav ul > li a", 4),
+        ("a[title='x y']", 1),
+        ("ul:not(.a .b) li", 2),
+        ("h1+p~span", 3),
+    ],
+)
+def test_selector_length_counts_compounds(selector: str, length: int) -> None:
+    assert selector_length(selector) == length
+
+
+def test_default_budget_flags_violations_as_notes() -> None:
+    weight = audit_page_weight(PAGE)
+
+    assert weight.violations == (PerfViolation("css_imports", 1, 0),)
+    assert weight.notes == [
+        "Page weight: CSS @import count is 1, over the budget of 0."
+    ]
+
+
+def test_budgets_are_per_call_and_none_disables_a_check() -> None:
+    strict = PerfBudget(max_dom_nodes=5, max_css_imports=None, max_js_bytes=1)
+    violations = {item.metric for item in audit_page_weight(PAGE, strict).violations}
+
+    assert violations == {"dom_nodes", "js_bytes"}
+    assert audit_page_weight(PAGE, DEFAULT_BUDGET).violations[0].metric == (
+        "css_imports"
+    )
+
+
+def test_repeated_icons_count_as_duplicate_weight() -> None:
+    html = f"<html><body>{ICON * 12}</body></html>"
+
+    weight = audit_page_weight(html, PerfBudget(max_duplicate_svg_bytes=100))
+
+    assert weight.duplicate_svg_bytes > 100
+    assert [item.metric for item in weight.violations] == ["duplicate_svg_bytes"]
+
+
+def test_report_serializes_measurements_and_violations() -> None:
+    data = audit_page_weight(PAGE).to_dict()
+
+    assert data["dom_nodes"] == 11
+    assert data["violations"] == [{"metric": "css_imports", "value": 1, "limit": 0}]
+
+
+def test_budget_from_dict_overrides_defaults_and_rejects_typos() -> None:
+    budget = budget_from_dict({"max_dom_nodes": 600, "max_css_imports": None})
+
+    assert budget.max_dom_nodes == 600
+    assert budget.max_css_imports is None
+    assert budget.max_dom_depth == DEFAULT_BUDGET.max_dom_depth
+    with pytest.raises(ValueError, match="Unknown perf budget 'max_nodes'"):
+        budget_from_dict({"max_nodes": 1})
+    for bad in (-1, 1.5, True, "10"):
+        with pytest.raises(ValueError, match="non-negative integer"):
+            budget_from_dict({"max_dom_nodes": bad})
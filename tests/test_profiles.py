@@ -4,6 +4,7 @@ from pathlib import Path
 import pytest
 
 from src.generation import build_generation_prompt, build_section_regeneration_prompt
+from src.perf_audit import DEFAULT_BUDGET
 from src.profiles import (
     CUSTOM_PROFILE_ID,
     GenerationProfile,
@@ -46,6 +47,7 @@ def test_load_profiles_uses_defaults_for_optional_fields(tmp_path: Path) -> None
     assert profile.complexity_key == "balanced"
     assert profile.strict_minimal is False
     assert profile.extra_guidance == ""
+    assert profile.perf_budget == DEFAULT_BUDGET
 
 
 def test_load_profiles_reads_full_config(tmp_path: Path) -> None:
@@ -87,6 +89,22 @@ def test_load_profiles_rejects_unknown_complexity_key(tmp_path: Path) -> None:
         load_profiles(tmp_path)
 
 
+def test_load_profiles_reads_a_perf_budget(tmp_path: Path) -> None:
+    _write_profile(tmp_path, "lean", {"perf_budget": {"max_dom_nodes": 300}})
+
+    budget = load_profiles(tmp_path)[0].perf_budget
+
+    assert budget.max_dom_nodes == 300
+    assert budget.max_css_bytes == DEFAULT_BUDGET.max_css_bytes
+
+
+def test_load_profiles_rejects_unknown_perf_budgets(tmp_path: Path) -> None:
+    _write_profile(tmp_path, "bad", {"perf_budget": {"max_divs": 3}})
+
+    with pytest.raises(ValueError, match="max_divs.*bad.json"):
+        load_profiles(tmp_path)
+
+
 def test_load_profiles_rejects_invalid_json(tmp_path: Path) -> None:
     (tmp_path / "broken.json").write_text("{not json", encoding="utf-8")
 
@@ -1,14 +1,19 @@
 from __future__ import annotations
 
 import pytest
+from sqlalchemy import select
 
 from server.database import Database
-from server.models import UserRecord
+from server.documents import EditorDocumentValidationError
+from server.models import RevisionRecord, UserRecord
 from server.projects import (
     ProjectService,
     ProjectValidationError,
     VersionConflictError,
+    revision_html,
 )
+from src.delta import TextEdit
+from src.document_compiler import COMPILER_VERSION, compile_document
 from tests.editor_document import editor_document
 
 OWNER_ID = "00000000-0000-0000-0000-000000000010"
@@ -84,6 +89,44 @@ def test_save_page_creates_immutable_revision(projects: ProjectService) -> None:
     assert revisions[0]["source"] == "autosave"
 
 
+def test_save_page_can_share_repeated_svg_icons(projects: ProjectService) -> None:
+    icon = (
+        '<svg viewBox="0 0 24 24"><path d="M4 12h16M12 4v16" stroke="currentColor"/>'
+        '<circle cx="12" cy="12" r="9" stroke-width="2"/></svg>'
+    )
+    html = "<main>" + icon * 8 + "</main>"
+    page = projects.create_project(OWNER_ID, "Icons", html)["pages"][0]
+    assert page["html"] == html
+
+    saved = projects.save_page(
+        OWNER_ID, page["id"], html, expected_version=1, svg_sprite=True
+    )
+
+    assert saved["version"] == 2
+    assert saved["html"].count("<use href=") == 8
+    again = projects.save_page(
+        OWNER_ID, page["id"], saved["html"], expected_version=2, svg_sprite=True
+    )
+    assert again["version"] == 2
+
+
+def test_svg_sprite_cannot_fork_html_from_its_document(
+    projects: ProjectService,
+) -> None:
+    page = projects.create_project(OWNER_ID, "Icons", "<main>v1</main>")["pages"][0]
+
+    with pytest.raises(ProjectValidationError, match="svg_sprite"):
+        projects.save_page(
+            OWNER_ID,
+            page["id"],
+            "<main>v2</main>",
+            expected_version=1,
+            document=editor_document(),
+            svg_sprite=True,
+        )
+    assert projects.get_page(OWNER_ID, page["id"])["version"] == 1
+
+
 def test_noop_save_does_not_create_revision(projects: ProjectService) -> None:
     page = projects.create_project(OWNER_ID, "No-op", "same")["pages"][0]
 
@@ -104,6 +147,109 @@ def test_stale_save_reports_current_version(projects: ProjectService) -> None:
     assert projects.get_page(OWNER_ID, page["id"])["html"] == "v2"
 
 
+def test_delta_save_applies_edits_and_patches_to_the_current_revision(
+    projects: ProjectService,
+) -> None:
+    document = editor_document()
+    html = "<main>Hello</main>"
+    page = projects.create_project(OWNER_ID, "Delta", html, document)["pages"][0]
+
+    saved = projects.save_page_delta(
+        OWNER_ID,
+        page["id"],
+        expected_version=1,
+        html_edits=[TextEdit(6, 11, "Hi there")],
+        document_patch=[
+            {"op": "replace", "path": "/body/0/children/0/value", "value": "Hi there"}
+        ],
+    )
+
+    assert saved["version"] == 2
+    assert "html" not in saved and "document" not in saved
+    current = projects.get_page(OWNER_ID, page["id"])
+    assert current["html"] == "<main>Hi there</main>"
+    assert current["document"]["body"][0]["children"][0]["value"] == "Hi there"
+    assert current["document"]["css"] == document["css"]
+    assert projects.list_revisions(OWNER_ID, page["id"])[0]["source"] == "autosave"
+
+    unchanged = projects.save_page_delta(
+        OWNER_ID, page["id"], expected_version=2, html_edits=[TextEdit(0, 0)]
+    )
+    assert unchanged["version"] == 2
+    with pytest.raises(VersionConflictError) as exc:
+        projects.save_page_delta(
+            OWNER_ID, page["id"], expected_version=1, html_edits=[TextEdit(0, 0, "x")]
+        )
+    assert exc.value.current_version == 2
+
+
+def test_delta_save_validates_what_it_changes(projects: ProjectService) -> None:
+    page = projects.create_project(
+        OWNER_ID, "Delta", "<main></main>", editor_document()
+    )["pages"][0]
+
+    with pytest.raises(ProjectValidationError, match="out of range"):
+        projects.save_page_delta(
+            OWNER_ID,
+            page["id"],
+            expected_version=1,
+            document_patch=[{"op": "remove", "path": "/body/4"}],
+        )
+    with pytest.raises(EditorDocumentValidationError, match="tag is invalid"):
+        projects.save_page_delta(
+            OWNER_ID,
+            page["id"],
+            expected_version=1,
+            document_patch=[{"op": "replace", "path": "/body/0/tag", "value": "1x"}],
+        )
+    assert projects.get_page(OWNER_ID, page["id"])["version"] == 1
+
+
+def test_delta_saves_check_new_nodes_against_the_whole_saved_page(
+    projects: ProjectService,
+) -> None:
+    page = projects.create_project(
+        OWNER_ID, "Delta", "<main></main>", editor_document()
+    )["pages"][0]
+    card = {
+        "type": "element",
+        "id": "card",
+        "tag": "section",
+        "attributes": {},
+        "children": [],
+    }
+    projects.save_page_delta(
+        OWNER_ID,
+        page["id"],
+        expected_version=1,
+        document_patch=[{"op": "add", "path": "/body/0/children/-", "value": card}],
+    )
+    projects.save_page_delta(
+        OWNER_ID,
+        page["id"],
+        expected_version=2,
+        html_edits=[TextEdit(0, 0, "<!-- -->")],
+    )
+
+    with pytest.raises(EditorDocumentValidationError, match="IDs must be unique"):
+        projects.save_page_delta(
+            OWNER_ID,
+            page["id"],
+            expected_version=3,
+            document_patch=[{"op": "add", "path": "/body/-", "value": card}],
+        )
+    with pytest.raises(EditorDocumentValidationError, match="IDs must be unique"):
+        projects.save_page_delta(
+            OWNER_ID,
+            page["id"],
+            expected_version=3,
+            document_patch=[
+                {"op": "add", "path": "/body/0/children/1/children/-", "value": card}
+            ],
+        )
+    assert projects.get_page(OWNER_ID, page["id"])["version"] == 3
+
+
 def test_restore_creates_a_new_revision(projects: ProjectService) -> None:
     page = projects.create_project(OWNER_ID, "Restore", "v1")["pages"][0]
     first_revision = projects.list_revisions(OWNER_ID, page["id"])[0]
@@ -243,3 +389,52 @@ def test_structured_document_survives_revision_workflows(
     assert saved["document"] == second_document
     assert checkpoint["document"] == second_document
     assert duplicate["pages"][0]["document"] == second_document
+
+
+def test_revisions_store_html_only_when_the_document_does_not_compile_to_it(
+    tmp_path,
+) -> None:
+    database = Database.from_url(f"sqlite:///{tmp_path / 'derived.db'}")
+    _add_owner(database)
+    projects = ProjectService(database.sessions)
+    document = editor_document()
+    compiled = compile_document(document)
+    created = projects.create_project(OWNER_ID, "Derived", compiled, document)
+    page_id = created["pages"][0]["id"]
+    first_revision = created["pages"][0]["current_revision_id"]
+    projects.save_page(
+        OWNER_ID,
+        page_id,
+        "<main>hand edited</main>",
+        expected_version=1,
+        document=document,
+    )
+    restored = projects.restore_revision(
+        OWNER_ID, page_id, first_revision, expected_version=2
+    )
+
+    with database.sessions() as session:
+        stored = session.execute(
+            select(RevisionRecord.html, RevisionRecord.compiler_version).order_by(
+                RevisionRecord.sequence
+            )
+        ).all()
+    database.close()
+
+    assert [tuple(row) for row in stored] == [
+        (None, COMPILER_VERSION),
+        ("<main>hand edited</main>", None),
+        (None, COMPILER_VERSION),
+    ]
+    assert created["pages"][0]["html"] == compiled
+    assert restored["html"] == compiled
+    assert restored["document"] == document
+
+
+def test_derived_html_is_never_recompiled_by_another_compiler_version() -> None:
+    revision = RevisionRecord(
+        id="r1", html=None, compiler_version=0, document_json=editor_document()
+    )
+
+    with pytest.raises(RuntimeError, match="document compiler 0"):
+        revision_html(revision)
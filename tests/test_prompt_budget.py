@@ -0,0 +1,169 @@
+from types import SimpleNamespace
+
+from src.generation import call_gemini
+from src.prompt_budget import (
+    STALE_CODE_PLACEHOLDER,
+    compact_messages,
+    estimate_tokens,
+)
+
+
+class _FakeGenaiTypes:
+    class GenerationConfig:
+        def __init__(self, **kwargs) -> None:
+            self.kwargs = kwargs
+
+
+class _RecordingModel:
+    def __init__(self) -> None:
+        self.prompts: list[str] = []
+
+    def generate_content(self, prompt: str, generation_config=None):
+        self.prompts.append(prompt)
+        return SimpleNamespace(text="<html><body>ok</body></html>")
+
+
+def _page(turn: int) -> str:
+    cards = "".join(
+        f'<article class="card"><h2>Card {turn}.{n}</h2><p>Detail {n}</p></article>'
+        for n in range(40)
+    )
+    return f"<!doctype html><html><body><main>{cards}</main></body></html>"
+
+
+def test_estimate_tokens_counts_words_and_symbols() -> None:
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("hello world") == 4
+    assert estimate_tokens("<div>") == 3
+    assert estimate_tokens("a" * 40) == 10
+
+
+def test_conversation_within_budget_is_unchanged() -> None:
+    messages = [
+        {"role": "user", "content": "Build a bakery site"},
+        {"role": "assistant", "content": "Done."},
+    ]
+
+    result = compact_messages(messages, 1_000)
+
+    assert result.messages == messages
+    assert result.compacted == 0
+
+
+def test_stale_code_dumps_are_elided_before_turns_are_dropped() -> None:
+    messages = [
+        {"role": "user", "content": "Build a bakery site"},
+        {"role": "assistant", "content": _page(1)},
+        {"role": "user", "content": "Make it warmer"},
+        {"role": "assistant", "content": _page(2)},
+        {"role": "user", "content": "Add a menu"},
+    ]
+    budget = estimate_tokens(_page(2)) + 100
+
+    result = compact_messages(messages, budget)
+
+    assert result.elided == 1
+    assert result.dropped == 0
+    assert result.messages[1]["content"] == STALE_CODE_PLACEHOLDER
+    assert result.messages[3]["content"] == _page(2)
+    assert [m["content"] for m in result.messages if m["role"] == "user"] == [
+        "Build a bakery site",
+        "Make it warmer",
+        "Add a menu",
+    ]
+    assert result.tokens <= budget
+
+
+def test_system_page_outranks_newer_dumps_in_history() -> None:
+    messages = [
+        {"role": "system", "content": f"Current page:\n{_page(9)}"},
+        {"role": "assistant", "content": _page(1)},
+        {"role": "user", "content": "Tighten the spacing"},
+    ]
+
+    result = compact_messages(messages, estimate_tokens(_page(9)) + 50)
+
+    assert result.messages[0]["content"].endswith(_page(9))
+    assert result.messages[1]["content"] == STALE_CODE_PLACEHOLDER
+
+
+def test_old_replies_go_before_old_instructions_and_brief_is_kept() -> None:
+    messages = [{"role": "user", "content": "Build a bakery site"}]
+    for turn in range(10):
+        messages.append({"role": "assistant", "content": f"Updated ({turn}). " * 20})
+        messages.append({"role": "user", "content": f"Change number {turn}"})
+
+    result = compact_messages(messages, 120)
+
+    contents = [m["content"] for m in result.messages]
+    assert contents[0] == "Build a bakery site"
+    assert contents[-1] == "Change number 9"
+    assert all(m["role"] == "user" for m in result.messages)
+    assert result.dropped == 10
+    assert compact_messages(messages, 120) == result
+
+
+def test_pinned_messages_survive_an_impossible_budget() -> None:
+    messages = [
+        {"role": "system", "content": _page(1)},
+        {"role": "user", "content": "Make it warmer"},
+    ]
+
+    result = compact_messages(messages, 1)
+
+    assert result.messages == messages
+    assert result.tokens > 1
+
+
+def test_prompt_size_stays_flat_over_a_fifty_turn_conversation() -> None:
+    """Benchmark: replay a 50-turn session with and without a budget."""
+    budget = 6_000
+
+    def run_session(prompt_token_budget: int | None) -> list[int]:
+        model = _RecordingModel()
+        history: list[dict[str, str]] = []
+        for turn in range(50):
+            history.append({"role": "user", "content": f"Refinement {turn}: " * 5})
+            call_gemini(
+                model=model,
+                genai=SimpleNamespace(types=_FakeGenaiTypes),
+                messages=history,
+                temperature=0.2,
+                max_output_tokens=1024,
+                prompt_token_budget=prompt_token_budget,
+            )
+            history.append({"role": "assistant", "content": _page(turn)})
+        return [estimate_tokens(prompt) for prompt in model.prompts]
+
+    unbudgeted = run_session(None)
+    budgeted = run_session(budget)
+
+    assert max(budgeted) <= budget
+    assert unbudgeted[-1] > 10 * budgeted[-1]
+    # Flat, not merely capped: once full, each turn sits within one page of the
+    # budget instead of climbing with the turn count.
+    plateau = budgeted[10:]
+    assert min(plateau) >= budget - estimate_tokens(_page(0)) - 100
+
+
+def test_instructions_that_mention_tags_are_never_elided() -> None:
+    request = (
+        "Make the <body> background dark blue and add a pricing table with three tiers"
+    )
+    messages = [
+        {"role": "user", "content": "Build a <html> landing page for a bakery"},
+        {"role": "assistant", "content": _page(1)},
+        {"role": "user", "content": "Use a <!doctype html> with a warmer palette"},
+        {"role": "assistant", "content": _page(2)},
+        {"role": "user", "content": request},
+    ]
+
+    result = compact_messages(messages, estimate_tokens(_page(2)) + 100)
+
+    assert [m["content"] for m in result.messages if m["role"] == "user"] == [
+        "Build a <html> landing page for a bakery",
+        "Use a <!doctype html> with a warmer palette",
+        request,
+    ]
+    assert result.messages[1]["content"] == STALE_CODE_PLACEHOLDER
+    assert result.messages[3]["content"] == _page(2)
@@ -0,0 +1,306 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from src.generation import (
+    build_section_regeneration_prompt,
+    call_gemini,
+    call_gemini_for_section,
+)
+from src.prompt_cache import PromptCacheRegistry, prefix_key
+from src.sections import PageSection
+
+_PAGE = (
+    "<!doctype html><html><body><main>"
+    + "".join(
+        f"<section><h2>Part {n}</h2><p>Body copy {n}</p></section>" for n in range(200)
+    )
+    + "</main></body></html>"
+)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class _FakeResponse:
+    def __init__(self, body: bytes) -> None:
+        self._body = body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc) -> bool:
+        return False
+
+    def read(self) -> bytes:
+        return self._body
+
+
+class _FakeModel:
+    def __init__(self, name: str = "models/gemini-2.5-flash", cached=None) -> None:
+        self.model_name = name
+        self.cached = cached
+        self.prompts: list[str] = []
+
+    def generate_content(self, prompt: str, generation_config=None):
+        self.prompts.append(prompt)
+        return SimpleNamespace(
+            text="<main>ok</main>",
+            usage_metadata=SimpleNamespace(
+                cached_content_token_count=900 if self.cached else 0
+            ),
+        )
+
+
+class _FakeCachingGenai:
+    class types:
+        class GenerationConfig:
+            def __init__(self, **kwargs) -> None:
+                self.kwargs = kwargs
+
+    def __init__(self) -> None:
+        self.created: list[dict] = []
+        self.cached_models: list[_FakeModel] = []
+        genai = self
+
+        class CachedContent:
+            @staticmethod
+            def create(**kwargs):
+                genai.created.append(kwargs)
+                return SimpleNamespace(name=f"cachedContents/{len(genai.created)}")
+
+        class GenerativeModel:
+            @staticmethod
+            def from_cached_content(cached_content):
+                model = _FakeModel(cached=cached_content)
+                genai.cached_models.append(model)
+                return model
+
+        self.caching = SimpleNamespace(CachedContent=CachedContent)
+        self.GenerativeModel = GenerativeModel
+
+
+@pytest.fixture
+def registry(monkeypatch) -> PromptCacheRegistry:
+    fresh = PromptCacheRegistry()
+    monkeypatch.setattr("src.generation.PROMPT_CACHE", fresh)
+    return fresh
+
+
+def _section(index: int = 0) -> PageSection:
+    html = f"<section><h2>Part {index}</h2><p>Body copy {index}</p></section>"
+    start = _PAGE.index(html)
+    return PageSection(
+        index=index,
+        tag="section",
+        snippet=f"Part {index}",
+        start=start,
+        end=start + len(html),
+        html=html,
+    )
+
+
+def test_registry_expires_entries_before_the_provider_does() -> None:
+    clock = _Clock()
+    registry = PromptCacheRegistry(clock=clock)
+
+    registry.put("k", "handle", ttl_seconds=300)
+    clock.now += 269
+    assert registry.get("k").handle == "handle"
+    clock.now += 2
+    assert registry.get("k") is None
+    assert len(registry) == 0
+
+
+def test_registry_evicts_the_soonest_to_expire_when_full() -> None:
+    clock = _Clock()
+    registry = PromptCacheRegistry(max_entries=2, clock=clock)
+
+    registry.put("short", 1, ttl_seconds=60)
+    registry.put("long", 2, ttl_seconds=600)
+    registry.put("new", 3, ttl_seconds=300)
+
+    assert registry.get("short") is None
+    assert registry.get("long").handle == 2
+    assert registry.get("new").handle == 3
+
+
+def test_prefix_key_separates_providers_and_models() -> None:
+    keys = {
+        prefix_key("gemini", "a", "prefix"),
+        prefix_key("gemini", "b", "prefix"),
+        prefix_key("openrouter", "a", "prefix"),
+        prefix_key("gemini", "a", "prefix2"),
+    }
+    assert len(keys) == 4
+
+
+def test_section_prompt_puts_the_page_after_instructions_and_guidance() -> None:
+    prompt = build_section_regeneration_prompt(
+        _PAGE,
+        _section(3),
+        "tighten it",
+        tone_key="editorial",
+        extra_guidance="Reuse the palette",
+        refine_aspect_key="spacing",
+    )
+
+    guidance = prompt.index("Style constraints:")
+    page = prompt.index("Current page code:")
+    target = prompt.index("Section to replace")
+    assert guidance < page < target
+    assert prompt.index("Reuse the palette") < page
+    assert prompt.index("Adjust spacing only") > target
+
+
+def test_section_prompts_for_one_page_share_a_prefix() -> None:
+    first = build_section_regeneration_prompt(
+        _PAGE, _section(1), "tighten it", refine_aspect_key="spacing"
+    )
+    second = build_section_regeneration_prompt(
+        _PAGE, _section(7), "recolor it", refine_aspect_key="color"
+    )
+
+    prefix = first.partition("\n\nSection to replace")[0]
+    assert second.startswith(prefix)
+    assert prefix.endswith(_PAGE)
+
+
+def test_gemini_section_regeneration_reuses_one_cached_prefix(
+    registry, tmp_path
+) -> None:
+    genai = _FakeCachingGenai()
+    analytics = tmp_path / "events.jsonl"
+
+    for index, instructions in ((1, "tighten it"), (7, "recolor it")):
+        out = call_gemini_for_section(
+            _FakeModel(),
+            genai,
+            _PAGE,
+            _section(index),
+            instructions,
+            temperature=0.2,
+            max_output_tokens=100,
+            analytics_file=str(analytics),
+            prompt_cache_ttl_seconds=600,
+        )
+        assert out == "<main>ok</main>"
+
+    assert len(genai.created) == 1
+    assert genai.created[0]["model"] == "models/gemini-2.5-flash"
+    assert genai.created[0]["contents"][0].endswith(_PAGE)
+    assert genai.created[0]["ttl"].total_seconds() == 600
+    assert len(registry) == 1
+    # Only the per-request remainder is sent alongside the cached prefix.
+    sent = genai.cached_models[1].prompts[0]
+    assert sent.startswith("\n\nSection to replace (position 8")
+    assert _PAGE not in sent
+    events = [json.loads(line) for line in analytics.read_text().splitlines()]
+    assert [event["cached_tokens"] for event in events] == [900, 900]
+
+
+def test_gemini_falls_back_to_a_plain_call_when_caching_is_refused(
+    registry,
+) -> None:
+    genai = _FakeCachingGenai()
+
+    def refuse(**kwargs):
+        genai.created.append(kwargs)
+        raise RuntimeError("Cached content is too small")
+
+    genai.caching.CachedContent.create = refuse
+    model = _FakeModel()
+
+    for _ in range(2):
+        call_gemini_for_section(
+            model,
+            genai,
+            _PAGE,
+            _section(1),
+            "tighten it",
+            temperature=0.2,
+            max_output_tokens=100,
+            prompt_cache_ttl_seconds=600,
+        )
+
+    assert len(genai.created) == 1
+    assert len(model.prompts) == 2
+    assert model.prompts[0].endswith("Regeneration instructions: tighten it")
+
+
+def test_short_prefixes_and_disabled_caching_send_plain_prompts(registry) -> None:
+    genai = _FakeCachingGenai()
+    model = _FakeModel()
+
+    call_gemini(
+        model,
+        genai,
+        [{"role": "user", "content": "build a portfolio"}],
+        temperature=0.2,
+        max_output_tokens=100,
+        prompt_cache_ttl_seconds=600,
+    )
+    call_gemini_for_section(
+        model,
+        genai,
+        _PAGE,
+        _section(1),
+        "tighten it",
+        temperature=0.2,
+        max_output_tokens=100,
+    )
+
+    assert genai.created == []
+    assert len(model.prompts) == 2
+
+
+def test_openrouter_marks_the_page_prefix_for_caching(monkeypatch, tmp_path) -> None:
+    requests: list[dict] = []
+    analytics = tmp_path / "events.jsonl"
+
+    def fake_urlopen(request, timeout=None):
+        requests.append(json.loads(request.data))
+        body = {
+            "choices": [{"message": {"content": "<main>ok</main>"}}],
+            "usage": {"prompt_tokens_details": {"cached_tokens": 1200}},
+        }
+        return _FakeResponse(json.dumps(body).encode("utf-8"))
+
+    monkeypatch.setattr("src.generation.urllib.request.urlopen", fake_urlopen)
+    page = {"role": "system", "content": f"Here is the current page:\n\n{_PAGE}"}
+
+    for history in (
+        [page, {"role": "user", "content": "make it darker"}],
+        [
+            page,
+            {"role": "system", "content": "Edit only the header."},
+            {"role": "user", "content": "make it darker"},
+            {"role": "assistant", "content": "Updated."},
+            {"role": "user", "content": "and bolder"},
+        ],
+    ):
+        call_gemini(
+            model="anthropic/claude-sonnet",
+            genai=None,
+            messages=history,
+            temperature=0.2,
+            max_output_tokens=100,
+            analytics_file=str(analytics),
+            provider="openrouter",
+            api_key="or-key",
+            prompt_cache_ttl_seconds=300,
+        )
+
+    first, second = (payload["messages"][0]["content"] for payload in requests)
+    assert first[0]["cache_control"] == {"type": "ephemeral"}
+    assert first[0]["text"] == second[0]["text"]
+    assert first[0]["text"].endswith(_PAGE + "\n")
+    assert second[1]["text"].startswith("SYSTEM: Edit only the header.")
+    events = [json.loads(line) for line in analytics.read_text().splitlines()]
+    assert [event["cached_tokens"] for event in events] == [1200, 1200]
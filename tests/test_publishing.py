@@ -0,0 +1,229 @@
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from server.database import Database
+from server.models import UserRecord
+from server.projects import (
+    ProjectNotFoundError,
+    ProjectService,
+    ProjectValidationError,
+)
+from server.publish_routes import accepted_encodings, etag_matches
+from server.publishing import SitePublisher, page_path
+from src.document_compiler import compile_document
+from src.site_archive import MANIFEST_NAME
+from tests.editor_document import editor_document
+
+OWNER_ID = "00000000-0000-0000-0000-000000000010"
+OTHER_ID = "00000000-0000-0000-0000-000000000011"
+STYLE = "<style>.hero { color: #123456; padding: 2rem; }</style>"
+
+
+def _page(text: str) -> str:
+    body = f'<main class="hero"><h1>{text}</h1>' + "<p>Copy.</p>" * 40 + "</main>"
+    return f"<!doctype html><html><head>{STYLE}</head><body>{body}</body></html>"
+
+
+@pytest.fixture()
+def database(tmp_path) -> Database:
+    database = Database.from_url(f"sqlite:///{tmp_path / 'publish.db'}")
+    with database.sessions.begin() as session:
+        for owner_id in (OWNER_ID, OTHER_ID):
+            session.add(
+                UserRecord(
+                    id=owner_id,
+                    email=f"{owner_id}@example.test",
+                    password_hash="!test-account",
+                )
+            )
+    try:
+        yield database
+    finally:
+        database.close()
+
+
+@pytest.fixture()
+def projects(database: Database) -> ProjectService:
+    return ProjectService(database.sessions)
+
+
+@pytest.fixture()
+def publisher(database: Database, tmp_path) -> SitePublisher:
+    return SitePublisher(database.sessions, tmp_path / "publish")
+
+
+def _save(projects: ProjectService, page: dict, html: str) -> dict:
+    return projects.save_page(
+        OWNER_ID, page["id"], html, expected_version=page["version"]
+    )
+
+
+def test_page_paths_put_home_at_the_root() -> None:
+    assert page_path("home") == "index.html"
+    assert page_path("about") == "about/index.html"
+
+
+def test_publish_writes_an_immutable_build_and_makes_it_live(
+    projects: ProjectService, publisher: SitePublisher, tmp_path
+) -> None:
+    project = projects.create_project(OWNER_ID, "Site", _page("One"))
+
+    build = publisher.publish(OWNER_ID, project["id"])
+
+    build_dir = publisher.build_dir(build["digest"])
+    manifest = json.loads((build_dir / MANIFEST_NAME).read_bytes())
+    assert build["live"] is True
+    assert build["url"] == f"/sites/{project['id']}/"
+    assert build["revisions"] == {"home": project["pages"][0]["current_revision_id"]}
+    assert set(manifest["files"]) <= {
+        path.relative_to(build_dir).as_posix() for path in build_dir.rglob("*")
+    }
+    assert not any((tmp_path / "publish" / "tmp").iterdir())
+    live = publisher.resolve(project["id"], "")
+    assert live is not None and live.path == build_dir / "index.html"
+    assert b"One" in live.path.read_bytes()
+
+
+def test_identical_sites_share_one_build_directory(
+    projects: ProjectService, publisher: SitePublisher
+) -> None:
+    project = projects.create_project(OWNER_ID, "Site", _page("Same"))
+
+    first = publisher.publish(OWNER_ID, project["id"])
+    second = publisher.publish(OWNER_ID, project["id"])
+
+    assert first["id"] != second["id"]
+    assert first["digest"] == second["digest"]
+    builds = publisher.list_builds(OWNER_ID, project["id"])
+    assert [build["live"] for build in builds] == [True, False]
+
+
+def test_publishing_a_new_revision_leaves_the_old_build_untouched(
+    projects: ProjectService, publisher: SitePublisher
+) -> None:
+    project = projects.create_project(OWNER_ID, "Site", _page("Old"))
+    old = publisher.publish(OWNER_ID, project["id"])
+    old_files = {
+        path: path.read_bytes()
+        for path in publisher.build_dir(old["digest"]).rglob("*")
+        if path.is_file()
+    }
+    _save(projects, project["pages"][0], _page("New"))
+
+    new = publisher.publish(OWNER_ID, project["id"])
+
+    assert new["digest"] != old["digest"]
+    assert {path: path.read_bytes() for path in old_files} == old_files
+    live = publisher.resolve(project["id"], "index.html")
+    assert live is not None and b"New" in live.path.read_bytes()
+
+
+def test_rollback_repoints_to_the_previous_build(
+    projects: ProjectService, publisher: SitePublisher
+) -> None:
+    project = projects.create_project(OWNER_ID, "Site", _page("Old"))
+    old = publisher.publish(OWNER_ID, project["id"])
+    _save(projects, project["pages"][0], _page("New"))
+    publisher.publish(OWNER_ID, project["id"])
+
+    rolled_back = publisher.rollback(OWNER_ID, project["id"])
+
+    assert rolled_back["id"] == old["id"]
+    live = publisher.resolve(project["id"], "")
+    assert live is not None and b"Old" in live.path.read_bytes()
+    with pytest.raises(ProjectValidationError):
+        publisher.rollback(OWNER_ID, project["id"])
+
+
+def test_publish_can_pin_a_page_to_an_earlier_revision(
+    projects: ProjectService, publisher: SitePublisher
+) -> None:
+    project = projects.create_project(OWNER_ID, "Site", _page("First"))
+    first_revision = project["pages"][0]["current_revision_id"]
+    _save(projects, project["pages"][0], _page("Second"))
+
+    build = publisher.publish(OWNER_ID, project["id"], first_revision)
+
+    assert build["revisions"] == {"home": first_revision}
+    live = publisher.resolve(project["id"], "")
+    assert live is not None and b"First" in live.path.read_bytes()
+
+
+def test_publishing_is_owner_scoped(
+    projects: ProjectService, publisher: SitePublisher
+) -> None:
+    project = projects.create_project(OWNER_ID, "Site", _page("Mine"))
+    other = projects.create_project(OTHER_ID, "Theirs", _page("Theirs"))
+
+    with pytest.raises(ProjectNotFoundError):
+        publisher.publish(OTHER_ID, project["id"])
+    with pytest.raises(ProjectNotFoundError):
+        publisher.publish(
+            OWNER_ID, project["id"], other["pages"][0]["current_revision_id"]
+        )
+    build = publisher.publish(OWNER_ID, project["id"])
+    with pytest.raises(ProjectNotFoundError):
+        publisher.rollback(OTHER_ID, project["id"], build["id"])
+    with pytest.raises(ProjectNotFoundError):
+        publisher.list_builds(OTHER_ID, project["id"])
+
+
+def test_resolve_only_serves_manifest_files(
+    projects: ProjectService, publisher: SitePublisher
+) -> None:
+    project = projects.create_project(OWNER_ID, "Site", _page("One"))
+    assert publisher.resolve(project["id"], "") is None
+    build = publisher.publish(OWNER_ID, project["id"])
+    manifest = json.loads(
+        (publisher.build_dir(build["digest"]) / MANIFEST_NAME).read_bytes()
+    )
+    asset = next(path for path in manifest["files"] if path.startswith("assets/"))
+
+    page = publisher.resolve(project["id"], "index.html")
+    assert page is not None and not page.immutable
+    assert "gzip" in page.encodings
+    served_asset = publisher.resolve(project["id"], asset)
+    assert served_asset is not None and served_asset.immutable
+    for path in (MANIFEST_NAME, "index.html.gz", "../publish.db", "missing.html"):
+        assert publisher.resolve(project["id"], path) is None
+
+
+def test_archived_projects_are_not_served(
+    projects: ProjectService, publisher: SitePublisher
+) -> None:
+    project = projects.create_project(OWNER_ID, "Site", _page("One"))
+    publisher.publish(OWNER_ID, project["id"])
+
+    projects.archive_project(OWNER_ID, project["id"])
+
+    assert publisher.resolve(project["id"], "") is None
+
+
+def test_accept_encoding_honours_refusals() -> None:
+    assert accepted_encodings("gzip, br;q=0, deflate;q=0.5") == {"gzip", "deflate"}
+    assert accepted_encodings("") == set()
+
+
+def test_if_none_match_uses_the_weak_comparison() -> None:
+    assert etag_matches('W/"abc", "def"', '"abc"')
+    assert etag_matches("*", '"abc"')
+    assert not etag_matches('"abc-gzip"', '"abc"')
+
+
+def test_publish_compiles_pages_stored_as_documents_only(
+    projects: ProjectService, publisher: SitePublisher
+) -> None:
+    document = editor_document("published")
+    project = projects.create_project(
+        OWNER_ID, "Site", compile_document(document), document
+    )
+
+    build = publisher.publish(OWNER_ID, project["id"])
+
+    live = publisher.resolve(project["id"], "")
+    assert build["live"] is True
+    assert live is not None
+    assert b'data-mwb-id="published"' in live.path.read_bytes()
@@ -1,12 +1,19 @@
 from __future__ import annotations
 
 import sys
+import time
 import types
 from dataclasses import replace
 from typing import Any
 
+import pytest
+
 from server import runtime
+from src.circuit_breaker import BreakerPolicy
+from src.concurrency_limit import LimitPolicy
 from src.config import GEMINI_PROVIDER, OPENROUTER_PROVIDER, AppConfig
+from src.hedging import HedgePolicy
+from src.observability import collect_counters, count
 
 _CONFIG = AppConfig(
     api_key="gemini-key",
@@ -62,10 +69,57 @@ def test_build_client_configures_gemini_sdk(monkeypatch) -> None:
     client = runtime.build_client()
 
     assert client.config is _CONFIG
-    assert fake_genai.configured_key == "gemini-key"
-    assert isinstance(client.model, _FakeGenerativeModel)
+    # Nothing is imported or configured until a generation needs the SDK.
+    assert fake_genai.configured_key is None
+    assert not client.genai.loaded
     assert client.model.model_name == "gemini-2.5-flash"
-    assert client.genai is fake_genai
+
+    assert isinstance(client.model.load(), _FakeGenerativeModel)
+    assert fake_genai.configured_key == "gemini-key"
+    assert client.genai.load() is fake_genai
+    assert client.model.load() is client.model.load()
+
+
+def test_build_client_does_not_need_the_gemini_sdk_to_start(monkeypatch) -> None:
+    def missing_sdk(cfg: AppConfig) -> Any:
+        raise RuntimeError("Module 'google.generativeai' not installed.")
+
+    monkeypatch.setattr(runtime, "load_config", lambda: _CONFIG)
+    monkeypatch.setattr(runtime, "_import_genai", missing_sdk)
+
+    client = runtime.build_client()
+
+    assert runtime.ProviderTarget("gemini", client.model).key == (
+        "gemini:gemini-2.5-flash"
+    )
+    with pytest.raises(RuntimeError, match="not installed"):
+        client.model.generate_content  # noqa: B018 - first use imports the SDK
+
+
+def test_build_client_builds_the_fallback_chain(monkeypatch) -> None:
+    fake_genai = _FakeGenai()
+    config = replace(
+        _CONFIG,
+        provider=OPENROUTER_PROVIDER,
+        generation_fallback_models=(
+            ("gemini", "gemini-2.5-flash-lite"),
+            ("openrouter", "meta/llama"),
+        ),
+    )
+    monkeypatch.setattr(runtime, "load_config", lambda: config)
+    monkeypatch.setattr(runtime, "_import_genai", lambda cfg: fake_genai)
+
+    client = runtime.build_client()
+
+    assert client.genai is None
+    assert [target.key for target in client.fallbacks] == [
+        "gemini:gemini-2.5-flash-lite",
+        "openrouter:meta/llama",
+    ]
+    assert client.fallbacks[0].genai.load() is fake_genai
+    assert client.fallbacks[0].model_name == "gemini-2.5-flash-lite"
+    assert client.fallbacks[1].api_key == "or-key"
+    assert client.fallbacks[1].base_url == "https://proxy.example/v1"
 
 
 def test_generate_forwards_client_config(monkeypatch) -> None:
@@ -282,3 +336,396 @@ def test_generate_forwards_the_total_timeout(monkeypatch) -> None:
     )
 
     assert captured["total_timeout_seconds"] == 210
+
+
+def test_generate_forwards_the_prompt_budget_for_the_model(monkeypatch) -> None:
+    captured: dict[str, Any] = {}
+    monkeypatch.setattr(
+        runtime, "call_gemini", lambda **kwargs: captured.update(kwargs) or ""
+    )
+    client = runtime.GenerationClient(
+        config=replace(
+            _CONFIG,
+            prompt_token_budget=9000,
+            prompt_token_budgets=(("gemini-2.5-flash", 4000),),
+        ),
+        model="m",
+        genai=None,
+    )
+
+    runtime.generate(
+        client,
+        messages=[],
+        tone_key="minimal",
+        strict_minimal=False,
+        complexity_key="balanced",
+    )
+
+    assert captured["prompt_token_budget"] == 4000
+
+
+def test_runtime_forwards_the_prompt_cache_ttl(monkeypatch) -> None:
+    captured: dict[str, Any] = {}
+    monkeypatch.setattr(
+        runtime, "call_gemini", lambda **kwargs: captured.update(kwargs) or ""
+    )
+    monkeypatch.setattr(
+        runtime,
+        "call_gemini_for_section",
+        lambda **kwargs: (
+            captured.update(section_ttl=kwargs["prompt_cache_ttl_seconds"]) or ""
+        ),
+    )
+    client = runtime.GenerationClient(
+        config=replace(_CONFIG, prompt_cache_ttl_seconds=600), model="m", genai=None
+    )
+
+    runtime.generate(
+        client,
+        messages=[],
+        tone_key="minimal",
+        strict_minimal=False,
+        complexity_key="balanced",
+    )
+    runtime.regenerate_section(
+        client,
+        current_code="<html></html>",
+        section=object(),
+        instructions="",
+        tone_key="minimal",
+        strict_minimal=False,
+        complexity_key="balanced",
+    )
+
+    assert captured["prompt_cache_ttl_seconds"] == 600
+    assert captured["section_ttl"] == 600
+
+
+def test_generate_forwards_a_hedge_policy_only_when_enabled(monkeypatch) -> None:
+    captured: dict[str, Any] = {}
+    monkeypatch.setattr(
+        runtime, "call_gemini", lambda **kwargs: captured.update(kwargs) or ""
+    )
+    kwargs: dict[str, Any] = {
+        "messages": [],
+        "tone_key": "minimal",
+        "strict_minimal": False,
+        "complexity_key": "balanced",
+    }
+
+    runtime.generate(
+        runtime.GenerationClient(config=_CONFIG, model="m", genai=None), **kwargs
+    )
+    assert captured["hedge"] is None
+
+    hedged = replace(
+        _CONFIG,
+        generation_hedge_percentile=90,
+        generation_hedge_max_rate=0.05,
+        generation_hedge_model="backup",
+    )
+    runtime.generate(
+        runtime.GenerationClient(config=hedged, model="m", genai=None), **kwargs
+    )
+    assert captured["hedge"] == HedgePolicy(
+        percentile=90, max_rate=0.05, model="backup"
+    )
+
+
+def test_runtime_forwards_fallbacks_and_the_breaker_policy(monkeypatch) -> None:
+    captured: dict[str, Any] = {}
+    monkeypatch.setattr(
+        runtime, "call_gemini", lambda **kwargs: captured.update(kwargs) or ""
+    )
+
+    def fake_section(*args: Any, **kwargs: Any) -> str:
+        captured["section_fallbacks"] = kwargs["fallbacks"]
+        captured["section_breaker"] = kwargs["breaker"]
+        return ""
+
+    monkeypatch.setattr(runtime, "call_gemini_for_section", fake_section)
+    config = replace(
+        _CONFIG,
+        circuit_breaker_error_rate=0.3,
+        circuit_breaker_min_calls=8,
+        circuit_breaker_cooldown_seconds=12,
+    )
+    fallbacks = (runtime.ProviderTarget("openrouter", "backup"),)
+    client = runtime.GenerationClient(
+        config=config, model="m", genai=None, fallbacks=fallbacks
+    )
+
+    runtime.generate(
+        client,
+        messages=[],
+        tone_key="minimal",
+        strict_minimal=False,
+        complexity_key="balanced",
+    )
+    runtime.regenerate_section(
+        client,
+        current_code="<html></html>",
+        section=object(),
+        instructions="",
+        tone_key="minimal",
+        strict_minimal=False,
+        complexity_key="balanced",
+    )
+
+    policy = BreakerPolicy(error_rate=0.3, min_calls=8, cooldown_seconds=12)
+    assert captured["fallbacks"] == fallbacks
+    assert captured["breaker"] == policy
+    assert captured["section_fallbacks"] == fallbacks
+    assert captured["section_breaker"] == policy
+
+
+def test_generate_forwards_a_limit_policy_only_when_adaptive(monkeypatch) -> None:
+    captured: dict[str, Any] = {}
+    monkeypatch.setattr(
+        runtime, "call_gemini", lambda **kwargs: captured.update(kwargs) or ""
+    )
+    kwargs: dict[str, Any] = {
+        "messages": [],
+        "tone_key": "minimal",
+        "strict_minimal": False,
+        "complexity_key": "balanced",
+    }
+
+    runtime.generate(
+        runtime.GenerationClient(config=_CONFIG, model="m", genai=None), **kwargs
+    )
+    assert captured["limit"] is None
+
+    adaptive = replace(
+        _CONFIG,
+        generation_max_concurrency=3,
+        generation_concurrency_min=2,
+        generation_concurrency_max=10,
+    )
+    runtime.generate(
+        runtime.GenerationClient(config=adaptive, model="m", genai=None), **kwargs
+    )
+    assert captured["limit"] == LimitPolicy(min_limit=2, max_limit=10, initial_limit=3)
+
+
+_SIX_SECTIONS = ["hero", "features", "about", "pricing", "faq", "footer"]
+
+
+def _skeleton_for(sections: list[str]) -> str:
+    slots = "".join(
+        f'<{"footer" if key == "footer" else "section"} data-section="{key}">'
+        f"</{'footer' if key == 'footer' else 'section'}>"
+        for key in sections
+    )
+    return f"<html><head><style>:root{{}}</style></head><body>{slots}</body></html>"
+
+
+def _fake_section_call(delay: float, fail: str | None = None):
+    def regenerate_section(_client, *, section, **_kwargs) -> str:
+        key = section.html.split('"')[1]
+        count("section_calls")
+        time.sleep(delay)
+        if key == fail:
+            return "API error: overloaded"
+        return (
+            f'```html\n<{section.tag} data-section="{key}">{key}!</{section.tag}>\n```'
+        )
+
+    return regenerate_section
+
+
+def test_sections_are_generated_in_parallel_and_stitched_in_order(
+    monkeypatch,
+) -> None:
+    client = runtime.GenerationClient(config=_CONFIG, model=None, genai=None)
+    monkeypatch.setattr(
+        runtime, "generate", lambda *a, **k: _skeleton_for(_SIX_SECTIONS)
+    )
+    monkeypatch.setattr(runtime, "regenerate_section", _fake_section_call(0.3))
+    reports: list[dict[str, Any]] = []
+
+    started = time.perf_counter()
+    with collect_counters() as counters:
+        html = runtime.generate_sectionwise(
+            client,
+            messages=[{"role": "user", "content": "a bakery"}],
+            sections=_SIX_SECTIONS,
+            page_request="a bakery",
+            tone_key="minimal",
+            strict_minimal=False,
+            complexity_key="balanced",
+            on_progress=reports.append,
+        )
+    elapsed = time.perf_counter() - started
+
+    # Close to one section's latency, far from the 1.8s of six in a row.
+    assert elapsed < 0.9
+    positions = [html.index(f"{key}!") for key in _SIX_SECTIONS]
+    assert positions == sorted(positions)
+    assert counters["section_calls"] == 6
+    assert reports[0]["stage"] == "skeleton"
+    assert reports[-1]["stage"] == "stitching"
+    assert reports[-1]["completed"] == 6
+    assert {item["status"] for item in reports[-1]["sections"]} == {"done"}
+
+
+def test_a_failed_section_fails_the_page(monkeypatch) -> None:
+    client = runtime.GenerationClient(
+        config=replace(_CONFIG, generation_section_parallelism=1),
+        model=None,
+        genai=None,
+    )
+    monkeypatch.setattr(
+        runtime, "generate", lambda *a, **k: _skeleton_for(_SIX_SECTIONS)
+    )
+    monkeypatch.setattr(
+        runtime, "regenerate_section", _fake_section_call(0, fail="features")
+    )
+    reports: list[dict[str, Any]] = []
+
+    with collect_counters() as counters:
+        result = runtime.generate_sectionwise(
+            client,
+            messages=[{"role": "user", "content": "a bakery"}],
+            sections=_SIX_SECTIONS,
+            page_request="a bakery",
+            tone_key="minimal",
+            strict_minimal=False,
+            complexity_key="balanced",
+            on_progress=reports.append,
+        )
+
+    assert result == "API error: Features section: overloaded"
+    # One at a time, so the sections after the failure were never requested.
+    assert counters["section_calls"] == 2
+    assert reports[-1]["stage"] == "failed"
+
+
+def test_a_skeleton_without_slots_falls_back_to_one_call(monkeypatch) -> None:
+    client = runtime.GenerationClient(config=_CONFIG, model=None, genai=None)
+    calls: list[str] = []
+
+    def generate(_client, *, extra_guidance: str, **_kwargs) -> str:
+        calls.append(extra_guidance)
+        return "<html><body><main>whole page</main></body></html>"
+
+    monkeypatch.setattr(runtime, "generate", generate)
+
+    html = runtime.generate_sectionwise(
+        client,
+        messages=[{"role": "user", "content": "a bakery"}],
+        sections=["hero", "footer"],
+        page_request="a bakery",
+        tone_key="minimal",
+        strict_minimal=False,
+        complexity_key="balanced",
+    )
+
+    assert html == "<html><body><main>whole page</main></body></html>"
+    assert len(calls) == 2
+    assert "placeholders" in calls[0]
+    assert "placeholders" not in calls[1]
+
+
+def test_candidates_are_drafted_at_once(monkeypatch) -> None:
+    client = runtime.GenerationClient(config=_CONFIG, model=None, genai=None)
+    drafted = iter(["<main>one</main>", "API error: overloaded", "<main>three</main>"])
+
+    def generate(*_args, **_kwargs) -> str:
+        time.sleep(0.3)
+        return next(drafted)
+
+    monkeypatch.setattr(runtime, "generate", generate)
+    reports: list[dict[str, Any]] = []
+
+    started = time.perf_counter()
+    with collect_counters() as counters:
+        drafts = runtime.generate_candidates(
+            client,
+            candidates=3,
+            messages=[{"role": "user", "content": "a bakery"}],
+            tone_key="minimal",
+            strict_minimal=False,
+            complexity_key="balanced",
+            on_progress=reports.append,
+        )
+
+    assert time.perf_counter() - started < 0.6
+    assert sorted(drafts) == sorted(
+        ["<main>one</main>", "API error: overloaded", "<main>three</main>"]
+    )
+    assert counters["candidates"] == 3
+    assert counters["failed_candidates"] == 1
+    assert [report["completed"] for report in reports] == [1, 2, 3]
+
+
+def _timed_generate(delays: dict[str, float]):
+    drafted = iter(delays)
+
+    def generate(*_args, **_kwargs) -> str:
+        draft = next(drafted)
+        time.sleep(delays[draft])
+        return draft
+
+    return generate
+
+
+def test_drafting_stops_at_the_first_accepted_candidate(monkeypatch) -> None:
+    client = runtime.GenerationClient(config=_CONFIG, model=None, genai=None)
+    monkeypatch.setattr(
+        runtime,
+        "generate",
+        _timed_generate(
+            {"<main>weak</main>": 0.05, "<main>good</main>": 0.1}
+            | {"<main>slow</main>": 2.0}
+        ),
+    )
+    reports: list[dict[str, Any]] = []
+
+    started = time.perf_counter()
+    with collect_counters() as counters:
+        drafts = runtime.generate_candidates(
+            client,
+            candidates=3,
+            messages=[{"role": "user", "content": "a bakery"}],
+            tone_key="minimal",
+            strict_minimal=False,
+            complexity_key="balanced",
+            accept=lambda raw: "good" in raw,
+            on_progress=reports.append,
+        )
+
+    assert time.perf_counter() - started < 1.0
+    assert drafts == ["<main>weak</main>", "<main>good</main>"]
+    assert counters["abandoned_candidates"] == 1
+    time.sleep(2.1)
+    assert [report["completed"] for report in reports] == [1, 2]
+
+
+def test_drafting_returns_what_it_has_at_the_deadline(monkeypatch) -> None:
+    client = runtime.GenerationClient(config=_CONFIG, model=None, genai=None)
+    monkeypatch.setattr(
+        runtime,
+        "generate",
+        _timed_generate(
+            {"API error: overloaded": 0.0, "<main>weak</main>": 0.2}
+            | {"<main>slow</main>": 2.0}
+        ),
+    )
+
+    started = time.perf_counter()
+    drafts = runtime.generate_candidates(
+        client,
+        candidates=3,
+        messages=[{"role": "user", "content": "a bakery"}],
+        tone_key="minimal",
+        strict_minimal=False,
+        complexity_key="balanced",
+        accept=lambda _raw: False,
+        deadline_seconds=0.1,
+    )
+
+    # The deadline passed before any draft succeeded, so the first success
+    # is waited for, and nothing after it.
+    assert 0.2 <= time.perf_counter() - started < 1.0
+    assert drafts == ["API error: overloaded", "<main>weak</main>"]
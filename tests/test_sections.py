@@ -121,6 +121,19 @@ def test_extract_sections_handles_top_level_self_closing_element() -> None:
     assert sections[1].html == "<main>one</main>"
 
 
+def test_extract_sections_handles_void_elements_without_a_slash() -> None:
+    html = (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"></head>'
+        "<body><header><img src='x'>a<br>b</header><hr><footer>f</footer></body>"
+        "</html>"
+    )
+    sections = extract_sections(html)
+
+    assert [s.tag for s in sections] == ["header", "hr", "footer"]
+    assert sections[0].html == "<header><img src='x'>a<br>b</header>"
+    assert html[sections[2].start : sections[2].end] == "<footer>f</footer>"
+
+
 def test_extract_first_top_level_skips_wrappers() -> None:
     html = "<html><body><section>one</section><footer>two</footer></body></html>"
     assert extract_first_top_level(html) == "<section>one</section>"
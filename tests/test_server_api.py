@@ -1,6 +1,10 @@
 from __future__ import annotations
 
+import io
+import json
+import threading
 import time
+import zipfile
 from dataclasses import replace
 
 import pytest
@@ -11,10 +15,14 @@ from server.auth import AuthService
 from server.controls import RequestControlService
 from server.database import Database
 from server.main import app
+from server.media import MediaLibrary
 from server.orchestrator import GenerationOrchestrator
 from server.projects import ProjectService
+from server.publishing import SitePublisher
 from server.runtime import GenerationClient
 from src.config import AppConfig
+from src.perf_audit import PerfBudget, audit_page_weight
+from src.profiles import GenerationProfile
 from tests.editor_document import editor_document
 
 
@@ -42,8 +50,14 @@ def client(monkeypatch: pytest.MonkeyPatch, tmp_path):
     database = Database.from_url(cfg.database_url)
     app.state.database = database
     app.state.auth = AuthService(database.sessions, session_hours=cfg.session_hours)
-    app.state.projects = ProjectService(database.sessions)
+    app.state.media = MediaLibrary(
+        database.sessions, tmp_path / "media", workers=1, max_upload_bytes=4096
+    )
+    app.state.projects = ProjectService(database.sessions, media=app.state.media)
     app.state.assets = ReusableAssetService(database.sessions)
+    app.state.publisher = SitePublisher(
+        database.sessions, tmp_path / "publish", media=app.state.media
+    )
     app.state.orchestrator = GenerationOrchestrator(database.sessions)
     app.state.controls = RequestControlService(database.sessions)
     test_client = TestClient(app)
@@ -56,6 +70,7 @@ def client(monkeypatch: pytest.MonkeyPatch, tmp_path):
         yield test_client
     finally:
         test_client.close()
+        app.state.media.shutdown()
         database.close()
 
 
@@ -85,6 +100,9 @@ def test_health(client: TestClient) -> None:
     assert j["ok"] is True
     assert j["provider"] == "openrouter"
     assert j["has_key"] is True
+    assert j["fallback_models"] == []
+    assert j["circuit_breakers"] == []
+    assert j["provider_concurrency"] == []
 
 
 def test_options_shape(client: TestClient) -> None:
@@ -130,12 +148,58 @@ def test_generate_uses_mocked_output(
     result = job["result"]
     assert "<h1>Hi</h1>" in result["html"]
     assert result["settings"]["tone"] == "minimal"
+    assert result["perf"]["dom_nodes"] == 3
+    assert result["perf"]["violations"] == []
+    assert job["metrics"]["perf_violations"] == []
     checkpoint = client.get("/api/conversations/generate-thread").json()
     assert checkpoint["current_code"] == result["html"]
     jobs = client.get("/api/generation-jobs").json()["jobs"]
     assert jobs[0]["operation"] == "generate"
 
 
+def test_generate_notes_page_weight_over_the_profile_budget(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    lean = GenerationProfile(
+        id="lean",
+        label="Lean",
+        description="",
+        tone_key="minimal",
+        complexity_key="compact",
+        strict_minimal=True,
+        extra_guidance="",
+        perf_budget=PerfBudget(max_dom_nodes=600),
+    )
+    monkeypatch.setattr(app.state, "profiles", [lean])
+    items = "".join(f"<li>Item {n}</li>" for n in range(700))
+    monkeypatch.setattr(
+        "server.main.generate",
+        lambda *a, **k: f"<!doctype html><html><body><ul>{items}</ul></body></html>",
+    )
+    audits: list[str] = []
+
+    def counting_audit(html, budget):
+        audits.append(html)
+        return audit_page_weight(html, budget)
+
+    monkeypatch.setattr("server.main.audit_page_weight", counting_audit)
+
+    job = run_generation(
+        client, "/api/generate", {"prompt": "a long list", "profile": "lean"}
+    )
+
+    result = job["result"]
+    assert len(audits) == 1
+    assert result["perf"]["dom_nodes"] == 703
+    assert (
+        "Page weight: element count is 703, over the budget of 600."
+        in (result["notes"])
+    )
+    assert job["metrics"]["perf_violations"] == ["dom_nodes"]
+    stats = client.get("/api/generation-jobs/stats").json()
+    assert stats["page_weight"]["violations"] == {"dom_nodes": 1}
+
+
 def test_generate_rejects_empty_prompt(client: TestClient) -> None:
     r = client.post("/api/generate", json={"prompt": "   "})
     assert r.status_code == 400
@@ -240,6 +304,82 @@ def test_export_single_and_split(client: TestClient) -> None:
     assert "color:red" in j["files"]["styles.css"]
 
 
+def test_export_optimize_reports_savings(client: TestClient) -> None:
+    html = (
+        "<!doctype html><html><head><style>\n  .hero { color: red; }\n"
+        "  .gone { color: blue; }\n</style></head>\n<body>\n"
+        '  <section class="hero">Hi</section>\n</body></html>'
+    )
+
+    r = client.post(
+        "/api/export", json={"html": html, "mode": "split", "optimize": True}
+    )
+
+    assert r.status_code == 200
+    body = r.json()
+    assert body["files"]["styles.css"] == ".hero{color:red}"
+    assert body["removed_css_rules"] == 1
+    savings = {item["name"]: item for item in body["savings"]}
+    assert savings["styles.css"]["saved_bytes"] > 0
+    assert (
+        savings["index.html"]["optimized_bytes"]
+        < savings["index.html"]["original_bytes"]
+    )
+
+    assert body["svg_sprite"] == {"symbols": 0, "replaced": 0, "saved_bytes": 0}
+
+    r = client.post("/api/export", json={"html": html, "optimize": True})
+    assert ".gone" not in r.json()["files"]["index.html"]
+    assert [item["name"] for item in r.json()["savings"]] == ["index.html"]
+
+
+def test_export_split_can_inline_critical_css(client: TestClient) -> None:
+    html = (
+        "<!doctype html><html><head><style>.hero { color: red; }\n"
+        + "".join(f".late-{n} {{ color: blue; }}\n" for n in range(20))
+        + "</style></head><body>"
+        '<section class="hero">Hi</section><section>Two</section>'
+        '<footer class="late-1">Bye</footer></body></html>'
+    )
+
+    r = client.post(
+        "/api/export", json={"html": html, "mode": "split", "critical_css": True}
+    )
+
+    assert r.status_code == 200
+    body = r.json()
+    index_html = body["files"]["index.html"]
+    assert "<style>.hero{color:red}</style>" in index_html
+    assert 'media="print"' in index_html
+    assert ".late-1" in body["files"]["styles.css"]
+    report = body["critical_css"]
+    assert report["sections"] == 2
+    assert report["first_paint_bytes_after"] < report["first_paint_bytes_before"]
+
+    r = client.post("/api/export", json={"html": html, "mode": "split"})
+    assert "critical_css" not in r.json()
+
+
+def test_export_zip_streams_an_archive(client: TestClient) -> None:
+    styles = "h1 { color: red; }\n" * 30
+    html = (
+        f"<!doctype html><html><head><style>{styles}</style></head>"
+        "<body><h1>Hi</h1></body></html>"
+    )
+
+    r = client.post("/api/export", json={"html": html, "mode": "zip"})
+
+    assert r.status_code == 200
+    assert r.headers["content-type"] == "application/zip"
+    assert "site.zip" in r.headers["content-disposition"]
+    archive = zipfile.ZipFile(io.BytesIO(r.content))
+    manifest = json.loads(archive.read("manifest.json"))
+    stylesheet = manifest["pages"]["index.html"]["styles.css"]
+    assert f'href="{stylesheet}"' in archive.read("index.html").decode()
+    assert archive.read(stylesheet).decode() == styles.strip()
+    assert f"{stylesheet}.gz" in archive.namelist()
+
+
 def test_templates_round_trip(client: TestClient) -> None:
     r = client.post("/api/templates", json={"name": "my-page", "html": "<html></html>"})
     assert r.status_code == 200
@@ -301,6 +441,25 @@ def test_chat_checkpoint_and_job_are_durable(client: TestClient) -> None:
     assert jobs[0]["status"] == "succeeded"
 
 
+def test_conversation_endpoint_pages_through_messages(client: TestClient) -> None:
+    for turn in range(2):
+        run_generation(
+            client, "/api/chat", {"message": f"hello {turn}", "thread_id": "paged"}
+        )
+
+    latest = client.get("/api/conversations/paged", params={"limit": 2}).json()
+    assert [item["role"] for item in latest["messages"]] == ["user", "assistant"]
+    assert latest["messages"][0]["content"] == "hello 1"
+    assert latest["next_before"] == 3
+
+    older = client.get(
+        "/api/conversations/paged", params={"limit": 2, "before": 3}
+    ).json()
+    assert older["messages"][0]["content"] == "hello 0"
+    assert older["next_before"] is None
+    assert client.get("/api/conversations/paged?limit=0").status_code == 422
+
+
 def test_chat_rejects_a_missing_scoped_editor_node(client: TestClient) -> None:
     response = client.post(
         "/api/chat",
@@ -402,6 +561,134 @@ def test_project_revision_api_round_trip(client: TestClient) -> None:
     assert created["id"] not in project_ids
 
 
+def test_publish_serves_the_live_build_and_rolls_back(client: TestClient) -> None:
+    page = (
+        "<!doctype html><html><head><style>.hero { color: red; }</style></head>"
+        '<body><main class="hero">' + "<p>Published copy.</p>" * 30 + "</main>"
+        "</body></html>"
+    )
+    project = client.post("/api/projects", json={"name": "Site", "html": page}).json()
+    first = client.post(f"/api/projects/{project['id']}/publish", json={})
+    assert first.status_code == 201
+    site = first.json()["url"]
+
+    home = client.get(site, headers={"Accept-Encoding": "gzip"})
+    assert home.status_code == 200
+    assert home.headers["content-encoding"] == "gzip"
+    assert "Accept-Encoding" in home.headers["vary"]
+    assert home.headers["cache-control"] == "public, max-age=0, must-revalidate"
+    assert home.headers["content-security-policy"] == (
+        "sandbox allow-scripts allow-forms allow-popups"
+    )
+    assert "Published copy." in home.text
+    plain = client.get(site, headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in plain.headers
+    assert plain.headers["etag"] != home.headers["etag"]
+    unchanged = client.get(
+        site,
+        headers={"Accept-Encoding": "gzip", "If-None-Match": home.headers["etag"]},
+    )
+    assert unchanged.status_code == 304
+    assert unchanged.headers["content-security-policy"] == (
+        "sandbox allow-scripts allow-forms allow-popups"
+    )
+
+    stylesheet = next(
+        part.split('"')[0]
+        for part in home.text.split('href="')[1:]
+        if part.startswith("assets/")
+    )
+    asset = client.get(site + stylesheet)
+    assert asset.status_code == 200
+    assert asset.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert client.get(site + "manifest.json").status_code == 404
+    assert client.get(site.rstrip("/"), follow_redirects=False).status_code == 308
+
+    saved = client.put(
+        f"/api/pages/{project['pages'][0]['id']}/document",
+        json={"html": page.replace("Published", "Updated"), "expected_version": 1},
+    )
+    assert saved.status_code == 200
+    client.post(f"/api/projects/{project['id']}/publish", json={})
+    assert "Updated copy." in client.get(site).text
+
+    rolled_back = client.post(f"/api/projects/{project['id']}/rollback", json={})
+    assert rolled_back.json()["id"] == first.json()["id"]
+    assert "Published copy." in client.get(site).text
+    builds = client.get(f"/api/projects/{project['id']}/builds").json()["builds"]
+    assert [build["live"] for build in builds] == [False, True]
+
+
+def test_page_delta_save_round_trip(client: TestClient) -> None:
+    project = client.post(
+        "/api/projects",
+        json={
+            "name": "Delta",
+            "html": "<main>Hello</main>",
+            "document": editor_document(),
+        },
+    ).json()
+    page_id = project["pages"][0]["id"]
+
+    saved = client.patch(
+        f"/api/pages/{page_id}/document",
+        json={
+            "expected_version": 1,
+            "html_edits": [{"start": 6, "end": 11, "text": "Hi"}],
+            "document_patch": [
+                {"op": "replace", "path": "/body/0/children/0/value", "value": "Hi"}
+            ],
+        },
+    )
+    assert saved.status_code == 200
+    assert saved.json()["version"] == 2
+    assert "html" not in saved.json()
+    page = client.get(f"/api/pages/{page_id}").json()
+    assert page["html"] == "<main>Hi</main>"
+    assert page["document"]["body"][0]["children"][0]["value"] == "Hi"
+
+    stale = client.patch(
+        f"/api/pages/{page_id}/document",
+        json={"expected_version": 1, "html_edits": [{"start": 0, "end": 0}]},
+    )
+    assert stale.status_code == 409
+    bad = client.patch(
+        f"/api/pages/{page_id}/document",
+        json={"expected_version": 2, "html_edits": [{"start": 0, "end": 999}]},
+    )
+    assert bad.status_code == 400
+
+
+def test_media_upload_list_and_serve(client: TestClient) -> None:
+    svg = b'<svg xmlns="http://www.w3.org/2000/svg"><circle r="4"/></svg>'
+    uploaded = client.post("/api/media", content=svg, headers={"X-Filename": "dot.svg"})
+    assert uploaded.status_code == 201
+    asset = uploaded.json()
+    assert asset["content_type"] == "image/svg+xml"
+    assert asset["filename"] == "dot.svg"
+    listed = client.get("/api/media").json()["assets"]
+    assert [item["id"] for item in listed] == [asset["id"]]
+    assert client.get(f"/api/media/{asset['id']}").json()["url"] == asset["url"]
+
+    served = client.get(asset["url"])
+    assert served.status_code == 200
+    assert served.content == svg
+    assert served.headers["content-type"].startswith("image/svg+xml")
+    assert served.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert served.headers["x-content-type-options"] == "nosniff"
+    assert "sandbox" in served.headers["content-security-policy"]
+    cached = client.get(asset["url"], headers={"If-None-Match": served.headers["etag"]})
+    assert cached.status_code == 304
+    assert client.get(f"/media/{asset['id']}/original.png").status_code == 404
+
+    assert client.post("/api/media", content=b"%PDF-1.7").status_code == 400
+    too_large = client.post("/api/media", content=svg + b" " * 4096)
+    assert too_large.status_code == 413
+    client.post("/api/auth/logout")
+    assert client.get("/api/media").status_code == 401
+    assert client.get(asset["url"]).status_code == 200
+
+
 def test_project_api_rejects_invalid_structured_document(client: TestClient) -> None:
     response = client.post(
         "/api/projects",
@@ -589,6 +876,39 @@ def test_unknown_job_is_reported_as_missing(client: TestClient) -> None:
     assert client.post("/api/generation-jobs/does-not-exist/cancel").status_code == 404
 
 
+def test_job_status_carries_an_etag_that_short_circuits_unchanged_reads(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(
+        "server.main.generate",
+        lambda *a, **k: "<!doctype html><html><body><h1>Hi</h1></body></html>",
+    )
+    job = run_generation(client, "/api/generate", {"prompt": "a landing page"})
+    url = f"/api/generation-jobs/{job['id']}"
+
+    first = client.get(url)
+    etag = first.headers["etag"]
+    assert etag == f'"{job["version"]}"'
+
+    # A settled job never changes, so even a long wait answers at once.
+    started = time.perf_counter()
+    unchanged = client.get(f"{url}?wait=20", headers={"If-None-Match": etag})
+    assert unchanged.status_code == 304
+    assert unchanged.headers["etag"] == etag
+    assert not unchanged.content
+    assert time.perf_counter() - started < 5
+
+    stale = client.get(url, headers={"If-None-Match": 'W/"stale"'})
+    assert stale.status_code == 200
+    assert stale.json()["status"] == "succeeded"
+
+
+def test_job_status_wait_is_bounded(client: TestClient) -> None:
+    assert client.get("/api/generation-jobs/x?wait=31").status_code == 422
+    assert client.get("/api/generation-jobs/x?wait=-1").status_code == 422
+    assert client.get("/api/generation-jobs/x?wait=1").status_code == 404
+
+
 def test_cancelling_a_settled_job_reports_its_final_state(
     client: TestClient, monkeypatch: pytest.MonkeyPatch
 ) -> None:
@@ -619,3 +939,163 @@ def test_repeating_an_idempotent_submission_reuses_the_same_job(
     second = client.post("/api/generate", json=payload, headers=headers)
 
     assert first.json()["job_id"] == second.json()["job_id"]
+
+
+def test_generate_writes_constraint_sections_in_parallel(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(
+        "server.runtime.generate",
+        lambda *a, **k: (
+            "<!doctype html><html><head><style>:root{}</style></head><body>"
+            '<section data-section="hero"></section>'
+            '<footer data-section="footer"></footer></body></html>'
+        ),
+    )
+
+    def regenerate_section(_client, *, section, instructions, **_kwargs) -> str:
+        assert "Page request: Generate a complete website" in instructions
+        return section.html.replace("><", ">Written<", 1)
+
+    monkeypatch.setattr("server.runtime.regenerate_section", regenerate_section)
+
+    job = run_generation(
+        client,
+        "/api/generate",
+        {"constraints": {"sections": ["hero", "footer"]}, "parallel_sections": True},
+    )
+
+    assert job["status"] == "succeeded", job["error"]
+    html = job["result"]["html"]
+    assert '<section data-section="hero">Written</section>' in html
+    assert '<footer data-section="footer">Written</footer>' in html
+    assert job["progress"]["completed"] == 2
+    assert [item["key"] for item in job["progress"]["sections"]] == ["hero", "footer"]
+
+
+def test_generate_drafts_candidates_and_returns_the_best(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    filler = "<p>" + "Fresh bread every morning. " * 60 + "</p>"
+    good = (
+        '<!doctype html><html lang="en"><head><title>Bakery</title></head><body>'
+        f"<header><h1>Bakery</h1></header><main>{filler}</main>"
+        "<footer>Hi</footer></body></html>"
+    )
+    framed = good.replace("<main>", '<main><iframe src="https://x.test"></iframe>')
+    drafts = iter([framed, "API error: overloaded", good])
+
+    def generate(*_args, **_kwargs) -> str:
+        draft = next(drafts)
+        if draft == good:
+            # Finishes last, so the weaker drafts are already in.
+            time.sleep(0.2)
+        return draft
+
+    monkeypatch.setattr("server.runtime.generate", generate)
+
+    job = run_generation(
+        client, "/api/generate", {"prompt": "a bakery landing page", "candidates": 3}
+    )
+
+    assert job["status"] == "succeeded", job["error"]
+    result = job["result"]
+    assert result["html"] == good
+    assert result["score"]["penalty"] == 0
+    assert [item["safety_alerts"] for item in result["alternatives"]] == [
+        ["Removed disallowed container tags (iframe/frame/object/embed)."]
+    ]
+    assert job["metrics"]["failed_candidates"] == 1
+
+
+def test_a_draft_with_only_advisory_notes_is_returned_without_waiting(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    filler = "<p>" + "Fresh bread every morning. " * 60 + "</p>"
+    page = (
+        '<!doctype html><html lang="en"><head><title>Bakery</title></head><body>'
+        '<header><h1>Bakery</h1></header><main><img src="/loaf.jpg">'
+        f'{filler}<button type="button">Order</button></main>'
+        "<footer>Hi</footer></body></html>"
+    )
+    slow = threading.Event()
+    drafts = iter([page, "slow"])
+
+    def generate(*_args, **_kwargs) -> str:
+        draft = next(drafts)
+        if draft == "slow":
+            slow.wait(timeout=10)
+        return draft
+
+    monkeypatch.setattr("server.runtime.generate", generate)
+
+    try:
+        job = run_generation(
+            client,
+            "/api/generate",
+            {"prompt": "a bakery landing page", "candidates": 2},
+        )
+    finally:
+        slow.set()
+
+    assert job["status"] == "succeeded", job["error"]
+    result = job["result"]
+    assert result["html"] == page
+    assert result["notes"]
+    assert "alternatives" not in result
+    assert job["metrics"]["abandoned_candidates"] == 1
+
+
+def test_refinements_are_drafted_once_whatever_candidates_asks(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    calls: list[int] = []
+
+    def generate(*_args, **_kwargs) -> str:
+        calls.append(1)
+        return "<!doctype html><html><body><h1>Blue</h1></body></html>"
+
+    monkeypatch.setattr("server.main.generate", generate)
+    monkeypatch.setattr("server.runtime.generate", generate)
+
+    job = run_generation(
+        client,
+        "/api/generate",
+        {
+            "prompt": "make the heading blue",
+            "current_code": "<!doctype html><html><body><h1>Hi</h1></body></html>",
+            "candidates": 3,
+        },
+    )
+
+    assert job["status"] == "succeeded", job["error"]
+    assert len(calls) == 1
+    assert "alternatives" not in job["result"]
+
+
+def test_generate_caps_candidates_at_the_configured_maximum(
+    client: TestClient, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    app.state.client = replace(
+        app.state.client,
+        config=replace(app.state.client.config, generation_max_candidates=1),
+    )
+    calls: list[int] = []
+
+    def generate(*_args, **_kwargs) -> str:
+        calls.append(1)
+        return "<!doctype html><html><body><h1>Hi</h1></body></html>"
+
+    monkeypatch.setattr("server.main.generate", generate)
+
+    job = run_generation(
+        client, "/api/generate", {"prompt": "a bakery landing page", "candidates": 4}
+    )
+
+    assert job["status"] == "succeeded"
+    assert len(calls) == 1
+    assert "alternatives" not in job["result"]
+    assert (
+        client.post("/api/generate", json={"prompt": "x", "candidates": 9}).status_code
+        == 422
+    )
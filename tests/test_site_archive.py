@@ -0,0 +1,152 @@
+from __future__ import annotations
+
+import gzip
+import io
+import json
+import zipfile
+
+import pytest
+
+from src.site_archive import (
+    MANIFEST_NAME,
+    MIN_PRECOMPRESS_BYTES,
+    SitePage,
+    content_hash,
+    hashed_name,
+    precompress,
+    site_files,
+    stream_site_archive,
+)
+
+STAMP = (2026, 1, 2, 3, 4, 5)
+STYLES = "h1 { color: #222; }\n" * 40
+SCRIPT = "console.log('hi');\n" * 40
+PAGE = (
+    f"<!DOCTYPE html><html><head><style>{STYLES}</style></head>"
+    f"<body><h1>Hello</h1><script>{SCRIPT}</script></body></html>"
+)
+
+
+def _archive(pages: list[SitePage]) -> tuple[zipfile.ZipFile, list[bytes]]:
+    chunks = list(stream_site_archive(pages, date_time=STAMP))
+    return zipfile.ZipFile(io.BytesIO(b"".join(chunks))), chunks
+
+
+def test_hashed_names_follow_the_content() -> None:
+    assert hashed_name("styles.css", b"a{}") == f"styles.{content_hash(b'a{}')}.css"
+    assert hashed_name("styles.css", b"a{}") != hashed_name("styles.css", b"b{}")
+
+
+def test_the_archive_holds_hashed_assets_and_rewritten_references() -> None:
+    archive, _ = _archive([SitePage("index.html", PAGE)])
+
+    assert archive.testzip() is None
+    manifest = json.loads(archive.read(MANIFEST_NAME))
+    assets = manifest["pages"]["index.html"]
+    stylesheet, script = assets["styles.css"], assets["app.js"]
+    assert stylesheet == f"assets/{hashed_name('styles.css', STYLES.strip().encode())}"
+    index = archive.read("index.html").decode()
+    assert f'href="{stylesheet}"' in index
+    assert f'src="{script}"' in index
+    assert archive.read(script).decode() == SCRIPT.strip()
+
+
+def test_text_files_get_precompressed_siblings_in_the_manifest() -> None:
+    archive, _ = _archive([SitePage("index.html", PAGE)])
+    files = json.loads(archive.read(MANIFEST_NAME))["files"]
+
+    compressed = 0
+    for path, entry in files.items():
+        data = archive.read(path)
+        assert entry["size"] == len(data)
+        if len(data) < MIN_PRECOMPRESS_BYTES:
+            assert entry["encodings"] == {}
+            continue
+        compressed += 1
+        gz = entry["encodings"]["gzip"]
+        assert gz == f"{path}.gz"
+        assert gzip.decompress(archive.read(gz)) == data
+        # Compressed siblings are stored, not deflated a second time.
+        assert archive.getinfo(gz).compress_type == zipfile.ZIP_STORED
+    assert compressed == 2
+    assert files["index.html"]["content_type"].startswith("text/html")
+
+
+def test_brotli_siblings_when_brotli_is_installed() -> None:
+    brotli = pytest.importorskip("brotli")
+    variants = precompress(STYLES.encode())
+
+    assert brotli.decompress(variants["br"]) == STYLES.encode()
+
+
+def test_small_files_are_not_precompressed() -> None:
+    assert precompress(b"x" * (MIN_PRECOMPRESS_BYTES - 1)) == {}
+
+
+def test_pages_share_assets_and_link_them_relatively() -> None:
+    archive, _ = _archive(
+        [SitePage("index.html", PAGE), SitePage("about/index.html", PAGE)]
+    )
+
+    names = archive.namelist()
+    stylesheet = json.loads(archive.read(MANIFEST_NAME))["pages"]["about/index.html"][
+        "styles.css"
+    ]
+    assert names.count(stylesheet) == 1
+    assert f'href="../{stylesheet}"' in archive.read("about/index.html").decode()
+
+
+def test_the_archive_is_streamed_a_file_at_a_time() -> None:
+    pages = [SitePage(f"page-{n}/index.html", PAGE + f"<!-- {n} -->") for n in range(5)]
+
+    _, chunks = _archive(pages)
+
+    # One chunk per file (pages, shared assets, precompressed siblings and the
+    # manifest) and the central directory at the end.
+    assert len(chunks) == len(list(site_files(pages))) + 1
+    assert max(len(chunk) for chunk in chunks) < len(PAGE)
+
+
+@pytest.mark.parametrize(
+    "path",
+    ["/index.html", "../index.html", "about/../index.html", "assets/x.html", "x.css"],
+)
+def test_unusable_page_paths_are_rejected(path: str) -> None:
+    with pytest.raises(ValueError):
+        SitePage(path, PAGE)
+
+
+def test_optimized_archives_are_minified_and_report_savings() -> None:
+    page = PAGE.replace("</style>", ".unused-card { color: blue; }</style>")
+
+    archive, _ = _archive_optimized([SitePage("index.html", page)])
+
+    manifest = json.loads(archive.read(MANIFEST_NAME))
+    report = manifest["optimization"]["index.html"]
+    assert report["removed_css_rules"] == 1
+    assert {item["name"] for item in report["files"]} == {
+        "index.html",
+        "styles.css",
+        "app.js",
+    }
+    stylesheet = archive.read(manifest["pages"]["index.html"]["styles.css"]).decode()
+    assert ".unused-card" not in stylesheet
+    assert "\n" not in stylesheet
+
+
+def _archive_optimized(pages: list[SitePage]) -> tuple[zipfile.ZipFile, list[bytes]]:
+    chunks = list(stream_site_archive(pages, date_time=STAMP, optimize=True))
+    return zipfile.ZipFile(io.BytesIO(b"".join(chunks))), chunks
+
+
+def test_site_files_end_with_a_deterministic_manifest() -> None:
+    pages = [SitePage("index.html", PAGE), SitePage("about/index.html", PAGE)]
+
+    first = list(site_files(pages))
+    second = list(site_files(pages))
+
+    assert first[-1].path == MANIFEST_NAME
+    assert first[-1].data == second[-1].data
+    assert all(
+        file.path.endswith((".gz", ".br")) for file in first if file.precompressed
+    )
@@ -0,0 +1,76 @@
+import pytest
+
+from src.sections import extract_sections
+from src.skeleton import (
+    SkeletonError,
+    build_skeleton_guidance,
+    section_instructions,
+    skeleton_slots,
+    slot_keys,
+    stitch,
+)
+
+SKELETON = (
+    "<!doctype html><html><head><style>:root{--accent:#222}</style></head><body>"
+    '<section data-section="hero"></section>'
+    '<section data-section="pricing"></section>'
+    '<footer data-section="footer"></footer>'
+    "<script>document.body.dataset.ready = '1'</script>"
+    "</body></html>"
+)
+
+
+def test_slot_keys_drop_duplicates_and_unusable_keys() -> None:
+    assert slot_keys(["Hero", "hero", " pricing ", "<b>", "", "footer"]) == [
+        "hero",
+        "pricing",
+        "footer",
+    ]
+
+
+def test_guidance_lists_one_placeholder_per_section_in_order() -> None:
+    guidance = build_skeleton_guidance(["hero", "footer"])
+
+    assert guidance.index('<section data-section="hero"></section>') < guidance.index(
+        '<footer data-section="footer"></footer>'
+    )
+    assert "Hero" in section_instructions("hero", "a bakery")
+    assert "a bakery" in section_instructions("hero", "a bakery")
+
+
+def test_slots_are_found_among_the_top_level_sections() -> None:
+    slots = skeleton_slots(SKELETON, ["footer", "hero", "pricing"])
+
+    assert {key: slot.tag for key, slot in slots.items()} == {
+        "footer": "footer",
+        "hero": "section",
+        "pricing": "section",
+    }
+
+
+def test_a_missing_slot_is_an_error() -> None:
+    with pytest.raises(SkeletonError, match="faq"):
+        skeleton_slots(SKELETON, ["hero", "faq"])
+
+
+def test_stitch_fills_every_slot_and_keeps_the_rest_of_the_page() -> None:
+    slots = skeleton_slots(SKELETON, ["hero", "pricing", "footer"])
+
+    page = stitch(
+        SKELETON,
+        slots,
+        {
+            "hero": '<section data-section="hero"><h1>Bread</h1></section>',
+            "pricing": '<section data-section="pricing"><p>$4</p></section>',
+            "footer": '<footer data-section="footer">Bye</footer>',
+        },
+    )
+
+    assert [section.tag for section in extract_sections(page)] == [
+        "section",
+        "section",
+        "footer",
+    ]
+    assert page.index("Bread") < page.index("$4") < page.index("Bye")
+    assert "--accent:#222" in page
+    assert "dataset.ready" in page
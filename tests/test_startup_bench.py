@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import tempfile
+
+from tools.startup_bench import (
+    LAZY_MODULES,
+    StartupReport,
+    format_report,
+    over_budget,
+    run,
+)
+
+
+def _report(**overrides) -> StartupReport:
+    values = {
+        "import_ms": 400.0,
+        "first_request_ms": 600.0,
+        "lazy_loaded": (),
+        "rounds": 3,
+    }
+    values.update(overrides)
+    return StartupReport(**values)
+
+
+def test_a_report_within_budget_passes() -> None:
+    assert over_budget(_report(), max_import_ms=500, max_first_request_ms=700) == []
+
+
+def test_slow_startup_and_eager_imports_are_reported() -> None:
+    problems = over_budget(
+        _report(import_ms=900.0, first_request_ms=1200.0, lazy_loaded=("langgraph",)),
+        max_import_ms=500,
+        max_first_request_ms=700,
+    )
+
+    assert problems == [
+        "import took 900 ms (budget 500 ms)",
+        "first request took 1200 ms (budget 700 ms)",
+        "langgraph was imported at startup",
+    ]
+    assert "OVER BUDGET: langgraph" in format_report(_report(), problems)
+
+
+def test_the_api_boots_without_its_lazy_dependencies(monkeypatch, tmp_path) -> None:
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+    report = run(repeat=1)
+
+    assert report.rounds == 1
+    assert report.lazy_loaded == ()
+    assert 0 < report.import_ms <= report.first_request_ms
+    assert "langgraph" in LAZY_MODULES
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import re
+
+from src.svg_sprite import SPRITE_OPEN, SpriteReport, dedupe_svgs, symbol_id
+
+ARROW = (
+    '<path d="M5 12h14M12 5l7 7-7 7" stroke-linecap="round" stroke-linejoin="round"/>'
+    '<circle cx="12" cy="12" r="10"/>'
+)
+
+
+def _icon(attrs: str = 'class="icon" viewBox="0 0 24 24"', inner: str = ARROW) -> str:
+    return f"<svg {attrs}>\n  {inner}\n</svg>"
+
+
+def _page(body: str, head: str = "") -> str:
+    return f"<!doctype html><html><head>{head}</head><body>{body}</body></html>"
+
+
+def test_repeated_icons_share_one_symbol() -> None:
+    html = _page("".join(f"<li>{_icon()}Item {n}</li>" for n in range(5)))
+
+    result, report = dedupe_svgs(html)
+
+    ident = symbol_id(ARROW)
+    assert report == SpriteReport(
+        symbols=1,
+        replaced=5,
+        saved_bytes=len(html.encode()) - len(result.encode()),
+    )
+    assert report.saved_bytes > 0
+    assert result.count(f'<symbol id="{ident}">{ARROW}</symbol>') == 1
+    assert result.count(f'<use href="#{ident}"/>') == 5
+    assert result.index(SPRITE_OPEN) == result.index("<body>") + len("<body>")
+    assert "Item 4" in result
+
+
+def test_outer_attributes_and_labels_stay_on_each_icon() -> None:
+    labelled = _icon(
+        'role="img" aria-labelledby="arrow-title" viewBox="0 0 24 24" width="32"',
+        f'<title id="arrow-title">Next</title><desc>Points right</desc>{ARROW}',
+    )
+    html = _page(_icon('aria-hidden="true" viewBox="0 0 24 24"') * 4 + labelled)
+
+    result, report = dedupe_svgs(html)
+
+    assert report.replaced == 5
+    assert (
+        '<svg role="img" aria-labelledby="arrow-title" viewBox="0 0 24 24" width="32">'
+        '<title id="arrow-title">Next</title><desc>Points right</desc>'
+        f'<use href="#{symbol_id(ARROW)}"/></svg>'
+    ) in result
+    assert result.count('<svg aria-hidden="true" viewBox="0 0 24 24"><use ') == 4
+    sprite = result[result.index(SPRITE_OPEN) :]
+    assert "<title" not in sprite[: sprite.index("</svg>")]
+
+
+def test_icons_differing_only_in_whitespace_and_editor_ids_match() -> None:
+    spaced = ARROW.replace("><", ">\n    <").replace(
+        "<circle", '<circle data-mwb-id="node-9"'
+    )
+    html = _page(_icon() * 3 + _icon(inner=spaced) * 3)
+
+    _, report = dedupe_svgs(html)
+
+    assert report.symbols == 1
+    assert report.replaced == 6
+
+
+def test_single_icons_and_small_pages_are_left_alone() -> None:
+    other = '<rect width="4" height="4"/>'
+    html = _page(_icon() + _icon(inner=other))
+
+    assert dedupe_svgs(html) == (html, SpriteReport())
+    tiny = _page(_icon(inner="<g/>") * 2)
+    assert dedupe_svgs(tiny) == (tiny, SpriteReport())
+
+
+def test_drawings_styled_or_scripted_by_the_page_stay_inline() -> None:
+    icons = _icon() * 8
+    assert dedupe_svgs(_page(icons))[1].replaced == 8
+    for html in (
+        _page(icons, head="<style>.card circle { fill: red; }</style>"),
+        _page(icons + "<script>document.querySelectorAll('path')</script>"),
+        _page(_icon(inner=f'<g class="spin">{ARROW}</g>') * 8),
+        _page(_icon(inner=f'<path id="p" d="M0 0"/>{ARROW}') * 8),
+        _page(_icon(inner=f'<text x="0" y="10">Hi</text>{ARROW}') * 8),
+    ):
+        assert dedupe_svgs(html)[1] == SpriteReport()
+
+
+def test_svg_in_comments_scripts_and_styles_is_ignored() -> None:
+    hidden = f"<!-- {_icon()} --><style>/* {_icon()} */</style>"
+    script = "<script>const badge = '<svg><rect/></svg>';</script>"
+
+    result, report = dedupe_svgs(_page(_icon() * 4 + hidden + script))
+
+    assert report.replaced == 4
+    assert hidden in result and script in result
+
+
+def test_nested_svgs_are_kept_whole() -> None:
+    nested = _icon(inner=f'<svg x="2">{ARROW}</svg>')
+    html = _page(nested * 8)
+
+    result, report = dedupe_svgs(html)
+
+    assert report == SpriteReport()
+    assert result == html
+
+
+def test_running_twice_changes_nothing_more() -> None:
+    once, _ = dedupe_svgs(_page(_icon() * 4))
+
+    assert dedupe_svgs(once) == (once, SpriteReport())
+    more, report = dedupe_svgs(once.replace("</body>", _icon() * 3 + "</body>"))
+    assert report.replaced == 3
+    assert more.count("<symbol ") == 1
+
+
+def test_fragments_without_a_body_get_the_sprite_before_the_first_icon() -> None:
+    html = "<main><h1>Hi</h1>" + _icon() * 4 + "</main>"
+
+    result, _ = dedupe_svgs(html)
+
+    assert result.startswith("<main><h1>Hi</h1>" + SPRITE_OPEN)
+    assert len(re.findall(r"<use href", result)) == 4
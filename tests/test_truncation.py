@@ -0,0 +1,83 @@
+import enum
+
+from src.truncation import (
+    build_continuation_prompt,
+    is_truncated,
+    normalize_finish_reason,
+    splice,
+)
+
+
+class _FinishReason(enum.Enum):
+    MAX_TOKENS = 2
+
+
+def test_finish_reasons_are_normalized() -> None:
+    assert normalize_finish_reason(_FinishReason.MAX_TOKENS) == "max_tokens"
+    assert normalize_finish_reason("length") == "length"
+    assert normalize_finish_reason(None) is None
+    assert normalize_finish_reason("") is None
+
+
+def test_truncation_is_read_from_the_finish_reason_first() -> None:
+    assert is_truncated("<main>done</main>", "length")
+    assert is_truncated("<main>done</main>", "max_tokens")
+    assert not is_truncated("<main>done</main>", "stop")
+
+
+def test_a_reported_finish_reason_is_trusted() -> None:
+    assert not is_truncated("<!doctype html><html><body><p>Fresh", "stop")
+    assert not is_truncated('<!doctype html><html><body><a href="/me', "stop")
+
+
+def test_a_complete_page_without_closing_tags_is_not_truncated() -> None:
+    page = "<!doctype html><html lang=en><head><title>Bakery</title></head>"
+    page += "<body><main><h1>Fresh bread</h1><p>Daily.</p></main>"
+
+    assert not is_truncated(page, None)
+    assert not is_truncated(page + "</body>", None)
+
+
+def test_without_a_finish_reason_only_a_page_cut_inside_a_tag_is_truncated() -> None:
+    assert is_truncated('<!doctype html><html><body><a href="/me', None)
+    assert is_truncated("<!doctype html><html><body><p>Fresh</p><sec", None)
+    assert not is_truncated("<!doctype html><html><body></body></html>", None)
+    # A fragment has no closing tag to miss.
+    assert not is_truncated("<section>Pricing</section>", None)
+    assert not is_truncated("<section><a href=", None)
+
+
+def test_the_continuation_prompt_extends_the_original() -> None:
+    prompt = build_continuation_prompt("Build a bakery page", "<html><body><p>Fre")
+
+    assert prompt.startswith("Build a bakery page\n")
+    assert "<html><body><p>Fre\nPARTIAL REPLY>>>" in prompt
+
+
+def test_splice_appends_a_clean_continuation() -> None:
+    assert splice("<p>Fresh bre", "ad daily</p>") == "<p>Fresh bread daily</p>"
+
+
+def test_splice_drops_text_the_model_repeated() -> None:
+    partial = "<main><section class='hero'><h1>Fresh bre"
+    continuation = "<section class='hero'><h1>Fresh bread</h1></section></main>"
+
+    assert splice(partial, continuation) == (
+        "<main><section class='hero'><h1>Fresh bread</h1></section></main>"
+    )
+
+
+def test_splice_ignores_short_coincidental_overlaps() -> None:
+    assert splice("<p>a</p>", "</p><p>b</p>") == "<p>a</p></p><p>b</p>"
+
+
+def test_splice_drops_a_reopened_code_fence() -> None:
+    assert splice("```html\n<p>Fre", "```html\nsh</p>\n```") == (
+        "```html\n<p>Fresh</p>\n```"
+    )
+
+
+def test_a_restarted_document_replaces_the_partial() -> None:
+    restarted = "<!doctype html><html><body>Again</body></html>"
+
+    assert splice("<!doctype html><html><body>Fir", restarted) == restarted
@@ -0,0 +1 @@
+"""Developer tooling that ships with the repo but not with the app."""
@@ -0,0 +1,436 @@
+"""The versioned input corpus for ``tools.benchmarks``.
+
+Pages are generated, not checked in: a seeded generator turns out the same
+bytes on every machine, so a 2 MB page costs nothing in the repository and
+the baseline always measures the inputs it was recorded against. Bump
+:data:`CORPUS_VERSION` whenever the output changes, then re-record the
+baseline; the runner refuses to compare timings across versions.
+
+Realistic pages have the shape generated pages have: a stylesheet, a header
+with navigation, a main of hero, card grid, feature list, table, testimonial
+and form sections, a footer and a small inline script, every element carrying
+the ``data-mwb-id`` the editor adds. Pathological inputs stress one axis each.
+"""
+
+from __future__ import annotations
+
+import random
+from functools import cache
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Any
+
+from server.content import MAX_DOCUMENT_CHARS
+
+CORPUS_VERSION = 1
+SEED = 20260101
+
+#: Realistic page sizes, in characters, up to the stored-document limit.
+PAGE_SIZES = {
+    "page-5kb": 5_000,
+    "page-50kb": 50_000,
+    "page-500kb": 500_000,
+    "page-2mb": MAX_DOCUMENT_CHARS - 10_000,
+}
+#: The element ``find_editor_element`` looks up: the last one on the page,
+#: so every lookup scans the whole document.
+TARGET_NODE_ID = "bench-target"
+
+_WORDS = (
+    "studio",
+    "craft",
+    "roast",
+    "single",
+    "origin",
+    "espresso",
+    "filter",
+    "design",
+    "brand",
+    "identity",
+    "launch",
+    "pricing",
+    "invoice",
+    "team",
+    "plan",
+    "monthly",
+    "yearly",
+    "support",
+    "secure",
+    "fast",
+    "simple",
+    "calm",
+    "focus",
+    "workflow",
+    "journal",
+    "gallery",
+    "archive",
+    "neighbourhood",
+    "seasonal",
+    "fresh",
+    "delivery",
+    "subscription",
+    "story",
+    "process",
+    "method",
+)
+
+_STYLE = """
+:root { --ink: #1c1917; --paper: #fafaf9; --accent: #b45309; --gap: 1.5rem; }
+* { box-sizing: border-box; }
+body { margin: 0; font: 16px/1.6 system-ui, sans-serif; color: var(--ink); }
+header, footer { display: flex; justify-content: space-between; padding: var(--gap); }
+nav a { margin-left: 1rem; color: inherit; text-decoration: none; }
+nav a:focus-visible, .button:focus-visible { outline: 2px solid var(--accent); }
+.hero { display: grid; gap: var(--gap); padding: 4rem var(--gap); }
+.grid { display: grid; grid-template-columns: repeat(auto-fit, minmax(14rem, 1fr)); }
+.card { border: 1px solid #e7e5e4; border-radius: .5rem; padding: 1rem; }
+.button { display: inline-block; padding: .75rem 1.25rem; background: var(--accent); }
+table { width: 100%; border-collapse: collapse; }
+td, th { padding: .5rem; border-bottom: 1px solid #e7e5e4; text-align: left; }
+@media (max-width: 40rem) { header { flex-direction: column; } }
+"""
+
+_SCRIPT = """
+document.querySelectorAll("[data-toggle]").forEach(function (button) {
+  button.addEventListener("click", function () {
+    var target = document.getElementById(button.dataset.toggle);
+    var open = target.hasAttribute("hidden");
+    target.toggleAttribute("hidden", !open);
+    button.setAttribute("aria-expanded", String(open));
+  });
+});
+var form = document.querySelector("form");
+if (form) {
+  form.addEventListener("submit", function (event) {
+    event.preventDefault();
+    form.querySelector("[role=status]").textContent = "Thanks, we'll be in touch.";
+  });
+}
+"""
+
+
+class _Ids:
+    def __init__(self) -> None:
+        self._next = 0
+
+    def __call__(self) -> str:
+        self._next += 1
+        return f'data-mwb-id="n{self._next}"'
+
+
+def _text(rng: random.Random, words: int) -> str:
+    picked = " ".join(rng.choice(_WORDS) for _ in range(words))
+    return picked[:1].upper() + picked[1:]
+
+
+def _section(rng: random.Random, ids: _Ids, index: int) -> str:
+    kind = index % 6
+    if kind == 0:
+        return (
+            f'<section class="hero" id="s{index}" {ids()}>'
+            f"<h2 {ids()}>{_text(rng, 5)}</h2><p {ids()}>{_text(rng, 24)}</p>"
+            f'<a class="button" href="#contact" {ids()}>{_text(rng, 2)}</a>'
+            "</section>\n"
+        )
+    if kind == 1:
+        cards = "".join(
+            f'<article class="card" {ids()}><img src="img/{index}-{card}.jpg" '
+            f'alt="{_text(rng, 3)}" width="320" height="200" loading="lazy" {ids()}>'
+            f"<h3 {ids()}>{_text(rng, 3)}</h3><p {ids()}>{_text(rng, 18)}</p></article>"
+            for card in range(3)
+        )
+        return f'<section class="grid" id="s{index}" {ids()}>{cards}</section>\n'
+    if kind == 2:
+        items = "".join(
+            f"<li {ids()}><strong {ids()}>{_text(rng, 2)}</strong> {_text(rng, 10)}</li>"
+            for _ in range(5)
+        )
+        return (
+            f'<section id="s{index}" {ids()}><h2 {ids()}>{_text(rng, 4)}</h2>'
+            f"<ul {ids()}>{items}</ul></section>\n"
+        )
+    if kind == 3:
+        rows = "".join(
+            f"<tr {ids()}><td {ids()}>{_text(rng, 2)}</td><td {ids()}>"
+            f"${rng.randrange(5, 99)}</td><td {ids()}>{_text(rng, 6)}</td></tr>"
+            for _ in range(4)
+        )
+        return (
+            f'<section id="s{index}" {ids()}><table {ids()}><thead {ids()}>'
+            f"<tr {ids()}><th {ids()}>Plan</th><th {ids()}>Price</th>"
+            f"<th {ids()}>Includes</th></tr></thead><tbody {ids()}>{rows}</tbody>"
+            "</table></section>\n"
+        )
+    if kind == 4:
+        return (
+            f'<section id="s{index}" {ids()}><blockquote {ids()}>'
+            f"<p {ids()}>{_text(rng, 30)}</p><cite {ids()}>{_text(rng, 2)}</cite>"
+            f'</blockquote><button type="button" data-toggle="more{index}" '
+            f'aria-expanded="false" {ids()}>More</button>'
+            f'<div id="more{index}" hidden {ids()}><p {ids()}>{_text(rng, 20)}</p>'
+            "</div></section>\n"
+        )
+    return (
+        f'<section id="s{index}" {ids()}><form {ids()}>'
+        f'<label for="email{index}" {ids()}>Email</label>'
+        f'<input id="email{index}" type="email" name="email" required {ids()}>'
+        f'<button class="button" type="submit" {ids()}>{_text(rng, 2)}</button>'
+        f'<p role="status" {ids()}></p></form></section>\n'
+    )
+
+
+def _document(body: str, *, style: str = _STYLE, script: str = _SCRIPT) -> str:
+    return (
+        '<!DOCTYPE html>\n<html lang="en">\n<head>\n<meta charset="utf-8">\n'
+        '<meta name="viewport" content="width=device-width, initial-scale=1">\n'
+        f"<title>Benchmark page</title>\n<style>{style}</style>\n</head>\n"
+        f"<body>\n{body}<script>{script}</script>\n</body>\n</html>\n"
+    )
+
+
+def realistic_page(size: int, seed: int = SEED) -> str:
+    """A generated-looking page of about ``size`` characters, never more."""
+    rng = random.Random(seed + size)
+    ids = _Ids()
+    header = (
+        f"<header {ids()}><strong {ids()}>Studio</strong><nav {ids()}>"
+        + "".join(f'<a href="#s{i}" {ids()}>{_text(rng, 1)}</a>' for i in range(4))
+        + "</nav></header>\n<main>\n"
+    )
+    footer = (
+        f'</main>\n<footer {ids()}><p data-mwb-id="{TARGET_NODE_ID}">'
+        "Made with care.</p></footer>\n"
+    )
+    fixed = len(_document(header + footer))
+    sections: list[str] = []
+    used = fixed
+    index = 0
+    while True:
+        section = _section(rng, ids, index)
+        if used + len(section) > size:
+            break
+        sections.append(section)
+        used += len(section)
+        index += 1
+    return _document(header + "".join(sections) + footer)
+
+
+def deep_nesting(depth: int = 5_000) -> str:
+    """One branch of ``depth`` nested elements: parser stacks at their worst."""
+    opening = "".join(f'<div class="d{level % 7}">' for level in range(depth))
+    body = (
+        f'<main>{opening}<p data-mwb-id="{TARGET_NODE_ID}">Deep</p>'
+        f"{'</div>' * depth}</main>\n"
+    )
+    return _document(body)
+
+
+def huge_inline_script(size: int = 1_500_000) -> str:
+    """A modest page carrying one script of about ``size`` characters."""
+    statement = 'items.push({ label: "item", value: count++ }); // keep\n'
+    script = "var items = [], count = 0;\n" + statement * (size // len(statement))
+    page = realistic_page(20_000)
+    return page.replace(f"<script>{_SCRIPT}</script>", f"<script>{script}</script>")
+
+
+def many_attributes(elements: int = 200, attributes: int = 250) -> str:
+    """Elements carrying hundreds of attributes, event handlers among them."""
+    rows = []
+    for element in range(elements):
+        attrs = " ".join(
+            f'data-a{attr}="v{attr}"' if attr % 25 else f'onclick="go({attr})"'
+            for attr in range(attributes)
+        )
+        rows.append(f'<div id="e{element}" {attrs}>cell</div>')
+    rows.append(f'<p data-mwb-id="{TARGET_NODE_ID}">Last</p>')
+    return _document(f"<main>{''.join(rows)}</main>\n")
+
+
+def unclosed_tags(count: int = 2_000) -> str:
+    """Opening tags that never close, which lazy ``.*?`` patterns rescan."""
+    body = "".join(
+        f"<section><p>{index}<iframe title=t{index}><script>var x{index} = 1;"
+        for index in range(count)
+    )
+    return _document(f'<main>{body}<p data-mwb-id="{TARGET_NODE_ID}">End</p>\n')
+
+
+@cache
+def pages() -> dict[str, str]:
+    """Every HTML input, by name."""
+    corpus = {name: realistic_page(size) for name, size in PAGE_SIZES.items()}
+    corpus["deep-nesting"] = deep_nesting()
+    corpus["huge-inline-script"] = huge_inline_script()
+    corpus["many-attributes"] = many_attributes()
+    corpus["unclosed-tags"] = unclosed_tags()
+    return corpus
+
+
+class _EditorTreeBuilder(HTMLParser):
+    """Turn a page body into editor-document nodes, as the web client does."""
+
+    _VOID = frozenset({"img", "input", "br", "hr", "meta", "link", "source", "wbr"})
+
+    def __init__(self) -> None:
+        super().__init__(convert_charrefs=True)
+        self.body: list[dict[str, Any]] = []
+        self._stack: list[list[dict[str, Any]]] = [self.body]
+        self._in_body = False
+        self._next_id = 0
+
+    def handle_starttag(self, tag: str, attrs: list[tuple[str, str | None]]) -> None:
+        if tag == "body":
+            self._in_body = True
+            return
+        if not self._in_body or tag == "script":
+            return
+        attributes = {name: value or "" for name, value in attrs}
+        node_id = attributes.pop("data-mwb-id", None)
+        if node_id is None:
+            self._next_id += 1
+            node_id = f"x{self._next_id}"
+        node = {
+            "type": "element",
+            "id": node_id,
+            "tag": tag,
+            "attributes": attributes,
+            "children": [],
+        }
+        self._stack[-1].append(node)
+        if tag not in self._VOID:
+            self._stack.append(node["children"])
+
+    def handle_endtag(self, tag: str) -> None:
+        if self._in_body and tag not in self._VOID and len(self._stack) > 1:
+            self._stack.pop()
+
+    def handle_data(self, data: str) -> None:
+        if self._in_body and len(self._stack) > 1 and data.strip():
+            self._stack[-1].append({"type": "text", "value": data})
+
+
+def editor_document(html: str) -> dict[str, Any]:
+    builder = _EditorTreeBuilder()
+    builder.feed(html)
+    return {
+        "schemaVersion": 1,
+        "doctype": "<!DOCTYPE html>",
+        "htmlAttributes": {"lang": "en"},
+        "headHtml": '<meta charset="utf-8">',
+        "bodyAttributes": {},
+        "body": builder.body,
+        "css": _STYLE,
+        "bodyScripts": [f"<script>{_SCRIPT}</script>"],
+        "responsiveStyles": {
+            "n1": {"mobile": {"flex-direction": "column", "padding": "1rem"}}
+        },
+        "designTokens": {"color-accent": "#b45309", "space-gap": "1.5rem"},
+    }
+
+
+def deep_editor_document(depth: int = 100, branches: int = 400) -> dict[str, Any]:
+    """Many branches at the maximum nesting depth the validator accepts."""
+    body = []
+    for branch in range(branches):
+        node: dict[str, Any] = {"type": "text", "value": "leaf"}
+        for level in range(depth - 1, 0, -1):
+            node = {
+                "type": "element",
+                "id": f"b{branch}-{level}",
+                "tag": "div",
+                "attributes": {"class": "nest"},
+                "children": [node],
+            }
+        body.append(node)
+    document = editor_document("")
+    document["body"] = body
+    document["responsiveStyles"] = {}
+    return document
+
+
+#: Sizes of the generated editor documents, in nodes.
+NODE_COUNTS = {"nodes-1k": 1_000, "nodes-10k": 10_000, "nodes-50k": 50_000}
+
+
+def sized_editor_document(nodes: int, seed: int = SEED) -> dict[str, Any]:
+    """Exactly ``nodes`` nodes of card sections, ten nodes to a card."""
+    rng = random.Random(seed)
+    body: list[dict[str, Any]] = []
+
+    def element(
+        node_id: str, tag: str, attributes: dict[str, str], *children: Any
+    ) -> dict[str, Any]:
+        return {
+            "type": "element",
+            "id": node_id,
+            "tag": tag,
+            "attributes": attributes,
+            "children": list(children),
+        }
+
+    def text(words: int) -> dict[str, Any]:
+        return {"type": "text", "value": _text(rng, words)}
+
+    for card in range(nodes // 10):
+        body.append(
+            element(
+                f"c{card}",
+                "section",
+                {"class": "card"},
+                element(f"c{card}-h", "h2", {}, text(3)),
+                element(f"c{card}-p", "p", {"class": "lede"}, text(6)),
+                element(
+                    f"c{card}-l",
+                    "ul",
+                    {},
+                    element(
+                        f"c{card}-i",
+                        "li",
+                        {},
+                        element(f"c{card}-a", "a", {"href": f"/c/{card}"}, text(3)),
+                    ),
+                ),
+                element(
+                    f"c{card}-m",
+                    "img",
+                    {"src": f"/img/{card}.png", "alt": f'Card "{card}"'},
+                ),
+            )
+        )
+    body.extend(text(2) for _ in range(nodes % 10))
+    document = editor_document("")
+    document["body"] = body
+    document["responsiveStyles"] = {"c0": {"mobile": {"padding": "1rem"}}}
+    return document
+
+
+@cache
+def editor_documents() -> dict[str, dict[str, Any]]:
+    """Editor documents for the validator, within its node and size limits."""
+    corpus = {
+        name: editor_document(html)
+        for name, html in pages().items()
+        if name in {"page-5kb", "page-50kb", "page-500kb"}
+    }
+    corpus["deep-nesting"] = deep_editor_document()
+    for name, nodes in NODE_COUNTS.items():
+        corpus[name] = sized_editor_document(nodes)
+    return corpus
+
+
+def write_corpus(directory: Path) -> list[Path]:
+    """Write every input to ``directory`` for inspection or other tools."""
+    import json
+
+    target = directory / f"v{CORPUS_VERSION}"
+    target.mkdir(parents=True, exist_ok=True)
+    written = []
+    for name, html in pages().items():
+        path = target / f"{name}.html"
+        path.write_text(html, encoding="utf-8")
+        written.append(path)
+    for name, document in editor_documents().items():
+        path = target / f"{name}.editor.json"
+        path.write_text(json.dumps(document), encoding="utf-8")
+        written.append(path)
+    return written
@@ -0,0 +1,337 @@
+"""Micro-benchmarks for the pure-Python passes that run on every generation.
+
+Each case times one function on one input from ``tools.bench_corpus``, taking
+the best of ``--repeat`` rounds as ``timeit`` does; the best run is the one
+least disturbed by the rest of the machine. Results are compared with the
+stored baseline, and any case slower than it by more than ``--threshold`` is
+flagged and fails the run::
+
+    python -m tools.benchmarks                      # compare with the baseline
+    python -m tools.benchmarks -k sections -k dna   # only matching cases
+    python -m tools.benchmarks --save-baseline      # re-record after a change
+
+Timings are normalised by a fixed pure-Python calibration loop measured in
+the same run, so a baseline recorded on one machine stays meaningful on a
+faster or slower one. It is still worth re-recording on the machine that
+runs the comparison when the numbers are close to the threshold.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+from collections.abc import Callable
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+from server.documents import (
+    editor_document_stats,
+    validate_editor_document,
+    validate_editor_document_change,
+)
+from server.editor_scope import find_editor_element
+from src.a11y import audit_generated_html
+from src.delta import TextEdit, apply_json_patch, apply_text_edits, changed_paths
+from src.document_compiler import compile_document
+from src.export import split_document
+from src.js_analysis import audit_inline_scripts
+from src.layout_dna import extract_layout_dna
+from src.perf_audit import audit_page_weight
+from src.safety import apply_output_safety_policy
+from src.sections import extract_sections
+from tools import bench_corpus
+
+BASELINE_FILE = Path(__file__).with_name("benchmark_baseline.json")
+DEFAULT_THRESHOLD = 0.25
+DEFAULT_REPEAT = 5
+
+#: An autosave delta: a typed word and a changed design token.
+DOCUMENT_PATCH = [
+    {"op": "replace", "path": "/css", "value": "main { gap: 2rem; }"},
+    {"op": "add", "path": "/designTokens/color-bench", "value": "#123456"},
+]
+
+#: The functions under test, each taking a page.
+HTML_FUNCTIONS: dict[str, Callable[[str], Any]] = {
+    "extract_sections": extract_sections,
+    "apply_output_safety_policy": apply_output_safety_policy,
+    "audit_generated_html": audit_generated_html,
+    "audit_inline_scripts": audit_inline_scripts,
+    "audit_page_weight": audit_page_weight,
+    "split_document": split_document,
+    "extract_layout_dna": extract_layout_dna,
+    "find_editor_element": lambda html: find_editor_element(
+        html, bench_corpus.TARGET_NODE_ID
+    ),
+}
+
+
+def _paragraph_edit(document: dict[str, Any]) -> Callable[[], Any]:
+    """Validate an autosave of one paragraph against the page it changed."""
+    middle = len(document["body"]) // 2
+    patch = [
+        {
+            "op": "replace",
+            "path": f"/body/{middle}/children/1/children/0/value",
+            "value": "Edited words",
+        }
+    ]
+    changed, _ = apply_json_patch(document, patch)
+    stats = editor_document_stats(document)
+    paths = changed_paths(patch)
+    return lambda: validate_editor_document_change(changed, document, stats, paths)
+
+
+@dataclass(frozen=True)
+class Case:
+    name: str
+    run: Callable[[], Any]
+
+
+@dataclass(frozen=True)
+class Comparison:
+    name: str
+    baseline_ms: float | None
+    current_ms: float
+    #: Normalised current time over normalised baseline time.
+    ratio: float | None
+    regressed: bool
+
+
+def cases() -> list[Case]:
+    found = [
+        Case(f"{function}/{page}", lambda fn=fn, html=html: fn(html))
+        for function, fn in HTML_FUNCTIONS.items()
+        for page, html in bench_corpus.pages().items()
+    ]
+    found.extend(
+        Case(
+            f"validate_editor_document/{name}",
+            lambda document=document: validate_editor_document(document),
+        )
+        for name, document in bench_corpus.editor_documents().items()
+    )
+    found.extend(
+        Case(
+            f"compile_document/{name}",
+            lambda document=document: compile_document(document),
+        )
+        for name, document in bench_corpus.editor_documents().items()
+    )
+    documents = bench_corpus.editor_documents()
+    found.extend(
+        Case(
+            f"validate_editor_document_change/{name}", _paragraph_edit(documents[name])
+        )
+        for name in bench_corpus.NODE_COUNTS
+    )
+    # Delta saves should cost the same on a small page as on a large one.
+    found.extend(
+        Case(
+            f"apply_text_edits/{page}",
+            lambda html=html: apply_text_edits(
+                html, [TextEdit(len(html) // 2, len(html) // 2 + 5, "words")]
+            ),
+        )
+        for page, html in bench_corpus.pages().items()
+        if page.startswith("page-")
+    )
+    found.extend(
+        Case(
+            f"apply_json_patch/{name}",
+            lambda document=document: apply_json_patch(document, DOCUMENT_PATCH),
+        )
+        for name, document in bench_corpus.editor_documents().items()
+    )
+    return found
+
+
+def select(all_cases: list[Case], patterns: list[str] | None) -> list[Case]:
+    if not patterns:
+        return all_cases
+    return [case for case in all_cases if any(p in case.name for p in patterns)]
+
+
+def measure(run: Callable[[], Any], repeat: int = DEFAULT_REPEAT) -> float:
+    """Best seconds per call over ``repeat`` rounds.
+
+    Quick calls are looped until a round takes at least 0.2s, as ``timeit``'s
+    ``autorange`` does; that first round counts as one of the ``repeat``.
+    """
+    timer = timeit.Timer(run)
+    loops, elapsed = timer.autorange()
+    rounds = timer.repeat(repeat=max(0, repeat - 1), number=loops)
+    return min([elapsed, *rounds]) / loops
+
+
+def _calibration_workload() -> int:
+    words = [f"w{index % 97}" for index in range(20_000)]
+    counts: dict[str, int] = {}
+    for word in words:
+        counts[word] = counts.get(word, 0) + 1
+    return len("".join(sorted(words)))
+
+
+def calibrate(repeat: int = DEFAULT_REPEAT) -> float:
+    """Milliseconds for a fixed workload, the unit every result is scaled by."""
+    return measure(_calibration_workload, repeat) * 1000
+
+
+def run(selected: list[Case], repeat: int = DEFAULT_REPEAT) -> dict[str, float]:
+    """Best milliseconds per call, by case name."""
+    return {case.name: round(measure(case.run, repeat) * 1000, 4) for case in selected}
+
+
+def load_baseline(path: Path = BASELINE_FILE) -> dict[str, Any] | None:
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
+
+
+def save_baseline(
+    results: dict[str, float],
+    calibration_ms: float,
+    path: Path = BASELINE_FILE,
+    previous: dict[str, Any] | None = None,
+) -> None:
+    """Write the baseline, keeping cases this run did not measure."""
+    kept = {}
+    if previous and previous.get("corpus_version") == bench_corpus.CORPUS_VERSION:
+        # A filtered run updates its own cases; the others stay as recorded,
+        # rescaled to this run's calibration so they remain comparable.
+        scale = calibration_ms / previous["calibration_ms"]
+        kept = {name: round(ms * scale, 4) for name, ms in previous["cases"].items()}
+    payload = {
+        "corpus_version": bench_corpus.CORPUS_VERSION,
+        "python": platform.python_version(),
+        "calibration_ms": round(calibration_ms, 4),
+        "cases": dict(sorted({**kept, **results}.items())),
+    }
+    path.write_text(json.dumps(payload, indent=2) + "\n", encoding="utf-8")
+
+
+def compare(
+    results: dict[str, float],
+    calibration_ms: float,
+    baseline: dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> list[Comparison]:
+    """Compare a run with the baseline after scaling both by calibration."""
+    recorded = baseline.get("cases", {})
+    baseline_unit = baseline["calibration_ms"]
+    comparisons = []
+    for name, current_ms in results.items():
+        baseline_ms = recorded.get(name)
+        if baseline_ms is None:
+            comparisons.append(Comparison(name, None, current_ms, None, False))
+            continue
+        ratio = (current_ms / calibration_ms) / (baseline_ms / baseline_unit)
+        comparisons.append(
+            Comparison(
+                name, baseline_ms, current_ms, round(ratio, 3), ratio > 1 + threshold
+            )
+        )
+    return comparisons
+
+
+def format_comparisons(comparisons: list[Comparison]) -> str:
+    lines = [f"{'case':<52} {'baseline':>10} {'current':>10} {'change':>8}"]
+    for item in comparisons:
+        baseline = "-" if item.baseline_ms is None else f"{item.baseline_ms:.2f}"
+        if item.ratio is None:
+            change = "new"
+        else:
+            change = f"{(item.ratio - 1) * 100:+.0f}%"
+        flag = "  REGRESSION" if item.regressed else ""
+        lines.append(
+            f"{item.name:<52} {baseline:>10} {item.current_ms:>10.2f} {change:>8}{flag}"
+        )
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "-k",
+        dest="patterns",
+        action="append",
+        help="only run cases whose name contains this; repeatable",
+    )
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="flag cases slower than the baseline by more than this fraction",
+    )
+    parser.add_argument("--baseline", type=Path, default=BASELINE_FILE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument(
+        "--write-corpus",
+        type=Path,
+        metavar="DIR",
+        help="write the corpus to DIR and exit",
+    )
+    args = parser.parse_args(argv)
+
+    if args.write_corpus:
+        for path in bench_corpus.write_corpus(args.write_corpus):
+            print(path)
+        return 0
+
+    selected = select(cases(), args.patterns)
+    if not selected:
+        parser.error("no benchmark matches the given -k patterns")
+    # Calibrate on both sides of the run so a machine that speeds up or slows
+    # down midway (turbo, a noisy neighbour) skews the unit less.
+    before = calibrate(args.repeat)
+    results = run(selected, args.repeat)
+    calibration_ms = min(before, calibrate(args.repeat))
+    baseline = load_baseline(args.baseline)
+
+    if args.save_baseline:
+        save_baseline(results, calibration_ms, args.baseline, baseline)
+        print(f"Recorded {len(results)} cases in {args.baseline}")
+        return 0
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; run with --save-baseline first.")
+        return 1
+    if baseline.get("corpus_version") != bench_corpus.CORPUS_VERSION:
+        print(
+            f"The baseline was recorded on corpus v{baseline.get('corpus_version')} "
+            f"and the corpus is v{bench_corpus.CORPUS_VERSION}; re-record it with "
+            "--save-baseline."
+        )
+        return 1
+
+    comparisons = compare(results, calibration_ms, baseline, args.threshold)
+    if args.json:
+        print(
+            json.dumps(
+                {
+                    "calibration_ms": calibration_ms,
+                    "cases": [asdict(item) for item in comparisons],
+                },
+                indent=2,
+            )
+        )
+    else:
+        print(format_comparisons(comparisons))
+    regressions = [item for item in comparisons if item.regressed]
+    if regressions:
+        print(
+            f"\n{len(regressions)} case(s) regressed by more than "
+            f"{args.threshold:.0%}.",
+            file=sys.stderr,
+        )
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
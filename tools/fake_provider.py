@@ -0,0 +1,432 @@
+"""A stand-in for OpenRouter's chat-completions API, for load tests.
+
+Serves ``POST .../chat/completions`` with canned HTML, either as one JSON body
+or as server-sent events when the request asks to ``stream``. Each response
+waits a latency drawn from a configurable distribution, and a configurable
+share of requests fail with a 429 or a 5xx. Text beyond the request's
+``max_tokens`` is cut off with ``finish_reason: "length"``, and continuation
+prompts get the rest of the page they resume. Nothing leaves the machine, so a
+load test costs no provider quota::
+
+    python -m tools.fake_provider --port 8790 --latency lognormal:800:0.5 \\
+        --throttle-rate 0.05 --error-rate 0.01
+
+then point the API at it with ``GENERATION_PROVIDER=openrouter`` and
+``OPENROUTER_BASE_URL=http://127.0.0.1:8790/api/v1``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import random
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Self
+
+from src.truncation import PARTIAL_REPLY_END, PARTIAL_REPLY_START
+
+#: Marker the section-regeneration prompt carries; such requests get a single
+#: ``<section>`` back instead of a whole page.
+SECTION_PROMPT_MARKER = "Section to replace"
+
+
+@dataclass(frozen=True)
+class Latency:
+    """A latency distribution, in milliseconds.
+
+    ``fixed:MS``, ``uniform:LOW:HIGH`` or ``lognormal:MEDIAN:SIGMA``; the
+    lognormal has the long right tail real providers show.
+    """
+
+    kind: str = "fixed"
+    a: float = 0.0
+    b: float = 0.0
+
+    @classmethod
+    def parse(cls, spec: str) -> Latency:
+        kind, _, rest = spec.partition(":")
+        values = [float(value) for value in rest.split(":") if value]
+        expected = {"fixed": 1, "uniform": 2, "lognormal": 2}.get(kind)
+        if expected is None or len(values) != expected:
+            raise ValueError(
+                f"Invalid latency {spec!r}; use fixed:MS, uniform:LOW:HIGH "
+                "or lognormal:MEDIAN:SIGMA"
+            )
+        return cls(kind, *values)
+
+    def sample_ms(self, rng: random.Random) -> float:
+        if self.kind == "uniform":
+            return rng.uniform(self.a, self.b)
+        if self.kind == "lognormal":
+            return rng.lognormvariate(math.log(max(self.a, 1e-3)), self.b)
+        return self.a
+
+
+def _page(title: str, accent: str, sections: list[tuple[str, str]]) -> str:
+    body = "\n".join(
+        f'<section id="s{index}" class="band">\n  <h2>{heading}</h2>\n'
+        f"  <p>{copy}</p>\n</section>"
+        for index, (heading, copy) in enumerate(sections)
+    )
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1">
+<title>{title}</title>
+<style>
+  :root {{ --accent: {accent}; --ink: #1d1d1f; --paper: #fafaf7; }}
+  body {{ margin: 0; font-family: system-ui, sans-serif; color: var(--ink);
+         background: var(--paper); line-height: 1.6; }}
+  header, .band, footer {{ max-width: 60rem; margin: 0 auto; padding: 3rem 1.5rem; }}
+  h1 {{ font-size: clamp(2rem, 5vw, 3.5rem); margin: 0 0 1rem; }}
+  h2 {{ color: var(--accent); }}
+  a.button {{ display: inline-block; padding: .75rem 1.25rem; color: #fff;
+             background: var(--accent); border-radius: .5rem; text-decoration: none; }}
+</style>
+</head>
+<body>
+<header>
+  <h1>{title}</h1>
+  <p>Made by a fake provider for load testing.</p>
+  <a class="button" href="#s0">Get started</a>
+</header>
+<main>
+{body}
+</main>
+<footer><p>&copy; 2026 {title}</p></footer>
+</body>
+</html>"""
+
+
+CANNED_PAGES: tuple[str, ...] = (
+    _page(
+        "Quiet Roast Coffee",
+        "#8a5a44",
+        [
+            ("Single origin", "Small batches roasted every Tuesday."),
+            ("Visit us", "Open daily from seven until four."),
+            ("Subscriptions", "Fresh beans at your door every fortnight."),
+        ],
+    ),
+    _page(
+        "Northlight Studio",
+        "#2f6f8f",
+        [
+            ("Selected work", "Identity and web design for independent brands."),
+            ("Process", "Research, sketches, prototypes, and launch."),
+            ("Clients", "Publishers, cafes, and climate nonprofits."),
+            ("Contact", "hello@northlight.example"),
+        ],
+    ),
+    _page(
+        "Ledgerly",
+        "#3b5bdb",
+        [
+            ("Invoices in seconds", "Create, send, and track without a spreadsheet."),
+            ("Pricing", "Free for five clients, then nine dollars a month."),
+        ],
+    ),
+)
+
+CANNED_SECTION = (
+    '<section class="band">\n  <h2>Regenerated section</h2>\n'
+    "  <p>Rewritten by the fake provider.</p>\n</section>"
+)
+
+
+@dataclass(frozen=True)
+class FakeProviderConfig:
+    latency: Latency = field(default_factory=Latency)
+    #: Share of requests answered with a 503.
+    error_rate: float = 0.0
+    #: Share of requests answered with a 429 and ``Retry-After``.
+    throttle_rate: float = 0.0
+    retry_after_seconds: int = 1
+    #: Characters per server-sent event when streaming.
+    stream_chunk_chars: int = 256
+    seed: int | None = None
+    pages: tuple[str, ...] = CANNED_PAGES
+
+
+def _prompt_text(payload: dict[str, Any]) -> str:
+    parts: list[str] = []
+    for message in payload.get("messages") or []:
+        content = message.get("content")
+        if isinstance(content, list):
+            parts.extend(str(part.get("text", "")) for part in content)
+        elif content:
+            parts.append(str(content))
+    return "\n".join(parts)
+
+
+class FakeProvider:
+    """Run the fake endpoint on a background thread.
+
+    Use as a context manager, or call :meth:`start` and :meth:`stop`. Port 0
+    picks a free port; :attr:`base_url` is what ``OPENROUTER_BASE_URL`` wants.
+    """
+
+    def __init__(
+        self,
+        config: FakeProviderConfig | None = None,
+        *,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ) -> None:
+        self.config = config or FakeProviderConfig()
+        self._rng = random.Random(self.config.seed)
+        self._lock = threading.Lock()
+        self.counts = {
+            "requests": 0,
+            "throttled": 0,
+            "errors": 0,
+            "streamed": 0,
+            "continued": 0,
+        }
+        self._server = ThreadingHTTPServer((host, port), _handler_for(self))
+        self._server.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/v1"
+
+    def start(self) -> Self:
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="fake-provider", daemon=True
+        )
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+    def serve_forever(self) -> None:
+        """Serve on the calling thread until interrupted."""
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+
+    def __enter__(self) -> Self:
+        return self.start()
+
+    def __exit__(self, *exc: object) -> None:
+        self.stop()
+
+    def note(self, name: str) -> None:
+        with self._lock:
+            self.counts[name] += 1
+
+    def _draw(self) -> tuple[str | None, float, int]:
+        """Pick an outcome, a latency in seconds, and a page index."""
+        with self._lock:
+            self.counts["requests"] += 1
+            roll = self._rng.random()
+            delay = max(0.0, self.config.latency.sample_ms(self._rng)) / 1000
+            page = self._rng.randrange(len(self.config.pages))
+            outcome = None
+            if roll < self.config.throttle_rate:
+                outcome = "throttled"
+            elif roll < self.config.throttle_rate + self.config.error_rate:
+                outcome = "errors"
+            if outcome:
+                self.counts[outcome] += 1
+            return outcome, delay, page
+
+    def respond(self, payload: dict[str, Any]) -> tuple[int, dict[str, Any], str]:
+        """Status, headers, and completion text for one request."""
+        outcome, delay, page = self._draw()
+        time.sleep(delay)
+        if outcome == "throttled":
+            return 429, {"Retry-After": str(self.config.retry_after_seconds)}, ""
+        if outcome == "errors":
+            return 503, {}, ""
+        prompt = _prompt_text(payload)
+        if PARTIAL_REPLY_END in prompt:
+            self.note("continued")
+            return 200, {}, self._remainder(prompt)
+        if SECTION_PROMPT_MARKER in prompt:
+            return 200, {}, CANNED_SECTION
+        return 200, {}, self.config.pages[page]
+
+    def _remainder(self, prompt: str) -> str:
+        """The rest of whichever canned reply a continuation prompt resumes."""
+        before, _, _ = prompt.rpartition(PARTIAL_REPLY_END)
+        partial = before.rpartition(PARTIAL_REPLY_START)[2]
+        for text in (*self.config.pages, CANNED_SECTION):
+            if partial and text.startswith(partial):
+                return text[len(partial) :]
+        return ""
+
+
+def _limit(text: str, max_tokens: Any) -> tuple[str, str]:
+    """Cut ``text`` at ``max_tokens``, counted the way ``_usage`` counts them."""
+    if isinstance(max_tokens, int) and 0 < max_tokens * 4 < len(text):
+        return text[: max_tokens * 4], "length"
+    return text, "stop"
+
+
+def _usage(prompt: str, text: str) -> dict[str, int]:
+    prompt_tokens = max(1, len(prompt) // 4)
+    completion_tokens = max(1, len(text) // 4)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def _handler_for(provider: FakeProvider) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format: str, *args: Any) -> None:
+            return
+
+        def do_POST(self) -> None:
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": "Not found"}})
+                return
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except json.JSONDecodeError:
+                self._send_json(400, {"error": {"message": "Invalid JSON"}})
+                return
+            status, headers, text = provider.respond(payload)
+            if status != 200:
+                self._send_json(
+                    status, {"error": {"message": "Injected failure"}}, headers
+                )
+                return
+            model = str(payload.get("model") or "fake/model")
+            text, finish_reason = _limit(text, payload.get("max_tokens"))
+            usage = _usage(_prompt_text(payload), text)
+            if payload.get("stream"):
+                provider.note("streamed")
+                self._send_stream(model, text, usage, finish_reason)
+                return
+            self._send_json(
+                200,
+                {
+                    "id": "gen-fake",
+                    "object": "chat.completion",
+                    "model": model,
+                    "choices": [
+                        {
+                            "index": 0,
+                            "message": {"role": "assistant", "content": text},
+                            "finish_reason": finish_reason,
+                        }
+                    ],
+                    "usage": usage,
+                },
+            )
+
+        def _send_json(
+            self,
+            status: int,
+            body: dict[str, Any],
+            headers: dict[str, str] | None = None,
+        ) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(
+            self, model: str, text: str, usage: dict[str, int], finish_reason: str
+        ) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            size = max(1, provider.config.stream_chunk_chars)
+            for start in range(0, len(text), size):
+                self._send_event(
+                    {
+                        "id": "gen-fake",
+                        "object": "chat.completion.chunk",
+                        "model": model,
+                        "choices": [
+                            {
+                                "index": 0,
+                                "delta": {"content": text[start : start + size]},
+                                "finish_reason": None,
+                            }
+                        ],
+                    }
+                )
+            self._send_event(
+                {
+                    "id": "gen-fake",
+                    "object": "chat.completion.chunk",
+                    "model": model,
+                    "choices": [
+                        {"index": 0, "delta": {}, "finish_reason": finish_reason}
+                    ],
+                    "usage": usage,
+                }
+            )
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+            self.close_connection = True
+
+        def _send_event(self, body: dict[str, Any]) -> None:
+            self.wfile.write(f"data: {json.dumps(body)}\n\n".encode())
+            self.wfile.flush()
+
+    return Handler
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8790)
+    parser.add_argument(
+        "--latency",
+        type=Latency.parse,
+        default=Latency(),
+        help="fixed:MS, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    provider = FakeProvider(
+        FakeProviderConfig(
+            latency=args.latency,
+            error_rate=args.error_rate,
+            throttle_rate=args.throttle_rate,
+            retry_after_seconds=args.retry_after,
+            seed=args.seed,
+        ),
+        host=args.host,
+        port=args.port,
+    )
+    print(f"Fake provider listening at {provider.base_url}")
+    try:
+        provider.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,466 @@
+"""Drive the API through full submit-and-poll cycles with simulated users.
+
+Each user registers, then runs ``--iterations`` rounds of the chosen
+operations: ``/api/generate``, ``/api/generate-section`` on the page it got
+back, and ``/api/chat`` refining that page. Every job is long-polled until
+it settles, as the web client does; ``--poll-interval`` polls at a fixed
+interval instead. The report gives throughput, end-to-end P50/P95/P99, queue
+wait, database queries and status reads per job, per operation::
+
+    python -m tools.loadtest --users 20 --iterations 5 --latency lognormal:800:0.5
+
+Without ``--base-url`` the API and a fake provider are started in-process on
+a scratch SQLite database, so the run is reproducible and costs no provider
+quota. With ``--base-url`` an already running deployment is driven instead;
+its rate limits must allow the load. ``--max-p95-ms`` exits non-zero when any
+operation is slower, so the harness can gate a deploy.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from typing import Any
+
+import httpx
+
+from tools.fake_provider import FakeProvider, FakeProviderConfig, Latency
+
+OPERATIONS = ("generate", "section", "chat")
+#: How long each long-poll asks the server to hold a status read.
+LONG_POLL_SECONDS = 25
+TERMINAL = frozenset({"succeeded", "failed", "cancelled"})
+
+_PROMPTS = (
+    "A landing page for a neighbourhood coffee roaster",
+    "A portfolio for an independent design studio",
+    "A pricing page for a small invoicing app",
+)
+
+
+@dataclass
+class JobSample:
+    operation: str
+    #: HTTP status of the submit; anything but 202 means no job was created.
+    submit_status: int
+    status: str = "rejected"
+    e2e_ms: int | None = None
+    queue_ms: int | None = None
+    db_queries: int | None = None
+    #: Status reads it took to see the job settle.
+    polls: int = 0
+    failure_kind: str | None = None
+
+
+@dataclass
+class OperationReport:
+    operation: str
+    jobs: int
+    succeeded: int
+    failed: int
+    rejected: int
+    p50_ms: int | None
+    p95_ms: int | None
+    p99_ms: int | None
+    queue_p50_ms: int | None
+    queue_p95_ms: int | None
+    db_queries_mean: float | None
+    db_queries_max: int | None
+    polls_mean: float | None
+    failure_kinds: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass
+class LoadReport:
+    users: int
+    duration_s: float
+    jobs: int
+    throughput_jobs_per_s: float
+    operations: list[OperationReport]
+    provider: dict[str, int] | None = None
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def percentile(values: list[int], pct: float) -> int | None:
+    """Nearest-rank percentile, matching the server's job stats."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize(samples: list[JobSample]) -> list[OperationReport]:
+    reports: list[OperationReport] = []
+    for operation in OPERATIONS:
+        items = [item for item in samples if item.operation == operation]
+        if not items:
+            continue
+        succeeded = [item for item in items if item.status == "succeeded"]
+        latencies = [item.e2e_ms for item in succeeded if item.e2e_ms is not None]
+        queued = [item.queue_ms for item in succeeded if item.queue_ms is not None]
+        queries = [item.db_queries for item in succeeded if item.db_queries is not None]
+        polls = [item.polls for item in items if item.polls]
+        kinds: dict[str, int] = {}
+        for item in items:
+            if item.failure_kind:
+                kinds[item.failure_kind] = kinds.get(item.failure_kind, 0) + 1
+        reports.append(
+            OperationReport(
+                operation=operation,
+                jobs=len(items),
+                succeeded=len(succeeded),
+                failed=sum(1 for item in items if item.status == "failed"),
+                rejected=sum(1 for item in items if item.status == "rejected"),
+                p50_ms=percentile(latencies, 50),
+                p95_ms=percentile(latencies, 95),
+                p99_ms=percentile(latencies, 99),
+                queue_p50_ms=percentile(queued, 50),
+                queue_p95_ms=percentile(queued, 95),
+                db_queries_mean=(
+                    round(sum(queries) / len(queries), 1) if queries else None
+                ),
+                db_queries_max=max(queries) if queries else None,
+                polls_mean=round(sum(polls) / len(polls), 1) if polls else None,
+                failure_kinds=kinds,
+            )
+        )
+    return reports
+
+
+class SimulatedUser:
+    """One account working through generate, section and chat jobs."""
+
+    def __init__(
+        self,
+        base_url: str,
+        index: int,
+        *,
+        operations: tuple[str, ...],
+        poll_interval: float | None,
+        job_timeout: float,
+    ) -> None:
+        self._http = httpx.Client(base_url=base_url, timeout=LONG_POLL_SECONDS + 10)
+        self._index = index
+        self._operations = operations
+        self._poll_interval = poll_interval
+        self._job_timeout = job_timeout
+        self._thread_id = f"load-{uuid.uuid4().hex[:12]}"
+        self._page: str | None = None
+        self.samples: list[JobSample] = []
+
+    def close(self) -> None:
+        self._http.close()
+
+    def register(self) -> None:
+        response = self._http.post(
+            "/api/auth/register",
+            json={
+                "email": f"load-{uuid.uuid4().hex[:12]}@example.test",
+                "password": "load test password",
+            },
+        )
+        response.raise_for_status()
+
+    def run(self, iterations: int) -> None:
+        for iteration in range(iterations):
+            for operation in self._operations:
+                payload = self._payload(operation, iteration)
+                if payload is not None:
+                    self.samples.append(self._run_job(operation, *payload))
+
+    def _payload(self, operation: str, iteration: int) -> tuple[str, dict] | None:
+        prompt = _PROMPTS[(self._index + iteration) % len(_PROMPTS)]
+        if operation == "generate":
+            return "/api/generate", {"prompt": prompt, "thread_id": self._thread_id}
+        if self._page is None:
+            # Section and chat jobs edit a page; without one there is nothing
+            # realistic to send, so the round is skipped rather than faked.
+            return None
+        if operation == "section":
+            return "/api/generate-section", {
+                "code": self._page,
+                "section_index": 0,
+                "instructions": "Tighten the copy",
+                "thread_id": self._thread_id,
+            }
+        return "/api/chat", {
+            "message": "Make the headline bolder",
+            "thread_id": self._thread_id,
+            "current_code": self._page,
+        }
+
+    def _run_job(self, operation: str, path: str, payload: dict) -> JobSample:
+        started = time.perf_counter()
+        response = self._http.post(path, json=payload)
+        sample = JobSample(operation=operation, submit_status=response.status_code)
+        if response.status_code != 202:
+            return sample
+        job_id = response.json()["job_id"]
+        deadline = started + self._job_timeout
+        job: dict[str, Any] = {}
+        long_poll = self._poll_interval is None
+        params = {"wait": LONG_POLL_SECONDS} if long_poll else None
+        headers: dict[str, str] = {}
+        while time.perf_counter() < deadline:
+            response = self._http.get(
+                f"/api/generation-jobs/{job_id}", params=params, headers=headers
+            )
+            sample.polls += 1
+            if response.status_code == 304:
+                continue
+            job = response.json()
+            if job.get("status") in TERMINAL:
+                break
+            if long_poll:
+                headers = {"If-None-Match": response.headers["etag"]}
+            else:
+                time.sleep(self._poll_interval)
+        sample.e2e_ms = int((time.perf_counter() - started) * 1000)
+        sample.status = (
+            job.get("status") if job.get("status") in TERMINAL else "timeout"
+        )
+        sample.failure_kind = job.get("failure_kind")
+        metrics = job.get("metrics") or {}
+        sample.queue_ms = metrics.get("queue_ms")
+        sample.db_queries = metrics.get("db_queries")
+        html = (job.get("result") or {}).get("html")
+        if sample.status == "succeeded" and html:
+            self._page = html
+        return sample
+
+
+def run_load(
+    base_url: str,
+    *,
+    users: int,
+    iterations: int,
+    operations: tuple[str, ...] = OPERATIONS,
+    poll_interval: float | None = None,
+    job_timeout: float = 120.0,
+) -> tuple[list[JobSample], float]:
+    """Run every simulated user on its own thread; samples and wall time.
+
+    Jobs are long-polled unless a fixed ``poll_interval`` is given.
+    """
+    pool = [
+        SimulatedUser(
+            base_url,
+            index,
+            operations=operations,
+            poll_interval=poll_interval,
+            job_timeout=job_timeout,
+        )
+        for index in range(users)
+    ]
+    try:
+        for user in pool:
+            user.register()
+        started = time.perf_counter()
+        threads = [
+            threading.Thread(target=user.run, args=(iterations,), daemon=True)
+            for user in pool
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - started
+    finally:
+        for user in pool:
+            user.close()
+    return [sample for user in pool for sample in user.samples], duration
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@contextmanager
+def _patched_env(values: dict[str, str]) -> Iterator[None]:
+    previous = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@contextmanager
+def local_stack(
+    provider_config: FakeProviderConfig, env: dict[str, str] | None = None
+) -> Iterator[tuple[str, FakeProvider]]:
+    """Start a fake provider and the API against it; yields the API base URL."""
+    import uvicorn
+
+    with (
+        tempfile.TemporaryDirectory(prefix="mwb-loadtest-") as scratch,
+        FakeProvider(provider_config) as provider,
+    ):
+        settings = {
+            "GENERATION_PROVIDER": "openrouter",
+            "OPENROUTER_API_KEY": "fake-key",
+            "OPENROUTER_BASE_URL": provider.base_url,
+            "DATABASE_URL": f"sqlite:///{scratch}/loadtest.db",
+            "AUTH_RATE_LIMIT_PER_MINUTE": "100000",
+            "GENERATION_RATE_LIMIT_PER_MINUTE": "100000",
+            "ANALYTICS_FILE": "",
+            "SCHEMA_CHECK_CACHE": f"{scratch}/schema-check.json",
+            **(env or {}),
+        }
+        with _patched_env(settings):
+            port = _free_port()
+            server = uvicorn.Server(
+                uvicorn.Config(
+                    "server.main:app", host="127.0.0.1", port=port, log_level="warning"
+                )
+            )
+            thread = threading.Thread(target=server.run, daemon=True)
+            thread.start()
+            deadline = time.monotonic() + 30
+            while not server.started:
+                if not thread.is_alive() or time.monotonic() > deadline:
+                    raise RuntimeError("API server failed to start")
+                time.sleep(0.05)
+            try:
+                yield f"http://127.0.0.1:{port}", provider
+            finally:
+                server.should_exit = True
+                thread.join(timeout=30)
+
+
+def format_report(report: LoadReport) -> str:
+    summary = (
+        f"{report.jobs} jobs from {report.users} users in {report.duration_s:.1f}s "
+        f"({report.throughput_jobs_per_s:.2f} jobs/s)"
+    )
+    header = (
+        f"{'operation':<10} {'jobs':>5} {'ok':>5} {'fail':>5} {'rej':>5} "
+        f"{'p50':>7} {'p95':>7} {'p99':>7} {'q-p50':>7} {'q-p95':>7} "
+        f"{'db-avg':>7} {'db-max':>7} {'polls':>6}"
+    )
+    lines = [summary, "", header]
+
+    def cell(value: Any) -> str:
+        return "-" if value is None else str(value)
+
+    for item in report.operations:
+        lines.append(
+            f"{item.operation:<10} {item.jobs:>5} {item.succeeded:>5} "
+            f"{item.failed:>5} {item.rejected:>5} {cell(item.p50_ms):>7} "
+            f"{cell(item.p95_ms):>7} {cell(item.p99_ms):>7} "
+            f"{cell(item.queue_p50_ms):>7} {cell(item.queue_p95_ms):>7} "
+            f"{cell(item.db_queries_mean):>7} {cell(item.db_queries_max):>7} "
+            f"{cell(item.polls_mean):>6}"
+        )
+        if item.failure_kinds:
+            kinds = ", ".join(f"{k}={v}" for k, v in sorted(item.failure_kinds.items()))
+            lines.append(f"{'':<10} failures: {kinds}")
+    if report.provider:
+        counts = ", ".join(f"{k}={v}" for k, v in report.provider.items())
+        lines.extend(["", f"fake provider: {counts}"])
+    return "\n".join(lines)
+
+
+def build_report(
+    samples: list[JobSample],
+    users: int,
+    duration_s: float,
+    provider: FakeProvider | None = None,
+) -> LoadReport:
+    return LoadReport(
+        users=users,
+        duration_s=round(duration_s, 3),
+        jobs=len(samples),
+        throughput_jobs_per_s=round(len(samples) / duration_s, 3) if duration_s else 0,
+        operations=summarize(samples),
+        provider=dict(provider.counts) if provider else None,
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--base-url", help="drive a running API instead")
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument(
+        "--operations",
+        default=",".join(OPERATIONS),
+        help="comma-separated subset of generate,section,chat",
+    )
+    parser.add_argument(
+        "--poll-interval",
+        type=float,
+        default=None,
+        help="poll job status every this many seconds instead of long-polling",
+    )
+    parser.add_argument("--job-timeout", type=float, default=120.0)
+    parser.add_argument("--latency", type=Latency.parse, default=Latency("fixed", 50))
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument(
+        "--max-p95-ms",
+        type=int,
+        default=None,
+        help="exit 1 when any operation's end-to-end P95 is above this",
+    )
+    args = parser.parse_args(argv)
+    operations = tuple(
+        item for item in args.operations.split(",") if item.strip() in OPERATIONS
+    )
+    load = {
+        "users": args.users,
+        "iterations": args.iterations,
+        "operations": operations or OPERATIONS,
+        "poll_interval": args.poll_interval,
+        "job_timeout": args.job_timeout,
+    }
+
+    if args.base_url:
+        samples, duration = run_load(args.base_url, **load)
+        report = build_report(samples, args.users, duration)
+    else:
+        config = FakeProviderConfig(
+            latency=args.latency,
+            error_rate=args.error_rate,
+            throttle_rate=args.throttle_rate,
+            seed=args.seed,
+        )
+        with local_stack(config) as (base_url, provider):
+            samples, duration = run_load(base_url, **load)
+            report = build_report(samples, args.users, duration, provider)
+
+    print(
+        json.dumps(report.to_dict(), indent=2) if args.json else format_report(report)
+    )
+    if args.max_p95_ms is not None and any(
+        item.p95_ms is not None and item.p95_ms > args.max_p95_ms
+        for item in report.operations
+    ):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
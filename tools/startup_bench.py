@@ -0,0 +1,189 @@
+"""Startup benchmark: API import time and time to the first request.
+
+Each round starts a fresh interpreter, imports ``server.main``, runs the
+lifespan (client, database, schema check, recovery) and serves one
+``/api/health`` request, against a migrated scratch SQLite database and a
+dummy OpenRouter key. Like ``tools.benchmarks`` it keeps the best of
+``--repeat`` rounds, and it fails the run when either figure is over budget
+or when a module meant to load on first use was imported at startup::
+
+    python -m tools.startup_bench
+    python -m tools.startup_bench --max-import-ms 800 --json
+
+The first round stamps the schema check cache, so the best round measures a
+restart of an existing deployment, which is the case worth keeping fast.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_REPEAT = 5
+#: Budgets sit well above a typical run so only a real regression trips them;
+#: the lazy-module check catches the usual cause much more precisely.
+IMPORT_BUDGET_MS = 2000.0
+FIRST_REQUEST_BUDGET_MS = 3000.0
+#: Heavy dependencies that must load on first use, never at startup.
+LAZY_MODULES = ("langgraph", "google.generativeai")
+
+# Runs in the child interpreter. Timings start after interpreter startup, which
+# the API code cannot influence.
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import server.main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(server.main.app) as client:
+    status = client.get("/api/health").status_code
+    answered = time.perf_counter()
+print(json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "first_request_ms": (answered - started) * 1000,
+    "status": status,
+    "lazy_loaded": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+@dataclass(frozen=True)
+class StartupSample:
+    import_ms: float
+    first_request_ms: float
+    #: Modules from ``LAZY_MODULES`` that were loaded by the time of the request.
+    lazy_loaded: tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class StartupReport:
+    import_ms: float
+    first_request_ms: float
+    lazy_loaded: tuple[str, ...]
+    rounds: int
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def _env(scratch: str, database_url: str) -> dict[str, str]:
+    return {
+        **os.environ,
+        "GENERATION_PROVIDER": "openrouter",
+        "OPENROUTER_API_KEY": "startup-bench",
+        "DATABASE_URL": database_url,
+        "SCHEMA_CHECK_CACHE": f"{scratch}/schema-check.json",
+        "ANALYTICS_FILE": "",
+    }
+
+
+def sample(env: dict[str, str]) -> StartupSample:
+    """Boot the API once in a fresh interpreter."""
+    completed = subprocess.run(
+        [sys.executable, "-c", _PROBE % (LAZY_MODULES,)],
+        cwd=REPO_ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=False,
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"API failed to start:\n{completed.stderr.strip()}")
+    result = json.loads(completed.stdout.strip().splitlines()[-1])
+    if result["status"] != 200:
+        raise RuntimeError(f"/api/health answered {result['status']}")
+    return StartupSample(
+        import_ms=result["import_ms"],
+        first_request_ms=result["first_request_ms"],
+        lazy_loaded=tuple(result["lazy_loaded"]),
+    )
+
+
+def run(repeat: int = DEFAULT_REPEAT) -> StartupReport:
+    with tempfile.TemporaryDirectory(prefix="mwb-startup-") as scratch:
+        database_url = f"sqlite:///{scratch}/startup.db"
+        env = _env(scratch, database_url)
+        # In a child so the scratch URL wins over any DATABASE_URL in .env.
+        subprocess.run(
+            [sys.executable, "-m", "alembic", "upgrade", "head"],
+            cwd=REPO_ROOT,
+            env=env,
+            capture_output=True,
+            check=True,
+        )
+        samples = [sample(env) for _ in range(max(1, repeat))]
+    return StartupReport(
+        import_ms=min(item.import_ms for item in samples),
+        first_request_ms=min(item.first_request_ms for item in samples),
+        lazy_loaded=tuple(
+            sorted({name for item in samples for name in item.lazy_loaded})
+        ),
+        rounds=len(samples),
+    )
+
+
+def over_budget(
+    report: StartupReport,
+    *,
+    max_import_ms: float = IMPORT_BUDGET_MS,
+    max_first_request_ms: float = FIRST_REQUEST_BUDGET_MS,
+) -> list[str]:
+    """Why the report fails its budget; empty when it passes."""
+    problems: list[str] = []
+    if report.import_ms > max_import_ms:
+        problems.append(
+            f"import took {report.import_ms:.0f} ms (budget {max_import_ms:.0f} ms)"
+        )
+    if report.first_request_ms > max_first_request_ms:
+        problems.append(
+            f"first request took {report.first_request_ms:.0f} ms "
+            f"(budget {max_first_request_ms:.0f} ms)"
+        )
+    for name in report.lazy_loaded:
+        problems.append(f"{name} was imported at startup")
+    return problems
+
+
+def format_report(report: StartupReport, problems: list[str]) -> str:
+    lines = [
+        f"import server.main   {report.import_ms:8.1f} ms",
+        f"first request        {report.first_request_ms:8.1f} ms",
+        f"(best of {report.rounds} rounds)",
+    ]
+    lines.extend(f"OVER BUDGET: {problem}" for problem in problems)
+    return "\n".join(lines)
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT)
+    parser.add_argument("--max-import-ms", type=float, default=IMPORT_BUDGET_MS)
+    parser.add_argument(
+        "--max-first-request-ms", type=float, default=FIRST_REQUEST_BUDGET_MS
+    )
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args(argv)
+
+    report = run(args.repeat)
+    problems = over_budget(
+        report,
+        max_import_ms=args.max_import_ms,
+        max_first_request_ms=args.max_first_request_ms,
+    )
+    if args.json:
+        print(json.dumps({**report.to_dict(), "problems": problems}, indent=2))
+    else:
+        print(format_report(report, problems))
+    return 1 if problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import type { EditorDocumentV1 } from "./editor/document";
+import type { JsonPatchOperation, TextEdit } from "./lib/delta";
 
 export interface OptionsResponse {
   profiles: { id: string; label: string; description: string }[];
@@ -15,11 +16,51 @@ export interface User {
   email: string;
 }
 
+/** How a drafted page scored; a lower penalty is better. */
+export interface CandidateScore {
+  penalty: number;
+  safety_alerts: number;
+  audit_notes: number;
+  sections: number;
+  chars: number;
+  broken: boolean;
+}
+
+/** How heavy a generated page is; budget violations also appear in its notes. */
+export interface PageWeight {
+  html_bytes: number;
+  dom_nodes: number;
+  dom_depth: number;
+  css_bytes: number;
+  inline_style_bytes: number;
+  js_bytes: number;
+  external_stylesheets: number;
+  external_scripts: number;
+  css_selectors: number;
+  selector_length: number;
+  duplicate_svg_bytes: number;
+  css_imports: number;
+  font_faces: number;
+  infinite_animations: number;
+  violations: { metric: string; value: number; limit: number }[];
+}
+
+export interface GenerateCandidate {
+  html: string;
+  safety_alerts: string[];
+  notes: string[];
+  score: CandidateScore;
+}
+
 export interface GenerateResponse {
   html: string;
   safety_alerts: string[];
   notes: string[];
   settings: { tone: string; complexity: string; strict_minimal: boolean; profile: string | null };
+  perf: PageWeight;
+  /** Present when several candidates were drafted: the runners-up, best first. */
+  score?: CandidateScore;
+  alternatives?: GenerateCandidate[];
 }
 
 export interface SectionInfo {
@@ -70,11 +111,11 @@ export class PageVersionConflictError extends Error {
   }
 }
 
-async function readPageResponse(
+async function readPageResponse<T = PageSnapshot>(
   response: Response,
   expectedVersion: number,
   fallback: string,
-): Promise<PageSnapshot> {
+): Promise<T> {
   if (response.status === 409) {
     const payload = await response.json();
     throw new PageVersionConflictError(
@@ -144,6 +185,16 @@ export async function logout(): Promise<void> {
 
 export type JobStatus = "queued" | "running" | "succeeded" | "failed" | "cancelled";
 
+export type SectionStatus = "pending" | "running" | "done" | "failed";
+
+/** How far a section-wise or multi-candidate generation has got. */
+export interface JobProgress {
+  stage: "skeleton" | "sections" | "stitching" | "fallback" | "failed" | "candidates";
+  total: number;
+  completed: number;
+  sections?: { key: string; label: string; status: SectionStatus }[];
+}
+
 export interface JobSnapshot {
   id: string;
   operation: string;
@@ -153,7 +204,9 @@ export interface JobSnapshot {
   failure_kind: string | null;
   duration_ms: number | null;
   metrics: Record<string, number> | null;
+  progress: JobProgress | null;
   cancel_requested: boolean;
+  version: string;
 }
 
 /** Thrown when a job ends because the user asked it to stop, not because it broke. */
@@ -164,7 +217,10 @@ export class GenerationCancelledError extends Error {
   }
 }
 
-const JOB_POLL_INTERVAL_MS = 600;
+/** How long the server may hold a status request open for a change. */
+const JOB_WAIT_SECONDS = 25;
+/** Polling interval when the server answers without waiting. */
+const JOB_RETRY_DELAY_MS = 600;
 
 export async function fetchJob(jobId: string): Promise<JobSnapshot> {
   return requestJson(
@@ -174,6 +230,22 @@ export async function fetchJob(jobId: string): Promise<JobSnapshot> {
   );
 }
 
+/**
+ * Read a job once it differs from `known`, or after the server's wait runs
+ * out; `null` means it is still as `known` left it.
+ */
+async function fetchJobChange(
+  jobId: string,
+  known: JobSnapshot | null,
+): Promise<JobSnapshot | null> {
+  const response = await fetch(
+    `/api/generation-jobs/${encodeURIComponent(jobId)}?wait=${JOB_WAIT_SECONDS}`,
+    known ? { headers: { "If-None-Match": `"${known.version}"` } } : undefined,
+  );
+  if (response.status === 304) return null;
+  return readJson(response, "Unable to read generation status");
+}
+
 export async function cancelJob(jobId: string): Promise<JobSnapshot> {
   return requestJson(
     `/api/generation-jobs/${encodeURIComponent(jobId)}/cancel`,
@@ -192,7 +264,7 @@ export async function fetchActiveJob(): Promise<JobSnapshot | null> {
 }
 
 /**
- * Poll a submitted job until it settles.
+ * Long-poll a submitted job until it settles.
  *
  * Generation runs on the server's worker pool, so the browser is no longer
  * holding the request open — which is what lets a reload reattach to work that
@@ -201,13 +273,24 @@ export async function fetchActiveJob(): Promise<JobSnapshot | null> {
 export async function awaitJob<T>(
   jobId: string,
   failureMessage: string,
+  onProgress?: (progress: JobProgress) => void,
 ): Promise<T> {
+  let job: JobSnapshot | null = null;
   for (;;) {
-    const job = await fetchJob(jobId);
-    if (job.status === "succeeded") return job.result as T;
-    if (job.status === "cancelled") throw new GenerationCancelledError();
-    if (job.status === "failed") throw new Error(job.error || failureMessage);
-    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+    const started = Date.now();
+    const next = await fetchJobChange(jobId, job);
+    const unchanged = next === null || next.version === job?.version;
+    job = next ?? job;
+    if (!unchanged && job?.progress) onProgress?.(job.progress);
+    if (job?.status === "succeeded") return job.result as T;
+    if (job?.status === "cancelled") throw new GenerationCancelledError();
+    if (job?.status === "failed") throw new Error(job.error || failureMessage);
+    // The server holds each read until the job changes, so after a change the
+    // next read goes straight out. An unchanged answer that came back at once
+    // means `wait` was ignored (a proxy, an older server): fall back to polling.
+    if (unchanged && Date.now() - started < JOB_RETRY_DELAY_MS) {
+      await new Promise((resolve) => setTimeout(resolve, JOB_RETRY_DELAY_MS));
+    }
   }
 }
 
@@ -239,10 +322,12 @@ export async function generate(req: {
   current_code: string | null;
   layout_dna_guidance: string;
   constraints?: { sections: string[]; color_limit: string; density: string };
+  parallel_sections?: boolean;
+  candidates?: number;
   thread_id: string;
-}, onJob?: (jobId: string) => void): Promise<GenerateResponse> {
+}, onJob?: (jobId: string) => void, onProgress?: (progress: JobProgress) => void): Promise<GenerateResponse> {
   const jobId = await submitJob("/api/generate", req, "Generation failed", onJob);
-  return awaitJob<GenerateResponse>(jobId, "Generation failed");
+  return awaitJob<GenerateResponse>(jobId, "Generation failed", onProgress);
 }
 
 export async function fetchSections(code: string): Promise<SectionInfo[]> {
@@ -269,6 +354,7 @@ export async function regenerateSection(req: {
   html: string;
   safety_alerts: string[];
   notes: string[];
+  perf: PageWeight;
 }> {
   const jobId = await submitJob(
     "/api/generate-section",
@@ -362,6 +448,30 @@ export async function savePage(
   return readPageResponse(r, expectedVersion, "Unable to save page");
 }
 
+/** A delta save's page; `html` and `document` come back only if the server rewrote them. */
+export type PageDeltaSnapshot = Omit<PageSnapshot, "html" | "document"> &
+  Partial<Pick<PageSnapshot, "html" | "document">>;
+
+/** Save only what changed since the revision at `expectedVersion`. */
+export async function savePageDelta(
+  pageId: string,
+  expectedVersion: number,
+  htmlEdits: TextEdit[],
+  documentPatch: JsonPatchOperation[],
+  source = "autosave",
+): Promise<PageDeltaSnapshot> {
+  const r = await fetch(
+    `/api/pages/${encodeURIComponent(pageId)}/document`,
+    jsonRequest("PATCH", {
+      expected_version: expectedVersion,
+      html_edits: htmlEdits,
+      document_patch: documentPatch,
+      source,
+    }),
+  );
+  return readPageResponse(r, expectedVersion, "Unable to save page");
+}
+
 export async function fetchRevisions(pageId: string): Promise<RevisionSummary[]> {
   const result = await requestJson<{ revisions: RevisionSummary[] }>(
     `/api/pages/${encodeURIComponent(pageId)}/revisions`,
@@ -455,17 +565,128 @@ export async function saveDna(html: string): Promise<void> {
   );
 }
 
+export type MediaStatus = "processing" | "ready" | "failed";
+
+export interface MediaVariant {
+  url: string;
+  width: number;
+  height: number;
+  content_type: string;
+  bytes: number;
+}
+
+export interface MediaAsset {
+  id: string;
+  /** The original, cacheable forever and usable in published pages. */
+  url: string;
+  filename: string;
+  content_type: string;
+  bytes: number;
+  sha256: string;
+  width: number | null;
+  height: number | null;
+  status: MediaStatus;
+  error: string | null;
+  /** Narrowest first; empty until processing finishes, or without Pillow. */
+  variants: MediaVariant[];
+  /** Ready to use as an `<img srcset>`; empty when there are no variants. */
+  srcset: string;
+  created_at: string;
+}
+
+/** Upload one image; identical bytes return the asset already stored. */
+export async function uploadMedia(file: File): Promise<MediaAsset> {
+  return requestJson<MediaAsset>(
+    `/api/media?filename=${encodeURIComponent(file.name)}`,
+    {
+      method: "POST",
+      headers: { "Idempotency-Key": crypto.randomUUID() },
+      body: file,
+    },
+    "Unable to upload image",
+  );
+}
+
+export async function fetchMedia(): Promise<MediaAsset[]> {
+  const result = await requestJson<{ assets: MediaAsset[] }>(
+    "/api/media",
+    undefined,
+    "Unable to load media",
+  );
+  return result.assets;
+}
+
+export interface FileSavings {
+  name: string;
+  original_bytes: number;
+  optimized_bytes: number;
+  saved_bytes: number;
+}
+
+export interface SpriteReport {
+  /** Distinct icons hoisted into the shared sprite. */
+  symbols: number;
+  /** Inline SVGs rewritten to reference a symbol. */
+  replaced: number;
+  saved_bytes: number;
+}
+
+export interface CriticalCssReport {
+  sections: number;
+  critical_bytes: number;
+  stylesheet_bytes: number;
+  index_html_bytes_before: number;
+  index_html_bytes_after: number;
+  /** Bytes fetched before the first paint: the page plus its stylesheet. */
+  first_paint_bytes_before: number;
+  /** Bytes fetched before the first paint: the page with inlined CSS. */
+  first_paint_bytes_after: number;
+}
+
+export interface ExportResponse {
+  mode: string;
+  files: Record<string, string>;
+  /** Present when the export was optimized. */
+  savings?: FileSavings[];
+  removed_css_rules?: number;
+  svg_sprite?: SpriteReport;
+  /** Present for split exports with critical CSS inlined. */
+  critical_css?: CriticalCssReport;
+}
+
 export async function exportPage(
   html: string,
-  mode: "single" | "split"
-): Promise<{ mode: string; files: Record<string, string> }> {
+  mode: "single" | "split",
+  optimize = false,
+  criticalCss = false,
+): Promise<ExportResponse> {
   return requestJson(
     "/api/export",
-    jsonRequest("POST", { html, mode }),
+    jsonRequest("POST", {
+      html,
+      mode,
+      optimize,
+      critical_css: mode === "split" && criticalCss,
+    }),
     "Unable to export page",
   );
 }
 
+/** The page as a ZIP of hashed, precompressed files with a manifest. */
+export async function exportArchive(
+  html: string,
+  optimize = false,
+): Promise<Blob> {
+  const response = await fetch(
+    "/api/export",
+    jsonRequest("POST", { html, mode: "zip", optimize }),
+  );
+  if (!response.ok) {
+    await readJson(response, "Unable to export page");
+  }
+  return response.blob();
+}
+
 export interface ChatMessage {
   role: "user" | "assistant";
   content: string;
@@ -477,12 +698,17 @@ export interface ChatResponse {
   intent: string | null;
   validation_errors: string[];
   validation_notes: string[];
+  /** Null when the turn produced no validated page. */
+  perf: PageWeight | null;
   error: string | null;
 }
 
 export interface ConversationSnapshot {
   thread_id: string;
+  /** The newest page of messages, oldest first. */
   messages: ChatMessage[];
+  /** Pass as `before` to read older messages; null at the start of the thread. */
+  next_before: number | null;
   current_code: string | null;
   document: EditorDocumentV1 | null;
 }
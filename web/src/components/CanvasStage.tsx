@@ -46,6 +46,7 @@ function SelectionPath() {
 export default function CanvasStage() {
   const code = useStore((state) => state.code);
   const busy = useStore((state) => state.busy);
+  const jobProgress = useStore((state) => state.jobProgress);
   const editing = useStore((state) => state.editing);
   const editorDocument = useStore((state) => state.editorDocument);
   const selectedNodeId = useStore((state) => state.selectedNodeId);
@@ -97,7 +98,11 @@ export default function CanvasStage() {
               <Spinner className="text-primary" />
               <p className="text-sm font-medium">Generating your page…</p>
               <p className="text-xs text-muted-foreground">
-                This usually takes 5–15 seconds
+                {jobProgress?.stage === "sections"
+                  ? `Writing sections: ${jobProgress.completed} of ${jobProgress.total}`
+                  : jobProgress?.stage === "candidates"
+                    ? `Drafting alternatives: ${jobProgress.completed} of ${jobProgress.total}`
+                    : "This usually takes 5–15 seconds"}
               </p>
             </div>
           </div>
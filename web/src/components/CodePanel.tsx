@@ -6,10 +6,17 @@ import {
   FileType2,
   SlidersHorizontal,
 } from "lucide-react";
-import { exportPage } from "../api";
+import {
+  exportArchive,
+  exportPage,
+  type CriticalCssReport,
+  type ExportResponse,
+} from "../api";
 import { compileDocument } from "../editor/document";
 import { useStore } from "../store";
 import { Button } from "./ui/button";
+import { Label } from "./ui/label";
+import { Switch } from "./ui/switch";
 import AdvancedCodePanel from "./editor/AdvancedCodePanel";
 
 export default function CodePanel() {
@@ -19,11 +26,17 @@ export default function CodePanel() {
   const portableCode = editorDocument
     ? compileDocument(editorDocument, { includeEditorIds: false })
     : code;
-  const [mode, setMode] = useState<"single" | "split">("single");
+  const [mode, setMode] = useState<"single" | "split" | "zip">("single");
   const [view, setView] = useState<"output" | "advanced">("output");
-  const [files, setFiles] = useState<Record<string, string> | null>(null);
+  const [optimize, setOptimize] = useState(true);
+  const [criticalCss, setCriticalCss] = useState(true);
+  const [result, setResult] = useState<ExportResponse | null>(null);
+  const files = result?.files ?? null;
 
-  useEffect(() => setFiles(null), [portableCode, mode]);
+  useEffect(
+    () => setResult(null),
+    [portableCode, mode, optimize, criticalCss],
+  );
 
   if (!code) {
     return (
@@ -36,12 +49,18 @@ export default function CodePanel() {
 
   async function runExport() {
     if (!portableCode) return;
-    const res = await exportPage(portableCode, mode);
-    setFiles(res.files);
+    if (mode === "zip") {
+      download("site.zip", await exportArchive(portableCode, optimize));
+      return;
+    }
+    setResult(await exportPage(portableCode, mode, optimize, criticalCss));
   }
 
-  function download(name: string, content: string) {
-    const blob = new Blob([content], { type: "text/plain" });
+  function download(name: string, content: string | Blob) {
+    const blob =
+      content instanceof Blob
+        ? content
+        : new Blob([content], { type: "text/plain" });
     const url = URL.createObjectURL(blob);
     const a = document.createElement("a");
     a.href = url;
@@ -88,7 +107,7 @@ export default function CodePanel() {
         {view === "output" && (
           <div className="flex items-center gap-3">
             <div className="flex rounded-lg border border-border p-0.5">
-              {(["single", "split"] as const).map((value) => (
+              {(["single", "split", "zip"] as const).map((value) => (
                 <button
                   key={value}
                   onClick={() => setMode(value)}
@@ -98,13 +117,42 @@ export default function CodePanel() {
                       : "rounded-md px-3 py-1.5 text-sm text-muted-foreground transition-colors hover:text-foreground"
                   }
                 >
-                  {value === "single" ? "Single HTML" : "Split"}
+                  {value === "single"
+                    ? "Single HTML"
+                    : value === "split"
+                      ? "Split"
+                      : "ZIP"}
                 </button>
               ))}
             </div>
+            <div className="flex items-center gap-2">
+              <Switch
+                id="export-minify"
+                checked={optimize}
+                onCheckedChange={setOptimize}
+              />
+              <Label htmlFor="export-minify" className="cursor-pointer">
+                Minify
+              </Label>
+            </div>
+            {mode === "split" && (
+              <div className="flex items-center gap-2">
+                <Switch
+                  id="export-critical-css"
+                  checked={criticalCss}
+                  onCheckedChange={setCriticalCss}
+                />
+                <Label
+                  htmlFor="export-critical-css"
+                  className="cursor-pointer"
+                >
+                  Inline critical CSS
+                </Label>
+              </div>
+            )}
             <Button variant="outline" onClick={runExport} className="gap-1.5">
               <Download className="h-3.5 w-3.5" />
-              Prepare export
+              {mode === "zip" ? "Download ZIP" : "Prepare export"}
             </Button>
           </div>
         )}
@@ -117,6 +165,16 @@ export default function CodePanel() {
         />
       ) : (
         <>
+          {result?.savings && (
+            <p className="mb-2 text-xs text-muted-foreground">
+              {savingsSummary(result)}
+            </p>
+          )}
+          {result?.critical_css && (
+            <p className="mb-2 text-xs text-muted-foreground">
+              {criticalCssSummary(result.critical_css)}
+            </p>
+          )}
           {files && (
             <div className="mb-3 flex flex-wrap gap-2">
               {Object.keys(files).map((name) => (
@@ -140,3 +198,37 @@ export default function CodePanel() {
     </div>
   );
 }
+
+function formatBytes(bytes: number): string {
+  return bytes < 1024 ? `${bytes} B` : `${(bytes / 1024).toFixed(1)} KB`;
+}
+
+function savingsSummary(result: ExportResponse): string {
+  const parts = (result.savings ?? []).map(
+    (item) =>
+      `${item.name} ${formatBytes(item.original_bytes)} → ${formatBytes(item.optimized_bytes)}`,
+  );
+  const rules = result.removed_css_rules ?? 0;
+  if (rules) {
+    parts.push(`${rules} unused CSS rule${rules === 1 ? "" : "s"} removed`);
+  }
+  const sprite = result.svg_sprite;
+  if (sprite?.replaced) {
+    parts.push(
+      `${sprite.replaced} inline SVGs shared as ${sprite.symbols} icon${sprite.symbols === 1 ? "" : "s"} (${formatBytes(sprite.saved_bytes)} saved)`,
+    );
+  }
+  return parts.join(" · ");
+}
+
+function criticalCssSummary(report: CriticalCssReport): string {
+  if (!report.critical_bytes) {
+    return "No critical CSS found; styles.css still loads before the first paint";
+  }
+  return (
+    `${formatBytes(report.critical_bytes)} of CSS for the first ${report.sections} sections inlined; ` +
+    `bytes before first paint ${formatBytes(report.first_paint_bytes_before)} → ` +
+    `${formatBytes(report.first_paint_bytes_after)}, ` +
+    `${formatBytes(report.stylesheet_bytes)} styles.css no longer blocks rendering`
+  );
+}
@@ -102,6 +102,42 @@ export default function SetupPanel() {
             />
           </div>
 
+          <div className="flex items-center justify-between gap-2">
+            <Label htmlFor="draft-alternatives" className="cursor-pointer">
+              Draft alternatives
+            </Label>
+            <Switch
+              id="draft-alternatives"
+              checked={s.draftAlternatives}
+              onCheckedChange={(v) => s.set("draftAlternatives", v)}
+            />
+          </div>
+
+          {s.candidates.length > 1 && (
+            <Field label="Drafts">
+              <div className="flex flex-wrap gap-1.5">
+                {s.candidates.map((candidate, index) => (
+                  <button
+                    key={index}
+                    type="button"
+                    aria-pressed={index === s.activeCandidate}
+                    title={`${candidate.notes.length + candidate.safety_alerts.length} findings`}
+                    onClick={() => s.pickCandidate(index)}
+                    disabled={s.busy}
+                    className={cn(
+                      "rounded-full border px-2.5 py-1 text-xs transition-colors",
+                      index === s.activeCandidate
+                        ? "border-primary bg-primary/10 text-primary"
+                        : "border-border text-muted-foreground hover:border-muted-foreground",
+                    )}
+                  >
+                    {index === 0 ? "Best" : `Draft ${index + 1}`}
+                  </button>
+                ))}
+              </div>
+            </Field>
+          )}
+
           <div className="flex items-center justify-between gap-2">
             <Label htmlFor="constraint-mode" className="cursor-pointer">
               Generate from constraints
@@ -0,0 +1,16 @@
+import { describe, expect, it } from "vitest";
+import fixtures from "./compile-fixtures.json";
+import { compileDocument, type EditorDocumentV1 } from "./document";
+
+// The server derives stored pages with src/document_compiler.py from the
+// same fixtures; both must produce these bytes.
+describe("compileDocument", () => {
+  it.each(fixtures)("matches the server compiler: $name", (fixture) => {
+    const document = fixture.document as unknown as EditorDocumentV1;
+
+    expect(compileDocument(document)).toBe(fixture.html);
+    expect(compileDocument(document, { includeEditorIds: false })).toBe(
+      fixture.codeHtml,
+    );
+  });
+});
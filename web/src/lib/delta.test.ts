@@ -0,0 +1,45 @@
+import { describe, expect, it } from "vitest";
+import { diffJson, diffText } from "./delta";
+
+describe("diffText", () => {
+  it("replaces only the span between the common ends", () => {
+    expect(diffText("<p>Hello</p>", "<p>Help</p>")).toEqual([
+      { start: 6, end: 8, text: "p" },
+    ]);
+    expect(diffText("same", "same")).toEqual([]);
+    expect(diffText("", "new")).toEqual([{ start: 0, end: 0, text: "new" }]);
+  });
+
+  it("keeps surrogate pairs whole", () => {
+    const [edit] = diffText("a\u{1F680}b", "a\u{1F681}b");
+
+    expect(edit).toEqual({ start: 1, end: 3, text: "\u{1F681}" });
+  });
+});
+
+describe("diffJson", () => {
+  it("patches changed fields and spliced arrays", () => {
+    const shared = { id: "b", children: [] };
+    const base = { css: "", body: [{ id: "a" }, shared], tokens: { old: "1" } };
+    const next = {
+      css: "p{}",
+      body: [{ id: "a" }, { id: "new" }, shared],
+      tokens: { "a/b": "2" },
+    };
+
+    expect(diffJson(base, next)).toEqual([
+      { op: "replace", path: "/css", value: "p{}" },
+      { op: "add", path: "/body/1", value: { id: "new" } },
+      { op: "remove", path: "/tokens/old" },
+      { op: "add", path: "/tokens/a~1b", value: "2" },
+    ]);
+  });
+
+  it("replaces values whose type changed, including the whole document", () => {
+    expect(diffJson(null, { a: 1 })).toEqual([{ op: "replace", path: "", value: { a: 1 } }]);
+    expect(diffJson({ a: [1] }, { a: { 0: 1 } })).toEqual([
+      { op: "replace", path: "/a", value: { 0: 1 } },
+    ]);
+    expect(diffJson({ a: [1, 2] }, { a: [1, 2] })).toEqual([]);
+  });
+});
@@ -0,0 +1,119 @@
+/** A splice of the saved HTML; offsets are UTF-16 code units, as in JS strings. */
+export interface TextEdit {
+  start: number;
+  end: number;
+  text: string;
+}
+
+/** One RFC 6902 JSON Patch operation; only the kinds `diffJson` emits. */
+export type JsonPatchOperation =
+  | { op: "add"; path: string; value: unknown }
+  | { op: "replace"; path: string; value: unknown }
+  | { op: "remove"; path: string };
+
+const isHighSurrogate = (code: number) => code >= 0xd800 && code <= 0xdbff;
+const isLowSurrogate = (code: number) => code >= 0xdc00 && code <= 0xdfff;
+
+/** The one splice turning `base` into `next`: everything between their common ends. */
+export function diffText(base: string, next: string): TextEdit[] {
+  if (base === next) return [];
+  const shorter = Math.min(base.length, next.length);
+  let start = 0;
+  while (start < shorter && base.charCodeAt(start) === next.charCodeAt(start)) {
+    start++;
+  }
+  let end = 0;
+  while (
+    end < shorter - start &&
+    base.charCodeAt(base.length - 1 - end) === next.charCodeAt(next.length - 1 - end)
+  ) {
+    end++;
+  }
+  // Never cut between the two halves of a surrogate pair.
+  if (start > 0 && isHighSurrogate(base.charCodeAt(start - 1))) start--;
+  if (end > 0 && isLowSurrogate(base.charCodeAt(base.length - end))) end--;
+  return [{ start, end: base.length - end, text: next.slice(start, next.length - end) }];
+}
+
+function isObject(value: unknown): value is Record<string, unknown> {
+  return typeof value === "object" && value !== null && !Array.isArray(value);
+}
+
+const has = (object: object, key: string) =>
+  Object.prototype.hasOwnProperty.call(object, key);
+
+function jsonEqual(a: unknown, b: unknown): boolean {
+  if (Object.is(a, b)) return true;
+  if (Array.isArray(a) && Array.isArray(b)) {
+    return a.length === b.length && a.every((item, index) => jsonEqual(item, b[index]));
+  }
+  if (isObject(a) && isObject(b)) {
+    const keys = Object.keys(a);
+    return (
+      keys.length === Object.keys(b).length &&
+      keys.every((key) => has(b, key) && jsonEqual(a[key], b[key]))
+    );
+  }
+  return false;
+}
+
+const pointerToken = (key: string) => key.replace(/~/g, "~0").replace(/\//g, "~1");
+
+function diffArray(base: unknown[], next: unknown[], path: string): JsonPatchOperation[] {
+  let start = 0;
+  while (start < base.length && start < next.length && jsonEqual(base[start], next[start])) {
+    start++;
+  }
+  let end = 0;
+  while (
+    end < base.length - start &&
+    end < next.length - start &&
+    jsonEqual(base[base.length - 1 - end], next[next.length - 1 - end])
+  ) {
+    end++;
+  }
+  const removed = base.length - start - end;
+  const added = next.length - start - end;
+  const paired = Math.min(removed, added);
+  const operations: JsonPatchOperation[] = [];
+  for (let i = 0; i < paired; i++) {
+    operations.push(...diffJson(base[start + i], next[start + i], `${path}/${start + i}`));
+  }
+  for (let i = paired; i < removed; i++) {
+    operations.push({ op: "remove", path: `${path}/${start + paired}` });
+  }
+  for (let i = paired; i < added; i++) {
+    operations.push({ op: "add", path: `${path}/${start + i}`, value: next[start + i] });
+  }
+  return operations;
+}
+
+/**
+ * JSON Patch operations turning `base` into `next`.
+ *
+ * Unchanged subtrees are skipped by reference first, so diffing an
+ * immutably updated editor document only walks the path of the edit.
+ */
+export function diffJson(base: unknown, next: unknown, path = ""): JsonPatchOperation[] {
+  if (Object.is(base, next)) return [];
+  if (Array.isArray(base) && Array.isArray(next)) return diffArray(base, next, path);
+  if (isObject(base) && isObject(next)) {
+    const operations: JsonPatchOperation[] = [];
+    for (const key of Object.keys(base)) {
+      if (!has(next, key)) {
+        operations.push({ op: "remove", path: `${path}/${pointerToken(key)}` });
+      }
+    }
+    for (const [key, value] of Object.entries(next)) {
+      const child = `${path}/${pointerToken(key)}`;
+      if (has(base, key)) {
+        operations.push(...diffJson(base[key], value, child));
+      } else {
+        operations.push({ op: "add", path: child, value });
+      }
+    }
+    return operations;
+  }
+  if (jsonEqual(base, next)) return [];
+  return [{ op: "replace", path, value: next }];
+}
@@ -25,6 +25,7 @@ vi.mock("./api", () => ({
   duplicateProject: vi.fn(),
   archiveProject: vi.fn(),
   savePage: vi.fn(),
+  savePageDelta: vi.fn(),
   fetchRevisions: vi.fn(),
   restoreRevision: vi.fn(),
   createCheckpoint: vi.fn(),
@@ -38,11 +39,30 @@ import { compileDocument, parseEditorDocument } from "./editor/document";
 
 const canonical = (html: string) => compileDocument(parseEditorDocument(html));
 
+const perf = {
+  html_bytes: 29,
+  dom_nodes: 2,
+  dom_depth: 2,
+  css_bytes: 0,
+  inline_style_bytes: 0,
+  js_bytes: 0,
+  external_stylesheets: 0,
+  external_scripts: 0,
+  css_selectors: 0,
+  selector_length: 0,
+  duplicate_svg_bytes: 0,
+  css_imports: 0,
+  font_faces: 0,
+  infinite_animations: 0,
+  violations: [],
+};
+
 const generated = {
   html: "<html><body>new</body></html>",
   notes: [],
   safety_alerts: [],
   settings: { tone: "minimal", complexity: "balanced", strict_minimal: false, profile: null },
+  perf,
 };
 
 const page = {
@@ -89,6 +109,7 @@ describe("document revision workflows", () => {
       activeProjectId: null,
       activePageId: null,
       activePageVersion: 0,
+      savedPage: null,
       revisions: [],
       checkpointName: "",
       sectionsError: null,
@@ -96,6 +117,9 @@ describe("document revision workflows", () => {
       dnasError: null,
       saveState: "idle",
       saveQueued: false,
+      draftAlternatives: false,
+      candidates: [],
+      activeCandidate: 0,
     });
     vi.mocked(api.fetchProjects).mockResolvedValue([]);
     vi.mocked(api.fetchRevisions).mockResolvedValue([]);
@@ -114,10 +138,38 @@ describe("document revision workflows", () => {
           color_limit: "single-accent",
           density: "balanced",
         },
+        parallel_sections: true,
       }),
       expect.any(Function),
+      expect.any(Function),
     );
     expect(useStore.getState().code).toBe(canonical(generated.html));
+    expect(useStore.getState().jobProgress).toBeNull();
+  });
+
+  it("drafts first-page alternatives and switches between them", async () => {
+    const score = { penalty: 0, safety_alerts: 0, audit_notes: 0, sections: 3, chars: 2000, broken: false };
+    const runnerUp = {
+      html: "<html><body>runner-up</body></html>",
+      notes: ["Found an <img> without an alt attribute."],
+      safety_alerts: [],
+      score: { ...score, penalty: 2, audit_notes: 1 },
+    };
+    vi.mocked(api.generate).mockResolvedValue({ ...generated, score, alternatives: [runnerUp] });
+    useStore.setState({ draftAlternatives: true });
+
+    await useStore.getState().runGenerate("a bakery landing page");
+
+    expect(api.generate).toHaveBeenCalledWith(
+      expect.objectContaining({ candidates: 3 }),
+      expect.any(Function),
+      expect.any(Function),
+    );
+    expect(useStore.getState().candidates).toHaveLength(2);
+    useStore.getState().pickCandidate(1);
+    expect(useStore.getState().code).toBe(canonical(runnerUp.html));
+    expect(useStore.getState().notes).toEqual(runnerUp.notes);
+    expect(useStore.getState().activeCandidate).toBe(1);
   });
 
   it("records AI generations in undo history", async () => {
@@ -145,6 +197,7 @@ describe("document revision workflows", () => {
       intent: "refine",
       validation_errors: [],
       validation_notes: [],
+      perf: null,
       error: null,
     });
 
@@ -175,6 +228,7 @@ describe("document revision workflows", () => {
     vi.mocked(api.fetchConversation).mockResolvedValue({
       thread_id: useStore.getState().threadId,
       messages: [{ role: "assistant", content: "Welcome back" }],
+      next_before: null,
       current_code: "<html>restored</html>",
       document: null,
     });
@@ -234,6 +288,42 @@ describe("document revision workflows", () => {
     expect(useStore.getState().saveState).toBe("saved");
   });
 
+  it("autosaves only what changed since the saved revision", async () => {
+    const saved = parseEditorDocument("<html><body><p>v1</p></body></html>");
+    const edited = parseEditorDocument("<html><body><p>v2</p></body></html>");
+    const savedHtml = compileDocument(saved);
+    useStore.setState({
+      code: compileDocument(edited),
+      editorDocument: edited,
+      activeProjectId: "project-1",
+      activePageId: "page-1",
+      activePageVersion: 1,
+      savedPage: { pageId: "page-1", version: 1, html: savedHtml, document: saved },
+    });
+    vi.mocked(api.savePageDelta).mockResolvedValue({
+      ...page,
+      html: undefined,
+      document: undefined,
+      version: 2,
+    });
+
+    await useStore.getState().saveActivePage();
+
+    const [, version, htmlEdits, documentPatch] = vi.mocked(api.savePageDelta).mock.calls[0];
+    expect(version).toBe(1);
+    expect(htmlEdits).toHaveLength(1);
+    expect(htmlEdits[0].text).toBe("2");
+    expect(documentPatch.length).toBeGreaterThan(0);
+    expect(api.savePage).not.toHaveBeenCalled();
+    expect(useStore.getState().activePageVersion).toBe(2);
+    expect(useStore.getState().savedPage).toEqual({
+      pageId: "page-1",
+      version: 2,
+      html: compileDocument(edited),
+      document: edited,
+    });
+  });
+
   it("surfaces an optimistic save conflict without overwriting", async () => {
     useStore.setState({
       code: "<html>stale</html>",
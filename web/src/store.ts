@@ -6,6 +6,7 @@ import {
   parseEditorDocument,
   type EditorDocumentV1,
 } from "./editor/document";
+import { diffJson, diffText } from "./lib/delta";
 import { errorMessage } from "./lib/errors";
 
 export type CanvasViewport = "desktop" | "tablet" | "mobile";
@@ -16,6 +17,23 @@ export const VIEWPORT_WIDTHS: Record<CanvasViewport, number | null> = {
   mobile: 390,
 };
 
+/** The active page's latest revision as saved, which autosave diffs against. */
+interface SavedPage {
+  pageId: string;
+  version: number;
+  html: string;
+  document: EditorDocumentV1 | null;
+}
+
+function savedPageOf(page: api.PageSnapshot): SavedPage {
+  return {
+    pageId: page.id,
+    version: page.version,
+    html: page.html,
+    document: page.document,
+  };
+}
+
 interface State {
   options: api.OptionsResponse | null;
   optionsError: string | null;
@@ -32,6 +50,11 @@ interface State {
 
   layoutDnaGuidance: string;
 
+  // Draft several first pages at once and keep the runners-up to switch to.
+  draftAlternatives: boolean;
+  candidates: api.GenerateCandidate[];
+  activeCandidate: number;
+
   editing: boolean;
   selectedNodeId: string | null;
   // Canvas framing lives here rather than in the workspace so the top bar can
@@ -41,6 +64,8 @@ interface State {
   // The generation currently running server-side, if any. Kept so the user can
   // stop it and so a reload can reattach to work already in flight.
   activeJobId: string | null;
+  // Per-section progress of the running generation, when it reports any.
+  jobProgress: api.JobProgress | null;
 
   code: string | null;
   editorDocument: EditorDocumentV1 | null;
@@ -68,6 +93,7 @@ interface State {
   activeProjectId: string | null;
   activePageId: string | null;
   activePageVersion: number;
+  savedPage: SavedPage | null;
   revisions: api.RevisionSummary[];
   checkpointName: string;
   saveState: "idle" | "saving" | "saved" | "conflict";
@@ -83,6 +109,7 @@ interface State {
   set: <K extends keyof State>(key: K, value: State[K]) => void;
   selectNode: (nodeId: string | null) => void;
   runGenerate: (prompt: string) => Promise<void>;
+  pickCandidate: (index: number) => void;
   runConstraints: () => Promise<void>;
   refreshSections: () => Promise<void>;
   runRegenerate: (instructions: string) => Promise<void>;
@@ -118,6 +145,17 @@ let autosaveTimer: ReturnType<typeof setTimeout> | null = null;
 let draftTimer: ReturnType<typeof setTimeout> | null = null;
 let projectRequestSequence = 0;
 const THREAD_STORAGE_KEY = "mwb_thread_id";
+/** First pages drafted at once with alternatives on; the server may cap it. */
+const DRAFT_CANDIDATES = 3;
+
+/** The returned page and its runners-up, best first; empty for a single draft. */
+function candidatesOf(res: api.GenerateResponse): api.GenerateCandidate[] {
+  if (!res.alternatives?.length || !res.score) return [];
+  return [
+    { html: res.html, safety_alerts: res.safety_alerts, notes: res.notes, score: res.score },
+    ...res.alternatives,
+  ];
+}
 
 function newThreadId(): string {
   const id = crypto.randomUUID();
@@ -178,14 +216,20 @@ function retainedNodeId(
 function cancellationAware(error: unknown): {
   busy: boolean;
   activeJobId: null;
+  jobProgress: null;
   error?: string;
 } {
   // Matched by name rather than instanceof: the class identity is not stable
   // across module boundaries, and this must not depend on how api is loaded.
   if (error instanceof Error && error.name === "GenerationCancelledError") {
-    return { busy: false, activeJobId: null };
+    return { busy: false, activeJobId: null, jobProgress: null };
   }
-  return { busy: false, activeJobId: null, error: errorMessage(error) };
+  return {
+    busy: false,
+    activeJobId: null,
+    jobProgress: null,
+    error: errorMessage(error),
+  };
 }
 
 export const useStore = create<State>((set, get) => ({
@@ -204,11 +248,16 @@ export const useStore = create<State>((set, get) => ({
 
   layoutDnaGuidance: "",
 
+  draftAlternatives: false,
+  candidates: [],
+  activeCandidate: 0,
+
   editing: false,
   selectedNodeId: null,
   viewport: "desktop",
   zoom: 1,
   activeJobId: null,
+  jobProgress: null,
 
   code: null,
   editorDocument: null,
@@ -236,6 +285,7 @@ export const useStore = create<State>((set, get) => ({
   activeProjectId: null,
   activePageId: null,
   activePageVersion: 0,
+  savedPage: null,
   revisions: [],
   checkpointName: "",
   saveState: "idle",
@@ -262,7 +312,7 @@ export const useStore = create<State>((set, get) => ({
 
   runGenerate: async (prompt) => {
     const s = get();
-    set({ busy: true, error: null });
+    set({ busy: true, error: null, candidates: [], activeCandidate: 0 });
     try {
       const res = await api.generate({
         prompt,
@@ -272,23 +322,38 @@ export const useStore = create<State>((set, get) => ({
         profile: s.profile,
         current_code: s.code,
         layout_dna_guidance: s.layoutDnaGuidance,
+        // Only a first page is drafted several ways; edits build on the page shown.
+        candidates: s.draftAlternatives && !s.code ? DRAFT_CANDIDATES : 1,
         thread_id: s.threadId,
-      }, (jobId) => set({ activeJobId: jobId }));
+      }, (jobId) => set({ activeJobId: jobId }), (progress) => set({ jobProgress: progress }));
       get().setCodeWithHistory(res.html);
       set({
         notes: res.notes,
         safetyAlerts: res.safety_alerts,
+        candidates: candidatesOf(res),
         busy: false,
         activeJobId: null,
+        jobProgress: null,
       });
     } catch (e) {
       set(cancellationAware(e));
     }
   },
 
+  pickCandidate: (index) => {
+    const candidate = get().candidates[index];
+    if (!candidate) return;
+    get().setCodeWithHistory(candidate.html);
+    set({
+      notes: candidate.notes,
+      safetyAlerts: candidate.safety_alerts,
+      activeCandidate: index,
+    });
+  },
+
   runConstraints: async () => {
     const s = get();
-    set({ busy: true, error: null });
+    set({ busy: true, error: null, candidates: [], activeCandidate: 0 });
     try {
       const res = await api.generate({
         tone: s.tone,
@@ -302,14 +367,16 @@ export const useStore = create<State>((set, get) => ({
           color_limit: s.constraintColor,
           density: s.constraintDensity,
         },
+        parallel_sections: true,
         thread_id: s.threadId,
-      }, (jobId) => set({ activeJobId: jobId }));
+      }, (jobId) => set({ activeJobId: jobId }), (progress) => set({ jobProgress: progress }));
       get().setCodeWithHistory(res.html);
       set({
         notes: res.notes,
         safetyAlerts: res.safety_alerts,
         busy: false,
         activeJobId: null,
+        jobProgress: null,
       });
     } catch (e) {
       set(cancellationAware(e));
@@ -457,6 +524,7 @@ export const useStore = create<State>((set, get) => ({
         activeProjectId: project.id,
         activePageId: page.id,
         activePageVersion: page.version,
+        savedPage: savedPageOf(page),
         saveState: "saved",
         revisions: [],
         error: null,
@@ -489,6 +557,7 @@ export const useStore = create<State>((set, get) => ({
         activeProjectId: project.id,
         activePageId: page.id,
         activePageVersion: page.version,
+        savedPage: savedPageOf(page),
         ...materialized,
         selectedNodeId: null,
         undoStack: [],
@@ -545,6 +614,7 @@ export const useStore = create<State>((set, get) => ({
           activeProjectId: null,
           activePageId: null,
           activePageVersion: 0,
+          savedPage: null,
           revisions: [],
           saveState: "idle",
         });
@@ -565,20 +635,46 @@ export const useStore = create<State>((set, get) => ({
     }
     const pageId = s.activePageId;
     const html = s.code;
+    const editorDocument = s.editorDocument;
     const expectedVersion = s.activePageVersion;
+    const base =
+      s.savedPage?.pageId === pageId && s.savedPage.version === expectedVersion
+        ? s.savedPage
+        : null;
     set({ saveState: "saving", saveQueued: false });
-    try {
-      const page = await api.savePage(
-        pageId,
-        html,
-        expectedVersion,
-        "autosave",
-        s.editorDocument,
+    const saveWhole = async (): Promise<SavedPage> =>
+      savedPageOf(
+        await api.savePage(pageId, html, expectedVersion, "autosave", editorDocument),
       );
+    // Send only what changed since the saved revision, so a keystroke costs
+    // bytes rather than the whole page.
+    const saveDelta = async (saved: SavedPage): Promise<SavedPage> => {
+      // As with a whole save, a page without a structured document keeps the
+      // saved one while its HTML is unchanged.
+      const document = editorDocument ?? (html === saved.html ? saved.document : null);
+      try {
+        const page = await api.savePageDelta(
+          pageId,
+          expectedVersion,
+          diffText(saved.html, html),
+          diffJson(saved.document, document),
+        );
+        // The server returns the content only when it rewrote it.
+        return page.html === undefined
+          ? { pageId, version: page.version, html, document }
+          : { pageId, version: page.version, html: page.html, document: page.document ?? null };
+      } catch (e) {
+        if (e instanceof api.PageVersionConflictError) throw e;
+        return saveWhole();
+      }
+    };
+    try {
+      const saved = base ? await saveDelta(base) : await saveWhole();
       if (get().activePageId !== pageId) return;
       const saveAgain = get().saveQueued || get().code !== html;
       set({
-        activePageVersion: page.version,
+        activePageVersion: saved.version,
+        savedPage: saved,
         saveState: "saved",
         saveQueued: false,
         error: null,
@@ -631,6 +727,7 @@ export const useStore = create<State>((set, get) => ({
         ...materialized,
         selectedNodeId: null,
         activePageVersion: page.version,
+        savedPage: savedPageOf(page),
         undoStack: previous
           ? [...get().undoStack.slice(-49), previous]
           : get().undoStack,
@@ -661,6 +758,7 @@ export const useStore = create<State>((set, get) => ({
       set({
         checkpointName: "",
         activePageVersion: page.version,
+        savedPage: savedPageOf(page),
         saveState: "saved",
         error: null,
       });
@@ -746,9 +844,10 @@ export const useStore = create<State>((set, get) => ({
       const result = await api.awaitJob<{ html?: string | null }>(
         running.id,
         "Generation failed",
+        (progress) => set({ jobProgress: progress }),
       );
       if (result?.html) get().setCodeWithHistory(result.html);
-      set({ busy: false, activeJobId: null });
+      set({ busy: false, activeJobId: null, jobProgress: null });
     } catch (e) {
       set(cancellationAware(e));
     }